@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the Math-cell pipeline.
+
+Usage:
+  python scripts/bench_math_cell.py expressions [--repeat N]
+  python scripts/bench_math_cell.py statements [--repeat N]
+  python scripts/bench_math_cell.py functions [--repeat N]
+  python scripts/bench_math_cell.py latex
+  python scripts/bench_math_cell.py solve [--repeat N]
+  python scripts/bench_math_cell.py canonicalize [--repeat N]
+  python scripts/bench_math_cell.py blowup
+  python scripts/bench_math_cell.py linear [--repeat N]
+  python scripts/bench_math_cell.py incremental
+  python scripts/bench_math_cell.py branches
+  python scripts/bench_math_cell.py rpc [--repeat N]
+  python scripts/bench_math_cell.py tiers
+  python scripts/bench_math_cell.py numeric [--repeat N]
+  python scripts/bench_math_cell.py table [--repeat N]
+  python scripts/bench_math_cell.py cas
+  python scripts/bench_math_cell.py lambdify [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict
+from unittest.mock import patch
+
+import sympy as sp
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from sugarpy import (  # noqa: E402
+    branch_runner,
+    cas_memo,
+    expression_guard,
+    lambdify_cache,
+    latex_memo,
+    linear_solver,
+    math_cell,
+    math_parser,
+    notebook_dataflow,
+    numeric_eval,
+    server_extension,
+    solver_portfolio,
+    statement_cache,
+)
+
+EXPRESSIONS = [
+    "2x + 1",
+    "x^2 - 3x + 2",
+    "(x+1)(x-1)",
+    "sin(30) + cos(60)",
+    "sqrt(2)/2",
+    "3.5x^2 + .5y",
+    "(h-3)^2 + (k-38)^2",
+    "solve(x^2 = 4, x)",
+    "expand((a+b)^4)",
+    "[1, 2, 3]",
+]
+STATEMENTS = [
+    "a := 3",
+    "b := 4",
+    "c := sqrt(a^2 + b^2)",
+    "2a + 3b",
+    "alpha := atan(b/a)",
+    "sin(alpha)^2 + cos(alpha)^2",
+    "p := x^2 - 5x + 6",
+    "expand((x + a)(x - b))",
+    "r := 2.5",
+    "pi r^2",
+]
+
+# Equations as students commonly type them into `solve(...)`.
+SOLVE_CORPUS = [
+    "solve(x^2 = 4, x)",
+    "solve(2x + 3 = 7, x)",
+    "solve(x^2 - 5x + 6 = 0, x)",
+    "solve(x^3 - 3x + 1 = 0, x)",
+    "solve(x^4 - 10x^2 + 9 = 0, x)",
+    "solve(x^5 - x + 1 = 0, x)",
+    "solve(sqrt(x + 3) = x - 3, x)",
+    "solve(1/x + 1/(x+1) = 1, x)",
+    "solve(2^x = 10, x)",
+    "solve(exp(x) = 3x, x)",
+    "solve(sin(x) = 1/2, x)",
+    "solve(cos(x) = x, x)",
+    "solve(x^x = 2, x)",
+    "solve((x + y = 3, x - y = 1), (x, y))",
+    "solve((x^2 + y^2 = 25, y = 2x + 1), (x, y))",
+    "solve(((x-3)^2 + (y+1)^2 = 9, (x-4)^2 + (y-1)^2 = 4), (x, y))",
+    "solve((x y = 6, x + y = 5), (x, y))",
+    "solve((x^2 + y^2 = 1, x^2 - y = 1/2), (x, y))",
+]
+
+# Equation assignments from small student equations up to pasted rational/radical ones.
+CANONICALIZE_CORPUS = [
+    "E1 := x^2 - 5x + 6 = 0",
+    "E2 := (x-3)^2 + (y+1)^2 = 9",
+    "E3 := 1/x + 1/(x+1) = 1",
+    "E4 := sin(x)^2 + cos(x)^2 = (x+1)^2/(x+1)",
+    "E5 := ((x+1)^6 - (x-1)^6)/(x^2+1) = (2x+3)^4/(x-2)^2",
+    "E6 := (x+1)^8 (x-2)^5/(x^2+3x+1)^3 + (x-1)^7/(x+4)^2 = (2x+1)^9/(x^3+1) + sin(x)^2 + cos(x)^2",
+    "E7 := (a x + b)^4/(c x - d)^3 + sqrt(x^2 + a^2)/(x + b) = (x - a)^5 (x + c)^2/(x^2 + d)",
+]
+
+
+def _time_call(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def bench_expressions(repeat: int) -> None:
+    """Median latency of `parse_sympy_expression` per expression for each backend."""
+    print(f"{'expression':<24} {'parse_expr us':>14} {'direct us':>10} {'speedup':>8}")
+    for source in EXPRESSIONS:
+        row = []
+        for backend in math_parser.EXPRESSION_BACKENDS:
+            previous = math_parser.set_expression_backend(backend)
+            try:
+                math_parser.parse_sympy_expression(source, mode="deg", user_ns={})
+                row.append(
+                    _time_call(
+                        lambda: math_parser.parse_sympy_expression(source, mode="deg", user_ns={}),
+                        repeat,
+                    )
+                )
+            finally:
+                math_parser.set_expression_backend(previous)
+        reference, direct = row
+        print(f"{source:<24} {reference * 1e6:>14.1f} {direct * 1e6:>10.1f} {reference / direct:>7.1f}x")
+
+
+def bench_statements(repeat: int) -> None:
+    """Statement throughput of the single-statement renderer, plus the locals-table build alone."""
+    user_ns: Dict[str, object] = {}
+    for source in STATEMENTS:
+        math_cell._render_single_math(source, "deg", user_ns)
+
+    def run_statements() -> None:
+        for source in STATEMENTS:
+            math_cell._render_single_math(source, "deg", user_ns)
+
+    def build_locals() -> None:
+        for source in STATEMENTS:
+            math_parser.build_math_locals([source], mode="deg", user_ns=user_ns)
+
+    per_batch = _time_call(run_statements, repeat)
+    per_locals = _time_call(build_locals, repeat)
+    count = len(STATEMENTS)
+    print(f"statements/s:      {count / per_batch:10.0f}  ({per_batch / count * 1e6:.1f} us/statement)")
+    print(f"locals builds/s:   {count / per_locals:10.0f}  ({per_locals / count * 1e6:.1f} us/build)")
+
+
+def bench_functions(repeat: int) -> None:
+    """Per-call cost of a Math-cell function, compiled once versus re-parsed per call."""
+    user_ns: Dict[str, object] = {"a": 3}
+    fn = math_cell._make_math_function("f", ("x",), "a x^2 + sin(x) - 1", mode="deg", user_ns=user_ns)
+    slow = math_cell._make_math_function("g", ("x",), "a x^2 + sin(x) - 1", mode="deg", user_ns=user_ns)
+    slow._sugarpy_compiled[0] = None
+    values = list(range(50))
+
+    compiled = _time_call(lambda: [fn(value) for value in values], repeat) / len(values)
+    reparsed = _time_call(lambda: [slow(value) for value in values], repeat) / len(values)
+    print(f"re-parsed call: {reparsed * 1e6:8.1f} us")
+    print(f"compiled call:  {compiled * 1e6:8.1f} us  ({reparsed / compiled:.1f}x)")
+
+
+def _run_notebook(
+    path: Path,
+    render_mode: str,
+    shell: SimpleNamespace | None = None,
+    edit: Callable[[str], str] | None = None,
+) -> list[Dict[str, object]]:
+    """Run every Math cell of a notebook; with a `shell`, cells keep their ids and share that namespace."""
+    notebook = json.loads(path.read_text())
+    cell_ids = shell is not None
+    shell = shell or SimpleNamespace(user_ns={})
+    trig_mode = notebook.get("trigMode") or "deg"
+    results = []
+    with (
+        patch.object(math_cell, "get_ipython", return_value=shell),
+        contextlib.redirect_stdout(io.StringIO()),
+        warnings.catch_warnings(),
+    ):
+        warnings.simplefilter("ignore")
+        for cell in notebook.get("cells", []):
+            if cell.get("type") == "math" and str(cell.get("source") or "").strip():
+                source = edit(cell["source"]) if edit is not None else cell["source"]
+                results.append(
+                    math_cell.render_math_cell(
+                        source,
+                        trig_mode,
+                        render_mode=render_mode,
+                        cell_id=str(cell.get("id")) if cell_ids else None,
+                    )
+                )
+    return results
+
+
+def _run_all_notebooks(render_mode: str) -> None:
+    for path in sorted((ROOT / "notebooks").glob("*.sugarpy")):
+        _run_notebook(path, render_mode)
+
+
+def bench_latex(repeat: int) -> None:
+    """LaTeX memo hit rates over a Run All of the example notebooks, then a rerun in each render mode."""
+    latex_memo.clear_latex_memo()
+    _run_all_notebooks("exact")
+    first = latex_memo.latex_memo_info()
+    _run_all_notebooks("exact")
+    _run_all_notebooks("decimal")
+    repeated = latex_memo.latex_memo_info()
+
+    def _rate(info: Dict[str, int]) -> str:
+        lookups = info["hits"] + info["misses"]
+        return f"{info['hits']:6d}/{lookups:<6d} ({info['hits'] / lookups if lookups else 0.0:6.1%})"
+
+    print(f"{'memo':<12} {'first Run All':>24} {'after reruns':>24}")
+    for name in ("identity", "structural"):
+        print(f"{name:<12} {_rate(first[name]):>24} {_rate(repeated[name]):>24}")
+
+
+def bench_solve(repeat: int) -> None:
+    """Median statement latency of the solve corpus with sequential and portfolio solving."""
+    print(f"{'equation':<60} {'sequential ms':>14} {'portfolio ms':>13}  portfolio answer")
+    runs = max(min(repeat, 5), 1)
+    for source in SOLVE_CORPUS:
+        row = []
+        answer = ""
+        for mode in solver_portfolio.SOLVER_MODES:
+            previous = solver_portfolio.set_solver_mode(mode)
+            shell = SimpleNamespace(user_ns={})
+            try:
+                with patch.object(math_cell, "get_ipython", return_value=shell), warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    result: Dict[str, object] = {}
+
+                    def run() -> None:
+                        result.update(math_cell.render_math_cell(source))
+
+                    row.append(_time_call(run, runs))
+            finally:
+                solver_portfolio.set_solver_mode(previous)
+            if not result.get("ok"):
+                answer = "error"
+            else:
+                answer = "numeric" if result.get("warnings") else "exact"
+        sequential, portfolio = row
+        print(f"{source:<60} {sequential * 1e3:>14.1f} {portfolio * 1e3:>13.1f}  {answer}")
+
+
+def bench_canonicalize(repeat: int) -> None:
+    """Equation-assignment latency per canonicalization policy, then Run All time per example notebook."""
+    runs = max(min(repeat, 3), 1)
+    policies = math_parser.CANONICALIZE_POLICIES
+    header = " ".join(f"{policy + ' ms':>11}" for policy in policies)
+    print(f"{'equation':<48} {'ops':>4} {header}")
+    for source in CANONICALIZE_CORPUS:
+        lhs, rhs = source.split(":=", 1)[1].split("=", 1)
+        ops = sp.count_ops(
+            math_parser.parse_sympy_expression(lhs, mode="rad", user_ns={})
+            - math_parser.parse_sympy_expression(rhs, mode="rad", user_ns={})
+        )
+        timings = []
+        for policy in policies:
+            previous = math_parser.set_canonicalize_policy(policy)
+            try:
+                # SymPy's global cache would otherwise hide the canonicalization cost on repeated runs.
+                timings.append(
+                    _time_call(
+                        lambda: (sp.core.cache.clear_cache(), math_cell._render_single_math(source, "rad", {})),
+                        runs,
+                    )
+                )
+            finally:
+                math_parser.set_canonicalize_policy(previous)
+        print(f"{source[:48]:<48} {ops:>4} " + " ".join(f"{value * 1e3:>11.1f}" for value in timings))
+
+    print()
+    header = " ".join(f"{policy + ' s':>11}" for policy in policies)
+    print(f"{'notebook':<53} {header}  changed vs simplify")
+    for path in sorted((ROOT / "notebooks").glob("*.sugarpy")):
+        timings = {}
+        outputs = {}
+        for policy in policies:
+            previous = math_parser.set_canonicalize_policy(policy)
+            try:
+                outputs[policy] = [(r.get("steps"), r.get("value"), r.get("error")) for r in _run_notebook(path, "exact")]
+                timings[policy] = _time_call(lambda: (sp.core.cache.clear_cache(), _run_notebook(path, "exact")), runs)
+            finally:
+                math_parser.set_canonicalize_policy(previous)
+        changed = [policy for policy in policies if outputs[policy] != outputs["simplify"]]
+        print(
+            f"{path.name:<53} "
+            + " ".join(f"{timings[policy]:>11.2f}" for policy in policies)
+            + f"  {', '.join(changed) or '-'}"
+        )
+
+
+def bench_blowup(repeat: int) -> None:
+    """Per-step latency of an iterated exact radical with the size guard on and off."""
+    steps = 8
+    columns = {}
+    for label, limit in (("guarded", ""), ("unguarded", "0")):
+        previous = os.environ.get(expression_guard.MAX_OPS_ENV)
+        os.environ[expression_guard.MAX_OPS_ENV] = limit
+        try:
+            user_ns: Dict[str, object] = {}
+            math_cell._render_single_math("a := 1 + sqrt(2) + 3^(1/3)", "rad", user_ns)
+            timings = []
+            for _ in range(steps):
+                sp.core.cache.clear_cache()
+                latex_memo.clear_latex_memo()
+                timings.append(_time_call(lambda: math_cell._render_single_math("a := (a + 5/a)/2", "rad", user_ns), 1))
+            columns[label] = timings
+        finally:
+            if previous is None:
+                os.environ.pop(expression_guard.MAX_OPS_ENV, None)
+            else:
+                os.environ[expression_guard.MAX_OPS_ENV] = previous
+    print(f"{'a := (a + 5/a)/2':<18} {'guarded ms':>11} {'unguarded ms':>13}")
+    for step, (guarded, unguarded) in enumerate(zip(columns["guarded"], columns["unguarded"]), start=1):
+        print(f"{'step ' + str(step):<18} {guarded * 1e3:>11.1f} {unguarded * 1e3:>13.1f}")
+
+
+LINEAR_SIZES = (10, 25, 50, 100, 200)
+# Generic `sp.solve` takes seconds past this size; larger systems only time the fast path.
+LINEAR_SOLVE_MAX_UNKNOWNS = 50
+
+
+def _linear_system_source(size: int, rng: random.Random, floats: bool = False) -> str:
+    """A sparse, worksheet-style system: each equation couples three unknowns."""
+    rows = []
+    for row in range(size):
+        columns = sorted({row, (row + 1) % size, rng.randrange(size)})
+        coefficient = "{}.5" if floats else "{}"
+        terms = " + ".join(f"{coefficient.format(rng.choice([1, 2, 3, 5]))} x{column}" for column in columns)
+        rows.append(f"{terms} = {rng.randint(-20, 20)}")
+    unknowns = ", ".join(f"x{column}" for column in range(size))
+    return f"solve(({', '.join(rows)}), ({unknowns}))"
+
+
+def bench_linear(repeat: int) -> None:
+    """Linear systems of 10-200 unknowns: generic `sp.solve`, the fast path, and a whole Math statement."""
+    runs = max(min(repeat, 3), 1)
+    rng = random.Random(7)
+    print(
+        f"{'unknowns':>8} {'sp.solve ms':>12} {'exact ms':>9} {'float ms':>9} {'statement ms':>13}"
+    )
+    for size in LINEAR_SIZES:
+        source = _linear_system_source(size, rng)
+        float_source = _linear_system_source(size, rng, floats=True)
+        call = source[len("solve(") : -1]
+        equations, unknowns = math_parser.parse_sympy_expression(f"({call})", mode="rad", user_ns={})
+        float_equations, _unknowns = math_parser.parse_sympy_expression(
+            f"({float_source[len('solve(') : -1]})", mode="rad", user_ns={}
+        )
+        reference = "-"
+        if size <= LINEAR_SOLVE_MAX_UNKNOWNS:
+            canonical = [equation.lhs - equation.rhs for equation in equations]
+            reference = f"{_time_call(lambda: sp.solve(canonical, unknowns), 1) * 1e3:.1f}"
+        exact = _time_call(lambda: linear_solver.solve_linear_system(equations, (unknowns,)), runs)
+        floating = _time_call(lambda: linear_solver.solve_linear_system(float_equations, (unknowns,)), runs)
+        statement = _time_call(lambda: math_cell._render_single_math(source, "rad", {}), runs)
+        print(f"{size:>8} {reference:>12} {exact * 1e3:>9.1f} {floating * 1e3:>9.1f} {statement * 1e3:>13.1f}")
+
+
+def bench_incremental(repeat: int) -> None:
+    """Math-cell Run All per example notebook: first run, unchanged rerun, and rerun with a line appended to each cell."""
+    print(f"{'notebook':<32} {'first s':>8} {'unchanged s':>12} {'line appended s':>16}")
+    for path in sorted((ROOT / "notebooks").glob("*.sugarpy")):
+        statement_cache.clear_cell_records()
+        sp.core.cache.clear_cache()
+        shell = SimpleNamespace(user_ns={})
+        first = _time_call(lambda: _run_notebook(path, "exact", shell), 1)
+        unchanged = _time_call(lambda: _run_notebook(path, "exact", shell), 1)
+        edited = _time_call(lambda: _run_notebook(path, "exact", shell, edit=lambda source: source + "\n1"), 1)
+        print(f"{path.name:<32} {first:>8.2f} {unchanged:>12.3f} {edited:>16.3f}")
+
+
+def _branch_notebook(sections: int) -> list[Dict[str, str]]:
+    cells = [{"id": "setup", "type": "code", "source": "k = 2"}]
+    for section in range(1, sections + 1):
+        cells += [
+            {"id": f"md{section}", "type": "markdown", "source": f"# Exercise {section}"},
+            {"id": f"r{section}", "type": "code", "source": f"r{section} = integrate(x*exp(x)*sin({section + 1}*x)**2, x)"},
+            {"id": f"m{section}", "type": "math", "source": f"s{section} := k*{section}\nt{section} := s{section}^2 + 1"},
+            {"id": f"c{section}", "type": "code", "source": f"c{section} = diff(r{section}, x).subs(x, t{section})"},
+        ]
+    return cells
+
+
+def bench_branches(repeat: int) -> None:
+    """Run All of four independent heavy sections: every cell in order vs. the planned forked branches."""
+    from IPython.core.interactiveshell import InteractiveShell
+
+    cells = _branch_notebook(4)
+    graph = notebook_dataflow.NotebookGraph(cells, "deg")
+    stages = notebook_dataflow.plan_stages(graph, 4)
+    print("plan:", " | ".join("+".join(",".join(graph.cell_ids[i] for i in branch) for branch in stage) for stage in stages))
+    code = {graph.cell_ids[i]: server_extension._cell_source_for_execution(cells[i], "deg", "exact") for i in range(len(cells))}
+    user_ns = InteractiveShell.instance().user_ns
+
+    def _fresh() -> None:
+        sp.core.cache.clear_cache()
+        statement_cache.clear_cell_records()
+        exec(server_extension._bootstrap_code(), user_ns)
+
+    def _branch(indices: list[int]) -> Dict[str, object]:
+        return {
+            "cells": [{"cellId": graph.cell_ids[i], "code": code[graph.cell_ids[i]]} for i in indices],
+            "writes": sorted(set().union(*(graph.writes(i) for i in indices))),
+        }
+
+    def _sequential() -> None:
+        for stage in stages:
+            for branch in stage:
+                branch_runner.run_branches([_branch(branch)], user_ns)
+
+    def _planned() -> None:
+        for stage in stages:
+            branch_runner.run_branches([_branch(branch) for branch in stage], user_ns)
+
+    _fresh()
+    _sequential()  # warm the integration tables both runs rely on
+    section_times = []
+    _fresh()
+    branch_runner.run_branches([_branch(stages[0][0])], user_ns)
+    for branch in stages[1]:
+        sp.core.cache.clear_cache()
+        section_times.append(_time_call(lambda: branch_runner.run_branches([_branch(branch)], user_ns), 1))
+    _fresh()
+    sequential = _time_call(_sequential, 1)
+    _fresh()
+    planned = _time_call(_planned, 1)
+    cpus = branch_runner.usable_cpus()
+    print(f"usable CPUs:  {cpus}" + ("" if branch_runner.branches_available() else "  (branches run in order)"))
+    print("sections s:   " + " ".join(f"{value:.2f}" for value in section_times))
+    print(f"sequential s: {sequential:.2f}")
+    print(f"branches s:   {planned:.2f}  (slowest section {max(section_times):.2f})")
+
+
+_RPC_CELLS = [
+    {"id": "m1", "type": "math", "source": "1 + 1"},
+    {"id": "m2", "type": "math", "source": "a := 3\nb := a^2 + 1\nb"},
+    {"id": "s1", "type": "stoich", "stoichState": {"reaction": "2H2 + O2 -> 2H2O", "inputs": {"H2": {"mass": 4}}}},
+    {
+        "id": "r1",
+        "type": "regression",
+        "regressionState": {"points": [{"x": i, "y": 2 * i + 1} for i in range(8)], "model": "linear"},
+    },
+]
+
+
+def bench_rpc(repeat: int) -> None:
+    """Per-cell latency through an in-process runtime: generated source vs. the structured kernel request."""
+    import tempfile
+
+    from sugarpy.runtime_manager import RuntimeManager
+
+    repeat = min(repeat, 100)
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as storage, patch.dict(os.environ, {"SUGARPY_NOTEBOOK_RUNTIME_BACKEND": "inprocess"}):
+        manager = RuntimeManager(
+            storage_root=Path(storage),
+            project_root=ROOT,
+            bootstrap_code=server_extension._bootstrap_code(),
+            executor=server_extension._execute_kernel_code,
+            rpc_executor=server_extension._call_kernel_rpc,
+        )
+        loop.run_until_complete(manager.ensure_runtime("bench-rpc"))
+        try:
+            print(f"{'cell':<12} {'source ms':>10} {'rpc ms':>10} {'saved ms':>10}")
+            for cell in _RPC_CELLS:
+                code = server_extension._cell_source_for_execution(cell, "deg", "exact")
+                request = server_extension._kernel_rpc_request(cell, "deg", "exact")
+                via_source = _time_call(lambda: loop.run_until_complete(manager.execute_code("bench-rpc", code, 20.0)), repeat)
+                via_rpc = _time_call(lambda: loop.run_until_complete(manager.call_rpc("bench-rpc", request, 20.0)), repeat)
+                label = f"{cell['type']}:{cell['id']}"
+                print(f"{label:<12} {via_source * 1000:>10.2f} {via_rpc * 1000:>10.2f} {(via_source - via_rpc) * 1000:>10.2f}")
+        finally:
+            loop.run_until_complete(manager.delete_runtime("bench-rpc"))
+            loop.close()
+
+
+def _rss_mib(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def bench_tiers(repeat: int) -> None:
+    """Startup time and resident memory of the math-only worker vs. an ipykernel runtime process.
+
+    Both run locally here: the Docker tier runs these same commands inside a container.
+    """
+    import tempfile
+
+    from jupyter_client.manager import AsyncKernelManager
+
+    from sugarpy.runtime_manager import RuntimeManager
+
+    request = server_extension._kernel_rpc_request(_RPC_CELLS[1], "deg", "exact")
+    loop = asyncio.new_event_loop()
+    rows = []
+    with tempfile.TemporaryDirectory() as storage, patch.dict(os.environ, {"SUGARPY_NOTEBOOK_RUNTIME_BACKEND": "inprocess"}):
+        manager = RuntimeManager(
+            storage_root=Path(storage),
+            project_root=ROOT,
+            bootstrap_code=server_extension._bootstrap_code(),
+            executor=server_extension._execute_kernel_code,
+        )
+        started = time.perf_counter()
+        loop.run_until_complete(manager.ensure_runtime("bench-tier", math_only=True))
+        startup = time.perf_counter() - started
+        loop.run_until_complete(manager.call_rpc("bench-tier", request, 20.0))
+        rows.append(("math worker", startup, _rss_mib(manager._sessions["bench-tier"].process.pid)))
+        loop.run_until_complete(manager.delete_runtime("bench-tier"))
+
+    async def _kernel() -> tuple[float, float]:
+        kernel_manager = AsyncKernelManager(kernel_name="python3")
+        started = time.perf_counter()
+        await kernel_manager.start_kernel(env={**os.environ, "PYTHONPATH": str(ROOT / "src")})
+        client = kernel_manager.client()
+        client.start_channels()
+        try:
+            await client.wait_for_ready(timeout=60)
+            await server_extension._execute_kernel_code(client, server_extension._bootstrap_code(), 60.0)
+            startup = time.perf_counter() - started
+            await server_extension._call_kernel_rpc(client, request, 20.0)
+            return startup, _rss_mib(kernel_manager.provisioner.pid)
+        finally:
+            client.stop_channels()
+            await kernel_manager.shutdown_kernel(now=True)
+
+    rows.append(("ipykernel", *loop.run_until_complete(_kernel())))
+    loop.close()
+    print(f"{'runtime':<12} {'startup s':>10} {'RSS MiB':>10}")
+    for label, startup, rss in rows:
+        print(f"{label:<12} {startup:>10.2f} {rss:>10.1f}")
+
+
+NUMERIC_STATEMENTS = [
+    "3.2*sin(41)^2 + 17/9",
+    "sqrt(2)/2 + cos(60)",
+    "2*pi*r",
+    "m*9.81*h",
+    "log(250, 10) - ln(3)",
+    "atan(0.75) + asin(1/3)",
+    "(1 + 0.05/12)^(12*30)",
+    "exp(-0.5) * 1600 / 7",
+]
+
+
+def bench_numeric(repeat: int) -> None:
+    """Decimal-mode latency of purely numeric statements with the mpmath fast path on and off."""
+    user_ns_base = {"r": sp.Float("2.5"), "m": sp.Integer(72), "h": sp.Rational(7, 2)}
+    print(f"{'statement':<26} {'symbolic us':>12} {'fast us':>9} {'speedup':>8}")
+    previous = numeric_eval.numeric_fast_path_enabled()
+    try:
+        for source in NUMERIC_STATEMENTS:
+            timings = {}
+            for enabled in (False, True):
+                numeric_eval.set_numeric_fast_path(enabled)
+                user_ns = dict(user_ns_base)
+
+                def run() -> None:
+                    sp.core.cache.clear_cache()
+                    latex_memo.clear_latex_memo()
+                    math_cell._render_single_math(source, "deg", user_ns, render_mode="decimal")
+
+                timings[enabled] = _time_call(run, repeat)
+            print(
+                f"{source:<26} {timings[False] * 1e6:>12.0f} {timings[True] * 1e6:>9.0f} "
+                f"{timings[False] / timings[True]:>7.1f}x"
+            )
+    finally:
+        numeric_eval.set_numeric_fast_path(previous)
+
+
+def bench_table(repeat: int) -> None:
+    """One `table(...)` statement vs. one Math statement per row for the same values."""
+    body = "x^3 - 2x + sin(x)"
+    print(f"{'rows':>6} {'per-row ms':>11} {'table ms':>9} {'speedup':>8}")
+    for rows in (11, 101, 401):
+        step = 100 / (rows - 1)
+        row_sources = [body.replace("x", f"({index * step})") for index in range(rows)]
+
+        def per_row() -> None:
+            user_ns: Dict[str, object] = {}
+            for source in row_sources:
+                math_cell._render_single_math(source, "deg", user_ns, render_mode="decimal")
+
+        def table() -> None:
+            math_cell._render_single_math(f"table({body}, x = 0..100, step={step})", "deg", {}, render_mode="decimal")
+
+        per_row_s = _time_call(per_row, max(1, repeat // 10))
+        table_s = _time_call(table, repeat)
+        print(f"{rows:>6} {per_row_s * 1e3:>11.1f} {table_s * 1e3:>9.2f} {per_row_s / table_s:>7.0f}x")
+
+
+def bench_cas(repeat: int) -> None:
+    """Run All of the example notebooks twice, with the CAS memo on and off (SymPy's cache cleared between runs)."""
+    previous = cas_memo.cas_memo_enabled()
+    print(f"{'memo':<6} {'first Run All s':>16} {'second Run All s':>17} {'hits':>6} {'misses':>7}")
+    try:
+        for enabled in (False, True):
+            cas_memo.set_cas_memo(enabled)
+            cas_memo.clear_cas_memo()
+            timings = []
+            for _ in range(2):
+                sp.core.cache.clear_cache()
+                latex_memo.clear_latex_memo()
+                started = time.perf_counter()
+                _run_all_notebooks("exact")
+                timings.append(time.perf_counter() - started)
+            info = cas_memo.cas_memo_info()
+            print(
+                f"{'on' if enabled else 'off':<6} {timings[0]:>16.2f} {timings[1]:>17.2f} "
+                f"{info['hits']:>6} {info['misses']:>7}"
+            )
+    finally:
+        cas_memo.set_cas_memo(previous)
+
+
+PLOT_EXPRESSIONS = [
+    "sin(x)",
+    "x**3 - 2*x + 1",
+    "exp(-x**2/4)*cos(3*x)",
+    "tan(x)",
+    "sqrt(x) + log(x + 2)",
+    "(x**2 - 1)/(x**2 + 1) + sin(x)/x",
+]
+
+
+def bench_lambdify(repeat: int) -> None:
+    """Re-plotting the same curves with the compiled-function cache cleared before each plot, and kept warm."""
+    from sugarpy import startup
+
+    exprs = [sp.sympify(source) for source in PLOT_EXPRESSIONS]
+    runs = max(repeat // 20, 3)
+    print(f"{'expression':<34} {'cold ms':>8} {'warm ms':>8} {'speedup':>8}")
+    with patch.object(startup, "display"):
+        for source, expr in zip(PLOT_EXPRESSIONS, exprs):
+            cold_s = _time_call(lambda: (lambdify_cache.clear_lambdify_cache(), startup.plot(expr)), runs)
+            warm_s = _time_call(lambda: startup.plot(expr), runs)
+            print(f"{source:<34} {cold_s * 1e3:>8.2f} {warm_s * 1e3:>8.2f} {cold_s / warm_s:>7.1f}x")
+
+
+SUITES: Dict[str, Callable[[int], None]] = {
+    "expressions": bench_expressions,
+    "statements": bench_statements,
+    "functions": bench_functions,
+    "latex": bench_latex,
+    "solve": bench_solve,
+    "canonicalize": bench_canonicalize,
+    "blowup": bench_blowup,
+    "linear": bench_linear,
+    "incremental": bench_incremental,
+    "branches": bench_branches,
+    "rpc": bench_rpc,
+    "tiers": bench_tiers,
+    "numeric": bench_numeric,
+    "table": bench_table,
+    "cas": bench_cas,
+    "lambdify": bench_lambdify,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("suite", choices=sorted(SUITES))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    SUITES[args.suite](args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,298 @@
+"""Run independent notebook branches concurrently in forked copies of the namespace.
+
+The server plans a Run All into stages (`sugarpy.notebook_dataflow.plan_stages`).
+For a stage with several branches it sends one execution that calls
+`display_branches`. Every branch runs in its own forked process, starting from
+the namespace the shared prefix left behind. Each child executes its cells in
+order, captures their outputs, and sends back the results together with the
+namespace entries it changed. The parent merges those entries into the live
+namespace and emits all cell results in one payload, which the server splits
+back into per-cell responses in notebook order.
+
+Some branches run in the parent while the children work, decided before
+forking. These are branches the plan marks `parent`: Math cells and plots keep
+render tokens, statement records and plot sessions in kernel-side stores that
+a child cannot hand back, and notebook and Math functions do not pickle. Also
+branches that change in place an object another name or container also holds,
+since a pickled copy would no longer be shared. A forked branch whose writes
+still cannot be pickled (open files, ...), that reached one of those stores
+anyway (a plot drawn by a notebook function), or whose child dies, is executed
+again in the parent so that the live namespace ends up in the same state as a
+sequential run. Without `fork`, or with a single usable CPU, every branch runs
+in the parent.
+
+Children ask Linux to kill them when the kernel dies, so a restarted kernel
+leaves no orphans, and the parent kills any child still running when the
+stage's time budget is spent; its cells report a timeout.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import gc
+import importlib
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+import time
+import types
+from multiprocessing.connection import wait
+from typing import Any, Dict, Sequence
+
+from IPython.core.getipython import get_ipython
+from IPython.display import display
+from IPython.utils.capture import capture_output
+
+BRANCHES_MIME = "application/vnd.sugarpy.branches+json"
+_MISSING = object()
+_IMMUTABLE = (int, float, complex, str, bytes, bool, type(None), frozenset, types.ModuleType)
+# Kernel-side stores a cell fills for later requests (mode toggles, plot resampling, reruns).
+_KERNEL_STORES = (
+    ("sugarpy.math_cell", "_RENDER_STORE"),
+    ("sugarpy.statement_cache", "_CELL_RECORDS"),
+    ("sugarpy.startup", "_PLOT_SESSIONS"),
+)
+_PR_SET_PDEATHSIG = 1
+
+
+class _ModuleRef:
+    # Modules do not pickle; the parent imports them again by name.
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+def _defined_in_notebook(value: Any) -> bool:
+    # Functions and classes from notebook cells pickle by reference to `__main__`, which the parent lacks.
+    return isinstance(value, (types.FunctionType, type)) and getattr(value, "__module__", None) == "__main__"
+
+
+def usable_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def branches_available() -> bool:
+    # On a single core the forks would only add copy-on-write and pickling overhead.
+    return "fork" in multiprocessing.get_all_start_methods() and usable_cpus() > 1
+
+
+def _mime_data(outputs: Sequence[Any]) -> Dict[str, Any]:
+    # Same merge as the kernel client: plain text accumulates, richer types keep the last value.
+    mime_data: Dict[str, Any] = {}
+    for output in outputs:
+        for mime, value in (output.data or {}).items():
+            if mime == "text/plain":
+                mime_data[mime] = str(mime_data.get(mime, "")) + str(value)
+            else:
+                mime_data[mime] = value
+    return mime_data
+
+
+def run_cell_code(cell_id: str, code: str, user_ns: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute one cell's generated code in `user_ns` and return it in the kernel client's result shape."""
+    started = time.perf_counter()
+    error_name = error_value = None
+    with capture_output() as captured:
+        try:
+            exec(compile(code, f"<cell {cell_id}>", "exec"), user_ns)
+        except Exception as exc:  # noqa: BLE001 - reported like a kernel error
+            error_name, error_value = type(exc).__name__, str(exc)
+    return {
+        "cellId": cell_id,
+        "status": "error" if error_name else "ok",
+        "stdout": captured.stdout,
+        "stderr": captured.stderr,
+        "mimeData": _mime_data(captured.outputs),
+        "errorName": error_name,
+        "errorValue": error_value,
+        "durationMs": int((time.perf_counter() - started) * 1000),
+    }
+
+
+def _run_branch(cells: Sequence[Dict[str, str]], user_ns: Dict[str, Any]) -> list[Dict[str, Any]]:
+    return [run_cell_code(cell["cellId"], cell["code"], user_ns) for cell in cells]
+
+
+def _changed_entries(
+    before: Dict[str, Any], user_ns: Dict[str, Any], writes: Sequence[str]
+) -> tuple[Dict[str, bytes], list[str], list[str]]:
+    """Pickled changed entries, names that could not be pickled, and names that were deleted.
+
+    Declared writes are always sent: they include objects the branch changed in place.
+    """
+    changed: Dict[str, bytes] = {}
+    unpicklable: list[str] = []
+    for name, value in user_ns.items():
+        if before.get(name, _MISSING) is value and name not in writes:
+            continue
+        if isinstance(value, types.ModuleType):
+            value = _ModuleRef(value.__name__)
+        elif _defined_in_notebook(value):
+            unpicklable.append(name)
+            continue
+        try:
+            changed[name] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            unpicklable.append(name)
+    return changed, unpicklable, [name for name in before if name not in user_ns]
+
+
+def _shared(name: str, user_ns: Dict[str, Any]) -> bool:
+    """Whether the object bound to `name` is also reachable through another name or a container."""
+    value = user_ns.get(name, _MISSING)
+    if value is _MISSING or isinstance(value, _IMMUTABLE):
+        return False
+    if any(other is value for key, other in user_ns.items() if key != name):
+        return True
+    return any(
+        referrer is not user_ns and not isinstance(referrer, types.FrameType) for referrer in gc.get_referrers(value)
+    )
+
+
+def _runs_in_parent(branch: Dict[str, Any], user_ns: Dict[str, Any]) -> bool:
+    if branch.get("parent"):
+        return True
+    mutates = branch.get("mutates")
+    return any(_shared(name, user_ns) for name in ((branch.get("writes") or ()) if mutates is None else mutates))
+
+
+def _store_puts() -> tuple[int, ...]:
+    return tuple(getattr(getattr(sys.modules.get(module), name, None), "puts", 0) for module, name in _KERNEL_STORES)
+
+
+def _die_with_parent(parent_pid: int) -> None:
+    # A killed or restarted kernel never reaps its children; let Linux kill them along with it.
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(_PR_SET_PDEATHSIG, signal.SIGKILL)
+    except (AttributeError, OSError):
+        pass
+    if os.getppid() != parent_pid:
+        os._exit(0)
+
+
+def _worker(conn: Any, branch: Dict[str, Any], user_ns: Dict[str, Any], parent_pid: int) -> None:
+    try:
+        _die_with_parent(parent_pid)
+        before = dict(user_ns)
+        stores = _store_puts()
+        writes = set(branch.get("writes") or ())
+        results = _run_branch(branch["cells"], user_ns)
+        changed, unpicklable, deleted = _changed_entries(before, user_ns, writes)
+        # Kernel-private names (`_`, `__sugarpy_value`) may be dropped; declared writes may not.
+        # Entries added to the kernel stores would be lost with the child.
+        merged = not set(unpicklable) & writes and _store_puts() == stores
+        conn.send(("ok", results, changed if merged else {}, deleted, merged))
+    except BaseException as exc:  # noqa: BLE001 - reported back to the parent
+        conn.send(("error", f"{type(exc).__name__}: {exc}", {}, [], False))
+    finally:
+        conn.close()
+        # Skip the kernel's atexit handlers and IOPub flushes in the child.
+        os._exit(0)
+
+
+def _merge(user_ns: Dict[str, Any], changed: Dict[str, bytes], deleted: Sequence[str]) -> bool:
+    try:
+        values = {name: pickle.loads(payload) for name, payload in changed.items()}
+        for name, value in values.items():
+            user_ns[name] = importlib.import_module(value.name) if isinstance(value, _ModuleRef) else value
+    except Exception:
+        return False
+    for name in deleted:
+        user_ns.pop(name, None)
+    return True
+
+
+def _timed_out(cells: Sequence[Dict[str, str]], time_budget_s: float) -> list[Dict[str, Any]]:
+    return [
+        {
+            "cellId": cell["cellId"],
+            "status": "error",
+            "stdout": "",
+            "stderr": "",
+            "mimeData": {},
+            "errorName": "TimeoutError",
+            "errorValue": f"The branch was stopped after {time_budget_s:.1f} s.",
+            "durationMs": int(time_budget_s * 1000),
+        }
+        for cell in cells
+    ]
+
+
+def run_branches(
+    branches: Sequence[Dict[str, Any]], user_ns: Dict[str, Any], time_budget_s: float | None = None
+) -> list[Dict[str, Any]]:
+    """Run `branches` and return every cell result.
+
+    A branch is `{"cells": [{"cellId", "code"}], "writes": [...], "mutates": [...], "parent": bool}`;
+    without `mutates` every write is checked for sharing. Forked branches still running after
+    `time_budget_s` are killed. Results are ordered branch by branch; the caller reorders them by cell id.
+    """
+    if len(branches) < 2 or not branches_available():
+        return [result for branch in branches for result in _run_branch(branch["cells"], user_ns)]
+    started = time.monotonic()
+    in_parent = [position for position, branch in enumerate(branches) if _runs_in_parent(branch, user_ns)]
+    context = multiprocessing.get_context("fork")
+    pending: Dict[Any, tuple[int, Any]] = {}
+    outcomes: Dict[int, tuple[Any, ...]] = {}
+    parent_results: Dict[int, list[Dict[str, Any]]] = {}
+    try:
+        for position, branch in enumerate(branches):
+            if position in in_parent:
+                continue
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_worker, args=(sender, branch, user_ns, os.getpid()), daemon=True)
+            process.start()
+            sender.close()
+            pending[receiver] = (position, process)
+        # The children forked the namespace before these branches touch it.
+        for position in in_parent:
+            parent_results[position] = _run_branch(branches[position]["cells"], user_ns)
+        deadline = None if time_budget_s is None else started + time_budget_s
+        while pending:
+            ready = wait(list(pending), None if deadline is None else max(deadline - time.monotonic(), 0.0))
+            if not ready:
+                for _receiver, (position, _process) in pending.items():
+                    outcomes[position] = ("timeout", [], {}, [], False)
+                break
+            for receiver in ready:
+                position, process = pending.pop(receiver)
+                try:
+                    outcomes[position] = receiver.recv()
+                except EOFError:
+                    outcomes[position] = ("error", "branch worker exited without a result", {}, [], False)
+                receiver.close()
+                process.join(timeout=1.0)
+    finally:
+        for receiver, (_position, process) in pending.items():
+            process.kill()
+            process.join(timeout=1.0)
+            receiver.close()
+
+    results: list[Dict[str, Any]] = []
+    for position, branch in enumerate(branches):
+        if position in parent_results:
+            results.extend(parent_results[position])
+            continue
+        status, branch_results, changed, deleted, merged = outcomes[position]
+        if status == "timeout":
+            results.extend(_timed_out(branch["cells"], time_budget_s or 0.0))
+        elif status == "ok" and merged and _merge(user_ns, changed, deleted):
+            results.extend(branch_results)
+        else:
+            results.extend(_run_branch(branch["cells"], user_ns))
+    return results
+
+
+def display_branches(branches: Sequence[Dict[str, Any]], time_budget_s: float | None = None) -> list[Dict[str, Any]]:
+    ip = get_ipython()
+    if ip is None:
+        raise RuntimeError("Branch execution needs an IPython kernel.")
+    results = run_branches(branches, ip.user_ns, time_budget_s)
+    display({BRANCHES_MIME: {"cells": results}}, raw=True)
+    return results
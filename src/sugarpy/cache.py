@@ -0,0 +1,85 @@
+"""Small bounded caches shared by the kernel-side helpers."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded least-recently-used mapping with hit/miss counters.
+
+    With a `weigher`, entries are also evicted while their total weight exceeds `maxweight`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        *,
+        maxweight: int | None = None,
+        weigher: Callable[[Any], int] | None = None,
+    ) -> None:
+        self.maxsize = max(int(maxsize), 1)
+        self.maxweight = maxweight if weigher is not None else None
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Counts stores, so callers can tell whether anything was added or replaced since an earlier reading.
+        self.puts = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.puts += 1
+        if self.weigher is not None:
+            weight = max(int(self.weigher(value)), 0)
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self.weight += weight - self._weights.get(key, 0)
+            self._weights[key] = weight
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+            evicted, _value = self._entries.popitem(last=False)
+            self.weight -= self._weights.pop(evicted, 0)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._weights.clear()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> Dict[str, int]:
+        info = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+        if self.maxweight is not None:
+            info["weight"] = self.weight
+            info["maxweight"] = self.maxweight
+        return info
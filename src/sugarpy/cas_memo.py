@@ -0,0 +1,142 @@
+"""Bounded memo for expensive CAS calls made from Math cells.
+
+Re-runs, Run All, sandbox replays and Math-function bodies repeat the same
+`solve`, `factor`, `simplify` or `integrate` call with the same arguments.
+SymPy values hash structurally and symbols carry their assumptions, so the key
+is the function name, the arguments with containers normalized to tuples and
+frozensets, Float precisions (Floats of different precision can compare equal),
+the active global assumptions and a caller-supplied context such as the solver
+mode. Arguments that are not hashable values (mutable matrices, arrays,
+callables) bypass the memo.
+
+Results are stored only when every leaf is immutable, and containers are
+rebuilt on each hit so that a caller mutating a returned list does not change
+the memo. Entries are evicted by count and by total result size in SymPy nodes.
+`SUGARPY_CAS_MEMO=0` turns the memo off; a single call opts out with
+`memo=False`.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Hashable
+
+import sympy as sp
+from sympy.assumptions import global_assumptions
+
+from .cache import LRUCache
+
+CAS_MEMO_ENV = "SUGARPY_CAS_MEMO"
+MAX_ENTRIES = 512
+# Total size of the memoized results, counted in SymPy tree nodes.
+MAX_NODES = 200_000
+
+_enabled = os.environ.get(CAS_MEMO_ENV, "1").strip().lower() not in {"0", "false", "no", "off"}
+_bypassed = 0
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _key(value: Any) -> Hashable:
+    if isinstance(value, sp.Basic):
+        floats = value.atoms(sp.Float)
+        return value, tuple(sorted(item._prec for item in floats)) if floats else ()
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        # The type keeps `1`, `1.0` and `True` apart.
+        return type(value).__name__, value
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, tuple(_key(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return "set", frozenset(_key(item) for item in value)
+    if isinstance(value, dict):
+        return "dict", frozenset((_key(k), _key(v)) for k, v in value.items())
+    raise _Uncacheable
+
+
+def _weight(value: Any) -> int:
+    if isinstance(value, sp.Basic):
+        return sum(1 for _node in sp.preorder_traversal(value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 1 + sum(_weight(item) for item in value)
+    if isinstance(value, dict):
+        return 1 + sum(_weight(k) + _weight(v) for k, v in value.items())
+    return 1
+
+
+def _storable(value: Any) -> bool:
+    if isinstance(value, sp.Basic):
+        return True
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_storable(item) for item in value)
+    if isinstance(value, dict):
+        return all(_storable(k) and _storable(v) for k, v in value.items())
+    return False
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    if isinstance(value, set):
+        return {_copy(item) for item in value}
+    if isinstance(value, dict):
+        return {_copy(k): _copy(v) for k, v in value.items()}
+    return value
+
+
+_MEMO = LRUCache(maxsize=MAX_ENTRIES, maxweight=MAX_NODES, weigher=_weight)
+_MISSING = object()
+
+
+def cas_memo_enabled() -> bool:
+    return _enabled
+
+
+def set_cas_memo(enabled: bool) -> bool:
+    global _enabled
+    _enabled = bool(enabled)
+    return _enabled
+
+
+def memo_call(
+    name: str,
+    fn: Callable[..., Any],
+    args: tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    *,
+    context: Hashable = (),
+    keep: Callable[[], bool] | None = None,
+) -> Any:
+    """Return `fn(*args, **kwargs)`, memoized under `name`; `keep()` can veto storing a fresh result."""
+    global _bypassed
+    if not _enabled:
+        return fn(*args, **kwargs)
+    try:
+        key = (name, _key(args), _key(kwargs), context, frozenset(global_assumptions))
+        hash(key)
+    except (_Uncacheable, TypeError):
+        _bypassed += 1
+        return fn(*args, **kwargs)
+    cached = _MEMO.get(key, _MISSING)
+    if cached is not _MISSING:
+        return _copy(cached)
+    result = fn(*args, **kwargs)
+    if _storable(result) and (keep is None or keep()):
+        _MEMO.put(key, _copy(result))
+    return result
+
+
+def cas_memo_info() -> Dict[str, int]:
+    """Hit/miss/eviction counters, entry count and stored result size, plus calls that bypassed the memo."""
+    return {**_MEMO.info(), "bypassed": _bypassed, "enabled": int(_enabled)}
+
+
+def clear_cas_memo() -> None:
+    global _bypassed
+    _MEMO.clear()
+    _bypassed = 0
@@ -0,0 +1,88 @@
+"""Size guard for Math-cell values whose exact form blows up.
+
+Repeated exact arithmetic on radicals (an iterated `a := (a + 5/a)/2`, or
+powers of cubic roots) doubles the expression tree each step, and `doit`,
+`latex` and decimal rounding then take seconds. Between pipeline stages the
+Math cell measures numeric values with a bounded `count_ops`-style walk and
+tree depth. Past the configured limits the value is replaced by a
+high-precision Float and the statement carries a warning. Values with free
+symbols are left alone: a numeric form would not make them smaller.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any
+
+import sympy as sp
+
+MAX_OPS_ENV = "SUGARPY_MATH_MAX_OPS"
+MAX_DEPTH_ENV = "SUGARPY_MATH_MAX_DEPTH"
+# Quartic roots are ~75 operations deep in radicals; iterated radicals pass 400 after a few steps.
+DEFAULT_MAX_OPS = 400
+DEFAULT_MAX_DEPTH = 60
+NUMERIC_FALLBACK_DIGITS = 30
+
+
+def _env_limit(name: str, default: int) -> int | None:
+    raw = os.environ.get(name, "").strip()
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        value = default
+    return value if value > 0 else None
+
+
+def size_limits() -> tuple[int | None, int | None]:
+    """Configured `(max_ops, max_depth)`; either is None when disabled (`0`)."""
+    return _env_limit(MAX_OPS_ENV, DEFAULT_MAX_OPS), _env_limit(MAX_DEPTH_ENV, DEFAULT_MAX_DEPTH)
+
+
+def exceeds_size_limit(value: sp.Basic, max_ops: int | None, max_depth: int | None) -> bool:
+    """True once `value` has more than `max_ops` operations or is nested deeper than `max_depth`.
+
+    Operations approximate `count_ops` from below (an n-term sum or product is n - 1 operations, every
+    other node one; divisions and negations folded into products are not counted). The walk stops as
+    soon as a limit is passed, so huge trees are not traversed in full.
+    """
+    ops = 0
+    stack = [(value, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if max_depth is not None and depth > max_depth:
+            return True
+        args = node.args
+        if not args or isinstance(node, sp.Atom):
+            continue
+        ops += len(args) - 1 if isinstance(node, (sp.Add, sp.Mul)) else 1
+        if max_ops is not None and ops > max_ops:
+            return True
+        stack.extend((arg, depth + 1) for arg in args if isinstance(arg, sp.Basic))
+    return False
+
+
+def _numeric_candidate(value: Any) -> bool:
+    return isinstance(value, sp.Expr) and not isinstance(value, sp.Atom) and not value.free_symbols
+
+
+def guard_size(value: Any) -> tuple[Any, bool]:
+    """Return `(value, False)`, or a high-precision numeric replacement and True when it was too large.
+
+    Lists and tuples (e.g. `solve` results) are guarded element-wise.
+    """
+    if isinstance(value, (list, tuple)):
+        guarded = [guard_size(item) for item in value]
+        if not any(replaced for _item, replaced in guarded):
+            return value, False
+        items = [item for item, _replaced in guarded]
+        return (items if isinstance(value, list) else tuple(items)), True
+    if not _numeric_candidate(value):
+        return value, False
+    max_ops, max_depth = size_limits()
+    if not exceeds_size_limit(value, max_ops, max_depth):
+        return value, False
+    try:
+        numeric = sp.N(value, NUMERIC_FALLBACK_DIGITS)
+    except Exception:
+        return value, False
+    return numeric, True
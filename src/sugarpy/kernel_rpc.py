@@ -0,0 +1,144 @@
+"""Structured Math, Stoichiometry and Regression requests, handled without generated Python source.
+
+The server opens a comm on `RPC_TARGET` with `{"method": ..., "params": {...}}`
+instead of generating Python source for these cells, and for re-sampling a plot
+to a new viewport. The handler renders the
+cell and displays the payload under the cell's MIME type, exactly like the
+`display_*` call in the generated source, and then displays an acknowledgement
+under `RPC_MIME`. The acknowledgement travels over IOPub rather than as a comm
+message because in-process kernels cannot publish comm messages.
+
+A kernel without the target closes the comm without an acknowledgement; the
+server then falls back to executing the generated source. `run_request` is
+also what the math-only worker (`sugarpy.math_worker`) answers requests with.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+from typing import Any, Callable, Dict, Tuple
+
+from IPython.display import display
+
+RPC_TARGET = "sugarpy.rpc"
+RPC_MIME = "application/vnd.sugarpy.rpc+json"
+
+_Rendered = Tuple[str, Dict[str, Any]]
+
+
+def _math(params: Dict[str, Any], user_ns: Dict[str, Any] | None) -> _Rendered:
+    from sugarpy.math_cell import MATH_MIME_TYPE, render_math_cell
+
+    time_budget_s = params.get("timeBudgetS")
+    return MATH_MIME_TYPE, render_math_cell(
+        str(params.get("source") or ""),
+        "rad" if params.get("trigMode") == "rad" else "deg",
+        "decimal" if params.get("renderMode") == "decimal" else "exact",
+        None if time_budget_s is None else float(time_budget_s),
+        str(params.get("cellId") or "") or None,
+        user_ns=user_ns,
+    )
+
+
+def _render(params: Dict[str, Any], user_ns: Dict[str, Any] | None) -> _Rendered:
+    from sugarpy.math_cell import MATH_RENDER_MIME_TYPE, render_math_tokens
+
+    tokens = params.get("tokens") if isinstance(params.get("tokens"), list) else []
+    return MATH_RENDER_MIME_TYPE, render_math_tokens([str(token) for token in tokens], str(params.get("renderMode") or "exact"))
+
+
+def _stoich(params: Dict[str, Any], user_ns: Dict[str, Any] | None) -> _Rendered:
+    from sugarpy.stoichiometry import STOICH_MIME_TYPE, render_stoichiometry
+
+    return STOICH_MIME_TYPE, render_stoichiometry(str(params.get("reaction") or ""), params.get("inputs") or {})
+
+
+def _regression(params: Dict[str, Any], user_ns: Dict[str, Any] | None) -> _Rendered:
+    from sugarpy.regression import REGRESSION_MIME_TYPE, render_regression
+
+    return REGRESSION_MIME_TYPE, render_regression(
+        params.get("points") or [],
+        str(params.get("model") or "linear"),
+        x_label=str(params.get("xLabel") or "x"),
+        y_label=str(params.get("yLabel") or "y"),
+    )
+
+
+def _plot(params: Dict[str, Any], user_ns: Dict[str, Any] | None) -> _Rendered:
+    from sugarpy.startup import PLOT_RESAMPLE_MIME_TYPE, resample_plot
+
+    token = str(params.get("token") or "")
+    return PLOT_RESAMPLE_MIME_TYPE, {
+        "token": token,
+        "resample": resample_plot(
+            token, float(params.get("xmin")), float(params.get("xmax")), int(params.get("widthPx") or 0)
+        ),
+    }
+
+
+_METHODS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any] | None], _Rendered]] = {
+    "math": _math,
+    "render": _render,
+    "stoich": _stoich,
+    "regression": _regression,
+    "plot": _plot,
+}
+
+
+def run_request(request: Any, user_ns: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Render one request and return its MIME bundle; `user_ns` defaults to the IPython user namespace."""
+    if not isinstance(request, dict):
+        raise ValueError("RPC request must be an object.")
+    method = _METHODS.get(str(request.get("method") or ""))
+    if method is None:
+        raise ValueError(f"Unknown RPC method: {request.get('method')!r}")
+    params = request.get("params")
+    mime, payload = method(params if isinstance(params, dict) else {}, user_ns)
+    return {mime: {**payload, "schema_version": 1}}
+
+
+def replay_requests(requests_json: str) -> None:
+    """Run Math requests for their namespace effects only, e.g. when a math-only runtime becomes a kernel.
+
+    Requests marked `failed` are expected to raise again. Any other request that raises is reported with a
+    `RuntimeError` once the rest have run.
+    """
+    unexpected: list[str] = []
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        for request in json.loads(requests_json):
+            try:
+                run_request(request)
+            except Exception as exc:  # noqa: BLE001 - collected and reported below
+                if not request.get("failed"):
+                    unexpected.append(f"{type(exc).__name__}: {exc}")
+    if unexpected:
+        raise RuntimeError(f"{len(unexpected)} Math request(s) failed during replay; first: {unexpected[0]}")
+
+
+def handle_request(request: Any) -> Dict[str, Any]:
+    """Run one request and display its acknowledgement; errors are reported, never raised."""
+    ack: Dict[str, Any] = {"status": "ok", "errorName": None, "errorValue": None}
+    try:
+        display(run_request(request), raw=True)
+    except Exception as exc:  # noqa: BLE001 - reported like a kernel error
+        ack = {"status": "error", "errorName": type(exc).__name__, "errorValue": str(exc)}
+    display({RPC_MIME: ack}, raw=True)
+    return ack
+
+
+def _on_open(comm: Any, msg: Dict[str, Any]) -> None:
+    try:
+        handle_request((msg.get("content") or {}).get("data"))
+    finally:
+        comm.close()
+
+
+def register_rpc_target() -> bool:
+    try:
+        import comm
+    except ImportError:
+        return False
+    comm.get_comm_manager().register_target(RPC_TARGET, _on_open)
+    return True
@@ -0,0 +1,58 @@
+"""Bounded cache of NumPy functions compiled by `lambdify`.
+
+`lambdify` prints the expression to Python source and compiles it, which costs
+far more than evaluating the result over a grid. Re-running a plot, re-plotting
+after a range edit, Run All, value tables and Math functions evaluated over
+arrays compile the same expressions again. SymPy values hash structurally, so
+the key is the argument symbols, the expression, the Float precisions in it
+(Floats of different precision compare equal but print differently) and the
+modules. Expressions calling functions made with `implemented_function` carry
+their implementation outside the tree and are never cached.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable
+
+import sympy as sp
+from sympy.core.function import AppliedUndef
+
+from .cache import LRUCache
+
+MAX_ENTRIES = 256
+
+_CACHE = LRUCache(maxsize=MAX_ENTRIES)
+
+
+def _key(value: Any) -> Hashable:
+    if isinstance(value, sp.Basic):
+        if any(hasattr(call.func, "_imp_") for call in value.atoms(AppliedUndef)):
+            raise TypeError("implemented functions are not cached")
+        floats = value.atoms(sp.Float)
+        return value, tuple(sorted(item._prec for item in floats)) if floats else ()
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, tuple(_key(item) for item in value)
+    # The type keeps `1`, `1.0` and `True` apart; unhashable values fail in `hash` below.
+    return type(value).__name__, value
+
+
+def cached_lambdify(args: Any, expr: Any, modules: Any = "numpy") -> Callable[..., Any]:
+    """`sympy.lambdify(args, expr, modules)`, reusing the function compiled for an equal expression."""
+    try:
+        key = (_key(args), _key(expr), modules)
+        hash(key)
+    except TypeError:
+        return sp.lambdify(args, expr, modules)
+    fn = _CACHE.get(key)
+    if fn is None:
+        fn = sp.lambdify(args, expr, modules)
+        _CACHE.put(key, fn)
+    return fn
+
+
+def lambdify_cache_info() -> Dict[str, int]:
+    return _CACHE.info()
+
+
+def clear_lambdify_cache() -> None:
+    _CACHE.clear()
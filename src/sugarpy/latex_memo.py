@@ -0,0 +1,47 @@
+"""Bounded LaTeX memo for SymPy values shown by Math cells and Code-cell output.
+
+SymPy objects are immutable, so a value seen before prints the same way again.
+Lookups go by identity first and then by structural equality. Values that
+contain Floats skip the structural key because Floats of different precision
+can compare equal while printing differently. Anything that is not a SymPy
+object is printed directly because containers may be mutated between calls.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import sympy as sp
+
+from .cache import LRUCache
+
+# The identity memo keeps its values alive, so an `id` is never reused while its entry exists.
+_IDENTITY_MEMO = LRUCache(maxsize=512)
+_STRUCTURAL_MEMO = LRUCache(maxsize=2048)
+
+
+def memo_latex(value: Any) -> str:
+    """Return `sp.latex(value)`, reusing earlier results for the same SymPy value."""
+    if not isinstance(value, sp.Basic):
+        return sp.latex(value)
+    entry = _IDENTITY_MEMO.get(id(value))
+    if entry is not None and entry[0] is value:
+        return entry[1]
+    structural = not value.has(sp.Float)
+    latex = _STRUCTURAL_MEMO.get(value) if structural else None
+    if latex is None:
+        latex = sp.latex(value)
+        if structural:
+            _STRUCTURAL_MEMO.put(value, latex)
+    _IDENTITY_MEMO.put(id(value), (value, latex))
+    return latex
+
+
+def latex_memo_info() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters for the identity and structural LaTeX memos."""
+    return {"identity": _IDENTITY_MEMO.info(), "structural": _STRUCTURAL_MEMO.info()}
+
+
+def clear_latex_memo() -> None:
+    _IDENTITY_MEMO.clear()
+    _STRUCTURAL_MEMO.clear()
@@ -0,0 +1,122 @@
+"""Fast path for linear systems passed to the Math-cell `solve`/`linsolve` helpers.
+
+`sp.solve` handles a linear system through its general machinery, which takes
+seconds once there are a few dozen unknowns. Systems with rational
+coefficients are solved here by reducing the augmented matrix with a sparse
+`DomainMatrix` over QQ. Systems with Float coefficients use `numpy.linalg`.
+Only systems with a unique solution (or none) are handled. Underdetermined
+and parametric systems, and `solve` calls whose unknowns carry assumptions,
+return None, and the caller falls back to SymPy so that the answer does not
+change.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+import numpy as np
+import sympy as sp
+from sympy.polys.matrices import DomainMatrix
+from sympy.solvers.solveset import NonlinearError
+
+_EXACT_DOMAINS = (sp.ZZ, sp.QQ)
+_PLAIN_ASSUMPTIONS = sp.Symbol("x").assumptions0
+
+
+def _as_expressions(equations: Any) -> list[Any] | None:
+    if not isinstance(equations, (list, tuple)) or len(equations) < 2:
+        return None
+    expressions = []
+    for item in equations:
+        if isinstance(item, sp.Equality):
+            item = item.lhs - item.rhs
+        if not isinstance(item, sp.Expr):
+            return None
+        expressions.append(item)
+    return expressions
+
+
+def _as_unknowns(symbols: Sequence[Any], expressions: list[Any]) -> tuple[sp.Symbol, ...] | None:
+    if not symbols:
+        return tuple(sp.ordered(set().union(*(item.free_symbols for item in expressions))))
+    if len(symbols) == 1 and isinstance(symbols[0], (list, tuple)):
+        symbols = symbols[0]
+    if not symbols or not all(isinstance(item, sp.Symbol) for item in symbols) or len(set(symbols)) != len(symbols):
+        return None
+    return tuple(symbols)
+
+
+def _solve_float(augmented: sp.Matrix, size: int) -> list[Any] | None:
+    try:
+        values = np.array(augmented.tolist(), dtype=float)
+    except TypeError:
+        # Symbolic or complex coefficients.
+        return None
+    coefficients, constants = values[:, :size], values[:, size]
+    if coefficients.shape[0] != size or np.linalg.matrix_rank(coefficients) < size:
+        return None
+    return [sp.Float(value) for value in np.linalg.solve(coefficients, constants)]
+
+
+def _solve_exact(matrix: DomainMatrix, size: int) -> list[Any] | None:
+    reduced, pivots = matrix.to_sparse().to_field().rref()
+    if size in pivots:
+        return []
+    if len(pivots) < size:
+        return None
+    domain = reduced.domain
+    rows = reduced.to_sdm()
+    return [domain.to_sympy(rows.get(row, {}).get(size, domain.zero)) for row in range(size)]
+
+
+def linear_solution(equations: Any, symbols: Sequence[Any] = ()) -> tuple[tuple[sp.Symbol, ...], list[Any]] | None:
+    """Solve a linear system with constant coefficients.
+
+    Returns `(unknowns, values)`, with an empty list of values when the
+    system is inconsistent, or None when the input is not handled here.
+    """
+    expressions = _as_expressions(equations)
+    if expressions is None:
+        return None
+    unknowns = _as_unknowns(symbols, expressions)
+    if not unknowns:
+        return None
+    try:
+        coefficients, constants = sp.linear_eq_to_matrix(expressions, unknowns)
+    except (NonlinearError, ValueError):
+        return None
+    augmented = coefficients.row_join(constants)
+    if augmented.has(sp.Float):
+        values = _solve_float(augmented, len(unknowns))
+    else:
+        matrix = DomainMatrix.from_Matrix(augmented)
+        if matrix.domain not in _EXACT_DOMAINS:
+            return None
+        values = _solve_exact(matrix, len(unknowns))
+    if values is None:
+        return None
+    return unknowns, values
+
+
+def solve_linear_system(equations: Any, symbols: Sequence[Any] = ()) -> dict[Any, Any] | list[Any] | None:
+    """`sp.solve`-shaped answer (a dict, or `[]` when inconsistent) for a linear system, or None."""
+    solution = linear_solution(equations, symbols)
+    if solution is None:
+        return None
+    unknowns, values = solution
+    if any(symbol.assumptions0 != _PLAIN_ASSUMPTIONS for symbol in unknowns):
+        # `sp.solve` drops solutions that contradict assumptions such as `positive=True`.
+        return None
+    return dict(zip(unknowns, values)) if values else []
+
+
+def linsolve_linear_system(equations: Any, symbols: Sequence[Any] = ()) -> sp.Set | None:
+    """`sp.linsolve`-shaped answer (a one-tuple FiniteSet, or EmptySet) for a linear system, or None."""
+    if not symbols:
+        # linsolve requires explicit unknowns; let SymPy raise its own error.
+        return None
+    solution = linear_solution(equations, symbols)
+    if solution is None:
+        return None
+    _unknowns, values = solution
+    return sp.FiniteSet(sp.Tuple(*values)) if values else sp.S.EmptySet
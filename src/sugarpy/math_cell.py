@@ -3,36 +3,65 @@
 from __future__ import annotations
 
 import json
+import numbers
+import secrets
+import time
+from dataclasses import dataclass, field
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable
 
+import numpy as np
 import sympy as sp
 from IPython import get_ipython
 from collections.abc import Mapping
 
+from .cache import LRUCache
+from .expression_guard import NUMERIC_FALLBACK_DIGITS, guard_size, size_limits
+from .lambdify_cache import cached_lambdify
+from .latex_memo import memo_latex
 from .math_parser import (
     MathParseError,
     RenderDirective,
+    canonical_difference,
     canonicalize_equation,
+    collect_math_warnings,
+    extract_call_arguments,
+    get_canonicalize_policy,
     is_equation_like,
+    numeric_expression,
     parse_math_input,
     parse_sympy_expression,
+    split_math_statements,
+    substitution_safe_globals,
+    table_expression_sources,
 )
+from .numeric_eval import evaluate_numeric, numeric_fast_path_enabled, tree_within_limits
+from .solver_portfolio import get_solver_mode
+from .statement_cache import StatementCapture, StatementRecord, cell_records, store_cell_records
+from .time_budget import MathStatementTimeout, statement_budget, statement_timeout_s
 from .utils import display_sugarpy
+from .value_table import ValueTable
 
 
 MATH_MIME_TYPE = "application/vnd.sugarpy.math+json"
+MATH_RENDER_MIME_TYPE = "application/vnd.sugarpy.math-render+json"
+RENDER_MODES = ("exact", "decimal")
+SIZE_FALLBACK_WARNING = (
+    f"Exact result grew too large; showing a {NUMERIC_FALLBACK_DIGITS}-digit numeric value instead."
+)
 
 
 def _as_latex(value: Any) -> str:
     try:
-        return sp.latex(value)
+        return memo_latex(value)
     except Exception:
         return str(value)
 
 
 def _finalize_value(value: Any) -> Any:
     """Finalize SymPy-native values while preserving container results from CAS calls."""
+    if isinstance(value, sp.Atom):
+        return value
     if isinstance(value, sp.Basic):
         try:
             return value.doit()
@@ -47,6 +76,14 @@ def _finalize_value(value: Any) -> Any:
     return value
 
 
+def _guard_size(value: Any, warnings: list[str]) -> Any:
+    """Swap an oversized exact value for its numeric form before the next pipeline stage."""
+    guarded, replaced = guard_size(value)
+    if replaced and SIZE_FALLBACK_WARNING not in warnings:
+        warnings.append(SIZE_FALLBACK_WARNING)
+    return guarded
+
+
 def _error_payload(source: str, mode: str, error: str, kind: str = "expression") -> Dict[str, Any]:
     return {
         "ok": False,
@@ -129,6 +166,94 @@ def _render_directive(directive: RenderDirective) -> tuple[str, Any]:
     return _as_latex(decimal_value), base_value
 
 
+@dataclass(slots=True)
+class _StoredRender:
+    """Finalized statement values kept in the kernel so the other render mode can be produced on demand."""
+
+    kind: str
+    lead_steps: tuple[str, ...]
+    values: tuple[Any, ...]
+    places: int
+    targets: tuple[str, ...] = ()
+    fixed_steps: bool = False
+    renders: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Set by the numeric fast path: computes the symbolic `(lead_steps, values)` when the exact mode is asked for.
+    exact: Callable[[], tuple[tuple[str, ...], tuple[Any, ...]]] | None = None
+
+    def render(self, render_mode: str) -> Dict[str, Any]:
+        rendered = self.renders.get(render_mode)
+        if rendered is None:
+            if self.exact is not None:
+                self.lead_steps, self.values = self.exact()
+                self.exact = None
+            if self.kind == "assignment":
+                rendered = _render_assignment_mode(self, render_mode)
+            else:
+                rendered = _render_expression_mode(self, render_mode)
+            self.renders[render_mode] = rendered
+        return rendered
+
+
+# Tokens outlive a kernel restart in the browser, so they are random rather than sequential.
+_RENDER_STORE = LRUCache(maxsize=512)
+
+
+def _render_assignment_mode(stored: _StoredRender, render_mode: str) -> Dict[str, Any]:
+    if render_mode == "decimal":
+        values = [_apply_decimal_places(item, stored.places) for item in stored.values]
+    else:
+        values = list(stored.values)
+    if len(stored.targets) == 1:
+        value_latex = _as_latex(values[0])
+    else:
+        value_latex = _as_latex(sp.Tuple(*values))
+
+    steps = list(stored.lead_steps)
+    if not stored.fixed_steps:
+        final_steps = [
+            f"{_as_latex(sp.Symbol(name))} = {_as_latex(rendered)}"
+            for name, rendered in zip(stored.targets, values)
+        ]
+        if render_mode == "decimal" or len(final_steps) != 1:
+            # In decimal display mode, keep assignment output concise and avoid duplicating exact+decimal lines.
+            steps = final_steps
+        elif steps[-1] != final_steps[0]:
+            steps.append(final_steps[0])
+    return {"steps": steps, "value": value_latex}
+
+
+def _render_expression_mode(stored: _StoredRender, render_mode: str) -> Dict[str, Any]:
+    if render_mode == "decimal":
+        # In decimal display mode, show only the decimal-rendered result.
+        value_latex = _as_latex(_apply_decimal_places(stored.values[0], stored.places))
+        return {"steps": [value_latex], "value": value_latex}
+    value_latex = _as_latex(stored.values[0])
+    steps = list(stored.lead_steps)
+    if steps[-1] != value_latex:
+        steps.append(value_latex)
+    return {"steps": steps, "value": value_latex}
+
+
+def _lazy_render_cache(stored: _StoredRender, render_mode: str) -> tuple[Dict[str, Any], Dict[str, Any]]:
+    """Render only `render_mode` and leave the other mode to `rerender_math_value`."""
+    rendered = stored.render(render_mode)
+    token = secrets.token_hex(8)
+    _RENDER_STORE.put(token, stored)
+    render_cache: Dict[str, Any] = {mode: None for mode in RENDER_MODES}
+    render_cache[render_mode] = {"steps": list(rendered["steps"]), "value": rendered["value"]}
+    render_cache["token"] = token
+    return rendered, render_cache
+
+
+def rerender_math_value(token: str, render_mode: str) -> Dict[str, Any] | None:
+    """Return the `render_cache` entry for `render_mode` of a stored statement, or None once evicted."""
+    stored = _RENDER_STORE.get(str(token))
+    if stored is None:
+        return None
+    rendered = stored.render(_resolve_render_mode(render_mode))
+    return {"steps": list(rendered["steps"]), "value": rendered["value"]}
+
+
 def _assignment_targets(parsed: Any) -> tuple[str, ...]:
     names = tuple(getattr(parsed, "assigned_names", ()) or ())
     if names:
@@ -149,6 +274,71 @@ def _assignment_target_tree(parsed: Any) -> Any:
     return None
 
 
+_UNBOUND = object()
+
+
+class _CompiledMathFunction:
+    """A Math-cell function body parsed once into a SymPy `Lambda` over dummy parameters.
+
+    The body is only valid while every namespace name it read still holds the same object;
+    `is_current` checks that before each call.
+    """
+
+    __slots__ = ("body", "globals_snapshot", "_numeric")
+
+    def __init__(self, body: sp.Lambda, globals_snapshot: Dict[str, Any]) -> None:
+        self.body = body
+        self.globals_snapshot = globals_snapshot
+        self._numeric: Any = None
+
+    def is_current(self, user_ns: Dict[str, Any]) -> bool:
+        return all(user_ns.get(name, _UNBOUND) is value for name, value in self.globals_snapshot.items())
+
+    def numeric(self) -> Any:
+        """NumPy callable for array arguments, built on first use."""
+        if self._numeric is None:
+            self._numeric = cached_lambdify(self.body.variables, _finalize_value(self.body.expr), "numpy")
+        return self._numeric
+
+
+def _is_immutable_value(value: Any) -> bool:
+    return value is _UNBOUND or isinstance(value, (sp.Basic, numbers.Number, str))
+
+
+def _is_scalar_argument(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, sp.Expr):
+        return not isinstance(value, sp.MatrixExpr)
+    return isinstance(value, numbers.Number)
+
+
+def _compile_math_function(
+    args: tuple[str, ...],
+    rhs_source: str,
+    *,
+    mode: str,
+    user_ns: Dict[str, Any],
+) -> _CompiledMathFunction | None:
+    referenced = substitution_safe_globals(rhs_source, args)
+    if referenced is None:
+        return None
+    snapshot = {name: user_ns.get(name, _UNBOUND) for name in referenced}
+    if not all(_is_immutable_value(value) for value in snapshot.values()):
+        # Lists and other mutable values can change without changing identity.
+        return None
+    params = tuple(sp.Dummy(arg) for arg in args)
+    template_ns = dict(user_ns)
+    template_ns.update(zip(args, params))
+    try:
+        template = parse_sympy_expression(rhs_source, mode=mode, user_ns=template_ns)
+    except Exception:
+        return None
+    if not isinstance(template, sp.Expr):
+        return None
+    return _CompiledMathFunction(sp.Lambda(params, template), snapshot)
+
+
 def _make_math_function(
     name: str,
     args: tuple[str, ...],
@@ -157,9 +347,11 @@ def _make_math_function(
     mode: str,
     user_ns: Dict[str, Any],
 ):
-    def _fn(*values: Any) -> Any:
-        if len(values) != len(args):
-            raise TypeError(f"{name} expects {len(args)} arguments, got {len(values)}.")
+    compiled: list[_CompiledMathFunction | None] = [
+        _compile_math_function(args, rhs_source, mode=mode, user_ns=user_ns)
+    ]
+
+    def _evaluate(values: tuple[Any, ...]) -> Any:
         local_ns = dict(user_ns)
         for arg, val in zip(args, values):
             local_ns[arg] = val
@@ -168,6 +360,22 @@ def _make_math_function(
             raise MathParseError("render_decimal/render_exact cannot be returned from function definition.")
         return _finalize_value(evaluated)
 
+    def _fn(*values: Any) -> Any:
+        if len(values) != len(args):
+            raise TypeError(f"{name} expects {len(args)} arguments, got {len(values)}.")
+        current = compiled[0]
+        if current is not None and not current.is_current(user_ns):
+            current = compiled[0] = _compile_math_function(args, rhs_source, mode=mode, user_ns=user_ns)
+        if current is None:
+            return _evaluate(values)
+        if all(_is_scalar_argument(value) for value in values):
+            return _finalize_value(current.body(*values))
+        if any(isinstance(value, np.ndarray) for value in values) and all(
+            isinstance(value, np.ndarray) or _is_scalar_argument(value) for value in values
+        ):
+            return current.numeric()(*values)
+        return _evaluate(values)
+
     _fn.__name__ = name
     _fn._sugarpy_math_function = {  # type: ignore[attr-defined]
         "name": name,
@@ -175,6 +383,7 @@ def _make_math_function(
         "body_source": rhs_source,
         "mode": mode,
     }
+    _fn._sugarpy_compiled = compiled  # type: ignore[attr-defined]
     user_ns[name] = _fn
     return _fn
 
@@ -224,95 +433,20 @@ def _current_decimal_places(user_ns: Dict[str, Any]) -> int:
     return min(max(places, 0), 12)
 
 
-def _split_top_level_args(source: str) -> list[str]:
-    parts: list[str] = []
-    buf: list[str] = []
-    depth = 0
-    quote: str | None = None
-    escaped = False
-    for ch in source:
-        if quote is not None:
-            buf.append(ch)
-            if escaped:
-                escaped = False
-                continue
-            if ch == "\\":
-                escaped = True
-                continue
-            if ch == quote:
-                quote = None
-            continue
-
-        if ch in {"'", '"'}:
-            quote = ch
-            buf.append(ch)
-            continue
-
-        if ch in "([{":
-            depth += 1
-            buf.append(ch)
-            continue
-        if ch in ")]}":
-            depth -= 1
-            buf.append(ch)
-            continue
-
-        if ch == "," and depth == 0:
-            parts.append("".join(buf).strip())
-            buf = []
-            continue
-
-        buf.append(ch)
-
-    tail = "".join(buf).strip()
-    if tail:
-        parts.append(tail)
-    return parts
+def _table_labels(source: str) -> list[str] | None:
+    """LaTeX of each `table(...)` expression as typed: radian-mode parse, no namespace values."""
+    sources = table_expression_sources(source)
+    if sources is None:
+        return None
+    try:
+        # `doit` folds the unevaluated `1*x**-1` the parser keeps for `1/x`.
+        return [_as_latex(parse_sympy_expression(item, mode="rad", user_ns={}).doit()) for item in sources]
+    except MathParseError:
+        return None
 
 
 def _extract_render_wrapper(source: str) -> tuple[str, list[str]] | None:
-    trimmed = source.strip()
-    for wrapper_name in ("render_decimal", "render_exact"):
-        prefix = f"{wrapper_name}("
-        if not trimmed.startswith(prefix):
-            continue
-        if len(trimmed) <= len(prefix) or not trimmed.endswith(")"):
-            continue
-
-        depth = 0
-        quote: str | None = None
-        escaped = False
-        close_idx = -1
-        for idx, ch in enumerate(trimmed):
-            if quote is not None:
-                if escaped:
-                    escaped = False
-                    continue
-                if ch == "\\":
-                    escaped = True
-                    continue
-                if ch == quote:
-                    quote = None
-                continue
-            if ch in {"'", '"'}:
-                quote = ch
-                continue
-            if ch == "(":
-                depth += 1
-                continue
-            if ch == ")":
-                depth -= 1
-                if depth == 0:
-                    close_idx = idx
-                    break
-                continue
-
-        if close_idx != len(trimmed) - 1:
-            continue
-        args_source = trimmed[len(prefix):close_idx]
-        args = _split_top_level_args(args_source)
-        return wrapper_name, args
-    return None
+    return extract_call_arguments(source, ("render_decimal", "render_exact"))
 
 
 def _resolve_decimal_places_arg(source: str | None, mode: str, user_ns: Dict[str, Any]) -> int:
@@ -386,7 +520,7 @@ def _render_wrapper_assignment(
         value_latex = _as_latex(sp.Tuple(*rendered_values))
 
     steps = [
-        f"{sp.latex(sp.Symbol(name))} = {_as_latex(rendered)}"
+        f"{_as_latex(sp.Symbol(name))} = {_as_latex(rendered)}"
         for name, rendered in zip(targets, rendered_values)
     ]
 
@@ -410,6 +544,60 @@ def _render_wrapper_assignment(
     }
 
 
+def _render_numeric_expression(
+    parsed: Any, mode: str, user_ns: Dict[str, Any], warnings: list[str]
+) -> Dict[str, Any] | None:
+    """Decimal-mode payload of a purely numeric expression evaluated with mpmath, or None to go symbolic."""
+    numeric = numeric_expression(parsed, user_ns)
+    if numeric is None:
+        return None
+    tree, bound = numeric
+    if not tree_within_limits(tree, *size_limits()):
+        return None
+    places = _current_decimal_places(user_ns)
+    result = evaluate_numeric(
+        tree,
+        bound,
+        mode,
+        max(places + 4, 8),
+        lambda value: _as_latex(_apply_decimal_places(value, places)),
+    )
+    if result is None:
+        return None
+    value, value_latex = result
+    source = parsed.source
+
+    def exact() -> tuple[tuple[str, ...], tuple[Any, ...]]:
+        exact_warnings: list[str] = []
+        expr = _guard_size(parse_sympy_expression(source, mode=mode, user_ns=dict(bound)), exact_warnings)
+        return (_as_latex(expr),), (_guard_size(_finalize_value(expr), exact_warnings),)
+
+    stored = _StoredRender(
+        kind="expression",
+        lead_steps=(),
+        values=(value,),
+        places=places,
+        renders={"decimal": {"steps": [value_latex], "value": value_latex}},
+        exact=exact,
+    )
+    rendered, render_cache = _lazy_render_cache(stored, "decimal")
+    return {
+        "ok": True,
+        "kind": "expression",
+        "steps": list(rendered["steps"]),
+        "value": rendered["value"],
+        "assigned": None,
+        "mode": mode,
+        "error": None,
+        "warnings": warnings,
+        "normalized_source": parsed.normalized_source,
+        "equation_latex": None,
+        "plotly_figure": None,
+        "trace": [],
+        "render_cache": render_cache,
+    }
+
+
 def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_mode: str | None = None) -> Dict[str, Any]:
     resolved_render_mode = _resolve_render_mode(render_mode)
     try:
@@ -463,7 +651,7 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
             rhs_source = parsed.rhs_source or ""
             rhs_parsed = parse_math_input(rhs_source)
             rendered_assignment = False
-            assign_label = ", ".join(sp.latex(sp.Symbol(name)) for name in targets)
+            assign_label = ", ".join(_as_latex(sp.Symbol(name)) for name in targets)
             if rhs_parsed.kind == "assignment":
                 raise MathParseError("Right side of ':=' cannot contain another ':=' assignment.")
 
@@ -471,7 +659,7 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
                 lhs_expr = parse_sympy_expression(rhs_parsed.lhs_source or "", mode=mode, user_ns=user_ns)
                 rhs_expr = parse_sympy_expression(rhs_parsed.rhs_source or "", mode=mode, user_ns=user_ns)
                 equation = sp.Eq(lhs_expr, rhs_expr, evaluate=False)
-                value_expr = sp.simplify(lhs_expr - rhs_expr)
+                value_expr = canonical_difference(lhs_expr, rhs_expr)
                 warnings.append("Equation assignments are stored in '=0' expression form for solve/plot compatibility.")
                 steps = [
                     f"{assign_label} = {_as_latex(equation)}",
@@ -493,63 +681,28 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
                         f"{assign_label} = {_as_latex(value_expr)}",
                     ]
                 else:
+                    value_expr = _guard_size(value_expr, warnings)
                     steps = [f"{assign_label} = {_as_latex(value_expr)}"]
-            value_expr = _finalize_value(value_expr)
+            value_expr = _guard_size(_finalize_value(value_expr), warnings)
             assigned_values = _unpack_assignment_values(target_tree, value_expr)
             finalized_values = [_finalize_value(item) for item in assigned_values]
             for name, assigned_value in zip(targets, finalized_values):
                 user_ns[name] = assigned_value
 
-            if resolved_render_mode == "decimal":
-                places = _current_decimal_places(user_ns)
-                rendered_values = [_apply_decimal_places(item, places) for item in finalized_values]
-            else:
-                rendered_values = finalized_values
-
-            exact_rendered_values = finalized_values
-            decimal_rendered_values = [_apply_decimal_places(item, _current_decimal_places(user_ns)) for item in finalized_values]
-
-            if len(targets) == 1:
-                value_latex = _as_latex(rendered_values[0])
-            else:
-                value_latex = _as_latex(sp.Tuple(*rendered_values))
-
-            exact_value_latex = _as_latex(exact_rendered_values[0]) if len(targets) == 1 else _as_latex(sp.Tuple(*exact_rendered_values))
-            decimal_value_latex = _as_latex(decimal_rendered_values[0]) if len(targets) == 1 else _as_latex(sp.Tuple(*decimal_rendered_values))
-
-            final_steps = [
-                f"{sp.latex(sp.Symbol(name))} = {_as_latex(rendered)}"
-                for name, rendered in zip(targets, rendered_values)
-            ]
-            exact_final_steps = [
-                f"{sp.latex(sp.Symbol(name))} = {_as_latex(rendered)}"
-                for name, rendered in zip(targets, exact_rendered_values)
-            ]
-            decimal_final_steps = [
-                f"{sp.latex(sp.Symbol(name))} = {_as_latex(rendered)}"
-                for name, rendered in zip(targets, decimal_rendered_values)
-            ]
-            exact_steps_cache = list(steps)
-            if not rendered_assignment:
-                if len(exact_final_steps) == 1:
-                    if exact_steps_cache[-1] != exact_final_steps[0]:
-                        exact_steps_cache.append(exact_final_steps[0])
-                else:
-                    exact_steps_cache = exact_final_steps
-            if resolved_render_mode == "decimal" and not rendered_assignment:
-                # In decimal display mode, keep assignment output concise and avoid duplicating exact+decimal lines.
-                steps = final_steps
-            elif not rendered_assignment:
-                if len(final_steps) == 1:
-                    if steps[-1] != final_steps[0]:
-                        steps.append(final_steps[0])
-                else:
-                    steps = final_steps
+            stored = _StoredRender(
+                kind="assignment",
+                lead_steps=tuple(steps),
+                values=tuple(finalized_values),
+                places=_current_decimal_places(user_ns),
+                targets=targets,
+                fixed_steps=rendered_assignment,
+            )
+            rendered, render_cache = _lazy_render_cache(stored, resolved_render_mode)
             return {
                 "ok": True,
                 "kind": "assignment",
-                "steps": steps,
-                "value": value_latex,
+                "steps": list(rendered["steps"]),
+                "value": rendered["value"],
                 "assigned": targets[0] if len(targets) == 1 else ", ".join(targets),
                 "mode": mode,
                 "error": None,
@@ -558,12 +711,7 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
                 "equation_latex": None,
                 "plotly_figure": None,
                 "trace": [],
-                "render_cache": _make_render_cache(
-                    exact_steps=exact_steps_cache,
-                    exact_value=exact_value_latex,
-                    decimal_steps=decimal_final_steps if not rendered_assignment else steps,
-                    decimal_value=decimal_value_latex,
-                ),
+                "render_cache": render_cache,
             }
 
         if parsed.kind == "equation":
@@ -594,6 +742,11 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
         if wrapper_assignment_result is not None:
             return wrapper_assignment_result
 
+        if resolved_render_mode == "decimal" and numeric_fast_path_enabled():
+            fast_result = _render_numeric_expression(parsed, mode, user_ns, warnings)
+            if fast_result is not None:
+                return fast_result
+
         expr = parse_sympy_expression(parsed.source, mode=mode, user_ns=user_ns)
         if isinstance(expr, RenderDirective):
             rendered_value, _stored = _render_directive(expr)
@@ -634,6 +787,24 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
                 "trace": [],
                 "render_cache": _make_render_cache(exact_steps=[], exact_value=None),
             }
+        if isinstance(expr, ValueTable):
+            return {
+                "ok": True,
+                "kind": "expression",
+                "steps": [],
+                "value": None,
+                "assigned": None,
+                "mode": mode,
+                "error": None,
+                "warnings": warnings,
+                "normalized_source": parsed.normalized_source,
+                "equation_latex": None,
+                "plotly_figure": None,
+                "value_table": expr.payload(_current_decimal_places(user_ns), _table_labels(parsed.normalized_source)),
+                "trace": [],
+                "render_cache": _make_render_cache(exact_steps=[], exact_value=None),
+            }
+        expr = _guard_size(expr, warnings)
         base = _as_latex(expr)
         steps = [base]
         if isinstance(expr, sp.Basic) and getattr(expr, "free_symbols", None):
@@ -655,29 +826,18 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
                     exact_value=None,
                 ),
             }
-        value_expr = _finalize_value(expr)
-        decimal_value_expr = _apply_decimal_places(value_expr, _current_decimal_places(user_ns))
-        if resolved_render_mode == "decimal":
-            places = _current_decimal_places(user_ns)
-            value_latex = _as_latex(_apply_decimal_places(value_expr, places))
-        else:
-            value_latex = _as_latex(value_expr)
-        exact_value_latex = _as_latex(value_expr)
-        decimal_value_latex = _as_latex(decimal_value_expr)
-        exact_steps_cache = list(steps)
-        if exact_steps_cache[-1] != exact_value_latex:
-            exact_steps_cache.append(exact_value_latex)
-        decimal_steps_cache = [decimal_value_latex]
-        if resolved_render_mode == "decimal":
-            # In decimal display mode, show only the decimal-rendered result.
-            steps = [value_latex]
-        elif steps[-1] != value_latex:
-            steps.append(value_latex)
+        stored = _StoredRender(
+            kind="expression",
+            lead_steps=tuple(steps),
+            values=(_guard_size(_finalize_value(expr), warnings),),
+            places=_current_decimal_places(user_ns),
+        )
+        rendered, render_cache = _lazy_render_cache(stored, resolved_render_mode)
         return {
             "ok": True,
             "kind": "expression",
-            "steps": steps,
-            "value": value_latex,
+            "steps": list(rendered["steps"]),
+            "value": rendered["value"],
             "assigned": None,
             "mode": mode,
             "error": None,
@@ -686,12 +846,7 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
             "equation_latex": None,
             "plotly_figure": None,
             "trace": [],
-            "render_cache": _make_render_cache(
-                exact_steps=exact_steps_cache,
-                exact_value=exact_value_latex,
-                decimal_steps=decimal_steps_cache,
-                decimal_value=decimal_value_latex,
-            ),
+            "render_cache": render_cache,
         }
     except MathParseError as exc:
         return _error_payload(source, mode, str(exc), kind=parsed.kind)
@@ -699,81 +854,32 @@ def _render_single_math(source: str, mode: str, user_ns: Dict[str, Any], render_
         return _error_payload(source, mode, f"{type(exc).__name__}: {exc}", kind=parsed.kind)
 
 
-def _split_math_statements(source: str) -> list[tuple[int, str]]:
-    """Split a Math cell into top-level statements.
+def render_math_cell(
+    source: str,
+    mode: str = "deg",
+    render_mode: str | None = None,
+    time_budget_s: float | None = None,
+    cell_id: str | None = None,
+    user_ns: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Render CAS-style input and compute its value.
 
-    Rules:
-    - New statement starts on newline only when not inside quotes and bracket depth is 0.
-    - Preserves 1-based starting line number for each statement.
+    Each statement runs under the `SUGARPY_MATH_STATEMENT_TIMEOUT_S` budget and, when
+    `time_budget_s` is given, within that many seconds for the whole cell. With a `cell_id`,
+    the unchanged leading statements of the previous run of that cell are reused
+    (`sugarpy.statement_cache`) and only the rest is evaluated. Definitions go to
+    `user_ns`, by default the IPython user namespace.
     """
-    statements: list[tuple[int, str]] = []
-    buf: list[str] = []
-    depth = 0
-    quote: str | None = None
-    escaped = False
-    line_no = 1
-    stmt_start_line = 1
-
-    def flush(next_start_line: int) -> None:
-        nonlocal stmt_start_line
-        text = "".join(buf).strip()
-        buf.clear()
-        if text:
-            statements.append((stmt_start_line, text))
-        stmt_start_line = next_start_line
-
-    for ch in source:
-        if ch == "\n":
-            if quote is None and depth == 0:
-                flush(line_no + 1)
-            else:
-                buf.append(ch)
-            line_no += 1
-            continue
-
-        if quote is not None:
-            buf.append(ch)
-            if escaped:
-                escaped = False
-                continue
-            if ch == "\\":
-                escaped = True
-                continue
-            if ch == quote:
-                quote = None
-            continue
-
-        if ch in {"'", '"'}:
-            quote = ch
-            buf.append(ch)
-            continue
-
-        if ch in "([{":
-            depth += 1
-            buf.append(ch)
-            continue
-        if ch in ")]}":
-            depth -= 1
-            buf.append(ch)
-            continue
-
-        buf.append(ch)
-
-    flush(line_no)
-    return statements
-
-
-def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = None) -> Dict[str, Any]:
-    """Render CAS-style input and compute its value."""
-    ip = get_ipython()
-    user_ns: Dict[str, Any] = ip.user_ns if ip is not None else {}
+    if user_ns is None:
+        ip = get_ipython()
+        user_ns = ip.user_ns if ip is not None else {}
 
     raw = (source or "")
     trimmed = raw.strip()
     if not raw:
         return _error_payload(source, mode, "Empty cell.")
 
-    statements = _split_math_statements(trimmed)
+    statements = split_math_statements(trimmed)
     if not statements:
         return _error_payload(source, mode, "Empty cell.")
 
@@ -781,11 +887,46 @@ def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = N
     merged_warnings: list[str] = []
     normalized_sources: list[str] = []
     plotly_figure: Any | None = None
+    value_table: Dict[str, Any] | None = None
     last_result: Dict[str, Any] | None = None
     trace: list[Dict[str, Any]] = []
 
-    for line_start, statement in statements:
-        result = _render_single_math(statement, mode, user_ns, render_mode=render_mode)
+    statement_limit_s = statement_timeout_s()
+    deadline = time.monotonic() + time_budget_s if time_budget_s is not None else None
+    context = (mode, render_mode, get_solver_mode(), get_canonicalize_policy())
+    previous_records = cell_records(cell_id) if cell_id is not None else []
+    records: list[StatementRecord | None] = []
+    for index, (line_start, statement) in enumerate(statements):
+        record = previous_records[index] if index < len(previous_records) else None
+        if record is not None and record.reusable(statement, context, user_ns):
+            record.restore(user_ns)
+            result = record.result
+        else:
+            previous_records = []
+            record = None
+            capture = StatementCapture(statement, context, user_ns) if cell_id is not None else None
+            started = time.monotonic()
+            timeout_s = statement_limit_s
+            if deadline is not None:
+                remaining = max(deadline - started, 0.0)
+                timeout_s = remaining if timeout_s is None else min(timeout_s, remaining)
+            try:
+                with statement_budget(timeout_s), collect_math_warnings() as helper_warnings:
+                    result = _render_single_math(statement, mode, user_ns, render_mode=render_mode)
+                if helper_warnings:
+                    result["warnings"] = [*(result.get("warnings") or []), *helper_warnings]
+            except MathStatementTimeout:
+                result = _error_payload(
+                    statement,
+                    mode,
+                    f"Too slow: stopped after {time.monotonic() - started:.1f} s. Earlier lines and variables are kept.",
+                )
+            if capture is not None and result.get("ok"):
+                record = capture.finish(user_ns, result)
+        if cell_id is not None:
+            if result.get("ok"):
+                records.append(record)
+            store_cell_records(cell_id, records)
         if not result.get("ok"):
             err = result.get("error") or "Unknown error"
             payload = _error_payload(source, mode, f"Line {line_start}: {err}", kind=result.get("kind") or "expression")
@@ -793,6 +934,7 @@ def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = N
             payload["steps"] = merged_steps
             payload["warnings"] = merged_warnings
             payload["plotly_figure"] = plotly_figure
+            payload["value_table"] = value_table
             return payload
 
         trace.append(
@@ -803,6 +945,7 @@ def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = N
                 "steps": result.get("steps") or [],
                 "value": result.get("value"),
                 "plotly_figure": result.get("plotly_figure"),
+                "value_table": result.get("value_table"),
                 "render_cache": result.get("render_cache"),
             }
         )
@@ -810,6 +953,8 @@ def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = N
         merged_warnings.extend(str(w) for w in (result.get("warnings") or []))
         if result.get("plotly_figure") is not None:
             plotly_figure = result.get("plotly_figure")
+        if result.get("value_table") is not None:
+            value_table = result.get("value_table")
         normalized = result.get("normalized_source")
         if normalized:
             normalized_sources.append(str(normalized))
@@ -830,6 +975,7 @@ def render_math_cell(source: str, mode: str = "deg", render_mode: str | None = N
         "normalized_source": "\n".join(normalized_sources) if normalized_sources else raw,
         "equation_latex": last_result.get("equation_latex"),
         "plotly_figure": plotly_figure,
+        "value_table": value_table,
         "trace": trace,
         "render_cache": last_result.get("render_cache"),
     }
@@ -840,8 +986,30 @@ def render_math_cell_json(source: str, mode: str = "deg", render_mode: str | Non
     return json.dumps(render_math_cell(source, mode, render_mode=render_mode))
 
 
-def display_math_cell(source: str, mode: str = "deg", render_mode: str | None = None) -> Dict[str, Any]:
+def render_math_tokens(tokens: Iterable[str], render_mode: str) -> Dict[str, Any]:
+    """Re-render stored statement values in another mode."""
+    resolved_render_mode = _resolve_render_mode(render_mode)
+    return {
+        "render_mode": resolved_render_mode,
+        "renders": {str(token): rerender_math_value(token, resolved_render_mode) for token in tokens},
+    }
+
+
+def display_math_render(tokens: Iterable[str], render_mode: str) -> Dict[str, Any]:
+    """Re-render stored statement values in another mode and send them via Jupyter MIME output."""
+    payload = render_math_tokens(tokens, render_mode)
+    display_sugarpy({**payload, "schema_version": 1}, MATH_RENDER_MIME_TYPE)
+    return payload
+
+
+def display_math_cell(
+    source: str,
+    mode: str = "deg",
+    render_mode: str | None = None,
+    time_budget_s: float | None = None,
+    cell_id: str | None = None,
+) -> Dict[str, Any]:
     """Render Math cell and send structured payload via Jupyter MIME output."""
-    payload = render_math_cell(source, mode, render_mode=render_mode)
+    payload = render_math_cell(source, mode, render_mode=render_mode, time_budget_s=time_budget_s, cell_id=cell_id)
     display_sugarpy({**payload, "schema_version": 1}, MATH_MIME_TYPE)
     return payload
@@ -0,0 +1,328 @@
+"""Direct SymPy construction for normalized Math-cell expressions.
+
+`parse_expr(..., evaluate=False)` re-tokenizes the source, rewrites the tokens,
+transforms the Python AST and finally `eval`s it. For the expression subset
+that SugarPy's normalizer produces we can build the same SymPy objects
+straight from the token stream. Anything outside that subset raises
+`UnsupportedExpression` so callers fall back to `parse_expr`.
+
+The compiled form is a small tuple tree; evaluation is table driven so other
+numeric backends can reuse the same tree.
+"""
+
+from __future__ import annotations
+
+import ast
+import operator
+from dataclasses import dataclass
+from keyword import iskeyword
+from typing import Any, Callable, Dict, Iterable, Sequence
+
+import sympy as sp
+
+# Same list `sympy.parsing.sympy_parser.EvaluateFalseTransformer` passes `evaluate=False` to.
+EVALUATE_FALSE_FUNCTIONS = frozenset(
+    {
+        "Abs", "im", "re", "sign", "arg", "conjugate",
+        "acos", "acot", "acsc", "asec", "asin", "atan",
+        "acosh", "acoth", "acsch", "asech", "asinh", "atanh",
+        "cos", "cot", "csc", "sec", "sin", "tan",
+        "cosh", "coth", "csch", "sech", "sinh", "tanh",
+        "exp", "ln", "log", "sqrt", "cbrt",
+    }
+)
+# Names that parse_expr's generated code looks up in the local namespace; if the
+# source mentions them, a user binding could change their meaning there.
+_TRANSFORM_NAMES = frozenset({"Integer", "Float", "Symbol", "Function", "Add", "Mul", "Pow"})
+_CONSTANT_NAMES = {"True": True, "False": False, "None": None}
+
+Node = tuple
+
+
+class UnsupportedExpression(Exception):
+    """Raised when an expression is outside the directly compiled subset."""
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledExpression:
+    tree: Node
+    names: frozenset[str]
+
+
+class _Parser:
+    __slots__ = ("tokens", "pos", "names")
+
+    def __init__(self, tokens: Sequence[Any]) -> None:
+        self.tokens = [token for token in tokens if token.kind != "newline"]
+        self.pos = 0
+        self.names: set[str] = set()
+
+    def peek(self) -> Any:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def accept(self, kind: str, *texts: str) -> Any:
+        token = self.peek()
+        if token is None or token.kind != kind or (texts and token.text not in texts):
+            return None
+        self.pos += 1
+        return token
+
+    def expect(self, kind: str, *texts: str) -> Any:
+        token = self.accept(kind, *texts)
+        if token is None:
+            raise UnsupportedExpression(f"expected {kind}")
+        return token
+
+    def parse(self) -> Node:
+        node = self.sum()
+        if self.peek() is not None:
+            raise UnsupportedExpression(f"unexpected {self.peek().text!r}")
+        return node
+
+    def sum(self) -> Node:
+        node = self.term()
+        while True:
+            token = self.accept("operator", "+", "-")
+            if token is None:
+                return node
+            right = self.term()
+            if token.text == "-":
+                right = ("mul", (("int", -1), right))
+            node = ("add", _flatten("add", (node, right)))
+
+    def term(self) -> Node:
+        node = self.unary()
+        while True:
+            token = self.accept("operator", "*", "/")
+            if token is None:
+                return node
+            right = self.unary()
+            if token.text == "/":
+                right = ("pow", right, ("int", -1))
+            node = ("mul", _flatten("mul", (node, right)))
+
+    def unary(self) -> Node:
+        token = self.accept("operator", "+", "-")
+        if token is None:
+            return self.power()
+        return ("neg" if token.text == "-" else "pos", self.unary())
+
+    def power(self) -> Node:
+        base = self.postfix()
+        if self.accept("power") is None:
+            return base
+        return ("pow", base, self.unary())
+
+    def postfix(self) -> Node:
+        node = self.atom()
+        while True:
+            token = self.peek()
+            if token is None or token.kind != "open" or token.text == "{":
+                return node
+            self.pos += 1
+            if token.text == "(":
+                if node[0] != "name":
+                    # parse_expr's flattening only understands calls on plain names.
+                    raise UnsupportedExpression("call on a non-name")
+                args, kwargs = self.call_arguments()
+                if node[1] in EVALUATE_FALSE_FUNCTIONS:
+                    if any(name == "evaluate" for name, _ in kwargs):
+                        raise UnsupportedExpression("explicit evaluate keyword")
+                    kwargs = kwargs + (("evaluate", ("const", False)),)
+                node = ("call", node[1], args, kwargs)
+                continue
+            items, trailing_comma = self.sequence("]")
+            if not items:
+                raise UnsupportedExpression("empty subscript")
+            index = items[0] if len(items) == 1 and not trailing_comma else ("tuple", items)
+            node = ("item", node, index)
+
+    def call_arguments(self) -> tuple[tuple[Node, ...], tuple[tuple[str, Node], ...]]:
+        args: list[Node] = []
+        kwargs: list[tuple[str, Node]] = []
+        while self.accept("close", ")") is None:
+            token = self.peek()
+            following = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
+            if (
+                token is not None
+                and token.kind == "ident"
+                and following is not None
+                and following.kind == "operator"
+                and following.text == "="
+            ):
+                if iskeyword(token.text) or any(name == token.text for name, _ in kwargs):
+                    raise UnsupportedExpression("invalid keyword argument")
+                self.pos += 2
+                kwargs.append((token.text, self.sum()))
+            elif kwargs:
+                raise UnsupportedExpression("positional argument after keyword argument")
+            else:
+                args.append(self.sum())
+            if self.accept("comma") is None:
+                self.expect("close", ")")
+                break
+        return tuple(args), tuple(kwargs)
+
+    def sequence(self, closer: str) -> tuple[tuple[Node, ...], bool]:
+        items: list[Node] = []
+        trailing_comma = False
+        while self.accept("close", closer) is None:
+            items.append(self.sum())
+            trailing_comma = self.accept("comma") is not None
+            if not trailing_comma:
+                self.expect("close", closer)
+                break
+        return tuple(items), trailing_comma
+
+    def atom(self) -> Node:
+        token = self.peek()
+        if token is None:
+            raise UnsupportedExpression("unexpected end of expression")
+        self.pos += 1
+        kind = token.kind
+        if kind == "number":
+            text = token.text
+            if "." in text:
+                return ("const", sp.Float(text))
+            if len(text) > 1 and text[0] == "0" and text.strip("0"):
+                raise UnsupportedExpression("leading zeros in integer literal")
+            return ("const", sp.Integer(int(text)))
+        if kind == "string":
+            try:
+                return ("const", ast.literal_eval(token.text))
+            except (SyntaxError, ValueError) as exc:
+                raise UnsupportedExpression("string literal") from exc
+        if kind == "ident":
+            name = token.text
+            if name in _CONSTANT_NAMES:
+                return ("const", _CONSTANT_NAMES[name])
+            if iskeyword(name) or name in _TRANSFORM_NAMES:
+                raise UnsupportedExpression(f"reserved name {name!r}")
+            self.names.add(name)
+            return ("name", name)
+        if kind == "open":
+            if token.text == "(":
+                items, trailing_comma = self.sequence(")")
+                if len(items) == 1 and not trailing_comma:
+                    return items[0]
+                return ("tuple", items)
+            if token.text == "[":
+                items, _ = self.sequence("]")
+                return ("list", items)
+            items, _ = self.sequence("}")
+            if not items:
+                # `{}` is a dict literal in Python.
+                raise UnsupportedExpression("dict literal")
+            return ("set", items)
+        raise UnsupportedExpression(f"unsupported token {token.text!r}")
+
+
+def _flatten(kind: str, args: Iterable[Node]) -> tuple[Node, ...]:
+    flattened: list[Node] = []
+    for arg in args:
+        if arg[0] == kind:
+            flattened.extend(arg[1])
+        else:
+            flattened.append(arg)
+    return tuple(flattened)
+
+
+def compile_expression(tokens: Sequence[Any]) -> CompiledExpression:
+    """Compile normalized expression tokens into a tree, or raise `UnsupportedExpression`."""
+    parser = _Parser(tokens)
+    tree = parser.parse()
+    return CompiledExpression(tree=tree, names=frozenset(parser.names))
+
+
+def _sympy_add(args: list[Any]) -> Any:
+    return sp.Add(*args, evaluate=False)
+
+
+def _sympy_mul(args: list[Any]) -> Any:
+    return sp.Mul(*args, evaluate=False)
+
+
+def _sympy_pow(base: Any, exponent: Any) -> Any:
+    return sp.Pow(base, exponent, evaluate=False)
+
+
+SYMPY_OPERATIONS: Dict[str, Callable[..., Any]] = {
+    "add": _sympy_add,
+    "mul": _sympy_mul,
+    "pow": _sympy_pow,
+    "neg": operator.neg,
+    "pos": operator.pos,
+}
+
+
+def _is_function(value: Any) -> bool:
+    # SymPy atoms such as `pi` are callable Python objects but not functions.
+    return isinstance(value, sp.Lambda) or (callable(value) and not isinstance(value, sp.Basic))
+
+
+def _check_bindings(node: Node, names: Dict[str, Any]) -> None:
+    kind = node[0]
+    if kind == "call":
+        if not _is_function(names[node[1]]):
+            raise UnsupportedExpression(f"call on non-function {node[1]!r}")
+        children = [*node[2], *(value for _name, value in node[3])]
+    elif kind == "pow":
+        if node[1][0] == "name" and _is_function(names[node[1][1]]):
+            raise UnsupportedExpression("power of a function")
+        children = [node[1], node[2]]
+    elif kind in {"add", "mul", "tuple", "list", "set"}:
+        children = list(node[1])
+    elif kind in {"neg", "pos"}:
+        children = [node[1]]
+    elif kind == "item":
+        children = [node[1], node[2]]
+    else:
+        return
+    for child in children:
+        _check_bindings(child, names)
+
+
+def evaluate_expression(
+    node: Node,
+    names: Dict[str, Any],
+    operations: Dict[str, Callable[..., Any]] = SYMPY_OPERATIONS,
+) -> Any:
+    """Evaluate a compiled tree; callers check that every name in `CompiledExpression.names` is bound.
+
+    parse_expr reads `pi(r+1)` as a product and `sin^2(x)` as `sin(x)**2`. A call on a bound value that is
+    not a function, or a power of a function, raises `UnsupportedExpression` before anything is evaluated,
+    so the caller can fall back to parse_expr without running a call twice.
+    """
+    _check_bindings(node, names)
+    return _evaluate(node, names, operations)
+
+
+def _evaluate(node: Node, names: Dict[str, Any], operations: Dict[str, Callable[..., Any]]) -> Any:
+    kind = node[0]
+    if kind == "const" or kind == "int":
+        return node[1]
+    if kind == "name":
+        return names[node[1]]
+    if kind == "add" or kind == "mul":
+        return operations[kind]([_evaluate(arg, names, operations) for arg in node[1]])
+    if kind == "pow":
+        base = _evaluate(node[1], names, operations)
+        return operations["pow"](base, _evaluate(node[2], names, operations))
+    if kind == "neg" or kind == "pos":
+        return operations[kind](_evaluate(node[1], names, operations))
+    if kind == "call":
+        fn = names[node[1]]
+        args = [_evaluate(arg, names, operations) for arg in node[2]]
+        kwargs = {name: _evaluate(value, names, operations) for name, value in node[3]}
+        return fn(*args, **kwargs)
+    if kind == "item":
+        target = _evaluate(node[1], names, operations)
+        return target[_evaluate(node[2], names, operations)]
+    items = [_evaluate(item, names, operations) for item in node[1]]
+    if kind == "tuple":
+        return tuple(items)
+    if kind == "list":
+        return items
+    return set(items)
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import os
 import re
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, Literal
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, Literal
 
 import sympy as sp
 from sympy.parsing.sympy_parser import (
@@ -14,14 +18,29 @@ from sympy.parsing.sympy_parser import (
     standard_transformations,
 )
 
+from .cache import LRUCache
+from .cas_memo import memo_call
+from .linear_solver import linsolve_linear_system, solve_linear_system
+from .math_compiler import (
+    CompiledExpression,
+    Node,
+    UnsupportedExpression,
+    compile_expression,
+    evaluate_expression,
+)
+from .numeric_eval import NUMERIC_NAMES
+from .solver_portfolio import build_strategies, get_solver_mode, portfolio_available, run_portfolio
+from .value_table import value_table
+
 _TRANSFORMS = standard_transformations + (convert_xor, implicit_multiplication_application)
 _IDENT_RE = re.compile(r"[A-Za-z_]\w*")
-_ASSIGN_TARGET_RE = re.compile(r"^[A-Za-z_]\w*$")
-_CALL_NAME_RE = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
-_NORMALIZE_TOKEN_RE = re.compile(
+# Single tokenizer shared by classification, normalization, rewriting and statement splitting.
+_TOKEN_RE = re.compile(
     r"""
-    (?P<space>\s+)
-    | (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")
+    (?P<newline>\n)
+    | (?P<space>[^\S\n]+)
+    | (?P<string>'(?:\\[\s\S]|[^'\\])*'|"(?:\\[\s\S]|[^"\\])*")
+    | (?P<unclosed_string>['"][\s\S]*)
     | (?P<compare>==|!=|<=|>=)
     | (?P<assign>:=)
     | (?P<power>\*\*|\^)
@@ -36,6 +55,8 @@ _NORMALIZE_TOKEN_RE = re.compile(
     """,
     re.VERBOSE,
 )
+_BRACKET_PAIRS = {"(": ")", "[": "]", "{": "}"}
+_UNSUPPORTED = object()
 _PLOT_KWARG_NAMES = {
     "xmin",
     "xmax",
@@ -51,6 +72,27 @@ _PLOT_KWARG_NAMES = {
     "showlegend",
     "var",
 }
+_TABLE_KWARG_NAMES = {"var", "start", "end", "step", "num"}
+# `name=value` call arguments kept as keyword arguments rather than read as equations.
+_KEYWORD_ARGUMENT_NAMES = frozenset({"memo"})
+_PARSE_CACHE_SIZE = 512
+# Parsed statements and rewritten expression sources keyed by stripped source text.
+# `ParsedMathInput` is frozen and only holds immutable values, so cached entries can be shared.
+_PARSE_CACHE = LRUCache(maxsize=_PARSE_CACHE_SIZE)
+_REWRITE_CACHE = LRUCache(maxsize=_PARSE_CACHE_SIZE)
+_COMPILE_CACHE = LRUCache(maxsize=_PARSE_CACHE_SIZE)
+_NAMES_CACHE = LRUCache(maxsize=_PARSE_CACHE_SIZE)
+# `parse_expr` is the reference backend; `direct` builds SymPy objects from SugarPy's own
+# token stream and falls back to `parse_expr` for anything outside its subset.
+EXPRESSION_BACKENDS = ("parse_expr", "direct")
+_expression_backend = os.environ.get("SUGARPY_MATH_EXPRESSION_BACKEND", "parse_expr").strip() or "parse_expr"
+# How `lhs = rhs` becomes the stored/solved `lhs - rhs` form. `auto` simplifies only differences
+# small enough (by `count_ops`) for `simplify` to stay cheap and keeps larger ones as they are.
+CANONICALIZE_POLICIES = ("auto", "plain", "together", "cancel", "simplify")
+AUTO_SIMPLIFY_MAX_OPS = 16
+_canonicalize_policy = os.environ.get("SUGARPY_MATH_CANONICALIZE", "auto").strip() or "auto"
+# Warning sinks for the Math statements being rendered; helpers such as `solve` append to the innermost one.
+_WARNING_SINKS: list[list[str]] = []
 _BLOCKED_IDENTIFIERS = {
     "import",
     "exec",
@@ -90,6 +132,22 @@ class RenderDirective:
     places: int | None = None
 
 
+@contextmanager
+def collect_math_warnings(sink: list[str] | None = None) -> Iterator[list[str]]:
+    """Collect warnings that Math helpers raise via `note_math_warning` while the block runs."""
+    collected = sink if sink is not None else []
+    _WARNING_SINKS.append(collected)
+    try:
+        yield collected
+    finally:
+        _WARNING_SINKS.pop()
+
+
+def note_math_warning(message: str) -> None:
+    if _WARNING_SINKS and message not in _WARNING_SINKS[-1]:
+        _WARNING_SINKS[-1].append(message)
+
+
 def _structured_parser_error(detail: str) -> MathParseError:
     return MathParseError(f"Structured parser diagnostic: {detail}")
 
@@ -98,10 +156,39 @@ def is_equation_like(value: Any) -> bool:
     return isinstance(value, sp.Equality)
 
 
+def canonical_difference(lhs: Any, rhs: Any, policy: str | None = None) -> Any:
+    """Return `lhs - rhs` canonicalized according to `policy` (default: the configured policy)."""
+    difference = lhs - rhs
+    policy = policy or _canonicalize_policy
+    if policy == "plain" or not isinstance(difference, sp.Basic):
+        return difference
+    if policy == "together":
+        return sp.together(difference)
+    if policy == "cancel":
+        return sp.cancel(difference)
+    if policy == "auto" and sp.count_ops(difference) > AUTO_SIMPLIFY_MAX_OPS:
+        return difference
+    return sp.simplify(difference)
+
+
+def get_canonicalize_policy() -> str:
+    return _canonicalize_policy
+
+
+def set_canonicalize_policy(name: str) -> str:
+    """Select how equations are canonicalized and return the previous policy."""
+    global _canonicalize_policy
+    if name not in CANONICALIZE_POLICIES:
+        raise ValueError(f"Unknown Math canonicalization policy: {name!r}")
+    previous = _canonicalize_policy
+    _canonicalize_policy = name
+    return previous
+
+
 def canonicalize_equation(value: Any) -> Any:
     """Convert equation-like values to SugarPy's implicit `lhs - rhs` form."""
     if isinstance(value, sp.Equality):
-        return sp.simplify(value.lhs - value.rhs)
+        return canonical_difference(value.lhs, value.rhs)
     if isinstance(value, list):
         return [canonicalize_equation(item) for item in value]
     if isinstance(value, tuple):
@@ -116,376 +203,585 @@ def canonicalize_equation(value: Any) -> Any:
     return value
 
 
-def _scan_top_level(source: str) -> Dict[str, list[int]]:
-    depth = 0
-    quote: str | None = None
-    escaped = False
-    assignment_positions: list[int] = []
-    equation_positions: list[int] = []
-    compare_positions: list[int] = []
-    i = 0
-    while i < len(source):
-        ch = source[i]
-        nxt = source[i + 1] if i + 1 < len(source) else ""
-        if quote:
-            if escaped:
-                escaped = False
-            elif ch == "\\":
-                escaped = True
-            elif ch == quote:
-                quote = None
-            i += 1
-            continue
-        if ch in {"'", '"'}:
-            quote = ch
-            i += 1
-            continue
-        if ch in "([{":
-            depth += 1
-            i += 1
-            continue
-        if ch in ")]}":
-            depth -= 1
-            if depth < 0:
-                raise _structured_parser_error("unmatched closing bracket")
-            i += 1
-            continue
-        if depth == 0:
-            pair = ch + nxt
-            if pair == ":=":
-                assignment_positions.append(i)
-                i += 2
-                continue
-            if pair in {"==", "!=", "<=", ">="}:
-                compare_positions.append(i)
-                i += 2
-                continue
-            if ch == "=":
-                equation_positions.append(i)
-        i += 1
-    if quote:
-        raise _structured_parser_error("unclosed string literal")
-    if depth != 0:
-        raise _structured_parser_error("unclosed bracket")
-    return {
-        "assignment": assignment_positions,
-        "equation": equation_positions,
-        "compare": compare_positions,
-    }
+def _is_blocked_identifier(name: str) -> bool:
+    return name.startswith("__") or name in _BLOCKED_IDENTIFIERS
 
 
-def _normalize_expression_source(source: str) -> str:
-    raw = (source or "").strip()
-    if not raw:
-        return raw
+@dataclass(frozen=True, slots=True)
+class _Token:
+    kind: str
+    text: str
+    start: int
+    end: int
+
 
-    tokens: list[tuple[str, str]] = []
-    for match in _NORMALIZE_TOKEN_RE.finditer(raw):
+@dataclass(slots=True)
+class _Group:
+    open: _Token
+    close: _Token
+    items: list[Any]
+    blocked: bool = False
+
+    @property
+    def start(self) -> int:
+        return self.open.start
+
+    @property
+    def end(self) -> int:
+        return self.close.end
+
+
+@dataclass(slots=True)
+class _Span:
+    """A run of sibling tokens/groups inside one bracket level of a source string."""
+
+    source: str
+    items: list[Any]
+
+    @property
+    def text(self) -> str:
+        if not self.items:
+            return ""
+        return self.source[self.items[0].start : self.items[-1].end]
+
+    def top_level(self, kind: str, text: str | None = None) -> list[int]:
+        return [
+            index
+            for index, item in enumerate(self.items)
+            if type(item) is _Token and item.kind == kind and (text is None or item.text == text)
+        ]
+
+    def split(self, *, keep_empty: bool = False) -> list["_Span"]:
+        parts: list[_Span] = []
+        current: list[Any] = []
+        for item in self.items:
+            if type(item) is _Token and item.kind == "comma":
+                parts.append(_Span(self.source, current))
+                current = []
+                continue
+            current.append(item)
+        if current or not keep_empty:
+            parts.append(_Span(self.source, current))
+        if keep_empty:
+            return parts
+        return [part for part in parts if part.items]
+
+    def slice(self, start: int, end: int | None = None) -> "_Span":
+        return _Span(self.source, self.items[start:end])
+
+    def ungrouped(self) -> "_Span":
+        span = self
+        while len(span.items) == 1 and type(span.items[0]) is _Group:
+            span = _Span(self.source, span.items[0].items)
+        return span
+
+    def is_name(self) -> bool:
+        return len(self.items) == 1 and type(self.items[0]) is _Token and self.items[0].kind == "ident"
+
+    def call_group(self, name: str | None = None) -> "_Group | None":
+        """Return the argument group when the span is exactly `name(...)`."""
+        if len(self.items) != 2:
+            return None
+        head, group = self.items
+        if type(head) is not _Token or head.kind != "ident" or (name is not None and head.text != name):
+            return None
+        if type(group) is not _Group or group.open.text != "(" or group.close.text != ")":
+            return None
+        if group.start != head.end:
+            return None
+        return group
+
+    def is_blocked(self) -> bool:
+        for item in self.items:
+            if type(item) is _Group:
+                if item.blocked:
+                    return True
+            elif _token_is_blocked(item):
+                return True
+        return False
+
+
+def _tokenize(source: str) -> list[_Token]:
+    """Tokenize Math-cell source in one pass; whitespace other than newlines is dropped."""
+    tokens: list[_Token] = []
+    for match in _TOKEN_RE.finditer(source):
         kind = match.lastgroup or "other"
-        value = match.group(0)
         if kind == "space":
             continue
-        if kind == "power":
-            value = "**"
-        tokens.append((kind, value))
-
-    normalized: list[str] = []
-    prev_kind: str | None = None
-    prev_value: str | None = None
-
-    def _ends_atom(kind: str | None) -> bool:
-        return kind in {"ident", "number", "string", "close"}
-
-    def _starts_atom(kind: str | None) -> bool:
-        return kind in {"ident", "number", "string", "open"}
-
-    for kind, value in tokens:
-        if normalized and _ends_atom(prev_kind) and _starts_atom(kind):
-            if not (
-                prev_kind == "ident" and value == "("
-            ) and not (
-                prev_kind == "close" and prev_value == "["
-            ) and not (
-                value == "[" and prev_kind in {"ident", "close"}
-            ):
-                normalized.append("*")
-        normalized.append(value)
-        prev_kind = kind
-        prev_value = value
-
-    return "".join(normalized)
-
-
-def _check_blocked_identifiers(source: str) -> None:
-    names = set(_IDENT_RE.findall(source))
-    for name in names:
-        if name.startswith("__"):
-            raise MathParseError("Names starting with '__' are not allowed in Math cells.")
-        if name in _BLOCKED_IDENTIFIERS:
-            raise MathParseError(f"'{name}' is not allowed in Math cells.")
+        tokens.append(_Token(kind, match.group(0), match.start(), match.end()))
+    return tokens
 
 
-def _split_top_level_commas(source: str) -> list[str]:
-    parts: list[str] = []
-    buf: list[str] = []
-    depth = 0
-    quote: str | None = None
-    escaped = False
-    for ch in source:
-        if quote:
-            buf.append(ch)
-            if escaped:
-                escaped = False
-                continue
-            if ch == "\\":
-                escaped = True
-                continue
-            if ch == quote:
-                quote = None
-            continue
+def _token_is_blocked(token: _Token) -> bool:
+    if token.kind == "ident":
+        return _is_blocked_identifier(token.text)
+    if token.kind in {"string", "unclosed_string"}:
+        return any(_is_blocked_identifier(name) for name in _IDENT_RE.findall(token.text))
+    return False
 
-        if ch in {"'", '"'}:
-            quote = ch
-            buf.append(ch)
-            continue
 
-        if ch in "([{":
-            depth += 1
-            buf.append(ch)
+def _check_blocked_tokens(tokens: Iterable[_Token]) -> None:
+    for token in tokens:
+        if token.kind == "ident":
+            names = [token.text]
+        elif token.kind in {"string", "unclosed_string"}:
+            names = _IDENT_RE.findall(token.text)
+        else:
             continue
-        if ch in ")]}":
-            depth -= 1
-            buf.append(ch)
+        for name in names:
+            if name.startswith("__"):
+                raise MathParseError("Names starting with '__' are not allowed in Math cells.")
+            if name in _BLOCKED_IDENTIFIERS:
+                raise MathParseError(f"'{name}' is not allowed in Math cells.")
+
+
+def _build_syntax_tree(tokens: list[_Token]) -> list[Any]:
+    root: list[Any] = []
+    stack: list[tuple[_Token, list[Any], bool]] = []
+    items = root
+    blocked = False
+    mismatched = False
+    for token in tokens:
+        kind = token.kind
+        if kind == "newline":
             continue
-
-        if ch == "," and depth == 0:
-            parts.append("".join(buf).strip())
-            buf = []
+        if kind == "open":
+            stack.append((token, items, blocked))
+            items = []
+            blocked = False
             continue
-        buf.append(ch)
-
-    parts.append("".join(buf).strip())
-    return [part for part in parts if part]
-
-
-def _strip_enclosing_group(source: str) -> str:
-    trimmed = source.strip()
-    while trimmed and trimmed[0] in "([{" and _find_matching_bracket(trimmed, 0) == len(trimmed) - 1:
-        trimmed = trimmed[1:-1].strip()
-    return trimmed
-
-
-def _find_matching_bracket(source: str, start: int) -> int:
-    pairs = {"(": ")", "[": "]", "{": "}"}
-    opener = source[start]
-    closer = pairs.get(opener)
-    if closer is None:
-        raise _structured_parser_error("unsupported bracket")
-
-    depth = 1
-    quote: str | None = None
-    escaped = False
-    i = start + 1
-    while i < len(source):
-        ch = source[i]
-        if quote:
-            if escaped:
-                escaped = False
-            elif ch == "\\":
-                escaped = True
-            elif ch == quote:
-                quote = None
-            i += 1
+        if kind == "close":
+            if not stack:
+                raise _structured_parser_error("unmatched closing bracket")
+            opener, parent, parent_blocked = stack.pop()
+            if _BRACKET_PAIRS[opener.text] != token.text:
+                mismatched = True
+            group = _Group(opener, token, items, blocked)
+            parent.append(group)
+            items = parent
+            blocked = parent_blocked or group.blocked
             continue
-        if ch in {"'", '"'}:
-            quote = ch
-            i += 1
+        if kind == "unclosed_string":
+            # The unclosed literal swallows the rest of the source, so this is the last token.
+            raise _structured_parser_error("unclosed string literal")
+        if not blocked and _token_is_blocked(token):
+            blocked = True
+        items.append(token)
+    if stack or mismatched:
+        raise _structured_parser_error("unclosed bracket")
+    return root
+
+
+def _syntax_span(source: str) -> _Span:
+    return _Span(source, _build_syntax_tree(_tokenize(source)))
+
+
+def _flatten_tokens(items: list[Any]) -> Iterable[_Token]:
+    stack: list[tuple[list[Any], int, _Token | None]] = [(items, 0, None)]
+    while stack:
+        current, index, close = stack.pop()
+        if index == len(current):
+            if close is not None:
+                yield close
             continue
-        if ch == opener:
-            depth += 1
-        elif ch == closer:
-            depth -= 1
-            if depth == 0:
-                return i
-        i += 1
-    raise _structured_parser_error("unclosed bracket")
+        item = current[index]
+        stack.append((current, index + 1, close))
+        if type(item) is _Group:
+            yield item.open
+            stack.append((item.items, 0, item.close))
+        else:
+            yield item
 
 
-def _wrap_equation_expression(source: str) -> str:
-    try:
-        parsed = parse_math_input(source)
-    except MathParseError:
-        return source
-    if parsed.kind != "equation":
-        return source
-    lhs = parsed.lhs_source or ""
-    rhs = parsed.rhs_source or ""
-    return f"Eq({lhs}, {rhs})"
+class _Normalizer:
+    """Streaming form of the `^` -> `**` and implicit-multiplication normalization."""
 
+    __slots__ = ("out", "prev_kind", "started")
 
-def _rewrite_inline_equations(source: str, *, nested: bool = False) -> str:
-    parts = _split_top_level_commas(source)
-    rewritten_parts: list[str] = []
-
-    for part in parts:
-        buf: list[str] = []
-        i = 0
-        while i < len(part):
-            ch = part[i]
-            if ch in "([{":
-                close_idx = _find_matching_bracket(part, i)
-                inner = part[i + 1 : close_idx]
-                rewritten_inner = _rewrite_inline_equations(inner, nested=True)
-                buf.append(ch)
-                buf.append(rewritten_inner)
-                buf.append(part[close_idx])
-                i = close_idx + 1
-                continue
-            buf.append(ch)
-            i += 1
-        rewritten = "".join(buf).strip()
-        if nested:
-            rewritten = _wrap_equation_expression(rewritten)
-        rewritten_parts.append(rewritten)
+    _ENDS_ATOM = frozenset({"ident", "number", "string", "close"})
+    _STARTS_ATOM = frozenset({"ident", "number", "string", "open"})
 
-    return ", ".join(rewritten_parts)
+    def __init__(self, out: list[str]) -> None:
+        self.out = out
+        self.prev_kind: str | None = None
+        self.started = False
+
+    def push(self, kind: str, text: str) -> None:
+        if kind == "power":
+            text = "**"
+        if (
+            self.started
+            and self.prev_kind in self._ENDS_ATOM
+            and kind in self._STARTS_ATOM
+            and not (self.prev_kind == "ident" and text == "(")
+            and not (text == "[" and self.prev_kind in {"ident", "close"})
+        ):
+            self.out.append("*")
+        self.out.append(text)
+        self.prev_kind = kind
+        self.started = True
+
+    def push_tokens(self, tokens: Iterable[_Token]) -> None:
+        for token in tokens:
+            if token.kind != "newline":
+                self.push(token.kind, token.text)
+
+
+def _normalize_span(span: _Span) -> str:
+    out: list[str] = []
+    _Normalizer(out).push_tokens(_flatten_tokens(span.items))
+    return "".join(out)
+
+
+def _inline_equation_sides(part: _Span) -> tuple[_Span, _Span] | None:
+    """Return `(lhs, rhs)` when a nested argument is a single `lhs = rhs` equation."""
+    if part.top_level("assign") or part.top_level("compare"):
+        return None
+    equals = part.top_level("operator", "=")
+    if len(equals) != 1:
+        return None
+    idx = equals[0]
+    if idx == 0 or idx == len(part.items) - 1:
+        return None
+    if part.is_blocked():
+        return None
+    lhs = part.slice(0, idx)
+    if lhs.is_name() and lhs.text in _KEYWORD_ARGUMENT_NAMES:
+        return None
+    return lhs, part.slice(idx + 1)
 
 
-def _find_top_level_range(source: str) -> int | None:
-    depth = 0
-    quote: str | None = None
-    escaped = False
-    i = 0
-    while i < len(source) - 1:
-        ch = source[i]
-        nxt = source[i + 1]
-        if quote:
-            if escaped:
-                escaped = False
-            elif ch == "\\":
-                escaped = True
-            elif ch == quote:
-                quote = None
-            i += 1
-            continue
-        if ch in {"'", '"'}:
-            quote = ch
-            i += 1
-            continue
-        if ch in "([{":
-            depth += 1
-            i += 1
+def _emit_rewritten_parts(span: _Span, nested: bool, out: list[str]) -> None:
+    for index, part in enumerate(span.split()):
+        if index:
+            out.append(", ")
+        sides = _inline_equation_sides(part) if nested else None
+        if sides is None:
+            _emit_raw_part(part, out)
             continue
-        if ch in ")]}":
-            depth -= 1
-            i += 1
+        lhs, rhs = sides
+        out.append("Eq(")
+        _emit_normalized_items(lhs.items, _Normalizer(out), span.source)
+        out.append(", ")
+        _emit_normalized_items(rhs.items, _Normalizer(out), span.source)
+        out.append(")")
+
+
+def _emit_raw_part(part: _Span, out: list[str]) -> None:
+    source = part.source
+    prev_end: int | None = None
+    for item in part.items:
+        if prev_end is not None:
+            out.append(source[prev_end : item.start])
+        if type(item) is _Group:
+            out.append(item.open.text)
+            _emit_rewritten_parts(_Span(source, item.items), True, out)
+            out.append(item.close.text)
+        else:
+            out.append(item.text)
+        prev_end = item.end
+
+
+def _emit_normalized_items(items: list[Any], normalizer: _Normalizer, source: str) -> None:
+    for item in items:
+        if type(item) is not _Group:
+            normalizer.push(item.kind, item.text)
             continue
-        if depth == 0 and ch == "." and nxt == ".":
-            return i
-        i += 1
-    return None
+        normalizer.push("open", item.open.text)
+        for index, part in enumerate(_Span(source, item.items).split()):
+            if index:
+                normalizer.push("comma", ",")
+            sides = _inline_equation_sides(part)
+            if sides is None:
+                _emit_normalized_items(part.items, normalizer, source)
+                continue
+            lhs, rhs = sides
+            normalizer.push("ident", "Eq")
+            normalizer.push("open", "(")
+            _emit_normalized_items(lhs.items, normalizer, source)
+            normalizer.push("comma", ",")
+            _emit_normalized_items(rhs.items, normalizer, source)
+            normalizer.push("close", ")")
+        normalizer.push("close", item.close.text)
+
+
+def _rewrite_inline_equations(source: str, *, nested: bool = False) -> str:
+    """Wrap nested `lhs = rhs` arguments as `Eq(lhs, rhs)` in a single walk over the syntax tree."""
+    out: list[str] = []
+    _emit_rewritten_parts(_syntax_span(source), nested, out)
+    return "".join(out)
+
+
+def _range_kwargs(target: str, range_start: str, range_end: str) -> list[str]:
+    if target == "x":
+        return [f"xmin={range_start}", f"xmax={range_end}"]
+    if target == "y":
+        return [f"ymin={range_start}", f"ymax={range_end}"]
+    return [f"var={target}", f"start={range_start}", f"end={range_end}"]
+
+
+def _table_range_kwargs(target: str, range_start: str, range_end: str) -> list[str]:
+    return [f"var={target}", f"start={range_start}", f"end={range_end}"]
 
 
-def _parse_plot_option_arg(arg: str) -> list[str] | None:
-    marks = _scan_top_level(arg)
-    if len(marks["equation"]) != 1 or marks["assignment"]:
+def _parse_plot_option_arg(
+    arg: _Span, range_kwargs: Any = _range_kwargs, kwarg_names: set[str] = _PLOT_KWARG_NAMES
+) -> list[str] | None:
+    if arg.top_level("assign"):
         return None
-    idx = marks["equation"][0]
-    lhs = arg[:idx].strip()
-    rhs = arg[idx + 1 :].strip()
-    if not _ASSIGN_TARGET_RE.match(lhs) or not rhs:
+    equals = arg.top_level("operator", "=")
+    if len(equals) != 1:
+        return None
+    idx = equals[0]
+    lhs = arg.slice(0, idx)
+    rhs = arg.slice(idx + 1)
+    if not lhs.is_name() or not rhs.items:
         return None
 
-    range_idx = _find_top_level_range(rhs)
-    if range_idx is not None:
-        range_start = rhs[:range_idx].strip()
-        range_end = rhs[range_idx + 2 :].strip()
+    ranges = rhs.top_level("range")
+    if ranges:
+        range_start = rhs.slice(0, ranges[0]).text
+        range_end = rhs.slice(ranges[0] + 1).text
         if not range_start or not range_end:
             return None
-        if lhs == "x":
-            return [f"xmin={range_start}", f"xmax={range_end}"]
-        if lhs == "y":
-            return [f"ymin={range_start}", f"ymax={range_end}"]
-        return [f"var={lhs}", f"start={range_start}", f"end={range_end}"]
-
-    if lhs in _PLOT_KWARG_NAMES:
-        return [f"{lhs}={rhs}"]
+        return range_kwargs(lhs.text, range_start, range_end)
+
+    if lhs.text in kwarg_names:
+        return [f"{lhs.text}={rhs.text}"]
     return None
 
 
-def _parse_plot_tuple_range_arg(arg: str) -> list[str] | None:
-    stripped = arg.strip()
-    if not stripped or stripped[0] not in "([{" or stripped[-1] not in ")]}":
+def _parse_plot_tuple_range_arg(arg: _Span, range_kwargs: Any = _range_kwargs) -> list[str] | None:
+    if not arg.items or type(arg.items[0]) is not _Group or type(arg.items[-1]) is not _Group:
         return None
-    inner = _strip_enclosing_group(stripped)
-    parts = _split_top_level_commas(inner)
+    parts = arg.ungrouped().split()
     if len(parts) != 3:
         return None
-    target = parts[0].strip()
-    range_start = parts[1].strip()
-    range_end = parts[2].strip()
-    if not _ASSIGN_TARGET_RE.match(target) or not range_start or not range_end:
+    target, range_start, range_end = parts
+    if not target.is_name():
         return None
-    if target == "x":
-        return [f"xmin={range_start}", f"xmax={range_end}"]
-    if target == "y":
-        return [f"ymin={range_start}", f"ymax={range_end}"]
-    return [f"var={target}", f"start={range_start}", f"end={range_end}"]
+    return range_kwargs(target.text, range_start.text, range_end.text)
 
 
-def _parse_plot_positional_range_args(args: list[str], idx: int) -> tuple[list[str], int] | None:
+def _parse_plot_positional_range_args(
+    args: list[_Span], idx: int, range_kwargs: Any = _range_kwargs
+) -> tuple[list[str], int] | None:
     if idx + 2 >= len(args):
         return None
-    target = args[idx].strip()
+    target = args[idx].text
     if target not in {"x", "y"}:
         return None
-    range_start = args[idx + 1].strip()
-    range_end = args[idx + 2].strip()
-    if not range_start or not range_end:
-        return None
+    range_start = args[idx + 1]
+    range_end = args[idx + 2]
     if _parse_plot_option_arg(range_start) is not None or _parse_plot_option_arg(range_end) is not None:
         return None
-    if target == "x":
-        return (["xmin=" + range_start, "xmax=" + range_end], idx + 3)
-    return (["ymin=" + range_start, "ymax=" + range_end], idx + 3)
+    return (range_kwargs(target, range_start.text, range_end.text), idx + 3)
 
 
-def _rewrite_plot_call_source(source: str) -> str:
-    trimmed = source.strip()
-    prefix = "plot("
-    if not trimmed.startswith(prefix) or not trimmed.endswith(")"):
-        return source
+def _rewrite_plot_call_span(span: _Span, name: str = "plot", expression_args: list[str] | None = None) -> str | None:
+    """Rewrite `plot(...)` (or `table(...)`) range and option arguments into keyword arguments.
 
-    close_idx = _find_matching_bracket(trimmed, len(prefix) - 1)
-    if close_idx != len(trimmed) - 1:
-        return source
+    The source of every other argument is appended to `expression_args` when given.
+    """
+    group = span.call_group(name)
+    if group is None:
+        return None
+    range_kwargs = _table_range_kwargs if name == "table" else _range_kwargs
+    kwarg_names = _TABLE_KWARG_NAMES if name == "table" else _PLOT_KWARG_NAMES
 
-    inner = trimmed[len(prefix):close_idx]
-    args = _split_top_level_commas(inner)
+    args = _Span(span.source, group.items).split()
     rewritten_args: list[str] = []
     idx = 0
     while idx < len(args):
-        stripped_arg = args[idx].strip()
-        option_args = _parse_plot_option_arg(stripped_arg)
+        arg = args[idx]
+        option_args = _parse_plot_option_arg(arg, range_kwargs, kwarg_names)
         if option_args is not None:
             rewritten_args.extend(option_args)
             idx += 1
             continue
-        tuple_option_args = _parse_plot_tuple_range_arg(stripped_arg)
+        tuple_option_args = _parse_plot_tuple_range_arg(arg, range_kwargs)
         if tuple_option_args is not None:
             rewritten_args.extend(tuple_option_args)
             idx += 1
             continue
-        positional_range = _parse_plot_positional_range_args(args, idx)
+        positional_range = _parse_plot_positional_range_args(args, idx, range_kwargs)
         if positional_range is not None:
             range_args, next_idx = positional_range
             rewritten_args.extend(range_args)
             idx = next_idx
             continue
-        rewritten_arg = _rewrite_plot_call_source(stripped_arg) if stripped_arg.startswith("plot(") else _rewrite_inline_equations(stripped_arg, nested=True)
-        rewritten_args.append(rewritten_arg)
+        if name == "plot" and arg.text.startswith("plot("):
+            rewritten_args.append(_rewrite_plot_call_span(arg) or arg.text)
+        else:
+            out: list[str] = []
+            _emit_rewritten_parts(arg, True, out)
+            rewritten_args.append("".join(out))
+        if expression_args is not None:
+            expression_args.append(arg.text)
         idx += 1
-    return f"plot({', '.join(rewritten_args)})"
+    return f"{name}({', '.join(rewritten_args)})"
+
+
+def _rewrite_plot_call_source(source: str, name: str = "plot") -> str:
+    rewritten = _rewrite_plot_call_span(_syntax_span(source.strip()), name)
+    return source if rewritten is None else rewritten
+
+
+def table_expression_sources(source: str) -> list[str] | None:
+    """Source of the expression arguments of `table(...)`, or None when `source` is not such a call."""
+    try:
+        span = _syntax_span(source.strip())
+    except MathParseError:
+        return None
+    sources: list[str] = []
+    if _rewrite_plot_call_span(span, "table", sources) is None:
+        return None
+    return sources
+
+
+def extract_call_arguments(source: str, names: Iterable[str]) -> tuple[str, list[str]] | None:
+    """Split `name(arg, ...)` into its raw argument sources when `source` is exactly such a call."""
+    try:
+        span = _syntax_span(source.strip())
+    except MathParseError:
+        return None
+    for name in names:
+        group = span.call_group(name)
+        if group is not None:
+            return name, [part.text for part in _Span(span.source, group.items).split(keep_empty=True)]
+    return None
+
+
+def _statement_spans(source: str) -> list[tuple[int, int, int]]:
+    """Return `(line_start, start, end)` offsets of each top-level statement in a Math cell."""
+    spans: list[tuple[int, int, int]] = []
+    depth = 0
+    line_no = 1
+    stmt_line = 1
+    stmt_start = 0
+
+    def flush(end: int) -> None:
+        segment = source[stmt_start:end]
+        stripped = segment.strip()
+        if stripped:
+            offset = stmt_start + (len(segment) - len(segment.lstrip()))
+            spans.append((stmt_line, offset, offset + len(stripped)))
+
+    for token in _tokenize(source):
+        kind = token.kind
+        if kind == "newline":
+            if depth == 0:
+                flush(token.start)
+                stmt_line = line_no + 1
+                stmt_start = token.end
+            line_no += 1
+        elif kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+        elif kind in {"string", "unclosed_string"}:
+            line_no += token.text.count("\n")
+    flush(len(source))
+    return spans
+
+
+def split_math_statements(source: str) -> list[tuple[int, str]]:
+    """Split a Math cell into top-level statements with their 1-based starting line numbers.
+
+    A newline only ends a statement outside quotes and at bracket depth 0.
+    """
+    return [(line, source[start:end]) for line, start, end in _statement_spans(source)]
+
+
+def _parse_error_range(tokens: list[_Token]) -> tuple[int, int] | None:
+    """Offsets of the token a `MathParseError` is about, found in the order `parse_math_input` checks."""
+    for token in tokens:
+        if token.kind in {"ident", "string", "unclosed_string"} and _token_is_blocked(token):
+            return token.start, token.end
+    openers: list[_Token] = []
+    for token in tokens:
+        if token.kind == "unclosed_string":
+            return token.start, token.end
+        if token.kind == "open":
+            openers.append(token)
+        elif token.kind == "close":
+            if not openers or _BRACKET_PAIRS[openers.pop().text] != token.text:
+                return token.start, token.end
+    if openers:
+        return openers[-1].start, openers[-1].end
+    depth = 0
+    assigns: list[_Token] = []
+    for token in tokens:
+        depth += {"open": 1, "close": -1}.get(token.kind, 0)
+        if depth == 0 and token.kind == "assign":
+            assigns.append(token)
+            if len(assigns) > 1:
+                return token.start, token.end
+    for token in tokens:
+        depth += {"open": 1, "close": -1}.get(token.kind, 0)
+        if depth == 0 and token.kind == "compare":
+            return token.start, token.end
+    return None
+
+
+def lint_math_source(source: str) -> Dict[str, Any]:
+    """Classify each statement of a Math cell without evaluating anything.
+
+    Statement spans and diagnostics carry character offsets into `source` and 1-based lines.
+    """
+    statements: list[Dict[str, Any]] = []
+    diagnostics: list[Dict[str, Any]] = []
+    for line_start, start, end in _statement_spans(source):
+        text = source[start:end]
+        statement: Dict[str, Any] = {
+            "line_start": line_start,
+            "start": start,
+            "end": end,
+            "kind": None,
+            "normalized_source": None,
+        }
+        statements.append(statement)
+        try:
+            parsed = parse_math_input(text)
+        except MathParseError as exc:
+            located = _parse_error_range(_tokenize(text))
+            error_start, error_end = (start + located[0], start + located[1]) if located else (start, end)
+            diagnostics.append(
+                {
+                    "severity": "error",
+                    "message": str(exc),
+                    "line": source.count("\n", 0, error_start) + 1,
+                    "start": error_start,
+                    "end": error_end,
+                }
+            )
+            continue
+        statement["kind"] = parsed.kind
+        statement["normalized_source"] = parsed.normalized_source
+        diagnostics.extend(
+            {"severity": "warning", "message": warning, "line": line_start, "start": start, "end": end}
+            for warning in parsed.warnings
+        )
+        # Nested `==` parses, but compares structurally instead of forming an equation.
+        diagnostics.extend(
+            {
+                "severity": "warning",
+                "message": "'==' tests whether both sides are identical; use '=' for an equation.",
+                "line": source.count("\n", 0, start + token.start) + 1,
+                "start": start + token.start,
+                "end": start + token.end,
+            }
+            for token in _tokenize(text)
+            if token.kind == "compare" and token.text == "=="
+        )
+    parsed_statements = [statement for statement in statements if statement["kind"] is not None]
+    return {
+        "ok": not any(diagnostic["severity"] == "error" for diagnostic in diagnostics),
+        "kind": parsed_statements[-1]["kind"] if parsed_statements else None,
+        "normalized_source": "\n".join(statement["normalized_source"] for statement in parsed_statements),
+        "statements": statements,
+        "diagnostics": diagnostics,
+    }
 
 
 def _flatten_assignment_target_tree(target_tree: Any) -> tuple[str, ...]:
@@ -497,22 +793,21 @@ def _flatten_assignment_target_tree(target_tree: Any) -> tuple[str, ...]:
     return tuple(flattened)
 
 
-def _parse_assignment_target_tree(lhs: str) -> Any:
-    trimmed = lhs.strip()
-    if not trimmed:
+def _parse_assignment_target_tree(lhs: _Span) -> Any:
+    if not lhs.items:
         raise MathParseError("Left side of ':=' must define at least one variable name.")
-    ungrouped = _strip_enclosing_group(trimmed)
-    parts = _split_top_level_commas(ungrouped)
+    ungrouped = lhs.ungrouped()
+    parts = ungrouped.split()
     if len(parts) > 1:
         return tuple(_parse_assignment_target_tree(part) for part in parts)
-    if _ASSIGN_TARGET_RE.match(ungrouped):
-        return ungrouped
+    if ungrouped.is_name():
+        return ungrouped.text
     raise MathParseError(
         "Left side of ':=' must be a variable name or comma-separated variable names."
     )
 
 
-def _parse_assignment_targets(lhs: str) -> tuple[tuple[str, ...], Any]:
+def _parse_assignment_targets(lhs: _Span) -> tuple[tuple[str, ...], Any]:
     target_tree = _parse_assignment_target_tree(lhs)
     targets = _flatten_assignment_target_tree(target_tree)
     if not targets:
@@ -522,52 +817,104 @@ def _parse_assignment_targets(lhs: str) -> tuple[tuple[str, ...], Any]:
     return targets, target_tree
 
 
-def _parse_function_target(lhs: str) -> tuple[str, tuple[str, ...]] | None:
-    trimmed = lhs.strip()
-    open_idx = trimmed.find("(")
-    close_idx = trimmed.rfind(")")
-    if open_idx <= 0 or close_idx != len(trimmed) - 1:
+def _parse_function_target(lhs: _Span) -> tuple[str, tuple[str, ...]] | None:
+    items = lhs.items
+    if len(items) < 2 or not lhs.slice(0, 1).is_name():
         return None
-    name = trimmed[:open_idx].strip()
-    if not _ASSIGN_TARGET_RE.match(name):
+    group = items[1]
+    if type(group) is not _Group or group.open.text != "(":
         return None
-    raw_args = trimmed[open_idx + 1 : close_idx].strip()
-    if not raw_args:
-        return name, ()
-    args = tuple(_split_top_level_commas(raw_args))
+    last = items[-1]
+    if type(last) is not _Group or last.close.text != ")":
+        return None
+    if len(items) > 2:
+        # Anything after the argument list (for example `f(a)(b)`) cannot be a parameter list.
+        raise MathParseError("Function arguments must be simple variable names.")
+    name = items[0].text
+    args_span = _Span(lhs.source, group.items)
+    args = tuple(part.text for part in args_span.split())
     if not args:
         return name, ()
-    for arg in args:
-        if not _ASSIGN_TARGET_RE.match(arg):
+    for part in args_span.split():
+        if not part.is_name():
             raise MathParseError("Function arguments must be simple variable names.")
     if len(set(args)) != len(args):
         raise MathParseError("Duplicate function argument names are not allowed.")
     return name, args
 
 
+def math_parse_cache_info() -> Dict[str, Dict[str, int]]:
+    """Return hit/miss counters for the parse and rewrite caches."""
+    return {
+        "parse": _PARSE_CACHE.info(),
+        "rewrite": _REWRITE_CACHE.info(),
+        "compile": _COMPILE_CACHE.info(),
+        "names": _NAMES_CACHE.info(),
+    }
+
+
+def clear_math_parse_cache() -> None:
+    _PARSE_CACHE.clear()
+    _REWRITE_CACHE.clear()
+    _COMPILE_CACHE.clear()
+    _NAMES_CACHE.clear()
+
+
+def get_expression_backend() -> str:
+    return _expression_backend
+
+
+def set_expression_backend(name: str) -> str:
+    """Select the expression backend and return the previous one."""
+    global _expression_backend
+    if name not in EXPRESSION_BACKENDS:
+        raise ValueError(f"Unknown Math expression backend: {name!r}")
+    previous = _expression_backend
+    _expression_backend = name
+    return previous
+
+
 def parse_math_input(source: str) -> ParsedMathInput:
     raw = (source or "").strip()
+    cached = _PARSE_CACHE.get(raw)
+    if isinstance(cached, ParsedMathInput):
+        return cached
+    if isinstance(cached, MathParseError):
+        raise MathParseError(str(cached))
+    try:
+        parsed = _parse_math_input_uncached(raw)
+    except MathParseError as exc:
+        _PARSE_CACHE.put(raw, exc)
+        raise
+    _PARSE_CACHE.put(raw, parsed)
+    return parsed
+
+
+def _parse_math_input_uncached(raw: str) -> ParsedMathInput:
     if not raw:
         raise MathParseError("Empty cell.")
-    _check_blocked_identifiers(raw)
-    marks = _scan_top_level(raw)
-    if len(marks["assignment"]) > 1:
+    tokens = _tokenize(raw)
+    _check_blocked_tokens(tokens)
+    span = _Span(raw, _build_syntax_tree(tokens))
+    assignments = span.top_level("assign")
+    if len(assignments) > 1:
         raise MathParseError("Use only one ':=' assignment per Math cell.")
-    if marks["compare"]:
+    if span.top_level("compare"):
         raise MathParseError(
             "Comparison operators are unsupported in Math cells; use single '=' for equations."
         )
 
-    if marks["assignment"]:
-        idx = marks["assignment"][0]
-        lhs = raw[:idx].strip()
-        rhs = raw[idx + 2 :].strip()
-        if not lhs or not rhs:
+    if assignments:
+        idx = assignments[0]
+        lhs_span = span.slice(0, idx)
+        rhs_span = span.slice(idx + 1)
+        lhs = lhs_span.text
+        if not lhs or not rhs_span.items:
             raise _structured_parser_error("assignment must have both name and expression")
-        function_target = _parse_function_target(lhs)
+        function_target = _parse_function_target(lhs_span)
         if function_target is not None:
             function_name, function_args = function_target
-            normalized_rhs = _normalize_expression_source(rhs)
+            normalized_rhs = _normalize_span(rhs_span)
             return ParsedMathInput(
                 kind="function_assignment",
                 source=raw,
@@ -579,8 +926,8 @@ def parse_math_input(source: str) -> ParsedMathInput:
                 function_name=function_name,
                 function_args=function_args,
             )
-        targets, target_tree = _parse_assignment_targets(lhs)
-        normalized_rhs = _normalize_expression_source(rhs)
+        targets, target_tree = _parse_assignment_targets(lhs_span)
+        normalized_rhs = _normalize_span(rhs_span)
         return ParsedMathInput(
             kind="assignment",
             source=raw,
@@ -592,16 +939,17 @@ def parse_math_input(source: str) -> ParsedMathInput:
             assignment_target_tree=target_tree,
         )
 
-    if len(marks["equation"]) > 1:
+    equations = span.top_level("operator", "=")
+    if len(equations) > 1:
         raise MathParseError("Use one top-level '=' per equation.")
-    if marks["equation"]:
-        idx = marks["equation"][0]
-        lhs = raw[:idx].strip()
-        rhs = raw[idx + 1 :].strip()
-        if not lhs or not rhs:
+    if equations:
+        idx = equations[0]
+        lhs_span = span.slice(0, idx)
+        rhs_span = span.slice(idx + 1)
+        if not lhs_span.items or not rhs_span.items:
             raise _structured_parser_error("equation must have expressions on both sides of '='")
-        normalized_lhs = _normalize_expression_source(lhs)
-        normalized_rhs = _normalize_expression_source(rhs)
+        normalized_lhs = _normalize_span(lhs_span)
+        normalized_rhs = _normalize_span(rhs_span)
         return ParsedMathInput(
             kind="equation",
             source=raw,
@@ -610,221 +958,372 @@ def parse_math_input(source: str) -> ParsedMathInput:
             rhs_source=normalized_rhs,
         )
 
-    normalized = _normalize_expression_source(raw)
+    normalized = _normalize_span(span)
     return ParsedMathInput(kind="expression", source=raw, normalized_source=normalized)
 
 
-def _collect_call_names(source: str) -> set[str]:
-    return {match.group(1) for match in _CALL_NAME_RE.finditer(source)}
+def _source_names(source: str) -> tuple[frozenset[str], frozenset[str]]:
+    """Return `(identifier names, names used as calls)` for a source string, from cached tokens."""
+    cached = _NAMES_CACHE.get(source)
+    if cached is not None:
+        return cached
+    names: set[str] = set()
+    call_names: set[str] = set()
+    pending: str | None = None
+    for token in _tokenize(source):
+        if token.kind == "newline":
+            continue
+        if pending is not None and token.kind == "open" and token.text == "(":
+            call_names.add(pending)
+        pending = None
+        if token.kind == "ident":
+            names.add(token.text)
+            pending = token.text
+    result = (frozenset(names), frozenset(call_names))
+    _NAMES_CACHE.put(source, result)
+    return result
+
+
+def _container_map(value: Any, fn: Any) -> Any:
+    if isinstance(value, list):
+        return [_container_map(item, fn) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_container_map(item, fn) for item in value)
+    if isinstance(value, dict):
+        return {_container_map(k, fn): _container_map(v, fn) for k, v in value.items()}
+    return fn(value)
 
 
-def _collect_identifier_names(source: str) -> set[str]:
-    return set(_IDENT_RE.findall(source))
+def _math_N(value: Any, *args: Any, **kwargs: Any) -> Any:
+    # SymPy's N() expects objects with evalf(); wrap it to support containers like solve(...) results.
+    def _n(v: Any) -> Any:
+        return sp.N(v, *args, **kwargs)
 
+    try:
+        return _container_map(value, _n)
+    except Exception:
+        return sp.N(value, *args, **kwargs)
 
-def build_math_locals(
-    source_parts: Iterable[str],
-    *,
-    mode: str,
-    user_ns: Dict[str, Any],
-) -> Dict[str, Any]:
-    source = " ".join(source_parts)
-    names = _collect_identifier_names(source)
-    call_names = _collect_call_names(source)
-
-    def _container_map(value: Any, fn: Any) -> Any:
-        if isinstance(value, list):
-            return [_container_map(item, fn) for item in value]
-        if isinstance(value, tuple):
-            return tuple(_container_map(item, fn) for item in value)
-        if isinstance(value, dict):
-            return {_container_map(k, fn): _container_map(v, fn) for k, v in value.items()}
-        return fn(value)
-
-    def N(value: Any, *args: Any, **kwargs: Any) -> Any:
-        # SymPy's N() expects objects with evalf(); wrap it to support containers like solve(...) results.
-        def _n(v: Any) -> Any:
-            return sp.N(v, *args, **kwargs)
 
+def _resolve_decimal_places(user_ns: Dict[str, Any], places: Any | None) -> int:
+    def _fallback_default() -> int:
+        default_places = user_ns.get("__sugarpy_decimal_places", 4)
         try:
-            return _container_map(value, _n)
+            resolved_default = int(default_places)
         except Exception:
-            return sp.N(value, *args, **kwargs)
-
-    def _resolve_decimal_places(places: Any | None) -> int:
-        def _fallback_default() -> int:
-            default_places = user_ns.get("__sugarpy_decimal_places", 4)
-            try:
-                resolved_default = int(default_places)
-            except Exception:
-                resolved_default = 4
-            return min(max(resolved_default, 0), 12)
-
-        if places is None:
-            return _fallback_default()
-        try:
-            resolved = int(places)
-        except Exception:
-            # Keep rendering resilient: if places cannot be parsed, use configured/default precision.
-            return _fallback_default()
-        return min(max(resolved, 0), 12)
-
-    def set_decimal_places(places: Any) -> int:
-        resolved = _resolve_decimal_places(places)
-        user_ns["__sugarpy_decimal_places"] = resolved
-        return resolved
-
-    def render_decimal(value: Any, places: Any | None = None) -> RenderDirective:
-        return RenderDirective(value=value, mode="decimal", places=_resolve_decimal_places(places))
-
-    def render_exact(value: Any) -> RenderDirective:
-        return RenderDirective(value=value, mode="exact", places=None)
-
-    def _is_symbol_spec(value: Any) -> bool:
-        if isinstance(value, sp.Symbol):
-            return True
-        if isinstance(value, (list, tuple, set)):
-            return bool(value) and all(_is_symbol_spec(item) for item in value)
-        return False
+            resolved_default = 4
+        return min(max(resolved_default, 0), 12)
 
-    def solve(equations: Any, *args: Any, **kwargs: Any) -> Any:
-        grouped_equations = [equations]
-        remaining_args: list[Any] = []
-        collecting_equations = not _is_symbol_spec(equations)
+    if places is None:
+        return _fallback_default()
+    try:
+        resolved = int(places)
+    except Exception:
+        # Keep rendering resilient: if places cannot be parsed, use configured/default precision.
+        return _fallback_default()
+    return min(max(resolved, 0), 12)
 
-        for arg in args:
-            if collecting_equations and not _is_symbol_spec(arg):
-                grouped_equations.append(arg)
-                continue
-            collecting_equations = False
-            remaining_args.append(arg)
 
-        normalized_input: Any
-        if len(grouped_equations) == 1:
-            normalized_input = grouped_equations[0]
-        else:
-            normalized_input = tuple(grouped_equations)
+def _math_set_decimal_places(user_ns: Dict[str, Any], places: Any) -> int:
+    resolved = _resolve_decimal_places(user_ns, places)
+    user_ns["__sugarpy_decimal_places"] = resolved
+    return resolved
 
-        normalized = canonicalize_equation(normalized_input)
-        try:
-            return sp.solve(normalized, *remaining_args, **kwargs)
-        except Exception as exc:
-            # SymPy can fail with `CoercionFailed: nan is not in any domain` for exact polynomial systems.
-            # Fallback to polynomial solver when possible to preserve exact symbolic output.
-            msg = str(exc).lower()
-            if "nan is not in any domain" not in msg:
-                raise
-            if kwargs:
-                raise
-            if not isinstance(normalized, (list, tuple)):
-                raise
-            if not remaining_args:
-                raise
-
-            raw_vars = remaining_args[0]
-            if isinstance(raw_vars, (list, tuple, set)):
-                vars_seq = tuple(raw_vars)
-            else:
-                vars_seq = (raw_vars,)
-            if not vars_seq:
-                raise
-
-            return sp.solve_poly_system(tuple(normalized), *vars_seq)
-
-    def subs(expr: Any, *args: Any, **kwargs: Any) -> Any:
-        if hasattr(expr, "subs"):
-            return expr.subs(*args, **kwargs)
-        return expr
-
-    mapping: Dict[str, Any] = {
-        "sqrt": sp.sqrt,
-        "sin": sp.sin,
-        "cos": sp.cos,
-        "tan": sp.tan,
-        "asin": sp.asin,
-        "acos": sp.acos,
-        "atan": sp.atan,
-        "log": sp.log,
-        "ln": sp.log,
-        "exp": sp.exp,
-        "pow": sp.Pow,
-        "abs": sp.Abs,
-        "pi": sp.pi,
-        "e": sp.E,
-        "E": sp.E,
-        "I": sp.I,
-        "Eq": sp.Eq,
-        "solve": solve,
-        "subs": subs,
-        "linsolve": sp.linsolve,
-        "simplify": sp.simplify,
-        "expand": sp.expand,
-        "factor": sp.factor,
-        "N": N,
-        "set_decimal_places": set_decimal_places,
-        "render_decimal": render_decimal,
-        "render_exact": render_exact,
-    }
 
-    plot_fn = user_ns.get("plot")
-    if not callable(plot_fn):
-        try:
-            from sugarpy.startup import plot as startup_plot
-        except Exception:
-            startup_plot = None
-        plot_fn = startup_plot
-    if callable(plot_fn):
-        def _plot(*plot_args: Any, **plot_kwargs: Any) -> Any:
-            normalized_args = tuple(canonicalize_equation(arg) for arg in plot_args)
-            return plot_fn(*normalized_args, **plot_kwargs)
+def _math_render_decimal(user_ns: Dict[str, Any], value: Any, places: Any | None = None) -> RenderDirective:
+    return RenderDirective(value=value, mode="decimal", places=_resolve_decimal_places(user_ns, places))
 
-        mapping["plot"] = _plot
 
-    if mode == "deg":
-        def sind(x: Any, **_kwargs: Any) -> Any:
-            return sp.sin(x * sp.pi / 180)
+def _math_render_exact(value: Any) -> RenderDirective:
+    return RenderDirective(value=value, mode="exact", places=None)
 
-        def cosd(x: Any, **_kwargs: Any) -> Any:
-            return sp.cos(x * sp.pi / 180)
 
-        def tand(x: Any, **_kwargs: Any) -> Any:
-            return sp.tan(x * sp.pi / 180)
+def _is_symbol_spec(value: Any) -> bool:
+    if isinstance(value, sp.Symbol):
+        return True
+    if isinstance(value, (list, tuple, set)):
+        return bool(value) and all(_is_symbol_spec(item) for item in value)
+    return False
 
-        def asind(x: Any, **_kwargs: Any) -> Any:
-            return sp.asin(x) * 180 / sp.pi
 
-        def acosd(x: Any, **_kwargs: Any) -> Any:
-            return sp.acos(x) * 180 / sp.pi
+def _math_solve(equations: Any, *args: Any, **kwargs: Any) -> Any:
+    grouped_equations = [equations]
+    remaining_args: list[Any] = []
+    collecting_equations = not _is_symbol_spec(equations)
 
-        def atand(x: Any, **_kwargs: Any) -> Any:
-            return sp.atan(x) * 180 / sp.pi
+    for arg in args:
+        if collecting_equations and not _is_symbol_spec(arg):
+            grouped_equations.append(arg)
+            continue
+        collecting_equations = False
+        remaining_args.append(arg)
 
-        mapping.update(
-            {
-                "sin": sind,
-                "cos": cosd,
-                "tan": tand,
-                "asin": asind,
-                "acos": acosd,
-                "atan": atand,
-            }
+    normalized_input: Any
+    if len(grouped_equations) == 1:
+        normalized_input = grouped_equations[0]
+    else:
+        normalized_input = tuple(grouped_equations)
+
+    if not kwargs and len(remaining_args) <= 1:
+        # Checked before canonicalization: the exact answer does not depend on how each equation is
+        # written, and simplifying hundreds of linear equations costs more than solving them.
+        linear = solve_linear_system(normalized_input, remaining_args)
+        if linear is not None:
+            return linear
+    normalized = canonicalize_equation(normalized_input)
+    if get_solver_mode() == "portfolio" and not kwargs and len(remaining_args) == 1 and portfolio_available():
+        strategies = build_strategies(
+            normalized,
+            remaining_args[0],
+            partial(_solve_sequential, normalized, remaining_args, kwargs),
         )
+        if strategies is not None:
+            result = run_portfolio(strategies)
+            if not result.exact:
+                note_math_warning("solve: no exact solution arrived in time; showing numeric roots (may be incomplete).")
+            return result.value
+    return _solve_sequential(normalized, remaining_args, kwargs)
+
+
+def _solve_sequential(normalized: Any, remaining_args: list[Any], kwargs: Dict[str, Any]) -> Any:
+    try:
+        return sp.solve(normalized, *remaining_args, **kwargs)
+    except Exception as exc:
+        # SymPy can fail with `CoercionFailed: nan is not in any domain` for exact polynomial systems.
+        # Fallback to polynomial solver when possible to preserve exact symbolic output.
+        msg = str(exc).lower()
+        if "nan is not in any domain" not in msg:
+            raise
+        if kwargs:
+            raise
+        if not isinstance(normalized, (list, tuple)):
+            raise
+        if not remaining_args:
+            raise
+
+        raw_vars = remaining_args[0]
+        if isinstance(raw_vars, (list, tuple, set)):
+            vars_seq = tuple(raw_vars)
+        else:
+            vars_seq = (raw_vars,)
+        if not vars_seq:
+            raise
+
+        return sp.solve_poly_system(tuple(normalized), *vars_seq)
+
+
+def _math_linsolve(system: Any, *symbols: Any) -> Any:
+    linear = linsolve_linear_system(system, symbols)
+    if linear is not None:
+        return linear
+    return sp.linsolve(system, *symbols)
+
+
+def _math_subs(expr: Any, *args: Any, **kwargs: Any) -> Any:
+    if hasattr(expr, "subs"):
+        return expr.subs(*args, **kwargs)
+    return expr
+
+
+def _memoized(name: str, fn: Any) -> Any:
+    """Wrap a CAS function with the `sugarpy.cas_memo` memo; `memo=False` opts a single call out."""
+
+    def call(*args: Any, memo: bool = True, **kwargs: Any) -> Any:
+        if not memo:
+            return fn(*args, **kwargs)
+        with collect_math_warnings() as emitted:
+            # Results that came with a warning (e.g. numeric portfolio roots) are not stored.
+            result = memo_call(
+                name,
+                fn,
+                args,
+                kwargs,
+                context=(get_solver_mode(), _canonicalize_policy),
+                keep=lambda: not emitted,
+            )
+        for message in emitted:
+            note_math_warning(message)
+        return result
+
+    call.__name__ = getattr(fn, "__name__", name)
+    call.__doc__ = getattr(fn, "__doc__", None)
+    return call
+
 
-    class _MathNamespaceProxy:
-        def __getattr__(self, name: str) -> Any:
-            if name != "math" and name in mapping:
-                return mapping[name]
-            return getattr(sp, name)
+# SymPy functions that reach Math cells through the kernel namespace (`from sympy import *`).
+_MEMOIZED_NAMESPACE_CALLS = {
+    name: _memoized(name, getattr(sp, name))
+    for name in ("integrate", "diff", "limit", "series", "apart", "together", "cancel", "trigsimp", "dsolve", "roots")
+}
+
+
+def _sind(x: Any, **_kwargs: Any) -> Any:
+    return sp.sin(x * sp.pi / 180)
+
+
+def _cosd(x: Any, **_kwargs: Any) -> Any:
+    return sp.cos(x * sp.pi / 180)
+
+
+def _tand(x: Any, **_kwargs: Any) -> Any:
+    return sp.tan(x * sp.pi / 180)
+
+
+def _asind(x: Any, **_kwargs: Any) -> Any:
+    return sp.asin(x) * 180 / sp.pi
+
+
+def _acosd(x: Any, **_kwargs: Any) -> Any:
+    return sp.acos(x) * 180 / sp.pi
+
+
+def _atand(x: Any, **_kwargs: Any) -> Any:
+    return sp.atan(x) * 180 / sp.pi
+
+
+_BASE_MATH_LOCALS: Dict[str, Any] = {
+    "sqrt": sp.sqrt,
+    "sin": sp.sin,
+    "cos": sp.cos,
+    "tan": sp.tan,
+    "asin": sp.asin,
+    "acos": sp.acos,
+    "atan": sp.atan,
+    "log": sp.log,
+    "ln": sp.log,
+    "exp": sp.exp,
+    "pow": sp.Pow,
+    "abs": sp.Abs,
+    "pi": sp.pi,
+    "e": sp.E,
+    "E": sp.E,
+    "I": sp.I,
+    "Eq": sp.Eq,
+    "solve": _memoized("solve", _math_solve),
+    "subs": _math_subs,
+    "linsolve": _memoized("linsolve", _math_linsolve),
+    "simplify": _memoized("simplify", sp.simplify),
+    "expand": _memoized("expand", sp.expand),
+    "factor": _memoized("factor", sp.factor),
+    "N": _math_N,
+    "render_exact": _math_render_exact,
+    "table": value_table,
+}
+# Built once per angle mode and never mutated; each statement copies the table and overlays
+# the entries that depend on the live namespace.
+_MODE_MATH_LOCALS: Dict[str, MappingProxyType] = {
+    "deg": MappingProxyType(
+        {
+            **_BASE_MATH_LOCALS,
+            "sin": _sind,
+            "cos": _cosd,
+            "tan": _tand,
+            "asin": _asind,
+            "acos": _acosd,
+            "atan": _atand,
+        }
+    ),
+    "rad": MappingProxyType(dict(_BASE_MATH_LOCALS)),
+}
 
-    mapping["math"] = _MathNamespaceProxy()
+
+# Helpers whose result for a symbolic argument, substituted afterwards, matches calling them
+# with the value directly. Math-function bodies limited to these can be compiled once.
+_SUBSTITUTION_SAFE_CALLS = frozenset(
+    {"sqrt", "sin", "cos", "tan", "asin", "acos", "atan", "log", "ln", "exp", "pow", "abs"}
+)
+
+
+def substitution_safe_globals(body_source: str, args: Iterable[str]) -> frozenset[str] | None:
+    """Return the namespace names a Math-function body reads, or None if it must be re-parsed per call.
+
+    A body qualifies when it is a plain expression that only calls elementary helpers and
+    never indexes, calls or dereferences one of its arguments.
+    """
+    try:
+        if parse_math_input(body_source).kind != "expression":
+            return None
+    except MathParseError:
+        return None
+    arg_names = set(args)
+    base = _MODE_MATH_LOCALS["rad"]
+    referenced: set[str] = set()
+    tokens = [token for token in _tokenize(body_source) if token.kind != "newline"]
+    for index, token in enumerate(tokens):
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if token.kind == "other":
+            # Attribute access (`math.solve`), factorials and similar escape the analysis.
+            return None
+        if token.kind != "ident":
+            continue
+        if following is not None and following.kind == "open" and following.text in "([":
+            if token.text in arg_names or (following.text == "(" and token.text not in _SUBSTITUTION_SAFE_CALLS):
+                return None
+        if token.text not in arg_names and token.text not in base:
+            referenced.add(token.text)
+    return frozenset(referenced)
+
+
+class _MathNamespaceProxy:
+    """`math.<name>` inside Math cells: SugarPy helpers first, then SymPy."""
+
+    __slots__ = ("_mapping",)
+
+    def __init__(self, mapping: Dict[str, Any]) -> None:
+        self._mapping = mapping
+
+    def __getattr__(self, name: str) -> Any:
+        mapping = self._mapping
+        if name != "math" and name in mapping:
+            return mapping[name]
+        return getattr(sp, name)
+
+
+def _default_plot() -> Any:
+    try:
+        from sugarpy.startup import plot as startup_plot
+    except Exception:
+        return None
+    return startup_plot
+
+
+def _make_plot_wrapper(plot_fn: Any) -> Any:
+    def _plot(*plot_args: Any, **plot_kwargs: Any) -> Any:
+        normalized_args = tuple(canonicalize_equation(arg) for arg in plot_args)
+        return plot_fn(*normalized_args, **plot_kwargs)
+
+    return _plot
+
+
+def build_math_locals(
+    source_parts: Iterable[str],
+    *,
+    mode: str,
+    user_ns: Dict[str, Any],
+) -> Dict[str, Any]:
+    source = " ".join(source_parts)
+    names, call_names = _source_names(source)
+
+    mapping: Dict[str, Any] = dict(_MODE_MATH_LOCALS["deg" if mode == "deg" else "rad"])
+    mapping["set_decimal_places"] = partial(_math_set_decimal_places, user_ns)
+    mapping["render_decimal"] = partial(_math_render_decimal, user_ns)
+
+    plot_fn = user_ns.get("plot")
+    if not callable(plot_fn):
+        plot_fn = _default_plot()
+    if callable(plot_fn):
+        mapping["plot"] = _make_plot_wrapper(plot_fn)
+
+    mapping["math"] = _MathNamespaceProxy(mapping)
 
     for name in names:
-        if name in mapping:
+        if name in mapping and not (name in _SHADOWABLE_HELPER_NAMES and name in user_ns):
             continue
         if name in user_ns:
             value = user_ns[name]
             if callable(value):
-                mapping[name] = value
+                memoized = _MEMOIZED_NAMESPACE_CALLS.get(name)
+                mapping[name] = memoized if memoized is not None and value is getattr(sp, name) else value
                 continue
             if name in call_names:
                 raise MathParseError(f"'{name}' is not callable. Define a function in a Code cell.")
@@ -837,6 +1336,103 @@ def build_math_locals(
     return mapping
 
 
+# Commands added after students may already have used the name for a variable; a namespace binding wins.
+_SHADOWABLE_HELPER_NAMES = frozenset({"table"})
+# Entries `build_math_locals` binds on top of the per-mode table.
+_NAMESPACE_HELPER_NAMES = frozenset({"set_decimal_places", "render_decimal", "plot", "math"})
+
+
+def _statement_reads(parsed: ParsedMathInput, mode: str) -> tuple[frozenset[str], frozenset[str]]:
+    """Return `(namespace names read, all identifiers on the evaluated side)` for a parsed statement."""
+    read_source = parsed.source
+    if parsed.kind in {"assignment", "function_assignment"}:
+        read_source = parsed.rhs_source or ""
+    names, _call_names = _source_names(read_source)
+    local_names = _MODE_MATH_LOCALS["deg" if mode == "deg" else "rad"].keys()
+    reads = frozenset(
+        name
+        for name in names
+        if (name not in local_names or name in _SHADOWABLE_HELPER_NAMES)
+        and name not in _NAMESPACE_HELPER_NAMES
+        and name not in parsed.function_args
+    )
+    return reads, names
+
+
+def statement_user_names(source: str, mode: str) -> frozenset[str] | None:
+    """Return the namespace names a Math statement reads, or None if it does more than read and assign.
+
+    Assignment targets and function parameters are not reads. Statements that call `plot` (which emits
+    its own output) or do not parse return None.
+    """
+    try:
+        parsed = parse_math_input(source)
+    except MathParseError:
+        return None
+    reads, names = _statement_reads(parsed, mode)
+    return None if "plot" in names else reads
+
+
+def statement_dataflow(source: str, mode: str) -> tuple[frozenset[str], frozenset[str]] | None:
+    """Return `(names read, names written)` for a Math statement, or None if it does not parse."""
+    try:
+        parsed = parse_math_input(source)
+    except MathParseError:
+        return None
+    reads, names = _statement_reads(parsed, mode)
+    writes = set(parsed.assigned_names)
+    if "set_decimal_places" in names:
+        writes.add("__sugarpy_decimal_places")
+    return reads, frozenset(writes)
+
+
+def _rewrite_expression_source(expression_source: str) -> str:
+    cached = _REWRITE_CACHE.get(expression_source)
+    if cached is not None:
+        return cached
+    if expression_source.startswith("plot("):
+        rewritten_source = _rewrite_plot_call_source(expression_source)
+    elif expression_source.startswith("table("):
+        rewritten_source = _rewrite_plot_call_source(expression_source, "table")
+    else:
+        rewritten_source = _rewrite_inline_equations(expression_source)
+    _REWRITE_CACHE.put(expression_source, rewritten_source)
+    return rewritten_source
+
+
+def _compile_direct(rewritten_source: str) -> CompiledExpression | None:
+    cached = _COMPILE_CACHE.get(rewritten_source, _UNSUPPORTED)
+    if cached is not _UNSUPPORTED:
+        return cached
+    try:
+        compiled = compile_expression(_tokenize(rewritten_source))
+    except UnsupportedExpression:
+        compiled = None
+    _COMPILE_CACHE.put(rewritten_source, compiled)
+    return compiled
+
+
+def numeric_expression(parsed: ParsedMathInput, user_ns: Dict[str, Any]) -> tuple[Node, Dict[str, Any]] | None:
+    """Compiled tree and bound values of an expression made only of numbers, elementary functions and
+    namespace names bound to SymPy numbers; None for anything else."""
+    if parsed.kind != "expression":
+        return None
+    compiled = _compile_direct(_rewrite_expression_source(parsed.normalized_source))
+    if compiled is None:
+        return None
+    bound: Dict[str, Any] = {}
+    for name in compiled.names:
+        if name in NUMERIC_NAMES:
+            continue
+        if name in _MODE_MATH_LOCALS["deg"] or name in _NAMESPACE_HELPER_NAMES:
+            return None
+        value = user_ns.get(name)
+        if not isinstance(value, (sp.Rational, sp.Float)):
+            return None
+        bound[name] = value
+    return compiled.tree, bound
+
+
 def parse_sympy_expression(source: str, *, mode: str, user_ns: Dict[str, Any]) -> Any:
     parsed = parse_math_input(source)
     if parsed.kind == "equation":
@@ -845,14 +1441,19 @@ def parse_sympy_expression(source: str, *, mode: str, user_ns: Dict[str, Any]) -
         return sp.Eq(lhs_expr, rhs_expr, evaluate=False)
 
     expression_source = parsed.normalized_source if parsed.kind == "expression" else source.strip()
-    if expression_source.startswith("plot("):
-        rewritten_source = _rewrite_plot_call_source(expression_source)
-    else:
-        rewritten_source = _rewrite_inline_equations(expression_source)
+    rewritten_source = _rewrite_expression_source(expression_source)
     try:
+        local_dict = build_math_locals([rewritten_source], mode=mode, user_ns=user_ns)
+        if _expression_backend == "direct" and parsed.kind == "expression":
+            compiled = _compile_direct(rewritten_source)
+            if compiled is not None and compiled.names <= local_dict.keys():
+                try:
+                    return evaluate_expression(compiled.tree, local_dict)
+                except UnsupportedExpression:
+                    pass
         return parse_expr(
             rewritten_source,
-            local_dict=build_math_locals([rewritten_source], mode=mode, user_ns=user_ns),
+            local_dict=local_dict,
             transformations=_TRANSFORMS,
             evaluate=False,
         )
@@ -0,0 +1,201 @@
+"""Math-only notebook runtime: a namespace and the SugarPy renderers behind a framed socket.
+
+Notebooks made only of Markdown, Math, Stoichiometry and Regression cells do not
+need a Jupyter kernel. `python -m sugarpy.math_worker` listens on one TCP port
+and answers the structured requests of `sugarpy.kernel_rpc` against a private
+namespace seeded like the kernel bootstrap. No ipykernel, ZMQ or history is
+involved.
+
+Frames are a 4-byte big-endian length followed by UTF-8 JSON. The first frame
+of every connection must be `{"key": ...}` with the key the worker wrote to its
+connection file, next to the port. Each request `{"method", "params"}` gets one
+reply in the execution result shape (`status`, `stdout`, `stderr`, `mimeData`,
+`errorName`, `errorValue`). Besides the render methods, `ping` checks liveness
+and `history` returns the Math requests that ran, in order, so that the
+runtime can replay them into a kernel when a Code cell needs one. A re-run of
+the cell that ran last replaces its previous request when it assigns every
+name that request assigned without reading any of them, so repeated runs of
+one cell do not grow the replay. Requests that raised are marked `failed`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import socket
+import struct
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# The Math-relevant part of the kernel bootstrap in `sugarpy.server_extension`.
+_SEED_CODE = "\n".join(
+    [
+        "import math",
+        "import sympy as sp",
+        "from sympy import *",
+        'x, y, z, t = symbols("x y z t")',
+        "from sugarpy.startup import plot",
+    ]
+)
+
+
+def send_frame(sock: socket.socket, payload: Any) -> None:
+    data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            return None
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def recv_frame(sock: socket.socket) -> Any:
+    """Return the next decoded frame, or None once the peer has closed the connection."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME_BYTES} byte limit.")
+    body = _recv_exact(sock, size)
+    if body is None:
+        return None
+    return json.loads(body.decode("utf-8"))
+
+
+class MathWorker:
+    def __init__(self) -> None:
+        self.namespace: Dict[str, Any] = {"__name__": "__main__"}
+        exec(_SEED_CODE, self.namespace)
+        self.history: list[Dict[str, Any]] = []
+
+    def handle(self, request: Any) -> Dict[str, Any]:
+        method = request.get("method") if isinstance(request, dict) else None
+        if method == "ping":
+            return _reply({})
+        if method == "history":
+            return _reply({}, history=self.history)
+        reply = run_captured(request, self.namespace)
+        if method == "math":
+            # Even a failing cell may have defined names before its failing statement.
+            entry = {**request, "failed": True} if reply["status"] == "error" else request
+            if self.history and _supersedes(request, self.history[-1]):
+                self.history[-1] = entry
+            else:
+                self.history.append(entry)
+        return reply
+
+
+def _supersedes(request: Dict[str, Any], previous: Dict[str, Any]) -> bool:
+    """Whether replaying `request` alone leaves the namespace as replaying `previous` and then `request` does."""
+    from sugarpy.notebook_dataflow import math_cell_dataflow
+
+    params = request.get("params") if isinstance(request.get("params"), dict) else {}
+    previous_params = previous.get("params") if isinstance(previous.get("params"), dict) else {}
+    cell_id = params.get("cellId")
+    if not cell_id or cell_id != previous_params.get("cellId"):
+        return False
+    flow = math_cell_dataflow(str(params.get("source") or ""), str(params.get("trigMode") or "deg"))
+    previous_flow = math_cell_dataflow(
+        str(previous_params.get("source") or ""), str(previous_params.get("trigMode") or "deg")
+    )
+    if flow.opaque or previous_flow.opaque:
+        return False
+    return previous_flow.writes <= flow.writes and not flow.reads & previous_flow.writes
+
+
+def run_captured(request: Any, namespace: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one render request against `namespace` and return its reply, with output and errors captured."""
+    from sugarpy.kernel_rpc import run_request
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    error: BaseException | None = None
+    mime_data: Dict[str, Any] = {}
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            mime_data = run_request(request, namespace)
+    except (Exception, KeyboardInterrupt) as exc:  # noqa: BLE001 - reported like a kernel error
+        error = exc
+    return _reply(mime_data, stdout.getvalue(), stderr.getvalue(), error)
+
+
+def _reply(
+    mime_data: Dict[str, Any],
+    stdout: str = "",
+    stderr: str = "",
+    error: BaseException | None = None,
+    **extra: Any,
+) -> Dict[str, Any]:
+    return {
+        "status": "error" if error is not None else "ok",
+        "stdout": stdout,
+        "stderr": stderr,
+        "mimeData": mime_data,
+        "errorName": type(error).__name__ if error is not None else None,
+        "errorValue": str(error) if error is not None else None,
+        **extra,
+    }
+
+
+def _serve_connection(connection: socket.socket, worker: MathWorker, key: str) -> None:
+    hello = recv_frame(connection)
+    if not isinstance(hello, dict) or not secrets.compare_digest(str(hello.get("key") or ""), key):
+        return
+    send_frame(connection, _reply({}))
+    while True:
+        request = recv_frame(connection)
+        if request is None:
+            return
+        send_frame(connection, worker.handle(request))
+
+
+def serve(host: str, port: int, connection_file: Path) -> None:
+    worker = MathWorker()
+    key = secrets.token_hex(16)
+    server = socket.create_server((host, port))
+    connection_file.parent.mkdir(parents=True, exist_ok=True)
+    staged = connection_file.with_suffix(".tmp")
+    # Written once the namespace is ready, so the file doubles as the readiness signal.
+    staged.write_text(
+        json.dumps({"port": server.getsockname()[1], "key": key, "pid": os.getpid()}), encoding="utf-8"
+    )
+    staged.replace(connection_file)
+    while True:
+        try:
+            connection, _address = server.accept()
+        except KeyboardInterrupt:
+            continue
+        # One client at a time: the server reconnects after it restarts.
+        with connection:
+            try:
+                _serve_connection(connection, worker, key)
+            except (OSError, ValueError, KeyboardInterrupt):
+                continue
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--connection-file", type=Path, required=True)
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.connection_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
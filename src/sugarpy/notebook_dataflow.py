@@ -0,0 +1,423 @@
+"""Notebook-level dataflow for incremental Run All.
+
+Every Code and Math cell is reduced to the namespace names it reads and
+writes: Code cells through their AST, Math cells through the parsed
+statements. A cell whose source and upstream inputs are unchanged since its
+last successful run in the live runtime is reused instead of executed.
+
+The tracker records, per runtime, which run last wrote each name. A cell is
+reusable when its previous run succeeded with the same execution source,
+every name it reads was last written by the run it saw back then and that
+run belongs to the cell the notebook order says is upstream, and nothing
+has overwritten its own writes since. Cells the analysis cannot see through
+(magics, `exec`, `globals()`, star imports, ...) are never reused, and every
+cell below one of them runs again after it ran. So does a cell that updates
+a name it also reads (`x = x + 1`, `data.append(...)`): re-running it is not
+idempotent, and the tracker cannot tell which value it read.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable
+
+from .cache import LRUCache
+from .math_parser import parse_math_input, split_math_statements, statement_dataflow
+
+# Calls that read or write the namespace in ways the AST does not show.
+_OPAQUE_CALLS = frozenset(
+    {"exec", "eval", "globals", "locals", "vars", "get_ipython", "__import__", "setattr", "delattr"}
+)
+_REUSABLE_TYPES = frozenset({"code", "math"})
+# Math statements render decimals with the precision `set_decimal_places` stored.
+_DECIMAL_PLACES_NAME = "__sugarpy_decimal_places"
+_DATAFLOW_CACHE = LRUCache(maxsize=512)
+
+
+@dataclass(frozen=True, slots=True)
+class CellDataflow:
+    reads: frozenset[str] = frozenset()
+    writes: frozenset[str] = frozenset()
+    # Names whose value the cell may change in place (`data.append(1)`, `d[k] = v`).
+    mutates: frozenset[str] = frozenset()
+    # Names the cell binds through an import; in-place calls on modules are not tracked.
+    imports: frozenset[str] = frozenset()
+    opaque: bool = False
+    # Whether the cell creates functions or classes (`def`, `lambda`, `f(x) := ...`), which do not pickle.
+    defines_functions: bool = False
+
+
+_OPAQUE = CellDataflow(opaque=True)
+
+
+def _root_name(node: ast.AST) -> str | None:
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+class _CodeScanner(ast.NodeVisitor):
+    """Collect the names one top-level statement loads, binds and mutates."""
+
+    def __init__(self) -> None:
+        self.loads: set[str] = set()
+        self.nested_loads: set[str] = set()
+        # Parameters and locals of functions, lambdas and comprehensions.
+        self.nested_stores: set[str] = set()
+        self.stores: set[str] = set()
+        self.mutates: set[str] = set()
+        self.imports: set[str] = set()
+        self.opaque = False
+        self.defines_functions = False
+        self._depth = 0
+
+    def _nested(self, nodes: Iterable[ast.AST]) -> None:
+        self._depth += 1
+        for node in nodes:
+            self.visit(node)
+        self._depth -= 1
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            (self.nested_loads if self._depth else self.loads).add(node.id)
+        else:
+            (self.nested_stores if self._depth else self.stores).add(node.id)
+
+    def visit_arg(self, node: ast.arg) -> None:
+        self.nested_stores.add(node.arg)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> None:
+        self.defines_functions = True
+        for child in [*node.decorator_list, *getattr(node, "bases", ()), *getattr(node, "keywords", ())]:
+            self.visit(child)
+        arguments = getattr(node, "args", None)
+        if arguments is not None:
+            for default in [*arguments.defaults, *arguments.kw_defaults]:
+                if default is not None:
+                    self.visit(default)
+        (self.nested_stores if self._depth else self.stores).add(node.name)
+        self._nested([*node.body, *([arguments] if arguments is not None else [])])
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self.defines_functions = True
+        self._nested([node.args, node.body])
+
+    def _visit_comprehension(self, node: ast.AST) -> None:
+        self._nested(ast.iter_child_nodes(node))
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_Import(self, node: ast.Import | ast.ImportFrom) -> None:
+        for alias in node.names:
+            if alias.name == "*":
+                self.opaque = True
+                continue
+            if self._depth:
+                continue
+            name = alias.asname or alias.name.split(".")[0]
+            self.stores.add(name)
+            self.imports.add(name)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_Global(self, node: ast.Global) -> None:
+        self.stores.update(node.names)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        if isinstance(node.target, ast.Name):
+            (self.nested_loads if self._depth else self.loads).add(node.target.id)
+        self.generic_visit(node)
+
+    def _visit_container_target(self, node: ast.Attribute | ast.Subscript) -> None:
+        if not isinstance(node.ctx, ast.Load):
+            name = _root_name(node)
+            if name is not None:
+                self.mutates.add(name)
+        self.generic_visit(node)
+
+    visit_Attribute = visit_Subscript = _visit_container_target
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name) and node.func.id in _OPAQUE_CALLS:
+            self.opaque = True
+        elif isinstance(node.func, ast.Attribute):
+            name = _root_name(node.func)
+            if name is not None:
+                self.mutates.add(name)
+        self.generic_visit(node)
+
+
+def code_cell_dataflow(source: str) -> CellDataflow:
+    """Names a Code cell reads and writes at module level, or an opaque flow it cannot analyse."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # IPython magics and shell escapes.
+        return _OPAQUE
+    reads: set[str] = set()
+    nested_reads: set[str] = set()
+    nested_locals: set[str] = set()
+    writes: set[str] = set()
+    mutates: set[str] = set()
+    imports: set[str] = set()
+    defines_functions = False
+    for statement in tree.body:
+        scanner = _CodeScanner()
+        scanner.visit(statement)
+        if scanner.opaque:
+            return _OPAQUE
+        # Only names not bound by an earlier statement of this cell come from upstream.
+        reads |= (scanner.loads | scanner.mutates) - writes
+        nested_reads |= scanner.nested_loads
+        nested_locals |= scanner.nested_stores
+        mutates |= scanner.mutates - writes
+        writes |= scanner.stores
+        imports |= scanner.imports
+        defines_functions = defines_functions or scanner.defines_functions
+    # Function bodies resolve names when called, usually after the whole cell bound them.
+    reads |= nested_reads - writes - nested_locals
+    return CellDataflow(
+        frozenset(reads), frozenset(writes), frozenset(mutates), frozenset(imports), defines_functions=defines_functions
+    )
+
+
+def math_cell_dataflow(source: str, mode: str) -> CellDataflow:
+    """Names a Math cell reads and assigns across its statements."""
+    reads: set[str] = set()
+    writes: set[str] = set()
+    defines_functions = False
+    for _line, statement in split_math_statements(source):
+        flow = statement_dataflow(statement, mode)
+        if flow is None:
+            return _OPAQUE
+        statement_reads, statement_writes = flow
+        reads |= statement_reads - writes
+        writes |= statement_writes
+        # `f(x) := ...` binds a closure over the cell's namespace.
+        defines_functions = defines_functions or parse_math_input(statement).kind == "function_assignment"
+    if _DECIMAL_PLACES_NAME not in writes:
+        reads.add(_DECIMAL_PLACES_NAME)
+    return CellDataflow(frozenset(reads), frozenset(writes), defines_functions=defines_functions)
+
+
+def cell_dataflow(cell: Dict[str, Any], trig_mode: str) -> CellDataflow:
+    cell_type = str(cell.get("type") or "code")
+    source = str(cell.get("source") or "")
+    if cell_type == "code":
+        key: tuple[str, ...] = ("code", source)
+    elif cell_type == "math":
+        key = ("math", "rad" if cell.get("mathTrigMode") == "rad" else trig_mode, source)
+    else:
+        # Stoichiometry and regression cells only use kernel-private names.
+        return CellDataflow()
+    cached = _DATAFLOW_CACHE.get(key)
+    if cached is None:
+        cached = code_cell_dataflow(source) if cell_type == "code" else math_cell_dataflow(source, key[1])
+        _DATAFLOW_CACHE.put(key, cached)
+    return cached
+
+
+class NotebookGraph:
+    """Dataflow of every cell in notebook order, with each read resolved to its nearest upstream writer."""
+
+    def __init__(self, cells: list[Dict[str, Any]], trig_mode: str) -> None:
+        self.cell_ids = [str(cell.get("id") or "") for cell in cells]
+        self.cell_types = [str(cell.get("type") or "code") for cell in cells]
+        self.flows = [cell_dataflow(cell, trig_mode) for cell in cells]
+        self._index = {cell_id: index for index, cell_id in enumerate(self.cell_ids)}
+
+    def index(self, cell_id: str) -> int:
+        return self._index.get(cell_id, -1)
+
+    def _upstream_index(self, index: int, name: str) -> int | None:
+        for candidate in range(index - 1, -1, -1):
+            if name in self.flows[candidate].writes:
+                return candidate
+        return None
+
+    def upstream(self, index: int) -> Dict[str, str | None]:
+        """Cell id of the nearest preceding writer of each name the cell reads."""
+        result: Dict[str, str | None] = {}
+        for name in self.flows[index].reads:
+            upstream = self._upstream_index(index, name)
+            result[name] = None if upstream is None else self.cell_ids[upstream]
+        return result
+
+    def writes(self, index: int) -> frozenset[str]:
+        """Names the cell binds, plus in-place updates of anything but an imported module."""
+        flow = self.flows[index]
+        mutated = set()
+        for name in flow.mutates:
+            upstream = self._upstream_index(index, name)
+            if upstream is None or name not in self.flows[upstream].imports:
+                mutated.add(name)
+        return flow.writes | frozenset(mutated)
+
+    def opaque_above(self, index: int) -> list[str]:
+        return [self.cell_ids[i] for i in range(index) if self.flows[i].opaque]
+
+    def reusable(self, index: int) -> bool:
+        flow = self.flows[index]
+        if self.cell_types[index] not in _REUSABLE_TYPES or flow.opaque:
+            return False
+        return not (flow.reads & self.writes(index))
+
+
+def _dependencies(graph: NotebookGraph, order: list[int]) -> Dict[int, set[int]]:
+    """For each cell, the earlier cells it must run after: its upstream writers and earlier writers of its names."""
+    writes = {index: graph.writes(index) for index in order}
+    dependencies: Dict[int, set[int]] = {}
+    for rank, index in enumerate(order):
+        earlier = order[:rank]
+        if graph.flows[index].opaque:
+            dependencies[index] = set(earlier)
+            continue
+        upstream = {graph.index(cell_id) for cell_id in graph.upstream(index).values() if cell_id is not None}
+        dependencies[index] = {
+            other
+            for other in earlier
+            if graph.flows[other].opaque or other in upstream or writes[other] & writes[index]
+        }
+    return dependencies
+
+
+def _find(parents: Dict[int, int], index: int) -> int:
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def _split_window(order: list[int], dependencies: Dict[int, set[int]]) -> tuple[int, int, list[list[int]]] | None:
+    """The window of `order` whose independent components save the most sequential cells.
+
+    Cell count stands in for cost: a window of n cells whose largest component has m cells
+    saves n - m. Ties go to the earliest, then the longest window.
+    """
+    best: tuple[int, int, int, Dict[int, int]] | None = None
+    for start in range(len(order) - 1):
+        parents: Dict[int, int] = {}
+        sizes: Dict[int, int] = {}
+        largest = 0
+        for stop in range(start, len(order)):
+            index = order[stop]
+            parents[index] = index
+            sizes[index] = 1
+            for other in dependencies[index]:
+                if other not in parents:
+                    continue
+                root, other_root = _find(parents, index), _find(parents, other)
+                if root != other_root:
+                    parents[other_root] = root
+                    sizes[root] += sizes.pop(other_root)
+            largest = max(largest, sizes[_find(parents, index)])
+            saved = stop + 1 - start - largest
+            if saved > 0 and (best is None or saved > best[0]):
+                best = (saved, start, stop + 1, dict(parents))
+    if best is None:
+        return None
+    _saved, start, stop, parents = best
+    grouped: Dict[int, list[int]] = {}
+    for index in order[start:stop]:
+        grouped.setdefault(_find(parents, index), []).append(index)
+    return start, stop, list(grouped.values())
+
+
+def _bucket(components: list[list[int]], max_branches: int) -> list[list[int]]:
+    """Pack independent components into at most `max_branches` branches, largest first."""
+    branches: list[list[int]] = [[] for _ in range(min(max_branches, len(components)))]
+    for component in sorted(components, key=len, reverse=True):
+        min(branches, key=len).extend(component)
+    return [sorted(branch) for branch in sorted(branches, key=min)]
+
+
+def plan_stages(graph: NotebookGraph, max_branches: int) -> list[list[list[int]]]:
+    """Split a Run All into stages of cell indices.
+
+    A stage with one branch runs its cells in order; a stage with several branches
+    holds cells that read nothing the other branches write, so the branches can run
+    concurrently after the stages before them. Markdown cells are left out.
+    """
+    order = [index for index, cell_type in enumerate(graph.cell_types) if cell_type != "markdown"]
+    dependencies = _dependencies(graph, order)
+    stages: list[list[list[int]]] = []
+    while order:
+        split = _split_window(order, dependencies) if max_branches > 1 else None
+        if split is None:
+            stages.extend([[index]] for index in order)
+            break
+        start, stop, components = split
+        stages.extend([[index]] for index in order[:start])
+        stages.append(_bucket(components, max_branches))
+        order = order[stop:]
+    return stages
+
+
+def execution_fingerprint(code: str) -> str:
+    return hashlib.sha1(code.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class _RunRecord:
+    fingerprint: str
+    version: int
+    ok: bool
+    reads: Dict[str, tuple[str, int] | None] = field(default_factory=dict)
+    writes: frozenset[str] = frozenset()
+
+
+class NotebookDataflowTracker:
+    """What the live runtime last executed for one notebook; reset whenever the runtime is replaced."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self._version = 0
+        self._last_writer: Dict[str, tuple[str, int]] = {}
+        self._last_opaque_run: Dict[str, int] = {}
+        self._records: Dict[str, _RunRecord] = {}
+
+    def can_reuse(self, graph: NotebookGraph, cell_id: str, fingerprint: str) -> bool:
+        index = graph.index(cell_id)
+        record = self._records.get(cell_id)
+        if index == -1 or record is None or not record.ok or record.fingerprint != fingerprint:
+            return False
+        if not graph.reusable(index):
+            return False
+        if any(self._last_opaque_run.get(opaque_id, -1) > record.version for opaque_id in graph.opaque_above(index)):
+            return False
+        for name, upstream_id in graph.upstream(index).items():
+            writer = self._last_writer.get(name)
+            if writer != record.reads.get(name):
+                return False
+            if (writer[0] if writer is not None else None) != upstream_id:
+                return False
+        writes = graph.writes(index)
+        if writes != record.writes:
+            return False
+        return all(self._last_writer.get(name) == (cell_id, record.version) for name in writes)
+
+    def record_run(self, graph: NotebookGraph, cell_id: str, fingerprint: str, ok: bool) -> None:
+        """Note that `cell_id` was executed; call after the kernel finished it, successful or not."""
+        index = graph.index(cell_id)
+        if index == -1:
+            return
+        self._version += 1
+        version = self._version
+        flow = graph.flows[index]
+        if flow.opaque:
+            self._last_opaque_run[cell_id] = version
+            self._records.pop(cell_id, None)
+            return
+        reads = {name: self._last_writer.get(name) for name in flow.reads}
+        writes = graph.writes(index)
+        for name in writes:
+            # A failed run may still have assigned some of its names.
+            self._last_writer[name] = (cell_id, version)
+        self._records[cell_id] = _RunRecord(fingerprint, version, ok, reads, writes)
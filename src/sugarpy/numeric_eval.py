@@ -0,0 +1,203 @@
+"""mpmath evaluation of purely numeric Math statements.
+
+In decimal mode a statement such as `3.2*sin(41)^2 + 17/9` only needs its
+rounded value, yet the symbolic path builds an unevaluated SymPy tree, `doit`s
+it and rounds it through `sp.N`. When the compiled tree
+(`sugarpy.math_compiler`) only reaches numbers, elementary functions and
+namespace names bound to SymPy numbers, it is evaluated with mpmath instead and
+handed to the same decimal rounding as a high-precision `sp.Float`.
+
+Decimal places only apply where SymPy can tell the value is real; otherwise
+the symbolic path rounds to significant digits. Trees whose realness SymPy
+leaves undecided are therefore left to it: `tan` (whether its argument hits a
+pole is usually undecidable) and anything with a complex or infinite
+intermediate value.
+
+The tree is evaluated twice, at double precision and with many guard digits.
+The symbolic path computes exactly or with Float arithmetic, somewhere between
+the two, so when both round to the same digits it rounds to them too. Anything
+else (symbols, CAS calls, complex or non-finite results, disagreeing roundings)
+returns None and the caller takes the symbolic path.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Mapping
+
+import mpmath
+import sympy as sp
+
+from .math_compiler import Node
+
+FAST_PATH_ENV = "SUGARPY_MATH_NUMERIC_FAST_PATH"
+_LOW_PREC = 53
+_GUARD_DIGITS = 30
+
+_fast_path_enabled = os.environ.get(FAST_PATH_ENV, "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+class _NotNumeric(Exception):
+    pass
+
+
+def _degrees(fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda x: fn(x * mpmath.pi / 180)
+
+
+def _to_degrees(fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda x: fn(x) * 180 / mpmath.pi
+
+
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "sqrt": mpmath.sqrt,
+    "sin": mpmath.sin,
+    "cos": mpmath.cos,
+    "asin": mpmath.asin,
+    "acos": mpmath.acos,
+    "atan": mpmath.atan,
+    "log": mpmath.log,
+    "ln": mpmath.log,
+    "exp": mpmath.exp,
+    "pow": lambda base, exponent: base**exponent,
+    "abs": abs,
+}
+# Same overrides as the `deg` table in `sugarpy.math_parser`.
+_MODE_FUNCTIONS: Dict[str, Dict[str, Callable[..., Any]]] = {
+    "deg": {
+        **_FUNCTIONS,
+        "sin": _degrees(mpmath.sin),
+        "cos": _degrees(mpmath.cos),
+        "asin": _to_degrees(mpmath.asin),
+        "acos": _to_degrees(mpmath.acos),
+        "atan": _to_degrees(mpmath.atan),
+    },
+    "rad": _FUNCTIONS,
+}
+_CONSTANTS: Dict[str, Callable[[], Any]] = {"pi": lambda: +mpmath.pi, "e": lambda: +mpmath.e, "E": lambda: +mpmath.e}
+NUMERIC_NAMES = frozenset(_FUNCTIONS) | frozenset(_CONSTANTS)
+
+
+def numeric_fast_path_enabled() -> bool:
+    return _fast_path_enabled
+
+
+def set_numeric_fast_path(enabled: bool) -> bool:
+    global _fast_path_enabled
+    _fast_path_enabled = bool(enabled)
+    return _fast_path_enabled
+
+
+def _number(value: Any) -> Any:
+    if isinstance(value, sp.Float):
+        return mpmath.mpf(value._mpf_)
+    if isinstance(value, sp.Rational):
+        return mpmath.mpf(value.p) / value.q
+    if isinstance(value, int) and not isinstance(value, bool):
+        return mpmath.mpf(value)
+    raise _NotNumeric
+
+
+def _real(value: Any) -> Any:
+    # SymPy cannot always tell that a value built from complex parts (`abs(asin(12))`) is real,
+    # and then rounds to significant digits instead of decimal places. Infinite parts such as
+    # `log(0)` become `zoo` there and poison the result.
+    if not isinstance(value, mpmath.mpf) or not mpmath.isfinite(value):
+        raise _NotNumeric
+    return value
+
+
+def _evaluate(node: Node, functions: Mapping[str, Callable[..., Any]], bound: Mapping[str, Any]) -> Any:
+    kind = node[0]
+    if kind == "const" or kind == "int":
+        return _number(node[1])
+    if kind == "name":
+        name = node[1]
+        if name in _CONSTANTS:
+            return _CONSTANTS[name]()
+        if name in bound:
+            return _number(bound[name])
+        raise _NotNumeric
+    if kind == "add":
+        return mpmath.fsum(_evaluate(arg, functions, bound) for arg in node[1])
+    if kind == "mul":
+        result = mpmath.mpf(1)
+        for arg in node[1]:
+            result *= _evaluate(arg, functions, bound)
+        return result
+    if kind == "pow":
+        return _real(_evaluate(node[1], functions, bound) ** _evaluate(node[2], functions, bound))
+    if kind == "neg":
+        return -_evaluate(node[1], functions, bound)
+    if kind == "pos":
+        return _evaluate(node[1], functions, bound)
+    if kind == "call":
+        fn = functions.get(node[1])
+        # The compiler only adds `evaluate=False`; any other keyword is a CAS option.
+        if fn is None or any(name != "evaluate" for name, _value in node[3]):
+            raise _NotNumeric
+        return _real(fn(*(_evaluate(arg, functions, bound) for arg in node[2])))
+    raise _NotNumeric
+
+
+def _evaluate_at(
+    node: Node, functions: Mapping[str, Callable[..., Any]], bound: Mapping[str, Any], prec: int
+) -> sp.Float | None:
+    with mpmath.workprec(prec):
+        try:
+            value = _evaluate(node, functions, bound)
+        except (_NotNumeric, ArithmeticError, ValueError, TypeError):
+            return None
+        if not isinstance(value, mpmath.mpf) or not mpmath.isfinite(value):
+            return None
+        return sp.Float(value, precision=prec)
+
+
+def tree_within_limits(node: Node, max_ops: int | None, max_depth: int | None) -> bool:
+    """Mirror of `expression_guard.exceeds_size_limit` on a compiled tree, negated."""
+    ops = 0
+    stack = [(node, 1)]
+    while stack:
+        current, depth = stack.pop()
+        if max_depth is not None and depth > max_depth:
+            return False
+        kind = current[0]
+        if kind in {"add", "mul"}:
+            children = list(current[1])
+            ops += len(children) - 1
+        elif kind == "pow":
+            children = [current[1], current[2]]
+            ops += 1
+        elif kind in {"neg", "pos"}:
+            children = [current[1]]
+            ops += 1
+        elif kind == "call":
+            children = list(current[2])
+            ops += 1
+        else:
+            continue
+        if max_ops is not None and ops > max_ops:
+            return False
+        stack.extend((child, depth + 1) for child in children)
+    return True
+
+
+def evaluate_numeric(
+    node: Node,
+    bound: Mapping[str, Any],
+    mode: str,
+    digits: int,
+    rounded: Callable[[sp.Float], str],
+) -> tuple[sp.Float, str] | None:
+    """Evaluate a numeric tree and return `(value, rounded(value))` when the rounding is settled, else None."""
+    functions = _MODE_FUNCTIONS["deg" if mode == "deg" else "rad"]
+    precise = _evaluate_at(node, functions, bound, int((digits + _GUARD_DIGITS) * 3.33) + 8)
+    if precise is None:
+        return None
+    coarse = _evaluate_at(node, functions, bound, _LOW_PREC)
+    if coarse is None:
+        return None
+    rendered = rounded(precise)
+    if rounded(coarse) != rendered:
+        return None
+    return precise, rendered
@@ -3,22 +3,32 @@ from __future__ import annotations
 import asyncio
 import calendar
 import contextlib
+import hashlib
 import io
 import json
+import multiprocessing
 import os
+import queue
 import shutil
+import signal
 import socket
 import subprocess
+import sys
 import time
+import uuid
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Protocol
+from typing import Any, Awaitable, Callable, NoReturn, Protocol
 
 from IPython.core.interactiveshell import InteractiveShell
 from ipykernel.inprocess.ipkernel import InProcessInteractiveShell
 from ipykernel.inprocess.manager import InProcessKernelManager
 from jupyter_client.asynchronous.client import AsyncKernelClient
 
+from sugarpy.cache import LRUCache
+from sugarpy.kernel_rpc import RPC_MIME, RPC_TARGET
+from sugarpy.math_worker import FRAME_HEADER, run_captured
+
 
 DEFAULT_RUNTIME_IMAGE = "sugarpy-runtime:latest"
 DEFAULT_RUNTIME_BACKEND = "docker"
@@ -31,8 +41,17 @@ MAX_STREAM_TEXT_LENGTH = 4000
 MAX_MIME_TEXT_LENGTH = 4000
 MAX_MIME_OBJECT_ENTRIES = 20
 RESTRICTED_DOCKER_ONLY_PROFILES = {"restricted-demo", "school-secure"}
+MATH_WORKER_CONNECTION_FILE = "math-worker.json"
+STATELESS_RPC_METHODS = frozenset({"stoich", "regression"})
+DEFAULT_CELL_POOL_MEMORY_BYTES = 512 * 1024 * 1024
+_SOURCE_ROOT = Path(__file__).resolve().parents[1]
 
 KernelExecutor = Callable[[Any, str, float], Awaitable[dict[str, Any]]]
+KernelRpcExecutor = Callable[[Any, dict[str, Any], float], Awaitable[dict[str, Any]]]
+
+
+class KernelRpcUnavailable(RuntimeError):
+    """The runtime cannot answer structured requests; the caller executes generated source instead."""
 
 
 class RuntimeSession(Protocol):
@@ -41,6 +60,7 @@ class RuntimeSession(Protocol):
     async def start(self) -> None: ...
     async def attach(self) -> bool: ...
     async def execute(self, code: str, timeout_s: float) -> dict[str, Any]: ...
+    async def call(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]: ...
     async def interrupt(self) -> bool: ...
     async def restart(self) -> None: ...
     async def stop(self, remove_workspace: bool) -> None: ...
@@ -83,6 +103,59 @@ def _container_user_flag() -> list[str]:
     return ["--user", f"{getuid()}:{getgid()}"]
 
 
+def _math_worker_replay_code(history: list[dict[str, Any]]) -> str:
+    return "\n".join(
+        [
+            "from sugarpy.kernel_rpc import replay_requests as __sugarpy_replay",
+            f"__sugarpy_replay({json.dumps(json.dumps(history))})",
+        ]
+    )
+
+
+def _docker_run_args(record: RuntimeRecord, project_root: Path, ports: list[int], command: list[str]) -> list[str]:
+    publish_args: list[str] = []
+    for port in ports:
+        publish_args.extend(["-p", f"{port}:{port}"])
+    return [
+        "docker",
+        "run",
+        "-d",
+        "--rm",
+        "--name",
+        record.container_name,
+        *_container_user_flag(),
+        "--memory",
+        os.environ.get("SUGARPY_RUNTIME_MEMORY", "1g"),
+        "--cpus",
+        os.environ.get("SUGARPY_RUNTIME_CPUS", "1.0"),
+        "--pids-limit",
+        os.environ.get("SUGARPY_RUNTIME_PIDS_LIMIT", "128"),
+        *publish_args,
+        "-e",
+        "PYTHONUNBUFFERED=1",
+        "-e",
+        "PYTHONDONTWRITEBYTECODE=1",
+        "-e",
+        "PYTHONPATH=/opt/sugarpy/app/src",
+        "-e",
+        f"HOME={CONTAINER_WORKDIR}",
+        "-e",
+        f"IPYTHONDIR={CONTAINER_WORKDIR}/.ipython",
+        "-e",
+        f"MPLCONFIGDIR={CONTAINER_WORKDIR}/.config/matplotlib",
+        "-e",
+        f"SUGARPY_SECURITY_PROFILE={os.environ.get('SUGARPY_SECURITY_PROFILE', 'container-live')}",
+        "-v",
+        f"{project_root.resolve()}:/opt/sugarpy/app:ro",
+        "-v",
+        f"{Path(record.workspace_path).resolve()}:{CONTAINER_WORKDIR}",
+        "-w",
+        CONTAINER_WORKDIR,
+        record.image,
+        *command,
+    ]
+
+
 async def _run_command(args: list[str]) -> tuple[int, str, str]:
     process = await asyncio.create_subprocess_exec(
         *args,
@@ -113,6 +186,40 @@ def _truncate_mime_value(value: Any) -> Any:
     return {key: _truncate_mime_value(entry) for key, entry in value.items()}
 
 
+def kernel_rpc_result(
+    stdout: str, stderr: str, mime_data: dict[str, Any], started_at: float
+) -> dict[str, Any]:
+    """Turn the outputs of one structured request into the execution result shape."""
+    mime_data = dict(mime_data)
+    ack = mime_data.pop(RPC_MIME, None)
+    if not isinstance(ack, dict):
+        # The kernel closed the comm without running a handler.
+        raise KernelRpcUnavailable("Notebook runtime does not handle structured requests.")
+    error_name = ack.get("errorName") if ack.get("status") == "error" else None
+    return {
+        "status": "error" if error_name else "ok",
+        "stdout": _truncate_text(stdout),
+        "stderr": _truncate_text(stderr),
+        "mimeData": mime_data,
+        "errorName": str(error_name) if error_name else None,
+        "errorValue": str(ack.get("errorValue") or "") if error_name else None,
+        "durationMs": int((time.perf_counter() - started_at) * 1000),
+    }
+
+
+def _math_worker_result(reply: dict[str, Any], started_at: float) -> dict[str, Any]:
+    mime_data = reply.get("mimeData") if isinstance(reply.get("mimeData"), dict) else {}
+    return {
+        "status": "error" if reply.get("status") == "error" else "ok",
+        "stdout": _truncate_text(str(reply.get("stdout") or "")),
+        "stderr": _truncate_text(str(reply.get("stderr") or "")),
+        "mimeData": {mime: _truncate_mime_value(value) for mime, value in mime_data.items()},
+        "errorName": reply.get("errorName"),
+        "errorValue": reply.get("errorValue"),
+        "durationMs": int((time.perf_counter() - started_at) * 1000),
+    }
+
+
 @dataclass
 class RuntimeRecord:
     notebook_id: str
@@ -125,6 +232,7 @@ class RuntimeRecord:
     last_activity_at: str
     image: str
     error: str | None = None
+    tier: str = "kernel"
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -138,6 +246,7 @@ class RuntimeRecord:
             "lastActivityAt": self.last_activity_at,
             "image": self.image,
             "error": self.error,
+            "tier": self.tier,
         }
 
     @classmethod
@@ -153,6 +262,7 @@ class RuntimeRecord:
             last_activity_at=str(payload.get("lastActivityAt") or _utc_now()),
             image=str(payload.get("image") or DEFAULT_RUNTIME_IMAGE),
             error=str(payload.get("error")) if payload.get("error") else None,
+            tier="math" if payload.get("tier") == "math" else "kernel",
         )
 
 
@@ -170,11 +280,13 @@ class DockerKernelRuntime:
         executor: KernelExecutor,
         start_timeout_s: float,
         exec_timeout_s: float,
+        rpc_executor: KernelRpcExecutor | None = None,
     ) -> None:
         self.record = record
         self.project_root = project_root
         self.bootstrap_code = bootstrap_code
         self.executor = executor
+        self.rpc_executor = rpc_executor
         self.start_timeout_s = start_timeout_s
         self.exec_timeout_s = exec_timeout_s
         self.workspace_path = Path(record.workspace_path)
@@ -208,6 +320,13 @@ class DockerKernelRuntime:
             raise RuntimeError("Notebook runtime client is not connected.")
         return await self.executor(self.client, code, timeout_s)
 
+    async def call(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        if self.client is None:
+            raise RuntimeError("Notebook runtime client is not connected.")
+        if self.rpc_executor is None:
+            raise KernelRpcUnavailable("Notebook runtime does not handle structured requests.")
+        return await self.rpc_executor(self.client, request, timeout_s)
+
     async def interrupt(self) -> bool:
         self.last_interrupt_recovered = False
         if self.client is not None:
@@ -241,57 +360,24 @@ class DockerKernelRuntime:
 
     async def _run_container(self) -> None:
         self.connection_ports = _reserve_kernel_ports()
-        publish_args: list[str] = []
-        for port in self.connection_ports.values():
-            publish_args.extend(["-p", f"{port}:{port}"])
-        args = [
-            "docker",
-            "run",
-            "-d",
-            "--rm",
-            "--name",
-            self.record.container_name,
-            *_container_user_flag(),
-            "--memory",
-            os.environ.get("SUGARPY_RUNTIME_MEMORY", "1g"),
-            "--cpus",
-            os.environ.get("SUGARPY_RUNTIME_CPUS", "1.0"),
-            "--pids-limit",
-            os.environ.get("SUGARPY_RUNTIME_PIDS_LIMIT", "128"),
-            *publish_args,
-            "-e",
-            "PYTHONUNBUFFERED=1",
-            "-e",
-            "PYTHONDONTWRITEBYTECODE=1",
-            "-e",
-            "PYTHONPATH=/opt/sugarpy/app/src",
-            "-e",
-            f"HOME={CONTAINER_WORKDIR}",
-            "-e",
-            f"IPYTHONDIR={CONTAINER_WORKDIR}/.ipython",
-            "-e",
-            f"MPLCONFIGDIR={CONTAINER_WORKDIR}/.config/matplotlib",
-            "-e",
-            f"SUGARPY_SECURITY_PROFILE={os.environ.get('SUGARPY_SECURITY_PROFILE', 'container-live')}",
-            "-v",
-            f"{self.project_root.resolve()}:/opt/sugarpy/app:ro",
-            "-v",
-            f"{self.workspace_path.resolve()}:{CONTAINER_WORKDIR}",
-            "-w",
-            CONTAINER_WORKDIR,
-            self.record.image,
-            "python",
-            "-m",
-            "ipykernel_launcher",
-            "-f",
-            f"{CONTAINER_WORKDIR}/{self.connection_file.name}",
-            "--IPKernelApp.ip=0.0.0.0",
-            f"--IPKernelApp.shell_port={self.connection_ports['shell_port']}",
-            f"--IPKernelApp.iopub_port={self.connection_ports['iopub_port']}",
-            f"--IPKernelApp.stdin_port={self.connection_ports['stdin_port']}",
-            f"--IPKernelApp.control_port={self.connection_ports['control_port']}",
-            f"--IPKernelApp.hb_port={self.connection_ports['hb_port']}",
-        ]
+        args = _docker_run_args(
+            self.record,
+            self.project_root,
+            list(self.connection_ports.values()),
+            [
+                "python",
+                "-m",
+                "ipykernel_launcher",
+                "-f",
+                f"{CONTAINER_WORKDIR}/{self.connection_file.name}",
+                "--IPKernelApp.ip=0.0.0.0",
+                f"--IPKernelApp.shell_port={self.connection_ports['shell_port']}",
+                f"--IPKernelApp.iopub_port={self.connection_ports['iopub_port']}",
+                f"--IPKernelApp.stdin_port={self.connection_ports['stdin_port']}",
+                f"--IPKernelApp.control_port={self.connection_ports['control_port']}",
+                f"--IPKernelApp.hb_port={self.connection_ports['hb_port']}",
+            ],
+        )
         code, stdout, stderr = await _run_command(args)
         if code != 0:
             raise DockerCommandError(stderr or stdout or "docker run failed")
@@ -409,6 +495,11 @@ class InProcessKernelRuntime:
             raise RuntimeError("Notebook runtime client is not connected.")
         return await self._execute_inprocess(code, timeout_s)
 
+    async def call(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        if self.client is None:
+            raise RuntimeError("Notebook runtime client is not connected.")
+        return await self._call_inprocess(request, timeout_s)
+
     async def interrupt(self) -> bool:
         return False
 
@@ -451,47 +542,11 @@ class InProcessKernelRuntime:
 
     async def _execute_inprocess(self, code: str, timeout_s: float) -> dict[str, Any]:
         started_at = time.perf_counter()
-        stdout = ""
-        stderr = ""
-        mime_data: dict[str, Any] = {}
-        error_name: str | None = None
-        error_value: str | None = None
         stdout_buffer = io.StringIO()
         stderr_buffer = io.StringIO()
         with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
             msg_id = self.client.execute(code, stop_on_error=True)
-            idle = False
-            deadline = time.monotonic() + timeout_s
-            while not idle:
-                if time.monotonic() > deadline:
-                    raise TimeoutError(f"In-process notebook execution timed out after {timeout_s:.1f}s.")
-                msg = self.client.get_iopub_msg(timeout=timeout_s)
-                if msg.get("parent_header", {}).get("msg_id") != msg_id:
-                    continue
-                msg_type = msg.get("msg_type")
-                content = msg.get("content", {})
-                if msg_type == "status" and content.get("execution_state") == "idle":
-                    idle = True
-                    continue
-                if msg_type == "stream":
-                    text = str(content.get("text") or "")
-                    if content.get("name") == "stderr":
-                        stderr = _truncate_text(stderr + text)
-                    else:
-                        stdout = _truncate_text(stdout + text)
-                    continue
-                if msg_type in {"execute_result", "display_data"}:
-                    data = content.get("data") or {}
-                    if isinstance(data, dict):
-                        for mime, value in data.items():
-                            if mime == "text/plain":
-                                mime_data[mime] = _truncate_text(f"{mime_data.get(mime, '')}{value}", limit=MAX_MIME_TEXT_LENGTH)
-                            else:
-                                mime_data[mime] = _truncate_mime_value(value)
-                    continue
-                if msg_type == "error":
-                    error_name = str(content.get("ename") or "Error")
-                    error_value = str(content.get("evalue") or "")
+            stdout, stderr, mime_data, error_name, error_value = self._collect_inprocess_outputs(msg_id, timeout_s)
             shell_reply = self.client.get_shell_msg(timeout=timeout_s)
         if shell_reply.get("parent_header", {}).get("msg_id") != msg_id:
             raise RuntimeError("Kernel shell reply did not match the execution request.")
@@ -505,6 +560,437 @@ class InProcessKernelRuntime:
             "durationMs": int((time.perf_counter() - started_at) * 1000),
         }
 
+    async def _call_inprocess(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        started_at = time.perf_counter()
+        stdout_buffer = io.StringIO()
+        stderr_buffer = io.StringIO()
+        msg = self.client.session.msg(
+            "comm_open", {"comm_id": uuid.uuid4().hex, "target_name": RPC_TARGET, "data": request}
+        )
+        with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
+            # comm_open has no shell reply, which the in-process client always tries to read.
+            with contextlib.suppress(queue.Empty):
+                self.client._dispatch_to_kernel(msg)
+            stdout, stderr, mime_data, _error_name, _error_value = self._collect_inprocess_outputs(
+                msg["header"]["msg_id"], timeout_s
+            )
+        return kernel_rpc_result(
+            f"{stdout}{stdout_buffer.getvalue()}", f"{stderr}{stderr_buffer.getvalue()}", mime_data, started_at
+        )
+
+    def _collect_inprocess_outputs(
+        self, msg_id: str, timeout_s: float
+    ) -> tuple[str, str, dict[str, Any], str | None, str | None]:
+        stdout = ""
+        stderr = ""
+        mime_data: dict[str, Any] = {}
+        error_name: str | None = None
+        error_value: str | None = None
+        deadline = time.monotonic() + timeout_s
+        while True:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"In-process notebook execution timed out after {timeout_s:.1f}s.")
+            msg = self.client.get_iopub_msg(timeout=timeout_s)
+            if msg.get("parent_header", {}).get("msg_id") != msg_id:
+                continue
+            msg_type = msg.get("msg_type")
+            content = msg.get("content", {})
+            if msg_type == "status" and content.get("execution_state") == "idle":
+                return stdout, stderr, mime_data, error_name, error_value
+            if msg_type == "stream":
+                text = str(content.get("text") or "")
+                if content.get("name") == "stderr":
+                    stderr = _truncate_text(stderr + text)
+                else:
+                    stdout = _truncate_text(stdout + text)
+                continue
+            if msg_type in {"execute_result", "display_data"}:
+                data = content.get("data") or {}
+                if isinstance(data, dict):
+                    for mime, value in data.items():
+                        if mime == "text/plain":
+                            mime_data[mime] = _truncate_text(f"{mime_data.get(mime, '')}{value}", limit=MAX_MIME_TEXT_LENGTH)
+                        else:
+                            mime_data[mime] = _truncate_mime_value(value)
+                continue
+            if msg_type == "error":
+                error_name = str(content.get("ename") or "Error")
+                error_value = str(content.get("evalue") or "")
+
+
+class MathWorkerRuntime:
+    """Math-only runtime tier: a `sugarpy.math_worker` process until a Code cell needs a kernel.
+
+    The worker runs in a Docker container on the docker backend and as a local subprocess
+    otherwise. It answers `call` directly. The first `execute` upgrades the runtime: the worker's
+    Math history is replayed into a kernel runtime from `kernel_factory`, which serves every later
+    request. When the replay fails, the kernel is dropped for a fresh worker and `execute` raises.
+    """
+
+    def __init__(
+        self,
+        record: RuntimeRecord,
+        *,
+        project_root: Path,
+        kernel_factory: Callable[[RuntimeRecord], RuntimeSession],
+        start_timeout_s: float,
+        exec_timeout_s: float,
+    ) -> None:
+        self.record = record
+        self.project_root = project_root
+        self.kernel_factory = kernel_factory
+        self.start_timeout_s = start_timeout_s
+        self.exec_timeout_s = exec_timeout_s
+        self.workspace_path = Path(record.workspace_path)
+        self.connection_file = self.workspace_path / MATH_WORKER_CONNECTION_FILE
+        self.kernel: RuntimeSession | None = None
+        self.process: asyncio.subprocess.Process | None = None
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.last_interrupt_recovered = False
+
+    async def start(self) -> None:
+        self.workspace_path.mkdir(parents=True, exist_ok=True)
+        self.connection_file.unlink(missing_ok=True)
+        if self.record.backend == "docker":
+            await _run_command(["docker", "rm", "-f", self.record.container_name])
+            port = _reserve_kernel_ports()["shell_port"]
+            args = _docker_run_args(
+                self.record,
+                self.project_root,
+                [port],
+                [
+                    "python",
+                    "-m",
+                    "sugarpy.math_worker",
+                    "--host",
+                    "0.0.0.0",
+                    "--port",
+                    str(port),
+                    "--connection-file",
+                    f"{CONTAINER_WORKDIR}/{MATH_WORKER_CONNECTION_FILE}",
+                ],
+            )
+            code, stdout, stderr = await _run_command(args)
+            if code != 0:
+                raise DockerCommandError(stderr or stdout or "docker run failed")
+        else:
+            env = {
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join(filter(None, [str(_SOURCE_ROOT), os.environ.get("PYTHONPATH")])),
+                "PYTHONDONTWRITEBYTECODE": "1",
+                "HOME": str(self.workspace_path),
+                "MPLCONFIGDIR": str(self.workspace_path / ".config" / "matplotlib"),
+            }
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "sugarpy.math_worker",
+                "--connection-file",
+                str(self.connection_file),
+                cwd=str(self.workspace_path),
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        await self._connect(await self._wait_for_connection_file())
+
+    async def attach(self) -> bool:
+        if self.kernel is not None:
+            return await self.kernel.attach()
+        if not self.connection_file.exists() or not await self.is_running():
+            return False
+        try:
+            await self._connect(self._read_connection_file())
+        except (OSError, ValueError, RuntimeError, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def execute(self, code: str, timeout_s: float) -> dict[str, Any]:
+        if self.kernel is None:
+            await self._upgrade(timeout_s)
+        assert self.kernel is not None
+        return await self.kernel.execute(code, timeout_s)
+
+    async def call(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        if self.kernel is not None:
+            return await self.kernel.call(request, timeout_s)
+        started_at = time.perf_counter()
+        return _math_worker_result(await self._request(request, timeout_s), started_at)
+
+    async def interrupt(self) -> bool:
+        if self.kernel is not None:
+            return await self.kernel.interrupt()
+        self.last_interrupt_recovered = False
+        if self.record.backend == "docker":
+            code, _stdout, _stderr = await _run_command(["docker", "kill", "--signal=SIGINT", self.record.container_name])
+            if code != 0:
+                return False
+        else:
+            try:
+                os.kill(int(self._read_connection_file()["pid"]), signal.SIGINT)
+            except (OSError, ValueError, KeyError):
+                return False
+        await asyncio.sleep(0.15)
+        with contextlib.suppress(Exception):
+            await self._request({"method": "ping"}, 2.0)
+            self.last_interrupt_recovered = True
+        return True
+
+    async def restart(self) -> None:
+        if self.kernel is not None:
+            await self.kernel.restart()
+            return
+        await self.stop(remove_workspace=False)
+        await self.start()
+
+    async def stop(self, remove_workspace: bool) -> None:
+        if self.kernel is not None:
+            await self.kernel.stop(remove_workspace)
+            return
+        await self._stop_worker()
+        if remove_workspace:
+            shutil.rmtree(self.workspace_path, ignore_errors=True)
+
+    async def is_running(self) -> bool:
+        if self.kernel is not None:
+            return await self.kernel.is_running()
+        if self.record.backend == "docker":
+            code, stdout, _stderr = await _run_command(["docker", "inspect", "-f", "{{.State.Running}}", self.record.container_name])
+            return code == 0 and stdout.strip().lower() == "true"
+        if self.process is not None:
+            return self.process.returncode is None
+        try:
+            os.kill(int(self._read_connection_file()["pid"]), 0)
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
+
+    async def _upgrade(self, timeout_s: float) -> None:
+        history = (await self._request({"method": "history"}, timeout_s)).get("history") or []
+        await self._stop_worker()
+        kernel = self.kernel_factory(self.record)
+        try:
+            await kernel.start()
+        except Exception as exc:
+            await self._fall_back_to_worker(kernel, f"Could not start a kernel ({type(exc).__name__}: {exc}).")
+        if history:
+            # Failed cells are replayed too: their leading statements may have defined names.
+            error: str | None = None
+            try:
+                result = await kernel.execute(_math_worker_replay_code(history), self.exec_timeout_s + timeout_s)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            else:
+                if result.get("status") == "error":
+                    error = f"{result.get('errorName')}: {result.get('errorValue')}"
+            if error is not None:
+                # A kernel that silently lacks the Math definitions is worse than a fresh runtime.
+                await self._fall_back_to_worker(
+                    kernel, f"Could not restore the Math cells' definitions in a kernel ({error})."
+                )
+        self.kernel = kernel
+        self.record.tier = "kernel"
+
+    async def _fall_back_to_worker(self, kernel: RuntimeSession, reason: str) -> NoReturn:
+        # The worker is already gone; without a fresh one the runtime would have nothing to call.
+        with contextlib.suppress(Exception):
+            await kernel.stop(remove_workspace=False)
+        await self.start()
+        raise RuntimeError(f"{reason} The runtime was restarted; run the Math cells again.")
+
+    async def _stop_worker(self) -> None:
+        self._disconnect()
+        if self.record.backend == "docker":
+            await _run_command(["docker", "rm", "-f", self.record.container_name])
+        elif self.process is not None:
+            if self.process.returncode is None:
+                self.process.terminate()
+                try:
+                    await asyncio.wait_for(self.process.wait(), timeout=2.0)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+            self.process = None
+        else:
+            with contextlib.suppress(OSError, ValueError, KeyError):
+                os.kill(int(self._read_connection_file()["pid"]), signal.SIGTERM)
+        self.connection_file.unlink(missing_ok=True)
+
+    def _read_connection_file(self) -> dict[str, Any]:
+        payload = json.loads(self.connection_file.read_text(encoding="utf-8"))
+        if not isinstance(payload, dict):
+            raise ValueError(f"{self.connection_file.name} is not a JSON object.")
+        return payload
+
+    async def _wait_for_connection_file(self) -> dict[str, Any]:
+        deadline = time.monotonic() + self.start_timeout_s
+        while time.monotonic() < deadline:
+            if self.connection_file.exists():
+                return self._read_connection_file()
+            if self.process is not None and self.process.returncode is not None:
+                raise RuntimeError(f"Math worker exited with code {self.process.returncode} during startup.")
+            await asyncio.sleep(0.05)
+        raise RuntimeError(f"Math worker did not create {self.connection_file.name} within {self.start_timeout_s:.0f}s.")
+
+    async def _connect(self, connection: dict[str, Any]) -> None:
+        self._disconnect()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection("127.0.0.1", int(connection["port"])), timeout=self.start_timeout_s
+        )
+        self.reader, self.writer = reader, writer
+        try:
+            await self._exchange({"key": str(connection.get("key") or "")}, self.start_timeout_s)
+        except BaseException:
+            self._disconnect()
+            raise
+
+    def _disconnect(self) -> None:
+        if self.writer is not None:
+            with contextlib.suppress(Exception):
+                self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def _request(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        if self.writer is None:
+            await self._connect(self._read_connection_file())
+        try:
+            return await self._exchange(request, timeout_s)
+        except asyncio.TimeoutError as exc:
+            self._disconnect()
+            raise TimeoutError(f"Notebook execution timed out after {timeout_s:.1f}s.") from exc
+        except BaseException:
+            # A reply may still be in flight; the next request starts on a fresh connection.
+            self._disconnect()
+            raise
+
+    async def _exchange(self, payload: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        assert self.reader is not None and self.writer is not None
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.writer.write(FRAME_HEADER.pack(len(data)) + data)
+        await self.writer.drain()
+
+        async def _read() -> Any:
+            assert self.reader is not None
+            header = await self.reader.readexactly(FRAME_HEADER.size)
+            (size,) = FRAME_HEADER.unpack(header)
+            return json.loads((await self.reader.readexactly(size)).decode("utf-8"))
+
+        try:
+            reply = await asyncio.wait_for(_read(), timeout=timeout_s)
+        except asyncio.IncompleteReadError as exc:
+            raise RuntimeError("Math worker closed the connection.") from exc
+        if not isinstance(reply, dict):
+            raise RuntimeError("Math worker sent a malformed reply.")
+        return reply
+
+
+def _init_cell_pool_worker(memory_bytes: int) -> None:
+    # The server's Ctrl+C reaches the whole process group; shutdown terminates the pool instead.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    with contextlib.suppress(ImportError, OSError, ValueError):
+        import resource
+
+        # Relative to what the interpreter and its thread pools have already reserved.
+        mapped_bytes = int(Path("/proc/self/statm").read_text().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        limit = mapped_bytes + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    # Pay for the renderer imports when the pool starts, not on the first cell.
+    import sugarpy.regression  # noqa: F401
+    import sugarpy.stoichiometry  # noqa: F401
+
+
+def _settle_future(future: asyncio.Future[Any], value: Any, failed: bool = False) -> None:
+    if future.done():
+        return
+    if failed:
+        future.set_exception(value)
+    else:
+        future.set_result(value)
+
+
+class StatelessCellPool:
+    """Evaluates Stoichiometry and Regression requests in worker processes, outside every notebook runtime.
+
+    Both renderers are pure functions of the cell state, so no kernel is started or woken for them and
+    results are cached by a hash of the request. Workers run with an address-space limit; a request that
+    times out terminates the pool, which starts again on the next request. The other requests still waiting
+    on that pool fail at once instead of waiting for their own timeouts.
+    """
+
+    def __init__(self, workers: int, *, cache_size: int = 256, memory_bytes: int = DEFAULT_CELL_POOL_MEMORY_BYTES) -> None:
+        self.workers = max(int(workers), 1)
+        self.memory_bytes = memory_bytes
+        self.cache = LRUCache(cache_size)
+        self._pool: Any = None
+        # Replies still awaited, with the pool each request was submitted to.
+        self._pending: dict[asyncio.Future[Any], Any] = {}
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        # The server process has threads (tornado, ZMQ), which a plain fork would copy mid-flight.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._pool = context.Pool(self.workers, initializer=_init_cell_pool_worker, initargs=(self.memory_bytes,))
+
+    def close(self) -> None:
+        self._terminate(self._pool)
+
+    def _terminate(self, pool: Any) -> None:
+        if pool is None:
+            return
+        if self._pool is pool:
+            self._pool = None
+        pool.terminate()
+        pool.join()
+
+    def _fail_pending(self, pool: Any, exc: BaseException) -> None:
+        for future, submitted_to in list(self._pending.items()):
+            if submitted_to is pool and not future.done():
+                future.get_loop().call_soon_threadsafe(_settle_future, future, exc, True)
+
+    async def call(self, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+        if request.get("method") not in STATELESS_RPC_METHODS:
+            raise ValueError(f"Not a stateless request: {request.get('method')!r}")
+        key = hashlib.sha256(
+            json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {**cached, "durationMs": 0}
+        self.start()
+        loop = asyncio.get_running_loop()
+        reply: asyncio.Future[Any] = loop.create_future()
+        pool = self._pool
+        self._pending[reply] = pool
+
+        started_at = time.perf_counter()
+        pool.apply_async(
+            run_captured,
+            (request, {}),
+            callback=lambda value: loop.call_soon_threadsafe(_settle_future, reply, value),
+            error_callback=lambda exc: loop.call_soon_threadsafe(_settle_future, reply, exc, True),
+        )
+        try:
+            result = _math_worker_result(await asyncio.wait_for(reply, timeout=timeout_s), started_at)
+        except asyncio.TimeoutError as exc:
+            # Terminating the pool is the only way to stop a worker stuck in a fit. Only this request's
+            # pool goes: another timeout may already have replaced it with a fresh one.
+            self._fail_pending(
+                pool, RuntimeError("The cell worker pool was restarted after another request timed out.")
+            )
+            await asyncio.to_thread(self._terminate, pool)
+            raise TimeoutError(f"Notebook execution timed out after {timeout_s:.1f}s.") from exc
+        finally:
+            self._pending.pop(reply, None)
+        if result["status"] == "ok":
+            self.cache.put(key, result)
+        return result
+
 
 class RuntimeManager:
     def __init__(
@@ -514,11 +1000,13 @@ class RuntimeManager:
         project_root: Path,
         bootstrap_code: str,
         executor: KernelExecutor,
+        rpc_executor: KernelRpcExecutor | None = None,
     ) -> None:
         self.storage_root = storage_root
         self.project_root = project_root
         self.bootstrap_code = bootstrap_code
         self.executor = executor
+        self.rpc_executor = rpc_executor
         self.security_profile = os.environ.get("SUGARPY_SECURITY_PROFILE", "").strip()
         self.backend, self.unavailable_reason = self._resolve_backend(
             os.environ.get("SUGARPY_NOTEBOOK_RUNTIME_BACKEND", DEFAULT_RUNTIME_BACKEND).strip(),
@@ -537,8 +1025,14 @@ class RuntimeManager:
         self._execution_locks: dict[str, asyncio.Lock] = {}
         self._execution_tasks: dict[str, asyncio.Task[dict[str, Any]]] = {}
         self._pending_interrupts: set[str] = set()
+        self._rpc_unavailable: set[str] = set()
+
+    async def ensure_runtime(self, notebook_id: str, math_only: bool = False) -> dict[str, Any]:
+        """Attach to or start the notebook's runtime.
 
-    async def ensure_runtime(self, notebook_id: str) -> dict[str, Any]:
+        With `math_only`, a new runtime starts as a math worker (`MathWorkerRuntime`) and only
+        becomes a kernel once code is executed; an existing runtime is kept whatever its tier.
+        """
         self._require_available_backend()
         await self._cleanup_idle_runtimes()
         async with self._lock_for(notebook_id):
@@ -546,7 +1040,10 @@ class RuntimeManager:
             runtime = await self._load_or_recover_runtime(notebook_id)
             session_state = "existing"
             if runtime is None:
-                runtime = self._create_runtime(notebook_id)
+                if math_only:
+                    runtime = self._create_runtime(notebook_id, existing_record=self._new_record(notebook_id, tier="math"))
+                else:
+                    runtime = self._create_runtime(notebook_id)
                 runtime.record.status = "starting"
                 runtime.record.error = None
                 self._persist_record(runtime.record)
@@ -568,6 +1065,25 @@ class RuntimeManager:
             return {**runtime.record.to_dict(), "sessionState": session_state}
 
     async def execute_code(self, notebook_id: str, code: str, timeout_s: float) -> tuple[dict[str, Any], dict[str, Any]]:
+        return await self._run_exclusive(notebook_id, lambda session: session.execute(code, timeout_s))
+
+    async def call_rpc(
+        self, notebook_id: str, request: dict[str, Any], timeout_s: float
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Send a structured request; raises `KernelRpcUnavailable` when the caller should execute source instead."""
+        runtime = self._sessions.get(notebook_id)
+        if notebook_id in self._rpc_unavailable or (runtime is not None and not hasattr(runtime, "call")):
+            raise KernelRpcUnavailable("Notebook runtime does not handle structured requests.")
+        try:
+            return await self._run_exclusive(notebook_id, lambda session: session.call(request, timeout_s))
+        except KernelRpcUnavailable:
+            # Kernels started from an older image keep lacking the target until they are replaced.
+            self._rpc_unavailable.add(notebook_id)
+            raise
+
+    async def _run_exclusive(
+        self, notebook_id: str, operation: Callable[[RuntimeSession], Awaitable[dict[str, Any]]]
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
         async with self._lock_for(notebook_id):
             runtime = self._sessions.get(notebook_id)
             if runtime is None:
@@ -581,7 +1097,7 @@ class RuntimeManager:
                 if notebook_id in self._pending_interrupts:
                     self._pending_interrupts.discard(notebook_id)
                     raise RuntimeError("Execution interrupted by runtime control.")
-                execution_task = asyncio.create_task(runtime.execute(code, timeout_s))
+                execution_task = asyncio.create_task(operation(runtime))
                 self._execution_tasks[notebook_id] = execution_task
                 result = await execution_task
             except asyncio.CancelledError as exc:
@@ -594,11 +1110,12 @@ class RuntimeManager:
                         self._persist_record(runtime.record)
                 raise RuntimeError("Execution interrupted by runtime control.") from exc
             except Exception as exc:
+                unavailable = isinstance(exc, KernelRpcUnavailable)
                 async with self._lock_for(notebook_id):
                     current_runtime = self._sessions.get(notebook_id)
                     if current_runtime is runtime:
-                        runtime.record.status = "error"
-                        runtime.record.error = str(exc)
+                        runtime.record.status = "connected" if unavailable else "error"
+                        runtime.record.error = None if unavailable else str(exc)
                         runtime.record.last_activity_at = _utc_now()
                         self._persist_record(runtime.record)
                 raise
@@ -639,6 +1156,11 @@ class RuntimeManager:
             self._delete_record(notebook_id)
             return self._disconnected_payload(notebook_id)
 
+    def known_runtime_status(self, notebook_id: str) -> dict[str, Any]:
+        """Last known status of a notebook's runtime, without probing, waking or starting it."""
+        runtime = self._sessions.get(notebook_id)
+        return runtime.record.to_dict() if runtime is not None else self._disconnected_payload(notebook_id)
+
     async def restart_runtime(self, notebook_id: str) -> dict[str, Any]:
         self._require_available_backend()
         async with self._lock_for(notebook_id):
@@ -775,8 +1297,8 @@ class RuntimeManager:
     async def _cleanup_idle_runtimes(self) -> None:
         await self.cleanup_idle_runtimes()
 
-    def _create_runtime(self, notebook_id: str, existing_record: RuntimeRecord | None = None) -> RuntimeSession:
-        record = existing_record or RuntimeRecord(
+    def _new_record(self, notebook_id: str, tier: str = "kernel") -> RuntimeRecord:
+        return RuntimeRecord(
             notebook_id=notebook_id,
             status="disconnected",
             backend=self.backend,
@@ -786,7 +1308,23 @@ class RuntimeManager:
             created_at=_utc_now(),
             last_activity_at=_utc_now(),
             image=self.image,
+            tier=tier,
         )
+
+    def _create_runtime(self, notebook_id: str, existing_record: RuntimeRecord | None = None) -> RuntimeSession:
+        self._rpc_unavailable.discard(notebook_id)
+        record = existing_record or self._new_record(notebook_id)
+        if record.tier == "math":
+            return MathWorkerRuntime(
+                record,
+                project_root=self.project_root,
+                kernel_factory=self._create_kernel_runtime,
+                start_timeout_s=self.start_timeout_s,
+                exec_timeout_s=self.exec_timeout_s,
+            )
+        return self._create_kernel_runtime(record)
+
+    def _create_kernel_runtime(self, record: RuntimeRecord) -> RuntimeSession:
         if record.backend == "inprocess":
             return InProcessKernelRuntime(
                 record,
@@ -801,6 +1339,7 @@ class RuntimeManager:
             executor=self.executor,
             start_timeout_s=self.start_timeout_s,
             exec_timeout_s=self.exec_timeout_s,
+            rpc_executor=self.rpc_executor,
         )
 
     async def _load_or_recover_runtime(self, notebook_id: str) -> RuntimeSession | None:
@@ -4,6 +4,7 @@ import ast
 import contextlib
 import json
 import logging
+import math
 import os
 import queue
 import re
@@ -18,7 +19,16 @@ from tornado import web
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 from tornado.ioloop import IOLoop, PeriodicCallback
 
-from sugarpy.runtime_manager import RuntimeManager
+from sugarpy.kernel_rpc import RPC_TARGET
+from sugarpy.math_parser import lint_math_source
+from sugarpy.notebook_dataflow import NotebookDataflowTracker, NotebookGraph, execution_fingerprint, plan_stages
+from sugarpy.runtime_manager import (
+    STATELESS_RPC_METHODS,
+    KernelRpcUnavailable,
+    RuntimeManager,
+    StatelessCellPool,
+    kernel_rpc_result,
+)
 
 
 OPENAI_API_URL = "https://api.openai.com/v1/responses"
@@ -30,6 +40,14 @@ DEFAULT_NOTEBOOK_TIMEOUT_S = 20.0
 DEFAULT_SANDBOX_TIMEOUT_S = 5.0
 DEFAULT_ASSISTANT_TRACES_ENABLED = False
 MAX_EXEC_SOURCE_LENGTH = 8000
+MAX_MATH_RENDER_TOKENS = 256
+MAX_MATH_PARSE_SOURCES = 64
+MATH_RENDER_TIMEOUT_S = 10.0
+PLOT_RESAMPLE_TIMEOUT_S = 5.0
+MAX_PLOT_RESAMPLE_WIDTH_PX = 4096
+MATH_TIMEOUT_MARGIN_S = 1.5
+BRANCHES_MIME = "application/vnd.sugarpy.branches+json"
+_MATH_RENDER_TOKEN_RE = re.compile(r"^[0-9a-f]{1,64}$")
 ALLOWED_IMPORTS = {
     "math",
     "cmath",
@@ -88,7 +106,9 @@ BLOCKED_ATTR_CALLS = {
     "pathlib.Path.open",
 }
 _RUNTIME_MANAGER: RuntimeManager | None = None
+_CELL_POOL: StatelessCellPool | None = None
 _RUNTIME_CLEANUP_CALLBACK: PeriodicCallback | None = None
+_DATAFLOW_TRACKERS: dict[str, NotebookDataflowTracker] = {}
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -229,6 +249,7 @@ def _load_assistant_server_config() -> dict[str, Any]:
             "assistantSandboxAvailable": _assistant_sandbox_available(),
             "assistantSandboxDockerOnly": _security_profile() in {"restricted-demo", "school-secure"},
             "coldStartReplay": False,
+            "parallelRunAll": _parallel_branches() > 1,
             "runtimeBackend": runtime_backend,
         },
     }
@@ -340,18 +361,16 @@ def _is_execution_timeout(exc: Exception) -> bool:
     return "timed out" in str(exc).lower()
 
 
-async def _execute_kernel_code(client: Any, code: str, timeout_s: float) -> dict[str, Any]:
-    started_at = time.perf_counter()
-    deadline = time.monotonic() + timeout_s
+async def _collect_kernel_outputs(
+    client: Any, msg_id: str, deadline: float, timeout_s: float
+) -> tuple[str, str, dict[str, Any], str | None, str | None]:
     stdout = ""
     stderr = ""
     mime_data: dict[str, Any] = {}
     error_name: str | None = None
     error_value: str | None = None
-    msg_id = client.execute(code, stop_on_error=True)
-    idle = False
 
-    while not idle:
+    while True:
         remaining = deadline - time.monotonic()
         if remaining <= 0:
             raise TimeoutError(f"Notebook execution timed out after {timeout_s:.1f}s.")
@@ -364,8 +383,7 @@ async def _execute_kernel_code(client: Any, code: str, timeout_s: float) -> dict
         msg_type = msg.get("msg_type")
         content = msg.get("content", {})
         if msg_type == "status" and content.get("execution_state") == "idle":
-            idle = True
-            continue
+            return stdout, stderr, mime_data, error_name, error_value
         if msg_type == "stream":
             text = str(content.get("text") or "")
             if content.get("name") == "stderr":
@@ -389,6 +407,15 @@ async def _execute_kernel_code(client: Any, code: str, timeout_s: float) -> dict
             if isinstance(traceback, list):
                 stderr = stderr or "\n".join(str(line) for line in traceback)
 
+
+async def _execute_kernel_code(client: Any, code: str, timeout_s: float) -> dict[str, Any]:
+    started_at = time.perf_counter()
+    deadline = time.monotonic() + timeout_s
+    msg_id = client.execute(code, stop_on_error=True)
+    stdout, stderr, mime_data, error_name, error_value = await _collect_kernel_outputs(
+        client, msg_id, deadline, timeout_s
+    )
+
     remaining = deadline - time.monotonic()
     if remaining <= 0:
         raise TimeoutError(f"Notebook execution timed out after {timeout_s:.1f}s.")
@@ -410,6 +437,18 @@ async def _execute_kernel_code(client: Any, code: str, timeout_s: float) -> dict
     }
 
 
+async def _call_kernel_rpc(client: Any, request: dict[str, Any], timeout_s: float) -> dict[str, Any]:
+    # A comm_open on the SugarPy target: no source to compile, no history entry and no shell reply.
+    started_at = time.perf_counter()
+    deadline = time.monotonic() + timeout_s
+    msg = client.session.msg("comm_open", {"comm_id": uuid.uuid4().hex, "target_name": RPC_TARGET, "data": request})
+    client.shell_channel.send(msg)
+    stdout, stderr, mime_data, _error_name, _error_value = await _collect_kernel_outputs(
+        client, msg["header"]["msg_id"], deadline, timeout_s
+    )
+    return kernel_rpc_result(stdout, stderr, mime_data, started_at)
+
+
 def _bootstrap_code() -> str:
     return "\n".join(
         [
@@ -421,21 +460,56 @@ def _bootstrap_code() -> str:
             'x, y, z, t = symbols("x y z t")',
             "from IPython.display import display as __sugarpy_display",
             "from sugarpy.startup import plot",
+            "from sugarpy.latex_memo import memo_latex as __sugarpy_latex",
+            "from sugarpy.kernel_rpc import register_rpc_target as __sugarpy_register_rpc",
+            "__sugarpy_register_rpc()",
             "def __sugarpy_emit_output(value):",
             "    payload = {'text/plain': repr(value)}",
             "    if isinstance(value, sp.Basic):",
             "        payload['text/plain'] = str(value)",
-            "        payload['text/latex'] = sp.latex(value)",
+            "        payload['text/latex'] = __sugarpy_latex(value)",
             "    __sugarpy_display(payload, raw=True)",
         ]
     )
 
 
-def _build_math_code(source: str, trig_mode: str, render_mode: str) -> str:
+def _build_math_code(
+    source: str,
+    trig_mode: str,
+    render_mode: str,
+    time_budget_s: float | None = None,
+    cell_id: str | None = None,
+) -> str:
+    extra = "" if time_budget_s is None else f", time_budget_s={time_budget_s:.3f}"
+    if cell_id:
+        extra += f", cell_id={json.dumps(cell_id)}"
     return "\n".join(
         [
             "from sugarpy.math_cell import display_math_cell",
-            f"_ = display_math_cell({json.dumps(source)}, {json.dumps(trig_mode)}, {json.dumps(render_mode)})",
+            f"_ = display_math_cell({json.dumps(source)}, {json.dumps(trig_mode)}, {json.dumps(render_mode)}{extra})",
+        ]
+    )
+
+
+def _math_time_budget_s(timeout_s: float) -> float:
+    # Leave the kernel time to report a slow statement before the execution timeout restarts the runtime.
+    return max(timeout_s - MATH_TIMEOUT_MARGIN_S, timeout_s * 0.5)
+
+
+def _build_math_render_code(tokens: list[str], render_mode: str) -> str:
+    return "\n".join(
+        [
+            "from sugarpy.math_cell import display_math_render",
+            f"_ = display_math_render({json.dumps(tokens)}, {json.dumps(render_mode)})",
+        ]
+    )
+
+
+def _build_plot_resample_code(token: str, xmin: float, xmax: float, width_px: int) -> str:
+    return "\n".join(
+        [
+            "from sugarpy.startup import display_plot_resample",
+            f"_ = display_plot_resample({json.dumps(token)}, {xmin!r}, {xmax!r}, {width_px})",
         ]
     )
 
@@ -449,6 +523,15 @@ def _build_stoich_code(reaction: str, inputs: dict[str, Any]) -> str:
     )
 
 
+def _build_branches_code(branches: list[dict[str, Any]], time_budget_s: float) -> str:
+    return "\n".join(
+        [
+            "from sugarpy.branch_runner import display_branches",
+            f"_ = display_branches({json.dumps(branches)}, time_budget_s={time_budget_s:.3f})",
+        ]
+    )
+
+
 def _build_regression_code(points: list[dict[str, Any]], model: str, x_label: str, y_label: str) -> str:
     return "\n".join(
         [
@@ -487,13 +570,20 @@ def _wrap_code_for_notebook_display(source: str) -> str:
     return "\n".join(lines)
 
 
-def _cell_source_for_execution(cell: dict[str, Any], trig_mode: str, render_mode: str) -> str:
+def _cell_source_for_execution(
+    cell: dict[str, Any],
+    trig_mode: str,
+    render_mode: str,
+    math_time_budget_s: float | None = None,
+) -> str:
     cell_type = str(cell.get("type") or "code")
     if cell_type == "math":
         return _build_math_code(
             str(cell.get("source") or ""),
             "rad" if cell.get("mathTrigMode") == "rad" else trig_mode,
             "decimal" if cell.get("mathRenderMode") == "decimal" else render_mode,
+            math_time_budget_s,
+            str(cell.get("id") or "") or None,
         )
     if cell_type == "stoich":
         state = cell.get("stoichState") if isinstance(cell.get("stoichState"), dict) else {}
@@ -511,6 +601,44 @@ def _cell_source_for_execution(cell: dict[str, Any], trig_mode: str, render_mode
     return _wrap_code_for_notebook_display(str(cell.get("source") or ""))
 
 
+def _kernel_rpc_request(
+    cell: dict[str, Any],
+    trig_mode: str,
+    render_mode: str,
+    math_time_budget_s: float | None = None,
+) -> dict[str, Any] | None:
+    """Structured counterpart of `_cell_source_for_execution` for Math, Stoichiometry and Regression cells."""
+    cell_type = str(cell.get("type") or "code")
+    if cell_type == "math":
+        return {
+            "method": "math",
+            "params": {
+                "source": str(cell.get("source") or ""),
+                "trigMode": "rad" if cell.get("mathTrigMode") == "rad" else trig_mode,
+                "renderMode": "decimal" if cell.get("mathRenderMode") == "decimal" else render_mode,
+                "timeBudgetS": math_time_budget_s,
+                "cellId": str(cell.get("id") or "") or None,
+            },
+        }
+    if cell_type == "stoich":
+        state = cell.get("stoichState") if isinstance(cell.get("stoichState"), dict) else {}
+        inputs = state.get("inputs") if isinstance(state.get("inputs"), dict) else {}
+        return {"method": "stoich", "params": {"reaction": str(state.get("reaction") or ""), "inputs": inputs}}
+    if cell_type == "regression":
+        state = cell.get("regressionState") if isinstance(cell.get("regressionState"), dict) else {}
+        labels = state.get("labels") if isinstance(state.get("labels"), dict) else {}
+        return {
+            "method": "regression",
+            "params": {
+                "points": state.get("points") if isinstance(state.get("points"), list) else [],
+                "model": str(state.get("model") or "linear"),
+                "xLabel": str(labels.get("x") or "x"),
+                "yLabel": str(labels.get("y") or "y"),
+            },
+        }
+    return None
+
+
 def _join_execution_chunks(chunks: list[str]) -> str:
     return "\n\n".join(chunk for chunk in chunks if chunk.strip())
 
@@ -532,10 +660,46 @@ def _runtime_manager() -> RuntimeManager:
             project_root=_project_root(),
             bootstrap_code=_bootstrap_code(),
             executor=_execute_kernel_code,
+            rpc_executor=_call_kernel_rpc,
         )
     return _RUNTIME_MANAGER
 
 
+def _cell_pool() -> StatelessCellPool | None:
+    # Stoichiometry and Regression cells bypass the notebook runtime when SUGARPY_CELL_POOL_WORKERS=N (N > 0).
+    global _CELL_POOL
+    if _CELL_POOL is None:
+        raw = os.environ.get("SUGARPY_CELL_POOL_WORKERS", "").strip()
+        try:
+            workers = int(raw) if raw else 0
+        except ValueError:
+            workers = 0
+        if workers > 0:
+            _CELL_POOL = StatelessCellPool(workers)
+    return _CELL_POOL
+
+
+def _parallel_branches() -> int:
+    # Maximum concurrent branches for a planned Run All; unset, 0 or 1 runs every cell in order.
+    raw = os.environ.get("SUGARPY_PARALLEL_BRANCHES", "").strip()
+    try:
+        return max(int(raw), 0) if raw else 0
+    except ValueError:
+        return 0
+
+
+def _kernel_rpc_enabled() -> bool:
+    # Math, Stoichiometry and Regression cells skip generated source unless SUGARPY_KERNEL_RPC=0.
+    raw = os.environ.get("SUGARPY_KERNEL_RPC", "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _math_worker_enabled() -> bool:
+    # Notebooks without Code cells start on the math-only worker tier when SUGARPY_MATH_WORKER=1.
+    raw = os.environ.get("SUGARPY_MATH_WORKER", "").strip().lower()
+    return raw in {"1", "true", "yes", "on"}
+
+
 def _runtime_cleanup_interval_ms() -> int:
     raw = os.environ.get("SUGARPY_RUNTIME_CLEANUP_INTERVAL_MS", "").strip()
     if not raw:
@@ -547,6 +711,27 @@ def _runtime_cleanup_interval_ms() -> int:
     return max(1_000, parsed)
 
 
+def _dataflow_tracker(notebook_id: str) -> NotebookDataflowTracker:
+    tracker = _DATAFLOW_TRACKERS.get(notebook_id)
+    if tracker is None:
+        tracker = _DATAFLOW_TRACKERS[notebook_id] = NotebookDataflowTracker()
+    return tracker
+
+
+def _reset_dataflow_tracker(notebook_id: str) -> None:
+    # The namespace the tracker describes is gone (or, after an interrupt, unknown).
+    _DATAFLOW_TRACKERS.pop(notebook_id, None)
+
+
+def _execution_ok(target_type: str, result: dict[str, Any]) -> bool:
+    if result["status"] != "ok":
+        return False
+    if target_type == "math":
+        math_payload = result["mimeData"].get("application/vnd.sugarpy.math+json")
+        return isinstance(math_payload, dict) and bool(math_payload.get("ok"))
+    return True
+
+
 async def _background_runtime_cleanup() -> None:
     manager = _runtime_manager()
     try:
@@ -556,6 +741,76 @@ async def _background_runtime_cleanup() -> None:
         _LOGGER.exception("Background runtime cleanup failed.")
 
 
+def _notebook_timeout_s(payload: dict[str, Any]) -> float:
+    return min(
+        max(float(payload.get("timeoutMs") or DEFAULT_NOTEBOOK_TIMEOUT_S * 1000.0) / 1000.0, 0.25),
+        DEFAULT_NOTEBOOK_TIMEOUT_S,
+    )
+
+
+def _reused_response(notebook_id: str, cell_id: str, cell_type: str, runtime: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "notebookId": notebook_id,
+        "cellId": cell_id,
+        "cellType": cell_type,
+        "status": "ok",
+        "reused": True,
+        "execCountIncrement": False,
+        "securityProfile": _security_profile(),
+        "freshRuntime": False,
+        "replayedCellIds": [],
+        "runtime": {**runtime, "sessionState": runtime.get("sessionState", "existing"), "freshRuntime": False},
+    }
+
+
+def _execution_error_response(
+    notebook_id: str,
+    cell_id: str,
+    cell_type: str,
+    exc: Exception,
+    runtime: dict[str, Any],
+    recovered_runtime: dict[str, Any] | None = None,
+    recovery_error: str = "",
+) -> dict[str, Any]:
+    if recovered_runtime is not None:
+        return {
+            "notebookId": notebook_id,
+            "cellId": cell_id,
+            "cellType": cell_type,
+            "status": "error",
+            "output": {
+                "type": "error",
+                "ename": exc.__class__.__name__,
+                "evalue": f"{exc} Runtime was restarted to recover from the timeout.{recovery_error}",
+            },
+            "execCountIncrement": False,
+            "securityProfile": _security_profile(),
+            "freshRuntime": True,
+            "replayedCellIds": [],
+            "runtime": {**recovered_runtime, "sessionState": "recreated-after-timeout", "freshRuntime": True},
+        }
+    return {
+        "notebookId": notebook_id,
+        "cellId": cell_id,
+        "cellType": cell_type,
+        "status": "error",
+        "output": {"type": "error", "ename": exc.__class__.__name__, "evalue": str(exc)},
+        "execCountIncrement": False,
+        "securityProfile": _security_profile(),
+        "freshRuntime": False,
+        "replayedCellIds": [],
+        "runtime": {**runtime, "status": "error", "error": str(exc)},
+    }
+
+
+async def _recover_from_timeout(notebook_id: str, runtime: dict[str, Any]) -> tuple[dict[str, Any], str]:
+    _reset_dataflow_tracker(notebook_id)
+    try:
+        return await _runtime_manager().restart_runtime(notebook_id), ""
+    except Exception as recovery_exc:
+        return {**runtime, "status": "error", "error": str(recovery_exc)}, f" Runtime restart failed: {recovery_exc}"
+
+
 async def execute_notebook_request(payload: dict[str, Any]) -> dict[str, Any]:
     cells = payload.get("cells")
     if not isinstance(cells, list):
@@ -588,13 +843,16 @@ async def execute_notebook_request(payload: dict[str, Any]) -> dict[str, Any]:
 
     trig_mode = "rad" if payload.get("trigMode") == "rad" else "deg"
     render_mode = "decimal" if payload.get("defaultMathRenderMode") == "decimal" else "exact"
-    timeout_s = min(
-        max(float(payload.get("timeoutMs") or DEFAULT_NOTEBOOK_TIMEOUT_S * 1000.0) / 1000.0, 0.25),
-        DEFAULT_NOTEBOOK_TIMEOUT_S,
-    )
+    timeout_s = _notebook_timeout_s(payload)
+    pool = _cell_pool()
+    if pool is not None and target_type in STATELESS_RPC_METHODS:
+        return await _execute_stateless_cell(pool, notebook_id, target_cell, target_type, trig_mode, timeout_s)
     manager = _runtime_manager()
     try:
-        runtime = await manager.ensure_runtime(notebook_id)
+        if _math_worker_enabled() and not any(str(cell.get("type") or "code") == "code" for cell in notebook_cells):
+            runtime = await manager.ensure_runtime(notebook_id, math_only=True)
+        else:
+            runtime = await manager.ensure_runtime(notebook_id)
     except Exception as exc:
         runtime_status = await manager.get_runtime_status(notebook_id)
         return {
@@ -611,56 +869,80 @@ async def execute_notebook_request(payload: dict[str, Any]) -> dict[str, Any]:
         }
 
     replay_cells: list[dict[str, Any]] = []
-    execution_chunks = [_cell_source_for_execution(target_cell, trig_mode, render_mode)]
+    if runtime.get("sessionState") != "existing":
+        _reset_dataflow_tracker(notebook_id)
+    tracker = _dataflow_tracker(notebook_id)
+    graph = NotebookGraph(notebook_cells, trig_mode)
+    execution_chunks = [
+        _cell_source_for_execution(target_cell, trig_mode, render_mode, _math_time_budget_s(timeout_s))
+    ]
+    fingerprint = execution_fingerprint(_join_execution_chunks(execution_chunks))
+    if payload.get("reuseIfUnchanged") and tracker.can_reuse(graph, target_cell_id, fingerprint):
+        return _reused_response(notebook_id, target_cell_id, target_type, runtime)
+    rpc_request = (
+        _kernel_rpc_request(target_cell, trig_mode, render_mode, _math_time_budget_s(timeout_s))
+        if _kernel_rpc_enabled()
+        else None
+    )
     try:
-        result, runtime_payload = await manager.execute_code(
-            notebook_id,
-            _join_execution_chunks(execution_chunks),
-            timeout_s,
-        )
+        result: dict[str, Any] | None = None
+        if rpc_request is not None:
+            with contextlib.suppress(KernelRpcUnavailable):
+                result, runtime_payload = await manager.call_rpc(notebook_id, rpc_request, timeout_s)
+        if result is None:
+            result, runtime_payload = await manager.execute_code(
+                notebook_id,
+                _join_execution_chunks(execution_chunks),
+                timeout_s,
+            )
     except Exception as exc:
         if _is_execution_timeout(exc):
-            recovery_error = ""
-            try:
-                recovered_runtime = await _runtime_manager().restart_runtime(notebook_id)
-            except Exception as recovery_exc:
-                recovered_runtime = {**runtime, "status": "error", "error": str(recovery_exc)}
-                recovery_error = f" Runtime restart failed: {recovery_exc}"
-            return {
-                "notebookId": notebook_id,
-                "cellId": target_cell_id,
-                "cellType": target_type,
-                "status": "error",
-                "output": {
-                    "type": "error",
-                    "ename": exc.__class__.__name__,
-                    "evalue": f"{exc} Runtime was restarted to recover from the timeout.{recovery_error}",
-                },
-                "execCountIncrement": False,
-                "securityProfile": _security_profile(),
-                "freshRuntime": True,
-                "replayedCellIds": [],
-                "runtime": {**recovered_runtime, "sessionState": "recreated-after-timeout", "freshRuntime": True},
-            }
-        return {
-            "notebookId": notebook_id,
-            "cellId": target_cell_id,
-            "cellType": target_type,
-            "status": "error",
-            "output": {"type": "error", "ename": exc.__class__.__name__, "evalue": str(exc)},
-            "execCountIncrement": False,
-            "securityProfile": _security_profile(),
-            "freshRuntime": False,
-            "replayedCellIds": [],
-            "runtime": {**runtime, "status": "error", "error": str(exc)},
-        }
+            recovered_runtime, recovery_error = await _recover_from_timeout(notebook_id, runtime)
+            return _execution_error_response(
+                notebook_id, target_cell_id, target_type, exc, runtime, recovered_runtime, recovery_error
+            )
+        return _execution_error_response(notebook_id, target_cell_id, target_type, exc, runtime)
+
+    tracker.record_run(graph, target_cell_id, fingerprint, _execution_ok(target_type, result))
+    return _execution_response(notebook_id, target_cell_id, target_type, trig_mode, result, runtime, runtime_payload)
+
+
+async def _execute_stateless_cell(
+    pool: StatelessCellPool,
+    notebook_id: str,
+    cell: dict[str, Any],
+    cell_type: str,
+    trig_mode: str,
+    timeout_s: float,
+) -> dict[str, Any]:
+    # Nothing here reads or writes the namespace, so the runtime is neither started nor touched.
+    cell_id = str(cell.get("id") or "")
+    runtime = _runtime_manager().known_runtime_status(notebook_id)
+    request = _kernel_rpc_request(cell, trig_mode, "exact")
+    assert request is not None
+    try:
+        result = await pool.call(request, timeout_s)
+    except Exception as exc:
+        return _execution_error_response(notebook_id, cell_id, cell_type, exc, runtime)
+    return _execution_response(notebook_id, cell_id, cell_type, trig_mode, result, runtime, runtime)
+
 
+def _execution_response(
+    notebook_id: str,
+    target_cell_id: str,
+    target_type: str,
+    trig_mode: str,
+    result: dict[str, Any],
+    runtime: dict[str, Any],
+    runtime_payload: dict[str, Any],
+) -> dict[str, Any]:
     fresh_runtime = runtime.get("sessionState") == "created"
     response: dict[str, Any] = {
         "notebookId": notebook_id,
         "cellId": target_cell_id,
         "cellType": target_type,
         "status": result["status"],
+        "reused": False,
         "execCountIncrement": result["status"] == "ok",
         "securityProfile": _security_profile(),
         "freshRuntime": fresh_runtime,
@@ -729,6 +1011,255 @@ async def execute_notebook_request(payload: dict[str, Any]) -> dict[str, Any]:
     return response
 
 
+async def _execute_branch_stage(
+    notebook_id: str,
+    graph: NotebookGraph,
+    notebook_cells: list[dict[str, Any]],
+    stage: list[list[int]],
+    reuse_ids: set[str],
+    trig_mode: str,
+    render_mode: str,
+    timeout_s: float,
+) -> list[dict[str, Any]]:
+    manager = _runtime_manager()
+    runtime = await manager.ensure_runtime(notebook_id)
+    if runtime.get("sessionState") != "existing":
+        _reset_dataflow_tracker(notebook_id)
+    tracker = _dataflow_tracker(notebook_id)
+    responses: dict[str, dict[str, Any]] = {}
+    fingerprints: dict[str, str] = {}
+    branches: list[dict[str, Any]] = []
+    for branch in stage:
+        branch_cells: list[dict[str, str]] = []
+        for index in branch:
+            cell_id = graph.cell_ids[index]
+            code = _cell_source_for_execution(notebook_cells[index], trig_mode, render_mode, _math_time_budget_s(timeout_s))
+            fingerprint = execution_fingerprint(code)
+            # Once a branch executes a cell, its later cells may read what that cell wrote.
+            if not branch_cells and cell_id in reuse_ids and tracker.can_reuse(graph, cell_id, fingerprint):
+                responses[cell_id] = _reused_response(notebook_id, cell_id, graph.cell_types[index], runtime)
+                continue
+            fingerprints[cell_id] = fingerprint
+            branch_cells.append({"cellId": cell_id, "code": code})
+        if branch_cells:
+            indices = [graph.index(cell["cellId"]) for cell in branch_cells]
+            branches.append(
+                {
+                    "cells": branch_cells,
+                    "writes": sorted(set().union(*(graph.writes(index) for index in indices))),
+                    "mutates": sorted(set().union(*(graph.flows[index].mutates for index in indices))),
+                    # Functions do not pickle back from a forked child, and render tokens, statement
+                    # records and plot sessions live in kernel-side stores the child cannot return.
+                    "parent": any(
+                        graph.cell_types[index] == "math"
+                        or graph.flows[index].defines_functions
+                        or "plot" in graph.flows[index].reads
+                        for index in indices
+                    ),
+                }
+            )
+
+    if branches:
+        # Each branch gets the per-cell timeout for every cell it runs.
+        stage_timeout_s = timeout_s * max(len(branch["cells"]) for branch in branches)
+        try:
+            result, runtime_payload = await manager.execute_code(
+                notebook_id, _build_branches_code(branches, _math_time_budget_s(stage_timeout_s)), stage_timeout_s
+            )
+        except Exception as exc:
+            recovered_runtime, recovery_error = None, ""
+            if _is_execution_timeout(exc):
+                recovered_runtime, recovery_error = await _recover_from_timeout(notebook_id, runtime)
+            for cell_id in fingerprints:
+                responses[cell_id] = _execution_error_response(
+                    notebook_id,
+                    cell_id,
+                    graph.cell_types[graph.index(cell_id)],
+                    exc,
+                    runtime,
+                    recovered_runtime,
+                    recovery_error,
+                )
+        else:
+            stage_payload = result["mimeData"].get(BRANCHES_MIME)
+            cell_results = stage_payload.get("cells") if isinstance(stage_payload, dict) else None
+            by_id = {
+                str(item.get("cellId")): item
+                for item in (cell_results if isinstance(cell_results, list) else [])
+                if isinstance(item, dict)
+            }
+            for cell_id, fingerprint in fingerprints.items():
+                cell_type = graph.cell_types[graph.index(cell_id)]
+                cell_result = by_id.get(cell_id)
+                if cell_result is None:
+                    cell_result = {
+                        "status": "error",
+                        "stdout": "",
+                        "stderr": result.get("stderr") or "",
+                        "mimeData": {},
+                        "errorName": result.get("errorName") or "BranchExecutionError",
+                        "errorValue": result.get("errorValue") or "The branch did not report this cell.",
+                    }
+                cell_result = {
+                    **cell_result,
+                    "stdout": _truncate_text(str(cell_result.get("stdout") or "")),
+                    "mimeData": _truncate_mime_value(cell_result.get("mimeData") or {}),
+                }
+                tracker.record_run(graph, cell_id, fingerprint, _execution_ok(cell_type, cell_result))
+                responses[cell_id] = _execution_response(
+                    notebook_id, cell_id, cell_type, trig_mode, cell_result, runtime, runtime_payload
+                )
+    return [responses[graph.cell_ids[index]] for index in sorted(index for branch in stage for index in branch)]
+
+
+async def execute_notebook_plan_request(payload: dict[str, Any]) -> dict[str, Any]:
+    """Run every cell of a notebook, running independent branches concurrently when enabled.
+
+    Responses come back in notebook order with the same shape as `execute_notebook_request`.
+    """
+    cells = payload.get("cells")
+    if not isinstance(cells, list):
+        raise web.HTTPError(400, reason="cells must be a list")
+    notebook_id = str(payload.get("notebookId") or "notebook").strip() or "notebook"
+    notebook_cells = [cell for cell in cells if isinstance(cell, dict)]
+    if any(len(str(cell.get("source") or "")) > MAX_EXEC_SOURCE_LENGTH for cell in notebook_cells):
+        raise web.HTTPError(400, reason=f"Cell source exceeds the {MAX_EXEC_SOURCE_LENGTH} character limit")
+    trig_mode = "rad" if payload.get("trigMode") == "rad" else "deg"
+    render_mode = "decimal" if payload.get("defaultMathRenderMode") == "decimal" else "exact"
+    timeout_s = _notebook_timeout_s(payload)
+    reuse_ids = {str(cell_id) for cell_id in payload.get("reuseCellIds") or [] if cell_id}
+    # Restricted Code cells are validated one by one in `execute_notebook_request`.
+    max_branches = 0 if _live_code_cells_restricted() else _parallel_branches()
+    graph = NotebookGraph(notebook_cells, trig_mode)
+    stages = plan_stages(graph, max_branches)
+
+    results: list[dict[str, Any]] = []
+    for stage in stages:
+        if len(stage) > 1:
+            try:
+                results.extend(
+                    await _execute_branch_stage(
+                        notebook_id, graph, notebook_cells, stage, reuse_ids, trig_mode, render_mode, timeout_s
+                    )
+                )
+                continue
+            except Exception:
+                _LOGGER.exception("Branch execution failed; running the stage in notebook order.")
+        for index in sorted(index for branch in stage for index in branch):
+            cell_id = graph.cell_ids[index]
+            results.append(
+                await execute_notebook_request(
+                    {**payload, "targetCellId": cell_id, "reuseIfUnchanged": cell_id in reuse_ids}
+                )
+            )
+    return {
+        "notebookId": notebook_id,
+        "results": results,
+        "stages": [[[graph.cell_ids[index] for index in branch] for branch in stage] for stage in stages],
+    }
+
+
+async def execute_math_render_request(payload: dict[str, Any]) -> dict[str, Any]:
+    tokens = payload.get("tokens")
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        raise web.HTTPError(400, reason="tokens must be a list of strings")
+    if len(tokens) > MAX_MATH_RENDER_TOKENS:
+        raise web.HTTPError(400, reason=f"At most {MAX_MATH_RENDER_TOKENS} render tokens per request")
+    notebook_id = str(payload.get("notebookId") or "notebook").strip() or "notebook"
+    render_mode = "decimal" if payload.get("renderMode") == "decimal" else "exact"
+    valid_tokens = list(dict.fromkeys(token for token in tokens if _MATH_RENDER_TOKEN_RE.match(token)))
+    renders: dict[str, Any] = {token: None for token in tokens}
+    response = {"notebookId": notebook_id, "renderMode": render_mode, "renders": renders}
+    if not valid_tokens:
+        return response
+
+    # Tokens only resolve inside the kernel that rendered them, so never start a runtime here.
+    manager = _runtime_manager()
+    try:
+        result: dict[str, Any] | None = None
+        if _kernel_rpc_enabled():
+            with contextlib.suppress(KernelRpcUnavailable):
+                result, _runtime_payload = await manager.call_rpc(
+                    notebook_id,
+                    {"method": "render", "params": {"tokens": valid_tokens, "renderMode": render_mode}},
+                    MATH_RENDER_TIMEOUT_S,
+                )
+        if result is None:
+            result, _runtime_payload = await manager.execute_code(
+                notebook_id,
+                _build_math_render_code(valid_tokens, render_mode),
+                MATH_RENDER_TIMEOUT_S,
+            )
+    except Exception as exc:
+        _LOGGER.debug("Math re-render for %s failed: %s", notebook_id, exc)
+        return response
+    render_payload = result["mimeData"].get("application/vnd.sugarpy.math-render+json")
+    if isinstance(render_payload, dict) and isinstance(render_payload.get("renders"), dict):
+        for token in valid_tokens:
+            rendered = render_payload["renders"].get(token)
+            renders[token] = rendered if isinstance(rendered, dict) else None
+    return response
+
+
+def _finite_number(value: Any, name: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise web.HTTPError(400, reason=f"{name} must be a finite number")
+    return float(value)
+
+
+async def execute_plot_resample_request(payload: dict[str, Any]) -> dict[str, Any]:
+    token = payload.get("token")
+    if not isinstance(token, str) or not _MATH_RENDER_TOKEN_RE.match(token):
+        raise web.HTTPError(400, reason="token must be a plot session token")
+    xmin = _finite_number(payload.get("xmin"), "xmin")
+    xmax = _finite_number(payload.get("xmax"), "xmax")
+    if xmin >= xmax:
+        raise web.HTTPError(400, reason="xmin must be less than xmax")
+    width_px = payload.get("widthPx")
+    if isinstance(width_px, bool) or not isinstance(width_px, int) or not 1 <= width_px <= MAX_PLOT_RESAMPLE_WIDTH_PX:
+        raise web.HTTPError(400, reason=f"widthPx must be an integer from 1 to {MAX_PLOT_RESAMPLE_WIDTH_PX}")
+    notebook_id = str(payload.get("notebookId") or "notebook").strip() or "notebook"
+    response: dict[str, Any] = {"notebookId": notebook_id, "token": token, "traces": None}
+
+    # Plot sessions only live in the kernel that drew the plot, so never start a runtime here.
+    manager = _runtime_manager()
+    try:
+        result: dict[str, Any] | None = None
+        if _kernel_rpc_enabled():
+            with contextlib.suppress(KernelRpcUnavailable):
+                result, _runtime_payload = await manager.call_rpc(
+                    notebook_id,
+                    {"method": "plot", "params": {"token": token, "xmin": xmin, "xmax": xmax, "widthPx": width_px}},
+                    PLOT_RESAMPLE_TIMEOUT_S,
+                )
+        if result is None:
+            result, _runtime_payload = await manager.execute_code(
+                notebook_id,
+                _build_plot_resample_code(token, xmin, xmax, width_px),
+                PLOT_RESAMPLE_TIMEOUT_S,
+            )
+    except Exception as exc:
+        _LOGGER.debug("Plot re-sample for %s failed: %s", notebook_id, exc)
+        return response
+    resample_payload = result["mimeData"].get("application/vnd.sugarpy.plot-resample+json")
+    if isinstance(resample_payload, dict) and isinstance(resample_payload.get("resample"), dict):
+        traces = resample_payload["resample"].get("traces")
+        response["traces"] = traces if isinstance(traces, list) else None
+    return response
+
+
+def math_parse_request(payload: dict[str, Any]) -> dict[str, Any]:
+    # Parsing is pure, so lint runs in the server process and never touches a runtime.
+    sources = payload.get("sources")
+    if not isinstance(sources, list) or not all(isinstance(source, str) for source in sources):
+        raise web.HTTPError(400, reason="sources must be a list of strings")
+    if len(sources) > MAX_MATH_PARSE_SOURCES:
+        raise web.HTTPError(400, reason=f"At most {MAX_MATH_PARSE_SOURCES} sources per request")
+    if any(len(source) > MAX_EXEC_SOURCE_LENGTH for source in sources):
+        raise web.HTTPError(400, reason=f"Cell source exceeds the {MAX_EXEC_SOURCE_LENGTH} character limit")
+    return {"results": [lint_math_source(source) for source in sources]}
+
+
 def _parse_math_validation(stdout: str) -> dict[str, Any] | None:
     lines = [line.strip() for line in stdout.splitlines() if line.strip()]
     for line in reversed(lines):
@@ -1106,16 +1637,19 @@ class RuntimeStatusHandler(SugarPyAPIHandler):
 
 class RuntimeInterruptHandler(SugarPyAPIHandler):
     async def post(self, notebook_id: str) -> None:
+        _reset_dataflow_tracker(notebook_id)
         self.finish(await _runtime_manager().interrupt_runtime(notebook_id))
 
 
 class RuntimeRestartHandler(SugarPyAPIHandler):
     async def post(self, notebook_id: str) -> None:
+        _reset_dataflow_tracker(notebook_id)
         self.finish(await _runtime_manager().restart_runtime(notebook_id))
 
 
 class RuntimeDeleteHandler(SugarPyAPIHandler):
     async def post(self, notebook_id: str) -> None:
+        _reset_dataflow_tracker(notebook_id)
         self.finish(await _runtime_manager().delete_runtime(notebook_id))
 
 
@@ -1143,6 +1677,38 @@ class ExecuteHandler(SugarPyAPIHandler):
         self.finish(await execute_notebook_request(payload))
 
 
+class ExecuteAllHandler(SugarPyAPIHandler):
+    async def post(self) -> None:
+        payload = self.get_json_body() or {}
+        if not isinstance(payload, dict):
+            raise web.HTTPError(400, reason="JSON body must be an object")
+        self.finish(await execute_notebook_plan_request(payload))
+
+
+class MathRenderHandler(SugarPyAPIHandler):
+    async def post(self) -> None:
+        payload = self.get_json_body() or {}
+        if not isinstance(payload, dict):
+            raise web.HTTPError(400, reason="JSON body must be an object")
+        self.finish(await execute_math_render_request(payload))
+
+
+class PlotResampleHandler(SugarPyAPIHandler):
+    async def post(self) -> None:
+        payload = self.get_json_body() or {}
+        if not isinstance(payload, dict):
+            raise web.HTTPError(400, reason="JSON body must be an object")
+        self.finish(await execute_plot_resample_request(payload))
+
+
+class MathParseHandler(SugarPyAPIHandler):
+    async def post(self) -> None:
+        payload = self.get_json_body() or {}
+        if not isinstance(payload, dict):
+            raise web.HTTPError(400, reason="JSON body must be an object")
+        self.finish(math_parse_request(payload))
+
+
 class SandboxHandler(SugarPyAPIHandler):
     async def post(self) -> None:
         payload = self.get_json_body() or {}
@@ -1277,6 +1843,10 @@ def _load_jupyter_server_extension(server_app: Any) -> None:
         (r"/sugarpy/api/runtime/(.+)/delete", RuntimeDeleteHandler),
         (r"/sugarpy/api/runtime/(.+)", RuntimeStatusHandler),
         (r"/sugarpy/api/execute", ExecuteHandler),
+        (r"/sugarpy/api/execute-all", ExecuteAllHandler),
+        (r"/sugarpy/api/math/render", MathRenderHandler),
+        (r"/sugarpy/api/math/parse", MathParseHandler),
+        (r"/sugarpy/api/plot/resample", PlotResampleHandler),
         (r"/sugarpy/api/sandbox", SandboxHandler),
         (r"/sugarpy/api/traces", TraceHandler),
         (r"/sugarpy/api/assistant/config", AssistantConfigHandler),
@@ -1295,6 +1865,10 @@ def _load_jupyter_server_extension(server_app: Any) -> None:
     _RUNTIME_CLEANUP_CALLBACK = PeriodicCallback(_schedule_runtime_cleanup, _runtime_cleanup_interval_ms())
     _RUNTIME_CLEANUP_CALLBACK.start()
     _schedule_runtime_cleanup()
+    pool = _cell_pool()
+    if pool is not None:
+        # Warm the workers now so the first Stoichiometry or Regression cell does not wait for them.
+        pool.start()
 
 
 load_jupyter_server_extension = _load_jupyter_server_extension
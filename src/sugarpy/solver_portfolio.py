@@ -0,0 +1,191 @@
+"""Opt-in solver portfolio for the Math-cell `solve` helper.
+
+`sp.solve` can grind for seconds on inputs that `solveset`, `nonlinsolve` or a
+numeric root finder answer almost instantly. In portfolio mode the candidate
+strategies run in forked worker processes. The first exact answer wins and the
+other workers are killed. A numeric answer is only used once the exact
+strategies have had `NUMERIC_GRACE_S` seconds (or have all failed), and the
+caller labels it as numeric.
+
+Only inputs whose answers have the same shape across strategies are raced:
+one equation in one symbol (a list of values) or a nonlinear system in a tuple
+of symbols (a list of tuples). Everything else goes to `sp.solve` directly.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Any, Callable, Sequence
+
+import sympy as sp
+
+SOLVER_MODES = ("sequential", "portfolio")
+NUMERIC_GRACE_S = 2.0
+_POLL_INTERVAL_S = 0.05
+_solver_mode = os.environ.get("SUGARPY_MATH_SOLVER", "sequential").strip() or "sequential"
+
+
+@dataclass(frozen=True)
+class Strategy:
+    name: str
+    exact: bool
+    run: Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class PortfolioResult:
+    value: Any
+    strategy: str
+    exact: bool
+
+
+def get_solver_mode() -> str:
+    return _solver_mode
+
+
+def set_solver_mode(name: str) -> str:
+    """Select `sequential` or `portfolio` solving and return the previous mode."""
+    global _solver_mode
+    if name not in SOLVER_MODES:
+        raise ValueError(f"Unknown Math solver mode: {name!r}")
+    previous = _solver_mode
+    _solver_mode = name
+    return previous
+
+
+def portfolio_available() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _finite_values(solutions: Any) -> list[Any]:
+    if not isinstance(solutions, sp.FiniteSet):
+        raise ValueError("no finite solution set")
+    values = list(solutions)
+    if any(isinstance(item, sp.Set) or (isinstance(item, sp.Tuple) and item.has(sp.Set)) for item in values):
+        raise ValueError("no finite solution set")
+    return values
+
+
+def _is_linear(equations: Sequence[Any], symbols: Sequence[Any]) -> bool:
+    try:
+        return all(sp.Poly(equation, *symbols).total_degree() <= 1 for equation in equations)
+    except sp.PolynomialError:
+        return False
+
+
+def build_strategies(
+    equations: Any,
+    symbols: Any,
+    solve: Callable[[], Any],
+) -> list[Strategy] | None:
+    """Candidate strategies for `solve(equations, symbols)`, or None when the input is not raced."""
+    if isinstance(symbols, sp.Symbol) and isinstance(equations, sp.Expr):
+        symbol = symbols
+        equation = equations
+        if equation.free_symbols and symbol not in equation.free_symbols:
+            return None
+        domain = sp.S.Reals if symbol.is_real else sp.S.Complexes
+
+        def _solveset() -> list[Any]:
+            return _finite_values(sp.solveset(equation, symbol, domain=domain))
+
+        def _numeric() -> list[Any]:
+            if equation.is_polynomial(symbol) and equation.free_symbols == {symbol}:
+                return sp.Poly(equation, symbol).nroots()
+            return [sp.nsolve(equation, symbol, 1)]
+
+        return [
+            Strategy("solve", True, solve),
+            Strategy("solveset", True, _solveset),
+            Strategy("numeric", False, _numeric),
+        ]
+
+    if (
+        isinstance(equations, (list, tuple))
+        and isinstance(symbols, (list, tuple))
+        and len(equations) > 1
+        and all(isinstance(item, sp.Expr) for item in equations)
+        and symbols
+        and all(isinstance(item, sp.Symbol) for item in symbols)
+    ):
+        system = list(equations)
+        unknowns = tuple(symbols)
+        if _is_linear(system, unknowns):
+            # `solve` returns a dict for linear systems and is fast there anyway.
+            return None
+
+        def _nonlinsolve() -> list[tuple[Any, ...]]:
+            return [tuple(item) for item in _finite_values(sp.nonlinsolve(system, unknowns))]
+
+        strategies = [
+            Strategy("solve", True, solve),
+            Strategy("nonlinsolve", True, _nonlinsolve),
+        ]
+        if len(system) == len(unknowns) and not set().union(*(eq.free_symbols for eq in system)) - set(unknowns):
+
+            def _numeric() -> list[tuple[Any, ...]]:
+                root = sp.nsolve(system, unknowns, [1] * len(unknowns))
+                return [tuple(root)]
+
+            strategies.append(Strategy("numeric", False, _numeric))
+        return strategies
+    return None
+
+
+def _worker(conn: Any, strategy: Strategy) -> None:
+    try:
+        payload = ("ok", strategy.run())
+    except BaseException as exc:  # noqa: BLE001 - reported back to the parent
+        payload = ("error", exc)
+    try:
+        conn.send(payload)
+    except Exception:
+        conn.send(("error", RuntimeError(f"{type(payload[1]).__name__}: {payload[1]}")))
+    finally:
+        conn.close()
+
+
+def run_portfolio(strategies: Sequence[Strategy]) -> PortfolioResult:
+    """Race `strategies` in forked processes; re-raise the first strategy's error if none succeeds."""
+    context = multiprocessing.get_context("fork")
+    pending: dict[Any, tuple[Strategy, Any]] = {}
+    try:
+        for strategy in strategies:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_worker, args=(sender, strategy), daemon=True)
+            process.start()
+            sender.close()
+            pending[receiver] = (strategy, process)
+
+        numeric: PortfolioResult | None = None
+        errors: dict[str, BaseException] = {}
+        grace_deadline = time.monotonic() + NUMERIC_GRACE_S
+        while pending:
+            # Short waits keep the parent responsive to the Math statement time budget.
+            for receiver in wait(list(pending), timeout=_POLL_INTERVAL_S):
+                strategy, _process = pending.pop(receiver)
+                try:
+                    status, payload = receiver.recv()
+                except EOFError:
+                    status, payload = "error", RuntimeError(f"{strategy.name} worker exited without a result")
+                receiver.close()
+                if status != "ok":
+                    errors[strategy.name] = payload
+                elif strategy.exact:
+                    return PortfolioResult(payload, strategy.name, True)
+                elif numeric is None:
+                    numeric = PortfolioResult(payload, strategy.name, False)
+            exact_pending = any(strategy.exact for strategy, _process in pending.values())
+            if numeric is not None and (not exact_pending or time.monotonic() >= grace_deadline):
+                return numeric
+        first = strategies[0].name
+        raise errors.get(first) or next(iter(errors.values()))
+    finally:
+        for receiver, (_strategy, process) in pending.items():
+            process.kill()
+            process.join(timeout=1.0)
+            receiver.close()
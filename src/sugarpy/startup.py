@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import math
+import secrets
+
 import numpy as np
 from IPython.display import display
 import sympy as sp
@@ -9,8 +12,11 @@ from contourpy import contour_generator
 from sympy import *  # noqa: F401,F403
 from sympy import Symbol, init_printing, lambdify, symbols
 
+from sugarpy.cache import LRUCache
+from sugarpy.lambdify_cache import cached_lambdify, clear_lambdify_cache, lambdify_cache_info  # noqa: F401
 from sugarpy.math_parser import canonicalize_equation
 from sugarpy.user_library import load_user_functions
+from sugarpy.utils import display_sugarpy
 
 x, y, z, t = symbols("x y z t")
 init_printing()
@@ -77,6 +83,120 @@ def _normalize_curve(values: object, x_values: np.ndarray) -> np.ndarray:
     return np.where(np.isfinite(arr), arr, np.nan)
 
 
+# Explicit curves start from this many points per visible width and are refined where needed.
+ADAPTIVE_COARSE_DIVISOR = 8
+ADAPTIVE_MAX_ROUNDS = 12
+# Midpoint deviation from the chord, as a fraction of the curve's vertical scale, that triggers a split.
+_ADAPTIVE_TOLERANCE = 1e-3
+# A sign change larger than this fraction of the vertical scale is split even when the midpoint is on the chord.
+_ADAPTIVE_JUMP = 0.05
+# Fraction of the visible width computed on each side, so a short pan has data before the re-sample arrives.
+DEFAULT_OVERSCAN = 0.25
+PLOT_RESAMPLE_MIME_TYPE = "application/vnd.sugarpy.plot-resample+json"
+MAX_RESAMPLE_WIDTH_PX = 4096
+# Points per pixel of plot width in a re-sampled viewport.
+_RESAMPLE_DENSITY = 2
+# Explicit curves of recent plots, by session token, so that pan and zoom can re-sample them.
+_PLOT_SESSIONS = LRUCache(maxsize=64)
+
+
+def _sample_curve(fn: object, x_values: np.ndarray) -> np.ndarray:
+    with np.errstate(all="ignore"):
+        return _normalize_curve(fn(x_values), x_values)
+
+
+def _vertical_scale(values: np.ndarray) -> float:
+    finite = _finite_values(values)
+    if not finite.size:
+        return 1.0
+    # Percentiles keep poles from flattening the rest of the curve.
+    low, high = np.percentile(finite, [5, 95])
+    return float(high - low) or max(float(np.max(np.abs(finite))), 1.0)
+
+
+def _pole_intervals(fn: object, x_values: np.ndarray, y_values: np.ndarray, scale: float, rounds: int) -> np.ndarray:
+    """Indices of intervals whose sign change is still larger than `scale` after bisecting it `rounds` times."""
+    with np.errstate(all="ignore"):
+        candidates = np.flatnonzero(
+            (y_values[:-1] * y_values[1:] < 0) & (np.abs(np.diff(y_values)) > scale)
+        )
+    if not candidates.size:
+        return candidates
+    lower = x_values[candidates].copy()
+    upper = x_values[candidates + 1].copy()
+    y_lower = y_values[candidates].copy()
+    y_upper = y_values[candidates + 1].copy()
+    undefined = np.zeros(candidates.size, dtype=bool)
+    for _ in range(rounds):
+        middle = (lower + upper) / 2
+        y_middle = _sample_curve(fn, middle)
+        undefined |= ~np.isfinite(y_middle)
+        left = y_lower * y_middle < 0
+        upper = np.where(left, middle, upper)
+        y_upper = np.where(left, y_middle, y_upper)
+        lower = np.where(left, lower, middle)
+        y_lower = np.where(left, y_lower, y_middle)
+    with np.errstate(all="ignore"):
+        return candidates[undefined | (np.abs(y_upper - y_lower) > scale)]
+
+
+def _adaptive_curve(fn: object, lower: float, upper: float, initial: int, budget: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sample `fn` on `[lower, upper]`: a coarse grid, then midpoints where the curve bends, jumps or ends.
+
+    Each round evaluates the midpoints of the intervals split in the previous round and keeps those that
+    deviate from the chord, change finiteness, or sit in a large sign change. At most `budget` points are
+    returned. Large sign changes that survive bisection are poles and get a NaN point, so the line
+    is broken there instead of drawn across.
+    """
+    x_values = np.linspace(lower, upper, max(initial, 2))
+    y_values = _sample_curve(fn, x_values)
+    scale = _vertical_scale(y_values)
+    tolerance = _ADAPTIVE_TOLERANCE * scale
+    jump = _ADAPTIVE_JUMP * scale
+    active = np.ones(x_values.size - 1, dtype=bool)
+    for _ in range(ADAPTIVE_MAX_ROUNDS):
+        room = budget - x_values.size
+        candidates = np.flatnonzero(active)
+        if room <= 0 or not candidates.size:
+            break
+        y_left = y_values[candidates]
+        y_right = y_values[candidates + 1]
+        mid_x = (x_values[candidates] + x_values[candidates + 1]) / 2
+        mid_y = _sample_curve(fn, mid_x)
+        finite_left = np.isfinite(y_left)
+        finite_right = np.isfinite(y_right)
+        finite_mid = np.isfinite(mid_y)
+        with np.errstate(all="ignore"):
+            error = np.abs(mid_y - (y_left + y_right) / 2)
+            crossing = (y_left * y_right < 0) & (np.abs(y_right - y_left) > jump)
+        finite_all = finite_left & finite_right & finite_mid
+        boundary = (finite_left != finite_right) | (finite_mid != finite_left)
+        refine = boundary | (finite_all & ((error > tolerance) | crossing))
+        if not refine.any():
+            break
+        priority = np.where(boundary | crossing, np.inf, np.nan_to_num(error, nan=np.inf))
+        if int(refine.sum()) > room:
+            ranked = np.argsort(-np.where(refine, priority, -1.0), kind="stable")[:room]
+            refine = np.zeros_like(refine)
+            refine[ranked] = True
+        chosen = candidates[refine]
+        x_values = np.insert(x_values, chosen + 1, mid_x[refine])
+        y_values = np.insert(y_values, chosen + 1, mid_y[refine])
+        inserted = chosen + 1 + np.arange(chosen.size)
+        active = np.zeros(x_values.size - 1, dtype=bool)
+        active[inserted - 1] = True
+        active[inserted] = True
+
+    poles = _pole_intervals(fn, x_values, y_values, scale, ADAPTIVE_MAX_ROUNDS + 8)
+    if poles.size:
+        x_values = np.insert(x_values, poles + 1, (x_values[poles] + x_values[poles + 1]) / 2)
+        y_values = np.insert(y_values, poles + 1, np.nan)
+    # One NaN is enough to break the line; runs of them only grow the payload.
+    undefined = np.isnan(y_values)
+    keep = ~(undefined & np.concatenate(([False], undefined[:-1])))
+    return x_values[keep], y_values[keep]
+
+
 def _finite_values(values: np.ndarray) -> np.ndarray:
     arr = np.asarray(values, dtype=float)
     return arr[np.isfinite(arr)]
@@ -162,7 +282,7 @@ def _make_implicit_traces(
     x_values = np.linspace(x_range[0], x_range[1], samples)
     y_values = np.linspace(y_range[0], y_range[1], samples)
     xx, yy = np.meshgrid(x_values, y_values)
-    fn = lambdify((x_symbol, y_symbol), expr, "numpy")
+    fn = cached_lambdify((x_symbol, y_symbol), expr, "numpy")
     z_values = np.asarray(fn(xx, yy), dtype=float)
     z_values = np.where(np.isfinite(z_values), z_values, np.nan)
     contour_lines = contour_generator(x=x_values, y=y_values, z=z_values).lines(0.0)
@@ -217,7 +337,7 @@ def plot(*args, **kwargs):
     ymax = kwargs.pop("ymax", None)
     samples = int(kwargs.pop("samples", kwargs.pop("num", 500)))
     title = str(kwargs.pop("title", "")).strip()
-    overscan = float(kwargs.pop("overscan", 1.0))
+    overscan = float(kwargs.pop("overscan", DEFAULT_OVERSCAN))
     has_explicit_equal_axes = "equal_axes" in kwargs
     equal_axes = bool(kwargs.pop("equal_axes", False))
     show_legend = kwargs.pop("showlegend", None)
@@ -243,14 +363,18 @@ def plot(*args, **kwargs):
         else:
             explicit_items.append(expr)
 
-    x_values = np.linspace(render_start, render_end, render_samples)
+    coarse_samples = max(samples // ADAPTIVE_COARSE_DIVISOR, 16)
+    initial_samples = min(render_samples, int(coarse_samples * render_span / span) + 1)
+    visible_x_values = np.linspace(start, end, samples)
     visible_y_min: float | None = None
     visible_y_max: float | None = None
-    visible_mask = (x_values >= start) & (x_values <= end)
+    session_curves: list[tuple[int, object]] = []
     for expr in explicit_items:
-        fn = lambdify(variable, expr, "numpy")
-        y_values = _normalize_curve(fn(x_values), x_values)
-        visible_values = _finite_values(y_values[visible_mask])
+        fn = cached_lambdify(variable, expr, "numpy")
+        session_curves.append((len(traces), fn))
+        x_values, y_values = _adaptive_curve(fn, render_start, render_end, initial_samples, render_samples)
+        # The y range follows an even grid over the visible width, so refinement near poles does not stretch it.
+        visible_values = _finite_values(_sample_curve(fn, visible_x_values))
         if visible_values.size:
             current_min = float(np.min(visible_values))
             current_max = float(np.max(visible_values))
@@ -312,6 +436,7 @@ def plot(*args, **kwargs):
     if show_legend is None:
         show_legend = len(traces) <= 2
 
+    session = _register_plot_session(session_curves) if session_curves else None
     figure = {
         "data": traces,
         "layout": {
@@ -365,12 +490,50 @@ def plot(*args, **kwargs):
                 "borderwidth": 1,
             },
             "margin": {"l": 56, "r": 24, "t": 56, "b": 48},
+            # Keeps the user's pan and zoom when re-sampled traces replace the data.
+            **({"uirevision": session} if session else {}),
         },
+        **({"plot_session": session} if session else {}),
     }
     display({"application/vnd.plotly.v1+json": figure}, raw=True)
     return figure
 
 
+def _register_plot_session(curves: list[tuple[int, object]]) -> str:
+    token = secrets.token_hex(8)
+    _PLOT_SESSIONS.put(token, tuple(curves))
+    return token
+
+
+def resample_plot(token: str, xmin: float, xmax: float, width_px: int) -> dict[str, object] | None:
+    """Re-sample the explicit curves of a plot session over `[xmin, xmax]` at screen resolution.
+
+    Returns `{"traces": [{"index", "x", "y"}]}` with `index` the trace's position in the figure data,
+    or None when the session is unknown or has been evicted.
+    """
+    curves = _PLOT_SESSIONS.get(token)
+    if curves is None:
+        return None
+    lower, upper = float(xmin), float(xmax)
+    if not (math.isfinite(lower) and math.isfinite(upper)) or lower >= upper:
+        raise ValueError("resample_plot() needs a finite range with xmin < xmax.")
+    width = max(16, min(int(width_px), MAX_RESAMPLE_WIDTH_PX))
+    budget = width * _RESAMPLE_DENSITY
+    initial = max(budget // ADAPTIVE_COARSE_DIVISOR, 16)
+    traces = []
+    for index, fn in curves:
+        x_values, y_values = _adaptive_curve(fn, lower, upper, initial, budget)
+        traces.append({"index": index, "x": x_values.tolist(), "y": y_values.tolist()})
+    return {"traces": traces}
+
+
+def display_plot_resample(token: str, xmin: float, xmax: float, width_px: int) -> dict[str, object]:
+    """Re-sample a plot session and send the traces via Jupyter MIME output."""
+    payload = {"token": token, "resample": resample_plot(token, xmin, xmax, width_px)}
+    display_sugarpy({**payload, "schema_version": 1}, PLOT_RESAMPLE_MIME_TYPE)
+    return payload
+
+
 try:
     import math  # noqa: F401
 
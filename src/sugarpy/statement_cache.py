@@ -0,0 +1,163 @@
+"""Statement-level reuse for multi-line Math cells.
+
+For each Math cell (keyed by its notebook cell id) the kernel keeps one
+record per statement from the last run. A record holds the statement source,
+the settings it ran under (angle and render mode, solver mode, canonicalize
+policy), a snapshot of every namespace name the statement read, the namespace
+entries it assigned, and its rendered result. On the next run the
+longest unchanged prefix is replayed from the records: writes are restored
+into the namespace and the results are reused. From the first statement that
+changed, or whose inputs changed, everything is evaluated again.
+
+Snapshots compare by identity. Containers are compared element-wise, so an
+in-place edit from a Code cell is noticed. Values that can change invisibly
+(NumPy arrays, mutable matrices, Python callables) make a statement
+non-reusable, and so does `plot`, which emits its own output.
+"""
+
+from __future__ import annotations
+
+import numbers
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import sympy as sp
+
+from .cache import LRUCache
+from .math_parser import statement_dataflow, statement_user_names
+
+_MISSING = object()
+_UNSUPPORTED = object()
+_CELL_RECORDS = LRUCache(maxsize=128)
+# Read by every statement that renders decimals; written by `set_decimal_places`.
+_IMPLICIT_READS = frozenset({"__sugarpy_decimal_places"})
+# Angle mode, render mode, solver mode and canonicalize policy.
+Context = tuple[str, str | None, str, str]
+
+
+def _is_math_function(value: Any) -> bool:
+    return callable(value) and hasattr(value, "_sugarpy_math_function")
+
+
+def _snapshot(value: Any) -> Any:
+    if value is _MISSING or value is None or isinstance(value, (sp.Basic, numbers.Number, str)):
+        return ("is", value)
+    if _is_math_function(value):
+        return ("is", value)
+    if isinstance(value, (list, tuple)):
+        items = tuple(_snapshot(item) for item in value)
+        if any(item is _UNSUPPORTED for item in items):
+            return _UNSUPPORTED
+        return (type(value), items)
+    if isinstance(value, dict):
+        entries = tuple((key, _snapshot(item)) for key, item in value.items())
+        if any(item is _UNSUPPORTED for _key, item in entries):
+            return _UNSUPPORTED
+        return (dict, entries)
+    return _UNSUPPORTED
+
+
+def _matches(value: Any, snapshot: Any) -> bool:
+    kind, payload = snapshot
+    if kind == "is":
+        return value is payload
+    if type(value) is not kind or len(value) != len(payload):
+        return False
+    if kind is dict:
+        return list(value) == [key for key, _item in payload] and all(
+            _matches(value[key], item) for key, item in payload
+        )
+    return all(_matches(item, item_snapshot) for item, item_snapshot in zip(value, payload))
+
+
+def _read_names(statement: str, mode: str, user_ns: Dict[str, Any]) -> set[str] | None:
+    """Names the statement reads, including the free names of any Math functions it calls."""
+    names = statement_user_names(statement, mode)
+    if names is None:
+        return None
+    reads = set(_IMPLICIT_READS)
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in reads:
+            continue
+        reads.add(name)
+        value = user_ns.get(name, _MISSING)
+        if _is_math_function(value):
+            spec = value._sugarpy_math_function
+            body_names = statement_user_names(spec["body_source"], spec["mode"])
+            if body_names is None:
+                return None
+            pending.extend(body_names - set(spec["args"]))
+    return reads
+
+
+@dataclass(frozen=True, slots=True)
+class StatementRecord:
+    source: str
+    context: Context
+    reads: Dict[str, Any]
+    writes: Dict[str, tuple[Any, Any]]
+    result: Dict[str, Any]
+
+    def reusable(self, source: str, context: Context, user_ns: Dict[str, Any]) -> bool:
+        if source != self.source or context != self.context:
+            return False
+        if not all(_matches(user_ns.get(name, _MISSING), snapshot) for name, snapshot in self.reads.items()):
+            return False
+        # A Code cell may have mutated what this statement assigned.
+        return all(_matches(value, snapshot) for value, snapshot in self.writes.values())
+
+    def restore(self, user_ns: Dict[str, Any]) -> None:
+        for name, (value, _snapshot_value) in self.writes.items():
+            if value is _MISSING:
+                user_ns.pop(name, None)
+            else:
+                user_ns[name] = value
+
+
+class StatementCapture:
+    """Snapshot taken before a statement runs; `finish` turns it into a record once it succeeded."""
+
+    __slots__ = ("source", "context", "reads", "before")
+
+    def __init__(self, source: str, context: Context, user_ns: Dict[str, Any]) -> None:
+        self.source = source
+        self.context = context
+        names = _read_names(source, context[0], user_ns)
+        reads = None
+        if names is not None:
+            reads = {name: _snapshot(user_ns.get(name, _MISSING)) for name in names}
+            if any(snapshot is _UNSUPPORTED for snapshot in reads.values()):
+                reads = None
+        self.reads = reads
+        # Only the names the statement assigns (`a, b := ...`, `f(x) := ...`, `set_decimal_places`)
+        # can change, so only those are remembered, not the whole namespace.
+        flow = statement_dataflow(source, context[0]) if reads is not None else None
+        self.before = {name: user_ns.get(name, _MISSING) for name in flow[1]} if flow is not None else None
+
+    def finish(self, user_ns: Dict[str, Any], result: Dict[str, Any]) -> StatementRecord | None:
+        if self.reads is None or self.before is None:
+            return None
+        writes: Dict[str, tuple[Any, Any]] = {}
+        for name, previous in self.before.items():
+            value = user_ns.get(name, _MISSING)
+            if value is previous:
+                continue
+            snapshot = _snapshot(value)
+            if snapshot is _UNSUPPORTED:
+                return None
+            writes[name] = (value, snapshot)
+        return StatementRecord(self.source, self.context, self.reads, writes, result)
+
+
+def cell_records(cell_id: str) -> list[StatementRecord | None]:
+    return _CELL_RECORDS.get(cell_id) or []
+
+
+def store_cell_records(cell_id: str, records: list[StatementRecord | None]) -> None:
+    _CELL_RECORDS.put(cell_id, records)
+
+
+def clear_cell_records() -> None:
+    _CELL_RECORDS.clear()
@@ -0,0 +1,76 @@
+"""Per-statement time budget for Math cells.
+
+A watchdog timer raises `MathStatementTimeout` asynchronously in the thread
+that runs the statement, so a runaway `simplify`/`solve` stops without the
+kernel being restarted. The exception is delivered between Python bytecodes:
+pure-Python SymPy code stops promptly, while a single long C call (a huge
+integer factorization, for example) finishes before the statement stops.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import ctypes
+import os
+import threading
+from typing import Iterator
+
+STATEMENT_TIMEOUT_ENV = "SUGARPY_MATH_STATEMENT_TIMEOUT_S"
+# Just below the 20 s notebook execution timeout, which restarts the whole runtime.
+DEFAULT_STATEMENT_TIMEOUT_S = 18.0
+
+
+class MathStatementTimeout(BaseException):
+    """Raised inside a Math statement that ran past its time budget.
+
+    Derives from `BaseException` so that `except Exception` blocks inside SymPy
+    cannot swallow it.
+    """
+
+
+def statement_timeout_s() -> float | None:
+    """Configured per-statement budget in seconds, or None when disabled (`0`)."""
+    raw = os.environ.get(STATEMENT_TIMEOUT_ENV, "").strip()
+    try:
+        value = float(raw) if raw else DEFAULT_STATEMENT_TIMEOUT_S
+    except ValueError:
+        value = DEFAULT_STATEMENT_TIMEOUT_S
+    return value if value > 0 else None
+
+
+def _set_async_exc(thread_id: int, exc_type: type[BaseException] | None) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id),
+        ctypes.py_object(exc_type) if exc_type is not None else ctypes.c_void_p(0),
+    )
+
+
+@contextlib.contextmanager
+def statement_budget(timeout_s: float | None) -> Iterator[None]:
+    """Raise `MathStatementTimeout` in the current thread if the block runs longer than `timeout_s`."""
+    if timeout_s is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    lock = threading.Lock()
+    state = {"done": False, "fired": False}
+
+    def _expire() -> None:
+        with lock:
+            if not state["done"]:
+                state["fired"] = True
+                _set_async_exc(thread_id, MathStatementTimeout)
+
+    timer = threading.Timer(timeout_s, _expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        with lock:
+            state["done"] = True
+            if state["fired"]:
+                # The block may have finished before the pending exception was delivered;
+                # drop it so it cannot surface in unrelated code.
+                _set_async_exc(thread_id, None)
+        timer.cancel()
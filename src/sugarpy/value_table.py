@@ -0,0 +1,142 @@
+"""Value tables for Math cells: `table(f(x), x = 0..10, step=0.5)`.
+
+Each expression is lambdified once (through `sugarpy.lambdify_cache`) and
+evaluated over the whole NumPy grid in a single call, instead of one trip
+through the SymPy pipeline per row. The
+Math parser rewrites the `x = a..b` range into `var`, `start` and `end`
+keywords, like it does for `plot`. Degree-mode trig is already part of the
+expression (`sin(pi*x/180)`), so Math cells label the columns from the source
+as typed. Math-cell functions defined with `:=` can be given as `f(x)` or just
+`f`.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Sequence
+
+import numpy as np
+import sympy as sp
+
+from .lambdify_cache import cached_lambdify
+
+MAX_TABLE_ROWS = 1000
+DEFAULT_STEP = 1
+# Grid values are rounded this far to hide binary noise such as 0.30000000000000004.
+_GRID_DECIMALS = 10
+
+
+@dataclass(frozen=True)
+class ValueTable:
+    variable: sp.Symbol
+    expressions: tuple[sp.Expr, ...]
+    grid: np.ndarray
+    columns: tuple[np.ndarray, ...]
+
+    def payload(self, places: int, labels: Sequence[str] | None = None) -> Dict[str, Any]:
+        """Columnar JSON payload; values are rounded to `places`, non-real or non-finite ones are null.
+
+        `labels` are LaTeX column headings for the expressions, e.g. from the source as typed;
+        without them the evaluated expressions label their columns.
+        """
+        if labels is None or len(labels) != len(self.expressions):
+            labels = [sp.latex(expr) for expr in self.expressions]
+        return {
+            "columns": [
+                {"label": sp.latex(self.variable), "values": _json_values(self.grid, _GRID_DECIMALS)},
+                *(
+                    {"label": label, "values": _json_values(values, places)}
+                    for label, values in zip(labels, self.columns)
+                ),
+            ],
+            "rows": int(self.grid.size),
+        }
+
+
+def _json_values(values: np.ndarray, places: int) -> list[float | None]:
+    rounded = np.round(values, places)
+    return [float(value) if math.isfinite(value) else None for value in rounded.tolist()]
+
+
+def _as_float(value: Any, name: str) -> float:
+    try:
+        result = float(sp.N(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"table() {name} must be a number, got {value}.") from None
+    if not math.isfinite(result):
+        raise ValueError(f"table() {name} must be finite.")
+    return result
+
+
+def _grid(start: float, end: float, step: Any, num: Any) -> np.ndarray:
+    if num is not None:
+        count = int(num)
+        if count < 1:
+            raise ValueError("table() num must be at least 1.")
+        if count > MAX_TABLE_ROWS:
+            raise ValueError(f"table() is limited to {MAX_TABLE_ROWS} rows.")
+        return np.linspace(start, end, count)
+    step_value = _as_float(DEFAULT_STEP if step is None else step, "step")
+    if step_value == 0 or (end - start) * step_value < 0:
+        raise ValueError("table() step must be nonzero and point from start to end.")
+    # The tolerance keeps `end` in the grid when the span is a multiple of the step up to rounding.
+    count = int(math.floor((end - start) / step_value + 1e-9)) + 1
+    if count > MAX_TABLE_ROWS:
+        raise ValueError(f"table() is limited to {MAX_TABLE_ROWS} rows; use a larger step.")
+    return np.round(start + step_value * np.arange(count), _GRID_DECIMALS)
+
+
+def _pick_variable(expressions: list[Any]) -> sp.Symbol:
+    for expr in expressions:
+        free = getattr(expr, "free_symbols", None)
+        if free:
+            return sorted(free, key=lambda item: item.name)[0]
+    return sp.Symbol("x")
+
+
+def _column(fn: Any, grid: np.ndarray) -> np.ndarray:
+    with np.errstate(all="ignore"):
+        values = np.asarray(fn(grid))
+    if values.shape != grid.shape:
+        values = np.broadcast_to(values, grid.shape)
+    if np.iscomplexobj(values):
+        values = np.where(np.abs(values.imag) <= 1e-12, values.real, np.nan)
+    try:
+        return values.astype(float)
+    except (TypeError, ValueError):
+        raise ValueError("table() values must be real numbers.") from None
+
+
+def value_table(
+    *expressions: Any,
+    var: Any = None,
+    start: Any = None,
+    end: Any = None,
+    step: Any = None,
+    num: Any = None,
+) -> ValueTable:
+    """Evaluate `expressions` over `start..end` in `step` increments (or `num` evenly spaced points)."""
+    if not expressions:
+        raise ValueError("table() expects at least one expression.")
+    if start is None or end is None:
+        raise ValueError("table() needs a range such as x = 0..10.")
+    variable = var if isinstance(var, sp.Symbol) else None
+    items = list(expressions)
+    if variable is None:
+        variable = _pick_variable([item for item in items if isinstance(item, sp.Basic)])
+    resolved: list[sp.Expr] = []
+    for item in items:
+        if callable(item) and not isinstance(item, sp.Basic):
+            item = item(variable)
+        expr = sp.sympify(item)
+        if isinstance(expr, sp.Basic) and not isinstance(expr, sp.Expr):
+            raise ValueError(f"table() expects expressions, got {expr}.")
+        extra = sorted(symbol.name for symbol in expr.free_symbols - {variable})
+        if extra:
+            raise ValueError(f"table() expression {expr} depends on {', '.join(extra)} besides {variable}.")
+        resolved.append(expr)
+
+    grid = _grid(_as_float(start, "start"), _as_float(end, "end"), step, num)
+    columns = tuple(_column(cached_lambdify(variable, expr, "numpy"), grid) for expr in resolved)
+    return ValueTable(variable=variable, expressions=tuple(resolved), grid=grid, columns=columns)
@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+
+import pytest
+from IPython.core.interactiveshell import InteractiveShell
+
+from sugarpy import branch_runner, math_cell
+from sugarpy.branch_runner import run_branches
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+
+
+@pytest.fixture
+def user_ns(monkeypatch):
+    # Fork even on a single-core runner.
+    monkeypatch.setattr(branch_runner, "usable_cpus", lambda: 4)
+    namespace = InteractiveShell.instance().user_ns
+    exec("import sympy as sp\nk = 2\ndata = [1]", namespace)
+    yield namespace
+    for name in ("a", "b", "c", "d", "f", "data", "k", "log"):
+        namespace.pop(name, None)
+
+
+def _branch(writes, *cells):
+    return {"cells": [{"cellId": cell_id, "code": code} for cell_id, code in cells], "writes": list(writes)}
+
+
+def test_run_branches_merges_forked_writes_and_outputs(user_ns):
+    results = run_branches(
+        [
+            _branch(["a", "b", "data"], ("a", "a = k + 1\nprint('hi')"), ("b", "data.append(5)\nb = a * 2")),
+            _branch(["c"], ("c", "c = sp.Symbol('q') ** k\nfrom IPython.display import display\ndisplay(c)")),
+        ],
+        user_ns,
+    )
+
+    assert [result["cellId"] for result in results] == ["a", "b", "c"]
+    assert results[0]["stdout"] == "hi\n"
+    assert results[2]["mimeData"]["text/plain"] == "q**2"
+    assert (user_ns["a"], user_ns["b"], user_ns["data"]) == (3, 6, [1, 5])
+    assert str(user_ns["c"]) == "q**2"
+
+
+def test_run_branches_reruns_branches_with_unpicklable_writes_in_the_parent(user_ns):
+    results = run_branches(
+        [
+            _branch(["f", "d"], ("d", "def f(v):\n    return v + k\nd = f(1)")),
+            _branch([], ("e", "1 / 0")),
+        ],
+        user_ns,
+    )
+
+    assert results[0]["status"] == "ok"
+    assert user_ns["f"](2) == 4 and user_ns["d"] == 3
+    assert results[1]["status"] == "error"
+    assert results[1]["errorName"] == "ZeroDivisionError"
+
+
+def test_run_branches_runs_branches_marked_for_the_parent_once(user_ns, tmp_path):
+    user_ns["log"] = str(tmp_path / "runs")
+    branch = _branch(["f"], ("d", "open(log, 'a').write('x')\ndef f(v):\n    return v + k"))
+    branch["parent"] = True
+
+    results = run_branches([branch, _branch(["c"], ("c", "c = k"))], user_ns)
+
+    assert [result["status"] for result in results] == ["ok", "ok"]
+    assert (tmp_path / "runs").read_text() == "x"
+    assert user_ns["f"](1) == 3 and user_ns["c"] == 2
+
+
+def test_run_branches_keeps_aliases_of_objects_changed_in_place(user_ns):
+    exec("a = [1]\nb = a", user_ns)
+    mutating = _branch(["a"], ("x", "a.append(2)"))
+    mutating["mutates"] = ["a"]
+
+    run_branches([mutating, _branch(["c"], ("c", "c = k"))], user_ns)
+
+    assert user_ns["a"] is user_ns["b"]
+    assert user_ns["b"] == [1, 2]
+    assert user_ns["c"] == 2
+
+
+def test_run_branches_reruns_forked_branches_that_fill_kernel_stores(user_ns):
+    store = math_cell._RENDER_STORE
+    try:
+        run_branches(
+            [
+                _branch(["c"], ("c", "from sugarpy import math_cell\nmath_cell._RENDER_STORE.put('branch-token', k)\nc = k")),
+                _branch(["d"], ("d", "d = k")),
+            ],
+            user_ns,
+        )
+
+        assert store.get("branch-token") == 2
+    finally:
+        store.clear()
+
+
+def test_run_branches_kills_forked_branches_past_the_time_budget(user_ns):
+    started = time.monotonic()
+    results = run_branches(
+        [_branch(["c"], ("c", "import time\ntime.sleep(30)\nc = 1")), _branch(["d"], ("d", "d = k"))],
+        user_ns,
+        time_budget_s=0.5,
+    )
+
+    assert time.monotonic() - started < 10
+    assert (results[0]["status"], results[0]["errorName"]) == ("error", "TimeoutError")
+    assert "c" not in user_ns and user_ns["d"] == 2
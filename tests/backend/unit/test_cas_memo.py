@@ -0,0 +1,107 @@
+import pytest
+import sympy as sp
+
+from sugarpy import cas_memo
+from sugarpy.cache import LRUCache
+from sugarpy.cas_memo import cas_memo_info, clear_cas_memo, memo_call
+from sugarpy.math_cell import render_math_cell
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    clear_cas_memo()
+    yield
+    clear_cas_memo()
+
+
+def _counting(fn):
+    calls = []
+
+    def wrapped(*args, **kwargs):
+        calls.append(args)
+        return fn(*args, **kwargs)
+
+    return wrapped, calls
+
+
+@pytest.mark.unit
+def test_repeated_calls_hit_and_results_are_copied():
+    x = sp.Symbol("x")
+    solve, calls = _counting(sp.solve)
+
+    first = memo_call("solve", solve, (x**2 - 4, x), {})
+    first.append("mutated")
+    second = memo_call("solve", solve, (x**2 - 4, x), {})
+
+    assert second == [-2, 2]
+    assert len(calls) == 1
+    assert cas_memo_info()["hits"] == 1
+
+
+@pytest.mark.unit
+def test_assumptions_float_precision_and_context_are_part_of_the_key():
+    x = sp.Symbol("x")
+    positive = sp.Symbol("x", positive=True)
+    solve, calls = _counting(sp.solve)
+
+    assert memo_call("solve", solve, (x**2 - 4, x), {}) == [-2, 2]
+    assert memo_call("solve", solve, (positive**2 - 4, positive), {}) == [2]
+    memo_call("solve", solve, (x - sp.Float("0.1", 15), x), {})
+    memo_call("solve", solve, (x - sp.Float("0.1", 30), x), {})
+    memo_call("solve", solve, (x**2 - 4, x), {}, context=("portfolio",))
+    with sp.assuming(sp.Q.positive(x)):
+        memo_call("solve", solve, (x**2 - 4, x), {})
+
+    assert len(calls) == 6
+
+
+@pytest.mark.unit
+def test_uncacheable_arguments_and_vetoed_results_are_not_stored():
+    x = sp.Symbol("x")
+    simplify, calls = _counting(lambda value: value)
+
+    memo_call("simplify", simplify, (sp.Matrix([x]),), {})
+    memo_call("simplify", simplify, (sp.Matrix([x]),), {})
+    memo_call("simplify", simplify, (x,), {}, keep=lambda: False)
+    memo_call("simplify", simplify, (x,), {})
+
+    assert len(calls) == 4
+    assert cas_memo_info()["bypassed"] == 2
+
+
+@pytest.mark.unit
+def test_weighted_lru_evicts_by_total_weight():
+    cache = LRUCache(maxsize=10, maxweight=5, weigher=len)
+    cache.put("a", "xxx")
+    cache.put("b", "xx")
+    cache.put("c", "xx")
+    cache.put("huge", "xxxxxx")
+
+    assert "a" not in cache and "huge" not in cache
+    assert cache.info()["weight"] == 4
+    assert cache.info()["evictions"] == 1
+
+
+@pytest.mark.unit
+def test_math_cells_reuse_cas_results_and_count_hits(monkeypatch):
+    user_ns = {"integrate": sp.integrate}
+    source = "solve(x^2 - 2 = 0, x)\nintegrate(x sin(x), x)\nfactor(x^4 - 1, memo=False)"
+
+    first = render_math_cell(source, "rad", "exact", user_ns=user_ns)
+    second = render_math_cell(source, "rad", "exact", user_ns=user_ns)
+
+    assert first["ok"] and first["steps"] == second["steps"]
+    assert (cas_memo_info()["misses"], cas_memo_info()["hits"], cas_memo_info()["size"]) == (2, 2, 2)
+
+    monkeypatch.setattr(cas_memo, "_enabled", False)
+    render_math_cell(source, "rad", "exact", user_ns=user_ns)
+    assert cas_memo_info()["hits"] == 2
+
+
+@pytest.mark.unit
+def test_math_cells_keep_user_variables_named_like_diagnostics():
+    user_ns: dict = {}
+    result = render_math_cell("cache_stats := 3\ncache_stats*2", "rad", "exact", user_ns=user_ns)
+
+    assert result["ok"] is True
+    assert result["value"] == "6"
@@ -0,0 +1,58 @@
+import pytest
+import sympy as sp
+
+from sugarpy import math_cell
+from sugarpy.expression_guard import MAX_OPS_ENV, exceeds_size_limit, guard_size, size_limits
+
+
+def _iterated_radical(steps: int) -> sp.Expr:
+    value = 1 + sp.sqrt(2) + sp.cbrt(3)
+    for _ in range(steps):
+        value = (value + 5 / value) / 2
+    return value
+
+
+@pytest.mark.unit
+def test_size_limit_approximates_count_ops_and_depth():
+    value = _iterated_radical(3)
+    ops = sp.count_ops(value)
+
+    assert not exceeds_size_limit(value, ops, None)
+    assert exceeds_size_limit(value, ops // 2, None)
+    assert exceeds_size_limit(sp.sqrt(2 + sp.sqrt(2 + sp.sqrt(2))), None, 4)
+    assert not exceeds_size_limit(value, None, None)
+
+
+@pytest.mark.unit
+def test_oversized_numbers_become_high_precision_floats():
+    value = _iterated_radical(6)
+    guarded, replaced = guard_size([value, sp.sqrt(2)])
+
+    assert replaced
+    assert isinstance(guarded[0], sp.Float)
+    assert abs(guarded[0] - sp.sqrt(5)) < sp.Float("1e-25")
+    assert guarded[1] == sp.sqrt(2)
+
+
+@pytest.mark.unit
+def test_symbolic_values_and_disabled_limits_are_left_alone(monkeypatch):
+    x, y = sp.symbols("x y")
+    polynomial = sp.expand((x + y + 1) ** 12)
+    assert guard_size(polynomial) == (polynomial, False)
+
+    monkeypatch.setenv(MAX_OPS_ENV, "0")
+    assert size_limits()[0] is None
+    value = _iterated_radical(6)
+    assert guard_size(value) == (value, False)
+
+
+@pytest.mark.unit
+def test_math_statement_switches_to_numeric_once_the_value_blows_up():
+    user_ns = {}
+    math_cell._render_single_math("a := 1 + sqrt(2) + 3^(1/3)", "rad", user_ns)
+    results = [math_cell._render_single_math("a := (a + 5/a)/2", "rad", user_ns) for _ in range(7)]
+
+    assert math_cell.SIZE_FALLBACK_WARNING not in results[0]["warnings"]
+    assert any(math_cell.SIZE_FALLBACK_WARNING in result["warnings"] for result in results)
+    assert isinstance(user_ns["a"], sp.Float)
+    assert results[-1]["ok"]
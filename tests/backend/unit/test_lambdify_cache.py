@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import sympy as sp
+from sympy.utilities.lambdify import implemented_function
+
+from sugarpy import startup
+from sugarpy.lambdify_cache import cached_lambdify, clear_lambdify_cache, lambdify_cache_info
+from sugarpy.value_table import value_table
+
+x = sp.Symbol("x")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_lambdify_cache()
+    yield
+    clear_lambdify_cache()
+
+
+@pytest.mark.unit
+def test_equal_expressions_share_one_compiled_function():
+    first = cached_lambdify(x, sp.sin(x) + x**2)
+    second = cached_lambdify(sp.Symbol("x"), x**2 + sp.sin(x))
+
+    assert first is second
+    assert cached_lambdify(x, sp.sin(x) + x**2, "math") is not first
+    assert cached_lambdify(sp.Symbol("x", positive=True), sp.sin(x) + x**2) is not first
+    assert lambdify_cache_info()["hits"] == 1
+
+
+@pytest.mark.unit
+def test_float_precision_and_implemented_functions_are_kept_apart():
+    low = cached_lambdify(x, sp.Float("0.1", 15) * x)
+    high = cached_lambdify(x, sp.Float("0.1", 30) * x)
+    assert low is not high
+
+    double = implemented_function("f", lambda value: 2 * value)
+    triple = implemented_function("f", lambda value: 3 * value)
+    assert cached_lambdify(x, double(x))(2.0) == 4.0
+    assert cached_lambdify(x, triple(x))(2.0) == 6.0
+
+
+@pytest.mark.unit
+def test_plots_and_value_tables_reuse_compiled_curves():
+    with patch.object(startup, "display"):
+        startup.plot(sp.cos(x) / (1 + x**2))
+        startup.plot(sp.cos(x) / (1 + x**2), xmin=-3, xmax=3)
+    table = value_table(sp.cos(x) / (1 + x**2), var=x, start=0, end=2)
+
+    assert lambdify_cache_info()["misses"] == 1
+    assert lambdify_cache_info()["hits"] == 2
+    assert np.allclose(table.columns[0], np.cos(table.grid) / (1 + table.grid**2))
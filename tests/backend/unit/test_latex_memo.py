@@ -0,0 +1,59 @@
+import pytest
+import sympy as sp
+
+from sugarpy import latex_memo
+from sugarpy.latex_memo import clear_latex_memo, latex_memo_info, memo_latex
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    clear_latex_memo()
+    yield
+    clear_latex_memo()
+
+
+@pytest.mark.unit
+def test_repeated_and_equal_values_are_printed_once(monkeypatch):
+    calls = []
+    real_latex = sp.latex
+    monkeypatch.setattr(latex_memo.sp, "latex", lambda value: calls.append(value) or real_latex(value))
+    x = sp.Symbol("x")
+    value = sp.sqrt(2) * x / 3
+
+    assert memo_latex(value) == real_latex(value)
+    assert memo_latex(value) == real_latex(value)
+    # Clearing SymPy's constructor cache makes the rebuilt value equal but not identical.
+    sp.core.cache.clear_cache()
+    rebuilt = sp.sqrt(2) * sp.Symbol("x") / 3
+    assert rebuilt is not value
+    assert memo_latex(rebuilt) == real_latex(value)
+    assert len(calls) == 1
+    info = latex_memo_info()
+    assert info["identity"]["hits"] == 1
+    assert info["structural"]["hits"] == 1
+
+
+@pytest.mark.unit
+def test_float_values_are_only_memoized_by_identity():
+    low = sp.Float("0.1", 5)
+    high = sp.Float("0.1", 30)
+    assert memo_latex(low) == sp.latex(low)
+    assert memo_latex(high) == sp.latex(high)
+    assert latex_memo_info()["structural"]["size"] == 0
+
+
+@pytest.mark.unit
+def test_mutable_containers_are_not_memoized():
+    values = [sp.Rational(1, 3)]
+    assert memo_latex(values) == sp.latex([sp.Rational(1, 3)])
+    values.append(sp.Symbol("y"))
+    assert memo_latex(values) == sp.latex([sp.Rational(1, 3), sp.Symbol("y")])
+    assert latex_memo_info()["identity"]["size"] == 0
+
+
+@pytest.mark.unit
+def test_unevaluated_argument_order_is_kept_apart():
+    x, y = sp.symbols("x y")
+    assert memo_latex(sp.Mul(2, x, evaluate=False)) == "2 x"
+    assert memo_latex(sp.Mul(x, 2, evaluate=False)) == "x 2"
+    assert memo_latex(sp.Add(y, x, evaluate=False)) == sp.latex(sp.Add(y, x, evaluate=False))
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+import sympy as sp
+
+from sugarpy import math_cell
+from sugarpy.linear_solver import linsolve_linear_system, solve_linear_system
+
+x, y, z, a = sp.symbols("x y z a")
+
+
+def _random_system(size: int, seed: int) -> tuple[list[sp.Expr], tuple[sp.Symbol, ...]]:
+    rng = random.Random(seed)
+    unknowns = sp.symbols(f"v0:{size}")
+    equations = [
+        sum(rng.randint(-4, 4) * symbol for symbol in unknowns) - rng.randint(-9, 9) for _ in range(size)
+    ]
+    return equations, unknowns
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("seed", range(6))
+def test_exact_systems_match_sympy_solve_and_linsolve(seed: int):
+    equations, unknowns = _random_system(3 + seed, seed)
+
+    assert solve_linear_system(equations, (unknowns,)) == sp.solve(equations, unknowns)
+    assert linsolve_linear_system(equations, (unknowns,)) == sp.linsolve(equations, unknowns)
+
+
+@pytest.mark.unit
+def test_equations_inconsistent_systems_and_inferred_unknowns():
+    system = [sp.Eq(x + y, 3), sp.Eq(x - y, 1)]
+
+    assert solve_linear_system(system) == {x: 2, y: 1}
+    assert solve_linear_system([x + y - 3, 2 * x + 2 * y - 5], ((x, y),)) == []
+    assert linsolve_linear_system([x + y - 3, 2 * x + 2 * y - 5], (x, y)) == sp.S.EmptySet
+
+
+@pytest.mark.unit
+def test_float_systems_are_solved_numerically():
+    solution = solve_linear_system([0.5 * x + y - 3, x - 0.25 * y - 1], ((x, y),))
+    reference = sp.solve([0.5 * x + y - 3, x - 0.25 * y - 1], (x, y))
+
+    assert all(isinstance(value, sp.Float) for value in solution.values())
+    assert all(abs(solution[key] - reference[key]) < 1e-12 for key in reference)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "equations",
+    [
+        [x + y - 3, 2 * x + 2 * y - 6],
+        [a * x + y - 3, x - y - 1],
+        [x * y - 3, x - y - 1],
+        [sp.sqrt(2) * x + y - 3, x - y - 1],
+        [x + y + z - 1],
+    ],
+)
+def test_underdetermined_parametric_and_nonlinear_systems_fall_back(equations):
+    assert solve_linear_system(equations, ((x, y),)) is None
+
+
+@pytest.mark.unit
+def test_math_cell_linear_systems_keep_their_output():
+    result = math_cell._render_single_math("solve((x + y = 3, x - y = 1), (x, y))", "rad", {})
+    linsolve = math_cell._render_single_math("linsolve((x + y = 3, x - y = 1), (x, y))", "rad", {})
+    underdetermined = math_cell._render_single_math("solve((x + y = 3, 2x + 2y = 6), (x, y))", "rad", {})
+
+    assert result["ok"] and result["value"] == sp.latex({x: 2, y: 1})
+    assert linsolve["ok"] and linsolve["value"] == sp.latex(sp.FiniteSet((2, 1)))
+    assert underdetermined["ok"] and underdetermined["value"] == sp.latex({x: 3 - y})
+
+
+@pytest.mark.unit
+def test_unknowns_with_assumptions_are_left_to_sympy():
+    p, q = sp.symbols("p q", positive=True)
+    system = [sp.Eq(p + q, 1), sp.Eq(p - q, 3)]
+
+    assert solve_linear_system(system) is None
+    result = math_cell._render_single_math("solve(p + q = 1, p - q = 3)", "rad", {"p": p, "q": q})
+    assert result["ok"] and result["value"] == sp.latex(sp.solve(system))
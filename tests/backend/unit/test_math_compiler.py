@@ -0,0 +1,78 @@
+import pytest
+import sympy as sp
+
+from sugarpy.math_parser import (
+    _compile_direct,
+    _rewrite_expression_source,
+    get_expression_backend,
+    parse_math_input,
+    parse_sympy_expression,
+    set_expression_backend,
+)
+
+# Differential corpus: every entry must produce identical objects (or identical errors)
+# through `parse_expr` and the direct compiler.
+DIFFERENTIAL_CORPUS = [
+    "x^2", "2x", "(x+1)(x-1)", "x - y - z", "a - (b + c)", "a + (b - c)", "-x^2", "x^-2",
+    "2^3^2", "-2^2", "--x", "+x", "x*-1", "a/b/c", "a*b/c", "-x/y", "a/(b*c)", "1/2",
+    "3.5x^2 + .5y", "0.25", "00", "2 pi r", "a b c d", "E^2", "I^2",
+    "sin(30)", "cos(x)^2 + sin(x)^2", "sqrt(2)/2", "log(x, 2)", "ln(e)", "exp(1)", "abs(-3)",
+    "atan(1)", "asin(1/2)", "sin(x)*cos(x)/tan(x) - 1/x", "(h-3)^2 + (k-38)^2",
+    "solve(x^2 = 4, x)", "solve((x^2+y^2=25, y=2x+1), (x, y))", "solve({x + y = 3, x - y = 1}, {x, y})",
+    "linsolve([x + y - 2, x - y], (x, y))", "N(sqrt(2), 8)", "expand((x+1)^3)", "factor(x^2-1)",
+    "simplify(sin(x)^2+cos(x)^2)", "subs(x^2, x, 3)", "Eq(x, 1)", "render_decimal(x/3, 2)",
+    "[1, 2, 3]", "(1, 2)", "()", "[]", "{1, 2}", "A[0]", "A[0][1]", "A[1, 2]", "'str'", "True",
+    "f(x)", "g(2, 3)", "g(2, b=3)", "2(x+1)", "x(y)",
+    # Calls on constants are products and powers of functions apply to the call, as in parse_expr.
+    "2pi(r+1)", "pi(r+1)^2", "e(x+1)", "E(x+1)", "sin^2(x)", "cos^2(x) + sin^2(x)", "sqrt^2(2)",
+    # Outside the direct subset; these must fall back to parse_expr.
+    "x % 2", "x!", "math.sin(30)", "Add(x, 1)", "007", "x[1:2]", "{x: 1}",
+]
+
+
+def _evaluate(backend: str, source: str, mode: str):
+    previous = set_expression_backend(backend)
+    try:
+        value = parse_sympy_expression(
+            source,
+            mode=mode,
+            user_ns={"A": [[1, 2], [3, 4]], "g": lambda a, b: a * b},
+        )
+        return ("ok", sp.srepr(value) if isinstance(value, sp.Basic) else repr(value))
+    except Exception as exc:
+        return ("error", type(exc).__name__, str(exc))
+    finally:
+        set_expression_backend(previous)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["deg", "rad"])
+@pytest.mark.parametrize("source", DIFFERENTIAL_CORPUS)
+def test_direct_backend_matches_parse_expr(source: str, mode: str):
+    assert _evaluate("direct", source, mode) == _evaluate("parse_expr", source, mode)
+
+
+@pytest.mark.unit
+def test_direct_backend_keeps_unevaluated_structure():
+    previous = set_expression_backend("direct")
+    try:
+        value = parse_sympy_expression("x - y - z", mode="deg", user_ns={})
+    finally:
+        set_expression_backend(previous)
+    x, y, z = sp.symbols("x y z")
+    assert value.func is sp.Add
+    assert value.args == (x, sp.Mul(-1, y, evaluate=False), sp.Mul(-1, z, evaluate=False))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("source", ["x % 2", "x!", "math.sin(30)", "Add(x, 1)", "x[1:2]"])
+def test_unsupported_syntax_is_not_compiled(source: str):
+    parsed = parse_math_input(source)
+    assert _compile_direct(_rewrite_expression_source(parsed.normalized_source)) is None
+
+
+@pytest.mark.unit
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown Math expression backend"):
+        set_expression_backend("fast")
+    assert get_expression_backend() in {"parse_expr", "direct"}
@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from sugarpy.math_cell import _make_math_function, render_math_cell
+
+
+def _define(body: str, args: tuple[str, ...], user_ns: dict, mode: str = "deg"):
+    return _make_math_function("f", args, body, mode=mode, user_ns=user_ns)
+
+
+def _reference(body: str, args: tuple[str, ...], user_ns: dict, values: tuple, mode: str = "deg"):
+    fn = _define(body, args, dict(user_ns), mode=mode)
+    fn._sugarpy_compiled[0] = None
+    return fn(*values)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("body", "args", "values"),
+    [
+        ("x**2 + 2*3", ("x",), (3,)),
+        ("sqrt(x**2 + y**2)", ("x", "y"), (3, 4)),
+        ("sin(x) + cos(x)**2", ("x",), (30,)),
+        ("a*x**2 + b", ("x",), (sp.Rational(1, 2),)),
+        ("exp(-x)/(1 + x)", ("x",), (0.5,)),
+        ("log(x, 2) - abs(x)", ("x",), (-8,)),
+        ("x/y", ("x", "y"), (sp.Symbol("t"), 2)),
+        ("atan(x)", ("x",), (1,)),
+    ],
+)
+def test_compiled_math_function_matches_per_call_parse(body: str, args: tuple[str, ...], values: tuple):
+    user_ns = {"a": sp.Integer(3), "b": sp.Symbol("k")}
+    fn = _define(body, args, dict(user_ns))
+
+    assert fn._sugarpy_compiled[0] is not None
+    assert fn(*values) == _reference(body, args, user_ns, values)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("body", "args"),
+    [
+        ("sqrt((P[0]-Q[0])^2 + (P[1]-Q[1])^2)", ("P", "Q")),
+        ("solve(x^2 = a, x)", ("a",)),
+        ("N(x)", ("x",)),
+        ("g(x) + 1", ("x",)),
+        ("x = 2", ("x",)),
+        ("L[0] * x", ("x",)),
+    ],
+)
+def test_unsafe_math_function_bodies_keep_per_call_parse(body: str, args: tuple[str, ...]):
+    fn = _define(body, args, {"L": [1, 2]})
+    assert fn._sugarpy_compiled[0] is None
+
+
+@pytest.mark.unit
+def test_compiled_math_function_recompiles_when_globals_change():
+    user_ns = {"a": sp.Integer(2)}
+    fn = _define("a*x", ("x",), user_ns)
+    first = fn._sugarpy_compiled[0]
+
+    assert fn(5) == 10
+    user_ns["a"] = sp.Integer(7)
+    assert fn(5) == 35
+    assert fn._sugarpy_compiled[0] is not first
+
+    user_ns["c"] = sp.Integer(1)
+    body = fn._sugarpy_compiled[0]
+    assert fn(1) == 7
+    assert fn._sugarpy_compiled[0] is body
+
+
+@pytest.mark.unit
+def test_compiled_math_function_does_not_reparse_per_call():
+    fn = _define("x^2 + 1", ("x",), {})
+    with patch("sugarpy.math_cell.parse_sympy_expression") as parse:
+        assert fn(4) == 17
+        assert fn(sp.Symbol("y")) == sp.Symbol("y") ** 2 + 1
+    parse.assert_not_called()
+
+
+@pytest.mark.unit
+def test_compiled_math_function_evaluates_arrays_with_numpy():
+    fn = _define("sin(x)", ("x",), {}, mode="deg")
+    values = fn(np.array([0.0, 30.0, 90.0]))
+
+    assert isinstance(values, np.ndarray)
+    assert np.allclose(values, [0.0, 0.5, 1.0])
+
+
+@pytest.mark.unit
+def test_math_function_call_from_cell_uses_compiled_body():
+    class DummyShell:
+        def __init__(self):
+            self.user_ns = {}
+
+    dummy = DummyShell()
+    with patch("sugarpy.math_cell.get_ipython", return_value=dummy):
+        assert render_math_cell("g(t) := t^2 - 1")["ok"]
+        result = render_math_cell("g(3) + g(4)")
+
+    assert result["ok"]
+    assert result["value"] == "23"
+    assert dummy.user_ns["g"]._sugarpy_compiled[0] is not None
@@ -1,7 +1,24 @@
+import time
+
 import pytest
 import sympy as sp
 
-from sugarpy.math_parser import MathParseError, parse_math_input, parse_sympy_expression
+from sugarpy.math_parser import (
+    AUTO_SIMPLIFY_MAX_OPS,
+    MathParseError,
+    _rewrite_inline_equations,
+    _rewrite_plot_call_source,
+    build_math_locals,
+    canonical_difference,
+    canonicalize_equation,
+    clear_math_parse_cache,
+    lint_math_source,
+    math_parse_cache_info,
+    parse_math_input,
+    parse_sympy_expression,
+    set_canonicalize_policy,
+    split_math_statements,
+)
 
 
 @pytest.mark.unit
@@ -211,3 +228,223 @@ def test_plot_eq_calls_are_normalized_before_dispatch():
         "ymax": 6,
         "equal_axes": True,
     }
+
+
+@pytest.mark.unit
+def test_parse_cache_returns_shared_frozen_result_and_counts_hits():
+    clear_math_parse_cache()
+    first = parse_math_input("  a := (x+1)(x-1)  ")
+    second = parse_math_input("a := (x+1)(x-1)")
+
+    assert second is first
+    info = math_parse_cache_info()["parse"]
+    assert info["hits"] == 1
+    assert info["misses"] == 1
+    assert info["size"] == 1
+
+
+@pytest.mark.unit
+def test_parse_cache_replays_parse_errors():
+    clear_math_parse_cache()
+    for _ in range(2):
+        with pytest.raises(MathParseError, match="Comparison operators are unsupported"):
+            parse_math_input("x == 2")
+    assert math_parse_cache_info()["parse"]["hits"] == 1
+
+
+@pytest.mark.unit
+def test_rewrite_cache_is_used_for_repeated_expressions():
+    clear_math_parse_cache()
+    for _ in range(3):
+        expr = parse_sympy_expression("solve(x^2 = 4, x)", mode="deg", user_ns={})
+        assert expr == [-2, 2]
+    info = math_parse_cache_info()["rewrite"]
+    assert info["misses"] == 1
+    assert info["hits"] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("solve(x**2=4,x)", "solve(Eq(x**2, 4), x)"),
+        ("solve((x**2+y**2=25,y=2*x+1),(x,y))", "solve((Eq(x**2+y**2, 25), Eq(y, 2*x+1)), (x, y))"),
+        ("[x = 1, [y = 2, (z = 3)]]", "[Eq(x, 1), [Eq(y, 2), (Eq(z, 3))]]"),
+        ("f( x  =  y ^ 2 , 2 z )", "f(Eq(x, y**2), 2 z)"),
+        ("f(2x = 3y)", "f(Eq(2*x, 3*y))"),
+        ("f(x = )", "f(x =)"),
+        ("f(a=b=c)", "f(a=b=c)"),
+        ("g(x==1)", "g(x==1)"),
+        ("h(x:=1)", "h(x:=1)"),
+        ("f('a=b')", "f('a=b')"),
+        ("f(import = 2)", "f(import = 2)"),
+        ("a, b = c", "a, b = c"),
+    ],
+)
+def test_inline_equation_rewrite_matches_reference_output(source: str, expected: str):
+    assert _rewrite_inline_equations(source) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("plot(sin(t),t=0..10,samples=200)", "plot(sin(t), var=t, start=0, end=10, samples=200)"),
+        ("plot(f, [x, -1, 1])", "plot(f, xmin=-1, xmax=1)"),
+        ("plot(f, y, a, b)", "plot(f, ymin=a, ymax=b)"),
+        ("plot(plot(x), x=0..1)", "plot(plot(x), xmin=0, xmax=1)"),
+        ("plot(f, title='a,b')", "plot(f, title='a,b')"),
+        ("plot(f, z=3)", "plot(f, Eq(z, 3))"),
+        ("plot(f, x=..3)", "plot(f, Eq(x, ..3))"),
+        ("plot(f, x, 1)", "plot(f, x, 1)"),
+        ("plot(x)+1", "plot(x)+1"),
+        ("plot()", "plot()"),
+    ],
+)
+def test_plot_rewrite_matches_reference_output(source: str, expected: str):
+    assert _rewrite_plot_call_source(source) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("plot(x,\n  x = 0..1)\nx", [(1, "plot(x,\n  x = 0..1)"), (3, "x")]),
+        ("'a\nb'\nc", [(1, "'a\nb'"), (3, "c")]),
+        ("\n\n x \n\n y", [(3, "x"), (5, "y")]),
+        ("a)\nb\nc", [(1, "a)\nb\nc")]),
+        ("a := 1\r\nb := 2", [(1, "a := 1"), (2, "b := 2")]),
+        ('"unclosed\nstill"\nnext', [(1, '"unclosed\nstill"'), (3, "next")]),
+    ],
+)
+def test_statement_splitting_tracks_brackets_strings_and_lines(source: str, expected: list):
+    assert split_math_statements(source) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("source", "message"),
+    [
+        ("'unclosed", "unclosed string literal"),
+        ("x := (1", "unclosed bracket"),
+        ("f(x]", "unclosed bracket"),
+        ("f(1,) := 2", "Function arguments must be simple variable names."),
+        ("f(a)(b) := 2", "Function arguments must be simple variable names."),
+        ("a, := 3", "must be a variable name or comma-separated variable names"),
+        ("import os", "'import' is not allowed"),
+    ],
+)
+def test_parser_error_messages_are_preserved(source: str, message: str):
+    with pytest.raises(MathParseError, match=message):
+        parse_math_input(source)
+
+
+@pytest.mark.unit
+def test_deeply_nested_inline_equations_rewrite_in_linear_time():
+    def nested(depth: int) -> str:
+        return "f(" * depth + "x = 1" + ")" * depth
+
+    def best_time(source: str) -> float:
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            _rewrite_inline_equations(source)
+            samples.append(time.perf_counter() - start)
+        return min(samples)
+
+    small = best_time(nested(100))
+    large = best_time(nested(300))
+
+    assert _rewrite_inline_equations(nested(300)) == "f(" * 300 + "Eq(x, 1)" + ")" * 300
+    # Quadratic rescanning would make the 3x deeper input ~9x slower.
+    assert large < small * 6 + 0.05
+
+
+@pytest.mark.unit
+def test_math_locals_overlay_does_not_leak_between_statements():
+    first = build_math_locals(["a + sin(b)"], mode="deg", user_ns={"a": 2})
+    second = build_math_locals(["c"], mode="rad", user_ns={})
+
+    assert first["a"] == 2
+    assert first["b"] == sp.Symbol("b")
+    assert "a" not in second and "b" not in second
+    assert first["sin"] is not second["sin"]
+    assert second["sin"] is sp.sin
+    assert first["solve"] is second["solve"]
+
+
+@pytest.mark.unit
+def test_math_locals_namespace_helpers_bind_the_live_namespace():
+    user_ns = {}
+    mapping = build_math_locals(["set_decimal_places(2)"], mode="deg", user_ns=user_ns)
+
+    assert mapping["set_decimal_places"](2) == 2
+    assert user_ns["__sugarpy_decimal_places"] == 2
+    assert mapping["render_decimal"](sp.Rational(1, 3)).places == 2
+    assert mapping["math"].solve is mapping["solve"]
+    assert mapping["math"].cosh is sp.cosh
+
+
+@pytest.mark.unit
+def test_math_locals_ignore_call_syntax_inside_strings():
+    mapping = build_math_locals(["f(x) + 'g(y)'"], mode="deg", user_ns={"g": 3})
+
+    assert mapping["f"] == sp.Function("f")
+    assert "g" not in mapping
+
+
+@pytest.mark.unit
+def test_canonical_difference_policies():
+    x = sp.Symbol("x")
+    lhs = 1 / x + 1 / (x + 1)
+
+    assert canonical_difference(lhs, 1, policy="plain") == lhs - 1
+    assert canonical_difference(lhs, 1, policy="together") == sp.together(lhs - 1)
+    assert canonical_difference(lhs, 1, policy="cancel") == sp.cancel(lhs - 1)
+    assert canonical_difference(lhs, 1, policy="simplify") == sp.simplify(lhs - 1)
+    assert canonical_difference(sp.sin(x) ** 2 + sp.cos(x) ** 2, 1, policy="auto") == 0
+
+
+@pytest.mark.unit
+def test_auto_canonicalization_skips_simplify_for_large_differences():
+    x = sp.Symbol("x")
+    lhs = (x + 1) ** 8 * (x - 2) ** 5 / (x**2 + 3 * x + 1) ** 3 + sp.sin(x) ** 2 + sp.cos(x) ** 2
+    rhs = (2 * x + 1) ** 9 / (x**3 + 1)
+    assert sp.count_ops(lhs - rhs) > AUTO_SIMPLIFY_MAX_OPS
+
+    assert canonical_difference(lhs, rhs, policy="auto") == lhs - rhs
+
+
+@pytest.mark.unit
+def test_canonicalize_equation_follows_the_configured_policy():
+    x = sp.Symbol("x")
+    equation = sp.Eq(x * (x + 2), x**2, evaluate=False)
+
+    assert canonicalize_equation(equation) == 2 * x
+    previous = set_canonicalize_policy("plain")
+    try:
+        assert canonicalize_equation([equation]) == [x * (x + 2) - x**2]
+    finally:
+        set_canonicalize_policy(previous)
+    with pytest.raises(ValueError, match="Unknown Math canonicalization policy"):
+        set_canonicalize_policy("expand")
+
+
+@pytest.mark.unit
+def test_lint_math_source_reports_statement_spans_and_locates_errors():
+    source = "a := 3\n  f(x) := x^2 + a\nsolve(x == 2, x)\ng(2*(x + 1)"
+
+    linted = lint_math_source(source)
+
+    assert [(s["line_start"], source[s["start"] : s["end"]], s["kind"]) for s in linted["statements"][:2]] == [
+        (1, "a := 3", "assignment"),
+        (2, "f(x) := x^2 + a", "function_assignment"),
+    ]
+    assert linted["statements"][1]["normalized_source"] == "f(x) := x**2+a"
+    assert linted["ok"] is False
+    assert [(d["severity"], d["line"], source[d["start"] : d["end"]]) for d in linted["diagnostics"]] == [
+        ("warning", 3, "=="),
+        ("error", 4, "("),
+    ]
+    assert lint_math_source("open(1)")["diagnostics"][0]["end"] == 4
+    assert lint_math_source("  ") == {"ok": True, "kind": None, "normalized_source": "", "statements": [], "diagnostics": []}
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import pytest
+
+from sugarpy import math_cell
+from sugarpy.math_cell import _render_single_math, rerender_math_value
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "statements",
+    [
+        ["a := 1/3"],
+        ["u, v := 1/3, sqrt(2)"],
+        ["q := render_decimal(1/7, 3)"],
+        ["sqrt(2)"],
+        ["b := 5/2", "3.2*sin(41)^2 + b"],
+        ["set_decimal_places(2)", "1/9"],
+    ],
+)
+def test_lazy_render_cache_matches_direct_render(statements):
+    for requested, other in (("exact", "decimal"), ("decimal", "exact")):
+        lazy_ns: dict = {}
+        direct_ns: dict = {}
+        for source in statements:
+            lazy = _render_single_math(source, "deg", lazy_ns, render_mode=requested)
+            direct = _render_single_math(source, "deg", direct_ns, render_mode=other)
+        cache = lazy["render_cache"]
+        assert cache[requested] == {"steps": lazy["steps"], "value": lazy["value"]}
+        assert cache[other] is None
+        assert rerender_math_value(cache["token"], other) == {"steps": direct["steps"], "value": direct["value"]}
+
+
+@pytest.mark.unit
+def test_exact_render_skips_decimal_work_and_memoizes_rerender():
+    with patch.object(math_cell, "_apply_decimal_places", wraps=math_cell._apply_decimal_places) as apply_places:
+        result = _render_single_math("c := sqrt(8)/3", "deg", {}, render_mode="exact")
+        assert apply_places.call_count == 0
+        token = result["render_cache"]["token"]
+        first = rerender_math_value(token, "decimal")
+        second = rerender_math_value(token, "decimal")
+    assert apply_places.call_count == 1
+    assert first == second == {"steps": ["c = 0.9428"], "value": "0.9428"}
+
+
+@pytest.mark.unit
+def test_rerender_of_unknown_token_returns_none():
+    assert rerender_math_value("0123456789abcdef", "decimal") is None
+    with patch.object(math_cell, "display_sugarpy") as display:
+        payload = math_cell.display_math_render(["0123456789abcdef"], "decimal")
+    assert payload == {"render_mode": "decimal", "renders": {"0123456789abcdef": None}}
+    display.assert_called_once_with({**payload, "schema_version": 1}, math_cell.MATH_RENDER_MIME_TYPE)
@@ -0,0 +1,53 @@
+import socket
+
+from sugarpy.math_worker import MathWorker, recv_frame, send_frame
+
+
+def test_frames_round_trip_and_report_a_closed_peer():
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, {"method": "math", "params": {"source": "α := 2"}})
+        assert recv_frame(right) == {"method": "math", "params": {"source": "α := 2"}}
+        left.close()
+        assert recv_frame(right) is None
+
+
+def test_math_worker_keeps_definitions_and_records_math_history():
+    worker = MathWorker()
+
+    first = worker.handle({"method": "math", "params": {"source": "a := 3\nf(x) := x^2 + a", "cellId": "c1"}})
+    second = worker.handle({"method": "math", "params": {"source": "f(2)", "cellId": "c2"}})
+    stoich = worker.handle({"method": "stoich", "params": {"reaction": "H2 + O2 -> H2O"}})
+    unknown = worker.handle({"method": "nope"})
+
+    assert first["status"] == "ok"
+    assert second["mimeData"]["application/vnd.sugarpy.math+json"]["value"] == "7"
+    assert stoich["mimeData"]["application/vnd.sugarpy.stoich+json"]["ok"] is True
+    assert (unknown["status"], unknown["errorName"]) == ("error", "ValueError")
+    assert [request["params"]["cellId"] for request in worker.handle({"method": "history"})["history"]] == ["c1", "c2"]
+
+
+def test_math_worker_history_drops_superseded_reruns_of_the_last_cell():
+    worker = MathWorker()
+
+    def run(source, cell_id):
+        worker.handle({"method": "math", "params": {"source": source, "cellId": cell_id, "trigMode": "deg"}})
+
+    run("a := 1", "c0")
+    for step in range(1, 4):
+        run(f"b := a + {step}", "c1")
+    run("a := a + 1", "c2")
+    run("a := a + 1", "c2")
+    run("c := 5", "c3")
+    run("d := 6", "c3")
+
+    history = [(entry["params"]["cellId"], entry["params"]["source"]) for entry in worker.history]
+    assert history == [
+        ("c0", "a := 1"),
+        ("c1", "b := a + 3"),
+        # A re-run that reads what the previous run assigned, or drops one of its names, is kept.
+        ("c2", "a := a + 1"),
+        ("c2", "a := a + 1"),
+        ("c3", "c := 5"),
+        ("c3", "d := 6"),
+    ]
@@ -0,0 +1,147 @@
+from sugarpy.notebook_dataflow import (
+    NotebookDataflowTracker,
+    NotebookGraph,
+    code_cell_dataflow,
+    math_cell_dataflow,
+    plan_stages,
+)
+
+
+def _cells(*specs):
+    return [
+        {"id": f"c{index}", "type": cell_type, "source": source}
+        for index, (cell_type, source) in enumerate(specs, start=1)
+    ]
+
+
+def _fingerprint(cells, cell_id):
+    return next(cell["source"] for cell in cells if cell["id"] == cell_id)
+
+
+def _run(tracker, cells, cell_id, ok=True):
+    tracker.record_run(NotebookGraph(cells, "deg"), cell_id, _fingerprint(cells, cell_id), ok)
+
+
+def _reusable(tracker, cells, cell_id):
+    return tracker.can_reuse(NotebookGraph(cells, "deg"), cell_id, _fingerprint(cells, cell_id))
+
+
+def test_code_cell_dataflow_reads_names_bound_upstream_only():
+    flow = code_cell_dataflow(
+        "import numpy as np\n"
+        "total = offset + 1\n"
+        "scaled = total * factor\n"
+        "def helper(v):\n"
+        "    local = v * scaled\n"
+        "    return local + later\n"
+        "later = 2\n"
+        "items.append(scaled)\n"
+    )
+
+    assert flow.reads == {"offset", "factor", "items"}
+    assert flow.writes == {"np", "total", "scaled", "helper", "later"}
+    assert flow.mutates == {"items"}
+    assert flow.imports == {"np"}
+    assert not flow.opaque
+    assert flow.defines_functions
+    assert code_cell_dataflow("g = lambda v: v + 1").defines_functions
+    assert not code_cell_dataflow("total = [v + 1 for v in items]").defines_functions
+
+
+def test_code_cell_dataflow_marks_unanalysable_cells_opaque():
+    assert code_cell_dataflow("%matplotlib inline").opaque
+    assert code_cell_dataflow("from math import *").opaque
+    assert code_cell_dataflow("globals()['a'] = 1").opaque
+    assert not code_cell_dataflow("print(a)").opaque
+
+
+def test_math_cell_dataflow_follows_statements_in_order():
+    flow = math_cell_dataflow("a := 3\nb := a + k\nf(x) := b*x + m\nf(2)", "deg")
+
+    assert flow.reads == {"k", "m", "__sugarpy_decimal_places"}
+    assert flow.writes == {"a", "b", "f"}
+    assert flow.defines_functions
+    assert not math_cell_dataflow("a := 3\nf(2)", "deg").defines_functions
+
+
+def test_tracker_reuses_unchanged_cells_and_reruns_changed_downstream():
+    cells = _cells(("code", "a = 1"), ("math", "b := a + 1"), ("code", "c = b * 2"), ("code", "d = 5"))
+    tracker = NotebookDataflowTracker()
+    for cell_id in (cell["id"] for cell in cells):
+        _run(tracker, cells, cell_id)
+
+    assert [_reusable(tracker, cells, cell_id) for cell_id in (cell["id"] for cell in cells)] == [True, True, True, True]
+
+    cells[0]["source"] = "a = 2"
+    assert not _reusable(tracker, cells, "c1")
+    _run(tracker, cells, "c1")
+    assert not _reusable(tracker, cells, "c2")
+    _run(tracker, cells, "c2")
+    assert not _reusable(tracker, cells, "c3")
+    _run(tracker, cells, "c3")
+    assert _reusable(tracker, cells, "c4")
+
+
+def test_tracker_does_not_reuse_failed_self_updating_or_overwritten_cells():
+    cells = _cells(("code", "a = 1"), ("code", "a = a + 1"), ("code", "b = a"), ("code", "a = 10"))
+    tracker = NotebookDataflowTracker()
+    _run(tracker, cells, "c1")
+    _run(tracker, cells, "c2")
+    _run(tracker, cells, "c3", ok=False)
+    _run(tracker, cells, "c4")
+
+    assert not _reusable(tracker, cells, "c1")  # `a` was overwritten by c2 and c4
+    assert not _reusable(tracker, cells, "c2")  # reads what it writes
+    assert not _reusable(tracker, cells, "c3")  # failed
+    assert _reusable(tracker, cells, "c4")
+
+
+def test_tracker_reruns_everything_below_an_opaque_cell():
+    cells = _cells(("code", "a = 1"), ("code", "%time b = 2"), ("code", "c = 3"))
+    tracker = NotebookDataflowTracker()
+    for cell_id in (cell["id"] for cell in cells):
+        _run(tracker, cells, cell_id)
+
+    assert _reusable(tracker, cells, "c1")
+    assert not _reusable(tracker, cells, "c2")
+    _run(tracker, cells, "c2")
+    assert not _reusable(tracker, cells, "c3")
+
+
+def test_tracker_ignores_in_place_calls_on_imported_modules():
+    cells = _cells(("code", "import random"), ("code", "random.seed(1)\nvalue = 4"), ("code", "w = value"))
+    tracker = NotebookDataflowTracker()
+    for cell_id in (cell["id"] for cell in cells):
+        _run(tracker, cells, cell_id)
+
+    assert all(_reusable(tracker, cells, cell_id) for cell_id in (cell["id"] for cell in cells))
+
+
+def test_plan_stages_runs_independent_sections_after_the_shared_prefix_concurrently():
+    cells = _cells(
+        ("code", "import sympy as sp\nk = 2"),
+        ("markdown", "# Exercise 1"),
+        ("math", "a := k + 1"),
+        ("code", "b = a * 2"),
+        ("math", "c := k * 3"),
+        ("code", "d = c + 1"),
+        ("code", "e = 5"),
+        ("code", "total = b + d"),
+    )
+    graph = NotebookGraph(cells, "deg")
+
+    stages = [[[graph.cell_ids[index] for index in branch] for branch in stage] for stage in plan_stages(graph, 4)]
+
+    assert stages[0] == [["c1"]]
+    assert stages[1] == [["c3", "c4"], ["c5", "c6"], ["c7"]]
+    assert all(len(stage) == 1 for stage in stages[2:])
+    assert [cell_id for stage in stages[2:] for branch in stage for cell_id in branch] == ["c8"]
+    assert plan_stages(graph, 2)[1] == [[2, 3, 6], [4, 5]]
+    assert all(len(stage) == 1 for stage in plan_stages(graph, 1))
+
+
+def test_plan_stages_keeps_writers_of_the_same_name_and_opaque_cells_in_order():
+    cells = _cells(("code", "a = 1"), ("code", "a = 2"), ("code", "%time b = 3"), ("code", "c = 4"))
+    graph = NotebookGraph(cells, "deg")
+
+    assert plan_stages(graph, 4) == [[[0]], [[1]], [[2]], [[3]]]
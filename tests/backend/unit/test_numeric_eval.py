@@ -0,0 +1,79 @@
+import pytest
+import sympy as sp
+
+from sugarpy import math_cell
+from sugarpy.math_cell import _render_single_math, rerender_math_value
+from sugarpy.math_parser import numeric_expression, parse_math_input
+from sugarpy.numeric_eval import set_numeric_fast_path
+
+
+@pytest.fixture
+def fast_path():
+    yield
+    set_numeric_fast_path(True)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("trig_mode", ["deg", "rad"])
+@pytest.mark.parametrize(
+    "source",
+    [
+        "3.2*sin(41)^2 + 17/9",
+        "sin(180)",
+        "-cos(90)",
+        "atan(1)*4",
+        "asin(0.5) + acos(-1)",
+        "log(100, 10) + ln(e)",
+        "sqrt(8)/2 + 2^0.5",
+        "12345678901234567890/7",
+        "0.00015",
+        "2*pi*r + a",
+        "tan(90)",
+        "sqrt(-1)",
+        "1/0",
+        "abs(41)+tan(e)",
+        "tan(45) + 1",
+        "abs(asin(12))^3",
+        "(7/3)^(log(7/3-7/3))",
+        "ln(41-tan(3))",
+    ],
+)
+def test_fast_path_renders_like_the_symbolic_path(fast_path, trig_mode, source):
+    rendered = {}
+    for enabled in (True, False):
+        set_numeric_fast_path(enabled)
+        user_ns = {"a": sp.Rational(3, 2), "r": sp.Float("2.25")}
+        result = _render_single_math(source, trig_mode, user_ns, render_mode="decimal")
+        exact = rerender_math_value(result["render_cache"]["token"], "exact") if result["ok"] and result["value"] else None
+        rendered[enabled] = (result["ok"], result["steps"], result["value"], result["error"], exact)
+    assert rendered[True] == rendered[False]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("source", "user_ns"),
+    [
+        ("x + 1", {}),
+        ("diff(3, x)", {}),
+        ("k + 1", {"k": sp.Symbol("k")}),
+        ("plot + 1", {}),
+        ("a := 2", {}),
+        ("2 = 3", {}),
+    ],
+)
+def test_numeric_expression_rejects_symbols_and_cas_calls(source, user_ns):
+    assert numeric_expression(parse_math_input(source), user_ns) is None
+
+
+@pytest.mark.unit
+def test_fast_path_skips_sympy_until_the_exact_render(monkeypatch):
+    calls = []
+    parse = math_cell.parse_sympy_expression
+    monkeypatch.setattr(math_cell, "parse_sympy_expression", lambda *args, **kwargs: calls.append(args) or parse(*args, **kwargs))
+
+    result = _render_single_math("sqrt(2) + k", "deg", {"k": sp.Integer(1)}, render_mode="decimal")
+    assert (result["value"], calls) == ("2.4142", [])
+
+    exact = rerender_math_value(result["render_cache"]["token"], "exact")
+    assert exact == {"steps": ["1 + \\sqrt{2}"], "value": "1 + \\sqrt{2}"}
+    assert len(calls) == 1
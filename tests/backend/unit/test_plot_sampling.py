@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from sugarpy import startup
+
+x = sp.Symbol("x")
+
+
+def _plot(*args, **kwargs):
+    with patch.object(startup, "display"):
+        return startup.plot(*args, **kwargs)
+
+
+@pytest.mark.unit
+def test_straight_lines_stay_coarse():
+    trace = _plot(2 * x + 1)["data"][0]
+
+    assert len(trace["x"]) < 200
+    assert np.allclose(trace["y"], 2 * np.asarray(trace["x"]) + 1)
+
+
+@pytest.mark.unit
+def test_poles_are_refined_and_broken():
+    trace = _plot(sp.tan(x), xmin=-2, xmax=2, overscan=0)["data"][0]
+    xs = np.asarray(trace["x"], dtype=float)
+    ys = np.asarray(trace["y"], dtype=float)
+
+    gaps = xs[np.isnan(ys)]
+    assert np.allclose(np.sort(gaps), [-np.pi / 2, np.pi / 2], atol=1e-4)
+    assert np.nanmax(np.abs(ys)) > 1e4
+
+
+@pytest.mark.unit
+def test_domain_edges_are_refined_and_undefined_runs_collapsed():
+    trace = _plot(sp.sqrt(x), xmin=-4, xmax=4, overscan=0)["data"][0]
+    xs = np.asarray(trace["x"], dtype=float)
+    ys = np.asarray(trace["y"], dtype=float)
+
+    assert int(np.isnan(ys).sum()) == 1
+    assert xs[np.isfinite(ys)].min() < 1e-3
+
+
+@pytest.mark.unit
+def test_point_budget_caps_oscillating_curves():
+    figure = _plot(sp.sin(50 * x), samples=200)
+    trace = figure["data"][0]
+
+    assert len(trace["x"]) <= 600
+    assert figure["layout"]["yaxis"]["range"] == pytest.approx([-1.16, 1.16], abs=0.03)
+
+
+@pytest.mark.unit
+def test_plot_session_resamples_explicit_curves_for_a_viewport():
+    y = sp.Symbol("y")
+    figure = _plot(sp.sin(x), x**2 + y**2 - 1, 2 * x)
+    token = figure["plot_session"]
+
+    assert figure["layout"]["uirevision"] == token
+    resampled = startup.resample_plot(token, 100.0, 110.0, 300)
+    traces = resampled["traces"]
+    assert [trace["index"] for trace in traces] == [0, 1]
+    assert [figure["data"][trace["index"]]["name"] for trace in traces] == ["sin(x)", "2*x"]
+    xs = np.asarray(traces[0]["x"])
+    assert xs[0] == 100.0 and xs[-1] == 110.0
+    assert len(xs) <= 600
+    assert np.allclose(traces[0]["y"], np.sin(xs))
+
+
+@pytest.mark.unit
+def test_plot_resample_rpc_reports_unknown_sessions():
+    from sugarpy.kernel_rpc import run_request
+
+    bundle = run_request({"method": "plot", "params": {"token": "0" * 16, "xmin": 0, "xmax": 1, "widthPx": 400}}, {})
+
+    assert bundle[startup.PLOT_RESAMPLE_MIME_TYPE]["resample"] is None
+    token = _plot(x)["plot_session"]
+    with pytest.raises(ValueError):
+        startup.resample_plot(token, 1.0, 1.0, 400)
@@ -1,13 +1,22 @@
 import asyncio
 import json
 import os
+import time
 from pathlib import Path
 
 import pytest
 from IPython.core.interactiveshell import InteractiveShell
 from IPython.terminal.interactiveshell import TerminalInteractiveShell
 
-from sugarpy.runtime_manager import DockerKernelRuntime, RuntimeManager, RuntimeRecord
+from sugarpy.kernel_rpc import replay_requests
+from sugarpy.runtime_manager import (
+    DockerKernelRuntime,
+    KernelRpcUnavailable,
+    MathWorkerRuntime,
+    RuntimeManager,
+    RuntimeRecord,
+    StatelessCellPool,
+)
 
 
 class FakeRuntime:
@@ -290,6 +299,202 @@ def test_runtime_manager_inprocess_backend_starts_with_existing_interactive_shel
         TerminalInteractiveShell.clear_instance()
 
 
+def test_runtime_manager_inprocess_backend_answers_structured_requests(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("SUGARPY_NOTEBOOK_RUNTIME_BACKEND", "inprocess")
+    manager = RuntimeManager(
+        storage_root=tmp_path,
+        project_root=tmp_path,
+        bootstrap_code="from sugarpy.kernel_rpc import register_rpc_target\nregister_rpc_target()",
+        executor=lambda *_args, **_kwargs: None,
+    )
+    request = {"method": "math", "params": {"source": "a := 2\na + 1", "trigMode": "deg", "renderMode": "exact"}}
+
+    try:
+        asyncio.run(manager.ensure_runtime("nb-rpc"))
+        result, runtime = asyncio.run(manager.call_rpc("nb-rpc", request, 5.0))
+        namespace, _ = asyncio.run(manager.execute_code("nb-rpc", "a", 5.0))
+        failed, _ = asyncio.run(manager.call_rpc("nb-rpc", {"method": "nope"}, 5.0))
+
+        assert result["status"] == "ok"
+        assert "application/vnd.sugarpy.rpc+json" not in result["mimeData"]
+        assert result["mimeData"]["application/vnd.sugarpy.math+json"]["ok"] is True
+        assert runtime["status"] == "connected"
+        assert namespace["mimeData"]["text/plain"] == "2"
+        assert (failed["status"], failed["errorName"]) == ("error", "ValueError")
+    finally:
+        asyncio.run(manager.delete_runtime("nb-rpc"))
+        InteractiveShell.clear_instance()
+
+
+def test_runtime_manager_math_worker_upgrades_to_a_kernel_on_the_first_code_execution(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("SUGARPY_NOTEBOOK_RUNTIME_BACKEND", "inprocess")
+    manager = RuntimeManager(
+        storage_root=tmp_path,
+        project_root=tmp_path,
+        bootstrap_code="from sympy import *",
+        executor=lambda *_args, **_kwargs: None,
+    )
+    request = {"method": "math", "params": {"source": "a := 2\nf(x) := x^2 + a", "cellId": "c1"}}
+
+    async def scenario():
+        runtime = await manager.ensure_runtime("nb-math", math_only=True)
+        worker = manager._sessions["nb-math"]
+        try:
+            result, _ = await manager.call_rpc("nb-math", request, 10.0)
+            assert worker.process is not None and worker.process.returncode is None
+            upgraded, payload = await manager.execute_code("nb-math", "(a, f(3))", 30.0)
+            return runtime, worker, result, upgraded, payload
+        finally:
+            await manager.delete_runtime("nb-math")
+
+    try:
+        runtime, worker, result, upgraded, payload = asyncio.run(scenario())
+    finally:
+        InteractiveShell.clear_instance()
+
+    assert runtime["tier"] == "math"
+    assert result["mimeData"]["application/vnd.sugarpy.math+json"]["ok"] is True
+    assert upgraded["mimeData"]["text/plain"] == "(2, 11)"
+    assert payload["tier"] == "kernel"
+    assert worker.process is None
+
+
+@pytest.mark.parametrize("failing_step", ["start", "replay"])
+def test_math_worker_upgrade_restarts_the_worker_when_the_kernel_fails(tmp_path: Path, failing_step: str):
+    class FailingKernel(FakeRuntime):
+        async def start(self):
+            if failing_step == "start":
+                raise RuntimeError("Kernel did not become ready.")
+            await super().start()
+
+        async def execute(self, code: str, timeout_s: float):
+            raise TimeoutError("Notebook execution timed out after 21.0s.")
+
+    kernels: list[FakeRuntime] = []
+
+    def kernel_factory(record):
+        kernels.append(FailingKernel(record))
+        return kernels[-1]
+
+    record = RuntimeRecord(
+        notebook_id="nb-math",
+        status="connected",
+        backend="local",
+        container_name="fake-nb-math",
+        workspace_path=str(tmp_path),
+        connection_file_path=str(tmp_path / "kernel.json"),
+        created_at="2026-03-13T00:00:00Z",
+        last_activity_at="2026-03-13T00:00:00Z",
+        image="fake-image",
+        tier="math",
+    )
+    runtime = MathWorkerRuntime(
+        record, project_root=tmp_path, kernel_factory=kernel_factory, start_timeout_s=5.0, exec_timeout_s=20.0
+    )
+    events: list[str] = []
+
+    async def fake_request(request, timeout_s):
+        return {"history": [{"method": "math", "params": {"source": "a := 2", "cellId": "c1"}}]}
+
+    async def fake_stop_worker():
+        events.append("stop worker")
+
+    async def fake_start():
+        events.append("start worker")
+
+    runtime._request = fake_request
+    runtime._stop_worker = fake_stop_worker
+    runtime.start = fake_start
+
+    with pytest.raises(RuntimeError, match="runtime was restarted"):
+        asyncio.run(runtime.execute("a", 1.0))
+
+    assert events == ["stop worker", "start worker"]
+    assert kernels[0].stop_calls == [False]
+    assert runtime.kernel is None
+    assert record.tier == "math"
+
+
+def test_replay_reports_requests_that_only_fail_in_the_kernel():
+    broken = {"method": "nope", "params": {}}
+
+    replay_requests(json.dumps([{**broken, "failed": True}]))
+    with pytest.raises(RuntimeError, match="1 Math request"):
+        replay_requests(json.dumps([broken]))
+
+
+def test_stateless_cell_pool_recovers_from_timeouts_and_caches_results():
+    request = {"method": "stoich", "params": {"reaction": "H2 + O2 -> H2O", "inputs": {}}}
+    pool = StatelessCellPool(1)
+
+    async def scenario():
+        # No worker can have started within a millisecond.
+        with pytest.raises(TimeoutError):
+            await pool.call(request, 0.001)
+        first = await pool.call(request, 30.0)
+        second = await pool.call(dict(reversed(list(request.items()))), 30.0)
+        with pytest.raises(ValueError):
+            await pool.call({"method": "math", "params": {"source": "1+1"}}, 30.0)
+        return first, second
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        pool.close()
+
+    assert first["mimeData"]["application/vnd.sugarpy.stoich+json"]["ok"] is True
+    assert second == {**first, "durationMs": 0}
+    assert (pool.cache.hits, pool.cache.misses) == (1, 2)
+
+
+def test_stateless_cell_pool_timeout_fails_the_other_pending_requests_at_once():
+    slow = {"method": "stoich", "params": {"reaction": "H2 + O2 -> H2O", "inputs": {}}}
+    other = {"method": "stoich", "params": {"reaction": "C + O2 -> CO2", "inputs": {}}}
+    pool = StatelessCellPool(1)
+
+    async def scenario():
+        waiting = asyncio.create_task(pool.call(other, 30.0))
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        # No worker can have started within a millisecond, so both requests are still queued.
+        with pytest.raises(TimeoutError):
+            await pool.call(slow, 0.001)
+        with pytest.raises(RuntimeError, match="restarted"):
+            await waiting
+        elapsed = time.perf_counter() - started
+        retried = await pool.call(other, 30.0)
+        return elapsed, retried
+
+    try:
+        elapsed, retried = asyncio.run(scenario())
+    finally:
+        pool.close()
+
+    assert elapsed < 10.0
+    assert retried["mimeData"]["application/vnd.sugarpy.stoich+json"]["ok"] is True
+    assert pool._pending == {}
+
+
+def test_runtime_manager_remembers_runtimes_without_the_structured_request_target(tmp_path: Path):
+    manager = FakeRuntimeManager(tmp_path)
+    asyncio.run(manager.ensure_runtime("nb-old-image"))
+    runtime = manager._sessions["nb-old-image"]
+    calls = []
+
+    async def call(request, timeout_s):
+        calls.append(request)
+        raise KernelRpcUnavailable("no target")
+
+    runtime.call = call
+    for _attempt in range(2):
+        with pytest.raises(KernelRpcUnavailable):
+            asyncio.run(manager.call_rpc("nb-old-image", {"method": "math", "params": {}}, 5.0))
+
+    assert len(calls) == 1
+    assert runtime.record.status == "connected"
+    assert runtime.record.error is None
+
+
 class FakeAttachFailureRuntime(FakeRuntime):
     def __init__(self, record: RuntimeRecord):
         super().__init__(record)
@@ -1,15 +1,20 @@
 import asyncio
+import json
 import queue
 from types import SimpleNamespace
 
 import pytest
 from sugarpy import server_extension
+from sugarpy.runtime_manager import KernelRpcUnavailable
 
 from sugarpy.server_extension import (
     _execute_kernel_code,
     _load_assistant_server_config,
+    execute_math_render_request,
     execute_notebook_request,
+    execute_plot_resample_request,
     execute_sandbox_request,
+    math_parse_request,
     validate_restricted_python,
 )
 
@@ -170,6 +175,9 @@ def test_execute_notebook_request_returns_regression_payload():
         async def ensure_runtime(self, notebook_id):
             return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
 
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            raise KernelRpcUnavailable("kernel predates the SugarPy comm target")
+
         async def execute_code(self, notebook_id, code, timeout_s):
             return (
                 {
@@ -233,6 +241,54 @@ def test_execute_notebook_request_returns_regression_payload():
     }
 
 
+def test_execute_notebook_request_evaluates_stoich_cells_in_the_cell_pool(monkeypatch):
+    class FakeRuntimeManager:
+        def known_runtime_status(self, notebook_id):
+            return {"notebookId": notebook_id, "status": "disconnected", "backend": "docker"}
+
+        async def ensure_runtime(self, notebook_id, math_only=False):
+            raise AssertionError("stateless cells must not start a runtime")
+
+    class FakePool:
+        def __init__(self):
+            self.requests = []
+
+        async def call(self, request, timeout_s):
+            self.requests.append(request)
+            return {
+                "status": "ok",
+                "stdout": "",
+                "stderr": "",
+                "mimeData": {"application/vnd.sugarpy.stoich+json": {"ok": True, "balanced": "2H2 + O2 -> 2H2O"}},
+                "errorName": None,
+                "errorValue": None,
+            }
+
+    fake_manager = FakeRuntimeManager()
+    pool = FakePool()
+    monkeypatch.setattr(server_extension, "_runtime_manager", lambda: fake_manager)
+    monkeypatch.setattr(server_extension, "_CELL_POOL", pool)
+
+    response = asyncio.run(
+        execute_notebook_request(
+            {
+                "notebookId": "nb-pool",
+                "cells": [
+                    {"id": "code-1", "type": "code", "source": "a = 1"},
+                    {"id": "stoich-1", "type": "stoich", "stoichState": {"reaction": "H2 + O2 -> H2O", "inputs": {}}},
+                ],
+                "targetCellId": "stoich-1",
+                "timeoutMs": 5000,
+            }
+        )
+    )
+
+    assert pool.requests == [{"method": "stoich", "params": {"reaction": "H2 + O2 -> H2O", "inputs": {}}}]
+    assert response["status"] == "ok"
+    assert response["stoichOutput"]["balanced"] == "2H2 + O2 -> 2H2O"
+    assert (response["freshRuntime"], response["runtime"]["status"]) == (False, "disconnected")
+
+
 def test_load_jupyter_server_extension_starts_background_runtime_cleanup(monkeypatch):
     cleanup_calls: list[str] = []
 
@@ -415,6 +471,273 @@ def test_execute_notebook_request_converts_timeout_ms_to_seconds():
     assert response["runtime"]["timeoutUsed"] == 4.0
 
 
+def test_execute_math_render_request_runs_rerender_in_existing_runtime():
+    calls = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            raise AssertionError("re-rendering must not start a runtime")
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            raise KernelRpcUnavailable("kernel predates the SugarPy comm target")
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            calls.append(code)
+            return (
+                {
+                    "status": "ok",
+                    "stdout": "",
+                    "stderr": "",
+                    "mimeData": {
+                        "application/vnd.sugarpy.math-render+json": {
+                            "render_mode": "decimal",
+                            "renders": {"abc123": {"steps": ["x = 0.3333"], "value": "0.3333"}},
+                        }
+                    },
+                    "errorName": None,
+                    "errorValue": None,
+                },
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+    fake_manager = FakeRuntimeManager()
+
+    original_factory = server_extension._runtime_manager
+    server_extension._runtime_manager = lambda: fake_manager
+    try:
+        response = asyncio.run(
+            execute_math_render_request(
+                {"notebookId": "nb-render", "tokens": ["abc123", "not a token"], "renderMode": "decimal"}
+            )
+        )
+    finally:
+        server_extension._runtime_manager = original_factory
+
+    assert len(calls) == 1
+    assert 'display_math_render(["abc123"], "decimal")' in calls[0]
+    assert response["renders"] == {
+        "abc123": {"steps": ["x = 0.3333"], "value": "0.3333"},
+        "not a token": None,
+    }
+
+
+def test_execute_math_render_request_returns_empty_renders_without_runtime():
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            raise RuntimeError("Notebook runtime is not connected.")
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            raise RuntimeError("Notebook runtime is not connected.")
+
+    fake_manager = FakeRuntimeManager()
+
+    original_factory = server_extension._runtime_manager
+    server_extension._runtime_manager = lambda: fake_manager
+    try:
+        response = asyncio.run(
+            execute_math_render_request({"notebookId": "nb-render", "tokens": ["abc123"], "renderMode": "exact"})
+        )
+    finally:
+        server_extension._runtime_manager = original_factory
+
+    assert response == {"notebookId": "nb-render", "renderMode": "exact", "renders": {"abc123": None}}
+
+
+def test_execute_plot_resample_request_calls_the_existing_runtime():
+    calls = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            raise AssertionError("re-sampling must not start a runtime")
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            calls.append(request)
+            return (
+                {
+                    "status": "ok",
+                    "stdout": "",
+                    "stderr": "",
+                    "mimeData": {
+                        "application/vnd.sugarpy.plot-resample+json": {
+                            "token": "abc123",
+                            "resample": {"traces": [{"index": 0, "x": [0.0, 1.0], "y": [0.0, 1.0]}]},
+                        }
+                    },
+                    "errorName": None,
+                    "errorValue": None,
+                },
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+    fake_manager = FakeRuntimeManager()
+
+    original_factory = server_extension._runtime_manager
+    server_extension._runtime_manager = lambda: fake_manager
+    try:
+        response = asyncio.run(
+            execute_plot_resample_request(
+                {"notebookId": "nb-plot", "token": "abc123", "xmin": 0, "xmax": 1.5, "widthPx": 640}
+            )
+        )
+        with pytest.raises(server_extension.web.HTTPError):
+            asyncio.run(
+                execute_plot_resample_request({"token": "abc123", "xmin": 2, "xmax": 1, "widthPx": 640})
+            )
+    finally:
+        server_extension._runtime_manager = original_factory
+
+    assert calls == [
+        {"method": "plot", "params": {"token": "abc123", "xmin": 0.0, "xmax": 1.5, "widthPx": 640}}
+    ]
+    assert response == {
+        "notebookId": "nb-plot",
+        "token": "abc123",
+        "traces": [{"index": 0, "x": [0.0, 1.0], "y": [0.0, 1.0]}],
+    }
+
+
+def test_execute_notebook_request_gives_math_cells_a_budget_below_the_timeout():
+    calls = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            raise KernelRpcUnavailable("kernel predates the SugarPy comm target")
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            calls.append((code, timeout_s))
+            return (
+                {
+                    "status": "ok",
+                    "stdout": "",
+                    "stderr": "",
+                    "mimeData": {"application/vnd.sugarpy.math+json": {"ok": True, "steps": []}},
+                    "errorName": None,
+                    "errorValue": None,
+                },
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+    fake_manager = FakeRuntimeManager()
+
+    original_factory = server_extension._runtime_manager
+    server_extension._runtime_manager = lambda: fake_manager
+    try:
+        asyncio.run(
+            execute_notebook_request(
+                {
+                    "notebookId": "nb-budget",
+                    "cells": [{"id": "cell-1", "type": "math", "source": "solve(x^2 = 2, x)"}],
+                    "targetCellId": "cell-1",
+                    "trigMode": "deg",
+                    "defaultMathRenderMode": "exact",
+                    "timeoutMs": 8000,
+                }
+            )
+        )
+    finally:
+        server_extension._runtime_manager = original_factory
+
+    code, timeout_s = calls[0]
+    assert timeout_s == 8.0
+    assert 'time_budget_s=6.500, cell_id="cell-1")' in code
+
+
+def test_execute_notebook_request_sends_math_cells_as_structured_requests(monkeypatch):
+    requests = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            requests.append(request)
+            return (
+                {
+                    "status": "ok",
+                    "stdout": "",
+                    "stderr": "",
+                    "mimeData": {"application/vnd.sugarpy.math+json": {"ok": True, "steps": []}},
+                    "errorName": None,
+                    "errorValue": None,
+                },
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            raise AssertionError("math cells should not need generated source")
+
+    fake_manager = FakeRuntimeManager()
+    monkeypatch.setattr(server_extension, "_runtime_manager", lambda: fake_manager)
+    response = asyncio.run(
+        execute_notebook_request(
+            {
+                "notebookId": "nb-rpc",
+                "cells": [{"id": "cell-1", "type": "math", "source": "a := 2", "mathRenderMode": "decimal"}],
+                "targetCellId": "cell-1",
+                "trigMode": "rad",
+                "defaultMathRenderMode": "exact",
+                "timeoutMs": 8000,
+            }
+        )
+    )
+
+    assert response["mathOutput"] == {"ok": True, "steps": []}
+    assert requests == [
+        {
+            "method": "math",
+            "params": {
+                "source": "a := 2",
+                "trigMode": "rad",
+                "renderMode": "decimal",
+                "timeBudgetS": 6.5,
+                "cellId": "cell-1",
+            },
+        }
+    ]
+
+
+def test_execute_notebook_request_starts_math_only_notebooks_on_the_worker_tier(monkeypatch):
+    ensured = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id, math_only=False):
+            ensured.append(math_only)
+            return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
+
+        async def call_rpc(self, notebook_id, request, timeout_s):
+            return (
+                {"status": "ok", "stdout": "", "stderr": "", "mimeData": {}, "errorName": None, "errorValue": None},
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            return await self.call_rpc(notebook_id, {}, timeout_s)
+
+    fake_manager = FakeRuntimeManager()
+    monkeypatch.setattr(server_extension, "_runtime_manager", lambda: fake_manager)
+    monkeypatch.setenv("SUGARPY_MATH_WORKER", "1")
+    math_cells = [{"id": "m1", "type": "markdown", "source": "# Notes"}, {"id": "m2", "type": "math", "source": "a := 1"}]
+    for cells, target in ((math_cells, "m2"), (math_cells + [{"id": "c1", "type": "code", "source": "a"}], "m2")):
+        asyncio.run(execute_notebook_request({"notebookId": "nb-tier", "cells": cells, "targetCellId": target}))
+
+    assert ensured == [True, False]
+
+
 def test_execute_notebook_request_restarts_runtime_after_timeout():
     class FakeRuntimeManager:
         backend = "docker"
@@ -474,6 +797,33 @@ def test_execute_kernel_code_converts_queue_empty_to_timeout():
         asyncio.run(_execute_kernel_code(FakeClient(), "while True: pass", 5.0))
 
 
+def test_call_kernel_rpc_collects_display_outputs_until_idle():
+    def reply(msg_type, content):
+        return {"msg_type": msg_type, "parent_header": {"msg_id": "rpc-1"}, "content": content}
+
+    class FakeClient:
+        def __init__(self, acknowledged):
+            self.sent = []
+            self.session = SimpleNamespace(msg=lambda msg_type, content: {"header": {"msg_id": "rpc-1"}, "content": content})
+            self.shell_channel = SimpleNamespace(send=self.sent.append)
+            data = {"application/vnd.sugarpy.stoich+json": {"ok": True}}
+            if acknowledged:
+                data["application/vnd.sugarpy.rpc+json"] = {"status": "ok", "errorName": None, "errorValue": None}
+            self.replies = [reply("display_data", {"data": data}), reply("status", {"execution_state": "idle"})]
+
+        async def get_iopub_msg(self, timeout):
+            return self.replies.pop(0)
+
+    client = FakeClient(True)
+    result = asyncio.run(server_extension._call_kernel_rpc(client, {"method": "stoich", "params": {}}, 5.0))
+
+    assert client.sent[0]["content"]["target_name"] == "sugarpy.rpc"
+    assert result["status"] == "ok"
+    assert result["mimeData"] == {"application/vnd.sugarpy.stoich+json": {"ok": True}}
+    with pytest.raises(KernelRpcUnavailable):
+        asyncio.run(server_extension._call_kernel_rpc(FakeClient(False), {"method": "stoich", "params": {}}, 5.0))
+
+
 def test_execute_sandbox_request_returns_unavailable_when_docker_is_missing():
     class FakeRuntimeManager:
         backend = "unavailable"
@@ -684,3 +1034,124 @@ def test_execute_sandbox_request_full_notebook_replay_includes_prior_math_and_dr
     assert response["executedBootstrap"] is True
     assert response["replayedCellIds"] == ["cell-code", "cell-math"]
     assert response["contextSourcesUsed"] == ["bootstrap", "notebook", "draft"]
+
+
+def test_execute_notebook_request_reuses_unchanged_cells_during_run_all():
+    executed = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            executed.append(code)
+            return (
+                {"status": "ok", "stdout": "", "stderr": "", "mimeData": {}, "errorName": None, "errorValue": None},
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+    fake_manager = FakeRuntimeManager()
+    cells = [
+        {"id": "cell-1", "type": "code", "source": "value = 41"},
+        {"id": "cell-2", "type": "code", "source": "other = value + 1"},
+    ]
+
+    def run(target, reuse=True):
+        return asyncio.run(
+            execute_notebook_request(
+                {"notebookId": "nb-reuse", "cells": cells, "targetCellId": target, "reuseIfUnchanged": reuse}
+            )
+        )
+
+    original_factory = server_extension._runtime_manager
+    server_extension._runtime_manager = lambda: fake_manager
+    try:
+        first = [run("cell-1"), run("cell-2")]
+        second = [run("cell-1"), run("cell-2")]
+        cells[0]["source"] = "value = 1"
+        third = [run("cell-1"), run("cell-2")]
+        forced = run("cell-2", reuse=False)
+    finally:
+        server_extension._runtime_manager = original_factory
+        server_extension._DATAFLOW_TRACKERS.clear()
+
+    assert [response["reused"] for response in first] == [False, False]
+    assert [response["reused"] for response in second] == [True, True]
+    assert second[0]["status"] == "ok" and not second[0]["execCountIncrement"]
+    assert [response["reused"] for response in third] == [False, False]
+    assert not forced["reused"]
+    assert len(executed) == 5
+
+
+@pytest.mark.parametrize(
+    ("third_cell", "third_in_parent"),
+    [
+        ({"type": "code", "source": "b = k * 3"}, False),
+        ({"type": "math", "source": "b := k * 3"}, True),
+        ({"type": "code", "source": "plot(k * x)"}, True),
+    ],
+)
+def test_execute_notebook_plan_request_runs_independent_branches_in_one_execution(
+    monkeypatch, third_cell, third_in_parent
+):
+    executed = []
+
+    class FakeRuntimeManager:
+        backend = "docker"
+
+        async def ensure_runtime(self, notebook_id):
+            return {"notebookId": notebook_id, "status": "connected", "backend": "docker", "sessionState": "existing"}
+
+        async def execute_code(self, notebook_id, code, timeout_s):
+            executed.append(code)
+            mime_data = {}
+            if "display_branches" in code:
+                cells = [
+                    {"cellId": cell_id, "status": "ok", "stdout": "", "mimeData": {"text/plain": cell_id}}
+                    for cell_id in ("cell-2", "cell-3")
+                ]
+                mime_data = {server_extension.BRANCHES_MIME: {"cells": cells}}
+            return (
+                {"status": "ok", "stdout": "", "stderr": "", "mimeData": mime_data, "errorName": None, "errorValue": None},
+                {"notebookId": notebook_id, "status": "connected", "backend": "docker"},
+            )
+
+    fake_manager = FakeRuntimeManager()
+    monkeypatch.setenv("SUGARPY_PARALLEL_BRANCHES", "4")
+    monkeypatch.setattr(server_extension, "_runtime_manager", lambda: fake_manager)
+    try:
+        response = asyncio.run(
+            server_extension.execute_notebook_plan_request(
+                {
+                    "notebookId": "nb-plan",
+                    "cells": [
+                        {"id": "cell-1", "type": "code", "source": "k = 2"},
+                        {"id": "cell-2", "type": "code", "source": "a = k + 1"},
+                        {"id": "cell-3", **third_cell},
+                    ],
+                }
+            )
+        )
+    finally:
+        server_extension._DATAFLOW_TRACKERS.clear()
+
+    assert response["stages"] == [[["cell-1"]], [["cell-2"], ["cell-3"]]]
+    assert [result["cellId"] for result in response["results"]] == ["cell-1", "cell-2", "cell-3"]
+    assert response["results"][1]["output"]["data"] == {"text/plain": "cell-2"}
+    assert len(executed) == 2
+    assert "display_branches" in executed[1]
+    branches = json.loads(executed[1].split("display_branches(", 1)[1].rsplit(", time_budget_s=", 1)[0])
+    assert [branch["parent"] for branch in branches] == [False, third_in_parent]
+
+
+def test_math_parse_request_lints_a_batch_without_a_runtime(monkeypatch):
+    monkeypatch.setattr(server_extension, "_runtime_manager", lambda: pytest.fail("parsing must not need a runtime"))
+
+    response = math_parse_request({"sources": ["x^2 + 1", "x == 1"]})
+
+    assert [result["ok"] for result in response["results"]] == [True, False]
+    assert response["results"][0]["normalized_source"] == "x**2+1"
+    with pytest.raises(server_extension.web.HTTPError):
+        math_parse_request({"sources": ["x"] * (server_extension.MAX_MATH_PARSE_SOURCES + 1)})
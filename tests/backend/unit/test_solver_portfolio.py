@@ -0,0 +1,104 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+import sympy as sp
+
+from sugarpy import math_cell, solver_portfolio
+from sugarpy.solver_portfolio import Strategy, build_strategies, run_portfolio, set_solver_mode
+
+x, y = sp.symbols("x y")
+
+
+@pytest.fixture
+def portfolio_mode():
+    previous = set_solver_mode("portfolio")
+    yield
+    set_solver_mode(previous)
+
+
+def _render(source: str):
+    shell = SimpleNamespace(user_ns={})
+    with patch.object(math_cell, "get_ipython", return_value=shell):
+        return math_cell.render_math_cell(source, "rad")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "source",
+    [
+        "solve(x^2 = 4, x)",
+        "solve(x^4 - 10x^2 + 9 = 0, x)",
+        "solve((x^2 + y^2 = 25, y = 2x + 1), (x, y))",
+        "solve((x + y = 3, x - y = 1), (x, y))",
+    ],
+)
+def test_portfolio_answers_like_sequential_solve(portfolio_mode, source):
+    raced = _render(source)
+    set_solver_mode("sequential")
+    reference = _render(source)
+    assert raced["ok"] and reference["ok"]
+    assert raced["warnings"] == reference["warnings"] == []
+    assert sorted(raced["value"].split(r",\ ")) == sorted(reference["value"].split(r",\ "))
+
+
+@pytest.mark.unit
+def test_linear_systems_and_other_shapes_are_not_raced():
+    assert build_strategies([x + y - 3, x - y - 1], (x, y), lambda: None) is None
+    assert build_strategies(x**2 - 4, (x, y), lambda: None) is None
+    assert [s.name for s in build_strategies(x**2 - 4, x, lambda: None)] == ["solve", "solveset", "numeric"]
+
+
+@pytest.mark.unit
+def test_first_exact_answer_wins_and_slow_workers_are_killed():
+    started = time.perf_counter()
+    result = run_portfolio(
+        [
+            Strategy("solve", True, lambda: time.sleep(30)),
+            Strategy("solveset", True, lambda: [sp.Integer(2)]),
+        ]
+    )
+    assert result.value == [2]
+    assert result.strategy == "solveset"
+    assert result.exact is True
+    assert time.perf_counter() - started < 5.0
+
+
+@pytest.mark.unit
+def test_numeric_answer_is_used_after_the_grace_period(monkeypatch):
+    monkeypatch.setattr(solver_portfolio, "NUMERIC_GRACE_S", 0.2)
+    result = run_portfolio(
+        [
+            Strategy("solve", True, lambda: time.sleep(30)),
+            Strategy("numeric", False, lambda: [sp.Float(1.5)]),
+        ]
+    )
+    assert result.exact is False
+    assert result.value == [sp.Float(1.5)]
+
+
+@pytest.mark.unit
+def test_all_failures_reraise_the_solve_error():
+    def _fail(message):
+        def run():
+            raise NotImplementedError(message)
+
+        return run
+
+    with pytest.raises(NotImplementedError, match="from solve"):
+        run_portfolio([Strategy("solve", True, _fail("from solve")), Strategy("solveset", True, _fail("other"))])
+
+
+@pytest.mark.unit
+def test_numeric_fallback_is_labelled_in_the_cell(portfolio_mode):
+    result = _render("solve(cos(x) = x, x)")
+    assert result["ok"] is True
+    assert result["value"].startswith(r"\left[ 0.739")
+    assert any("numeric" in warning for warning in result["warnings"])
+
+
+@pytest.mark.unit
+def test_unknown_solver_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown Math solver mode"):
+        set_solver_mode("fastest")
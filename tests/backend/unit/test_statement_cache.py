@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from sugarpy import math_cell
+from sugarpy.math_parser import set_canonicalize_policy
+from sugarpy.solver_portfolio import set_solver_mode
+from sugarpy.statement_cache import StatementCapture, clear_cell_records
+
+CELL = "a := 3\nb := a^2 + 1\nc := b + 1"
+
+
+@pytest.fixture
+def run_cell():
+    clear_cell_records()
+    shell = SimpleNamespace(user_ns={})
+    calls: list[str] = []
+    original = math_cell._render_single_math
+
+    def _counting(source, *args, **kwargs):
+        calls.append(source)
+        return original(source, *args, **kwargs)
+
+    def _run(source: str, cell_id: str | None = "cell-1"):
+        calls.clear()
+        with (
+            patch.object(math_cell, "get_ipython", return_value=shell),
+            patch.object(math_cell, "_render_single_math", side_effect=_counting),
+        ):
+            return math_cell.render_math_cell(source, "rad", cell_id=cell_id), list(calls)
+
+    _run.user_ns = shell.user_ns
+    yield _run
+    clear_cell_records()
+
+
+@pytest.mark.unit
+def test_unchanged_cell_reuses_every_statement(run_cell):
+    first, first_calls = run_cell(CELL)
+    second, second_calls = run_cell(CELL)
+
+    assert first_calls == ["a := 3", "b := a^2 + 1", "c := b + 1"]
+    assert second_calls == []
+    assert second == first
+    assert run_cell.user_ns["c"] == 11
+
+
+@pytest.mark.unit
+def test_only_the_dirty_suffix_is_rerun(run_cell):
+    run_cell(CELL)
+    result, calls = run_cell(CELL.replace("c := b + 1", "c := b + 2"))
+
+    assert calls == ["c := b + 2"]
+    assert result["value"] == "12"
+    assert [entry["source"] for entry in result["trace"]] == ["a := 3", "b := a^2 + 1", "c := b + 2"]
+
+
+@pytest.mark.unit
+def test_rebound_inputs_rerun_from_the_first_reader(run_cell):
+    run_cell("b := a^2 + 1\nc := b + 1")
+    run_cell.user_ns["a"] = sp.Integer(5)
+    result, calls = run_cell("b := a^2 + 1\nc := b + 1")
+
+    assert calls == ["b := a^2 + 1", "c := b + 1"]
+    assert result["value"] == "27"
+
+
+@pytest.mark.unit
+def test_restored_writes_undo_later_rebinding(run_cell):
+    run_cell(CELL)
+    run_cell.user_ns["b"] = sp.Integer(100)
+    result, calls = run_cell(CELL)
+
+    assert calls == []
+    assert run_cell.user_ns["b"] == 10
+    assert result["value"] == "11"
+
+
+@pytest.mark.unit
+def test_math_function_inputs_are_tracked_through_the_body(run_cell):
+    run_cell("a := 2\nf(x) := a x", cell_id="defs")
+    run_cell("c := f(3)", cell_id="use")
+    run_cell.user_ns["a"] = sp.Integer(10)
+    result, calls = run_cell("c := f(3)", cell_id="use")
+
+    assert calls == ["c := f(3)"]
+    assert result["value"] == "30"
+
+
+@pytest.mark.unit
+def test_mutated_containers_and_unsupported_values_are_not_reused(run_cell):
+    run_cell("s := solve(x^2 = 4, x)\nn := s[0]")
+    run_cell.user_ns["s"].append(sp.Integer(7))
+    _result, calls = run_cell("s := solve(x^2 = 4, x)\nn := s[0]")
+    assert calls == ["s := solve(x^2 = 4, x)", "n := s[0]"]
+
+    run_cell.user_ns["arr"] = np.array([1.0, 2.0])
+    run_cell("m := arr")
+    _result, calls = run_cell("m := arr")
+    assert calls == ["m := arr"]
+
+
+@pytest.mark.unit
+def test_cells_without_an_id_and_errors_are_not_cached(run_cell):
+    run_cell(CELL, cell_id=None)
+    _result, calls = run_cell(CELL, cell_id=None)
+    assert len(calls) == 3
+
+    failed, _calls = run_cell("a := 3\nb := 1/0 +")
+    assert not failed["ok"]
+    _result, calls = run_cell("a := 3\nb := a + 1")
+    assert calls == ["b := a + 1"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("setter", "value"),
+    [(set_solver_mode, "portfolio"), (set_canonicalize_policy, "simplify")],
+)
+def test_changed_solver_settings_rerun_the_cell(run_cell, setter, value):
+    run_cell("s := solve(x^2 = 4, x)")
+    previous = setter(value)
+    try:
+        _result, calls = run_cell("s := solve(x^2 = 4, x)")
+    finally:
+        setter(previous)
+    assert calls == ["s := solve(x^2 = 4, x)"]
+
+
+@pytest.mark.unit
+def test_capture_remembers_only_the_assigned_names():
+    user_ns = {f"v{index}": sp.Integer(index) for index in range(100)}
+    capture = StatementCapture("a, b := v1, v2", ("rad", None, "sequential", "auto"), user_ns)
+
+    assert set(capture.before) == {"a", "b"}
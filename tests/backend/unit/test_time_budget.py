@@ -0,0 +1,95 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from sugarpy import math_cell
+from sugarpy.time_budget import (
+    DEFAULT_STATEMENT_TIMEOUT_S,
+    MathStatementTimeout,
+    statement_budget,
+    statement_timeout_s,
+)
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.unit
+def test_budget_interrupts_a_busy_statement():
+    started = time.perf_counter()
+    with pytest.raises(MathStatementTimeout):
+        with statement_budget(0.1):
+            _spin(5.0)
+    assert time.perf_counter() - started < 2.0
+
+
+@pytest.mark.unit
+def test_budget_does_not_fire_after_the_block_finishes():
+    with statement_budget(0.05):
+        pass
+    _spin(0.2)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [("", DEFAULT_STATEMENT_TIMEOUT_S), ("2.5", 2.5), ("0", None), ("soon", DEFAULT_STATEMENT_TIMEOUT_S)],
+)
+def test_statement_timeout_setting(monkeypatch, raw, expected):
+    monkeypatch.setenv("SUGARPY_MATH_STATEMENT_TIMEOUT_S", raw)
+    assert statement_timeout_s() == expected
+
+
+@pytest.mark.unit
+def test_slow_statement_returns_error_and_keeps_namespace(monkeypatch):
+    monkeypatch.setenv("SUGARPY_MATH_STATEMENT_TIMEOUT_S", "0.2")
+    render_single = math_cell._render_single_math
+
+    def _slow_on_marker(source, mode, user_ns, render_mode=None):
+        if source == "slow":
+            _spin(5.0)
+        return render_single(source, mode, user_ns, render_mode=render_mode)
+
+    shell = SimpleNamespace(user_ns={})
+    with (
+        patch.object(math_cell, "get_ipython", return_value=shell),
+        patch.object(math_cell, "_render_single_math", side_effect=_slow_on_marker),
+    ):
+        result = math_cell.render_math_cell("a := 3\nslow\nb := 4")
+        follow_up = math_cell.render_math_cell("a + 1")
+
+    assert result["ok"] is False
+    assert result["error"].startswith("Line 2: Too slow: stopped after")
+    assert result["trace"][0]["source"] == "a := 3"
+    assert shell.user_ns["a"] == 3
+    assert "b" not in shell.user_ns
+    assert follow_up["ok"] is True
+    assert follow_up["value"] == "4"
+
+
+@pytest.mark.unit
+def test_cell_budget_caps_the_statement_budget(monkeypatch):
+    monkeypatch.setenv("SUGARPY_MATH_STATEMENT_TIMEOUT_S", "30")
+    render_single = math_cell._render_single_math
+
+    def _slow_on_marker(source, mode, user_ns, render_mode=None):
+        if source == "slow":
+            _spin(5.0)
+        return render_single(source, mode, user_ns, render_mode=render_mode)
+
+    shell = SimpleNamespace(user_ns={})
+    started = time.perf_counter()
+    with (
+        patch.object(math_cell, "get_ipython", return_value=shell),
+        patch.object(math_cell, "_render_single_math", side_effect=_slow_on_marker),
+    ):
+        result = math_cell.render_math_cell("a := 3\nslow", time_budget_s=0.3)
+
+    assert time.perf_counter() - started < 2.0
+    assert result["error"].startswith("Line 2: Too slow")
+    assert shell.user_ns["a"] == 3
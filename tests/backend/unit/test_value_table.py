@@ -0,0 +1,86 @@
+import pytest
+import sympy as sp
+
+from sugarpy.math_cell import render_math_cell
+from sugarpy.math_parser import _rewrite_expression_source
+from sugarpy.value_table import MAX_TABLE_ROWS, value_table
+
+
+@pytest.mark.unit
+def test_table_ranges_are_rewritten_into_keywords():
+    assert _rewrite_expression_source("table(f(x), x = 0..10, step=0.5)") == "table(f(x), var=x, start=0, end=10, step=0.5)"
+    assert _rewrite_expression_source("table(x^2, (t, 0, 5), num=6)") == "table(x^2, var=t, start=0, end=5, num=6)"
+
+
+@pytest.mark.unit
+def test_table_evaluates_math_functions_over_the_grid_in_degree_mode():
+    user_ns: dict = {}
+    result = render_math_cell("f(x) := x^2 + 1\ntable(f(x), sin(x), x = 0..90, step=30)", "deg", "decimal", user_ns=user_ns)
+
+    assert result["ok"] is True
+    table = result["value_table"]
+    assert table["rows"] == 4
+    assert [column["values"] for column in table["columns"]] == [
+        [0.0, 30.0, 60.0, 90.0],
+        [1.0, 901.0, 3601.0, 8101.0],
+        [0.0, 0.5, 0.866, 1.0],
+    ]
+    assert result["trace"][1]["value_table"] == table
+
+
+@pytest.mark.unit
+def test_table_labels_columns_with_the_source_as_typed():
+    result = render_math_cell("a := 2\ntable(sin(x), 1/x, a*x, x = 30..90, step=30)", "deg", "decimal", user_ns={})
+
+    table = result["value_table"]
+    assert [column["label"] for column in table["columns"]] == [
+        "x",
+        r"\sin{\left(x \right)}",
+        r"\frac{1}{x}",
+        "a x",
+    ]
+    assert table["columns"][1]["values"] == [0.5, 0.866, 1.0]
+    assert table["columns"][3]["values"] == [60.0, 120.0, 180.0]
+
+
+@pytest.mark.unit
+def test_table_accepts_callables_and_marks_non_real_values():
+    x = sp.Symbol("x")
+    table = value_table(lambda value: sp.sqrt(value), 3, var=x, start=-1, end=1)
+
+    payload = table.payload(2)
+    assert payload["columns"][1]["values"] == [None, 0.0, 1.0]
+    assert payload["columns"][2]["values"] == [3.0, 3.0, 3.0]
+    assert [column["label"] for column in payload["columns"]] == ["x", r"\sqrt{x}", "3"]
+    assert [column["label"] for column in table.payload(2, ["g", "c"])["columns"]] == ["x", "g", "c"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("kwargs", "message"),
+    [
+        ({"start": 0, "end": 1, "step": 0}, "step must be nonzero"),
+        ({"start": 0, "end": 1, "step": -1}, "step must be nonzero"),
+        ({"start": 0, "end": MAX_TABLE_ROWS * 2}, "limited to"),
+        ({"start": 0}, "needs a range"),
+    ],
+)
+def test_table_rejects_bad_ranges(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        value_table(sp.Symbol("x") ** 2, **kwargs)
+
+
+@pytest.mark.unit
+def test_table_rejects_other_free_symbols():
+    result = render_math_cell("table(a*x, x = 0..1)", "deg", "decimal", user_ns={})
+    assert result["ok"] is False
+    assert "depends on a besides x" in result["error"]
+
+
+@pytest.mark.unit
+def test_table_yields_to_a_namespace_variable_of_the_same_name():
+    user_ns: dict = {}
+    result = render_math_cell("table := 3\ntable*2", "rad", "exact", user_ns=user_ns)
+
+    assert result["ok"] is True
+    assert result["value"] == "6"
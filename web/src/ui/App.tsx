@@ -2,6 +2,7 @@ import React, { useEffect, useMemo, useRef, useState } from 'react';
 
 import { FunctionEntry, useFunctionLibrary } from './hooks/useFunctionLibrary';
 import { NotebookCell } from './components/NotebookCell';
+import type { PlotResampleRequest } from './components/OutputArea';
 import { AssistantDrawer, AssistantDrawerSection } from './components/AssistantDrawer';
 import { OnboardingCoachmark } from './components/OnboardingCoachmark';
 import { ErrorBoundary } from './components/ErrorBoundary';
@@ -36,11 +37,14 @@ import {
 import {
   deleteNotebookRuntime,
   executeNotebookCell,
+  executeNotebookRunAll,
+  fetchMathRenders,
   fetchRuntimeConfig,
   interruptNotebookRuntime,
   restartNotebookRuntime,
   loadServerAutosave as loadServerAutosaveRequest,
   persistAssistantTraceToServer,
+  resamplePlot,
   saveNotebookDocument,
   saveServerAutosave as saveServerAutosaveRequest,
   SugarPyRuntimeConfig
@@ -82,6 +86,7 @@ import {
   mergeEditorCompletions,
   type EditorCompletionItem
 } from './utils/editorSymbols';
+import { fillMathRenderCache, missingMathRenderTokens, type MathRenderCache } from './utils/mathRenderCache';
 
 export type CellModel = {
   id: string;
@@ -90,11 +95,9 @@ export type CellModel = {
   type?: 'code' | 'markdown' | 'math' | 'stoich' | 'regression';
   execCount?: number;
   isRunning?: boolean;
+  lastRun?: 'executed' | 'reused';
   mathOutput?: {
-    render_cache?: {
-      exact: { steps: string[]; value?: string | null };
-      decimal: { steps: string[]; value?: string | null };
-    } | null;
+    render_cache?: MathRenderCache;
     kind: 'expression' | 'equation' | 'assignment';
     steps: string[];
     value?: string;
@@ -105,6 +108,7 @@ export type CellModel = {
     assigned?: string | null;
     mode: 'deg' | 'rad';
     plotly_figure?: unknown;
+    value_table?: { columns: Array<{ label: string; values: Array<number | null> }>; rows: number } | null;
     trace?: Array<{
       line_start: number;
       source: string;
@@ -112,10 +116,8 @@ export type CellModel = {
       steps: string[];
       value?: string | null;
       plotly_figure?: unknown;
-      render_cache?: {
-        exact: { steps: string[]; value?: string | null };
-        decimal: { steps: string[]; value?: string | null };
-      } | null;
+      value_table?: { columns: Array<{ label: string; values: Array<number | null> }>; rows: number } | null;
+      render_cache?: MathRenderCache;
     }>;
   };
   mathRenderMode?: 'exact' | 'decimal';
@@ -263,6 +265,7 @@ const MAX_ASSISTANT_IMPORT_TOTAL_BYTES = 30 * 1024 * 1024;
 const MAX_ASSISTANT_IMPORT_PDF_PAGES = 8;
 const MAX_ASSISTANT_IMPORT_ITEMS = 16;
 const ASSISTANT_PHOTO_IMPORT_MODEL = 'gpt-5.4-mini';
+const MATH_RENDER_BATCH_SIZE = 256;
 
 const getNotebookExecCounter = (cells: CellModel[]) =>
   cells.reduce((max, cell) => {
@@ -1355,10 +1358,15 @@ function App() {
       setCells((prev) =>
         prev.map((cell) => {
           if (cell.id !== cellId) return cell;
+          if (response.reused) {
+            // Source and upstream inputs are unchanged since the last run; keep its outputs.
+            return { ...cell, isRunning: false, lastRun: 'reused' };
+          }
           if (response.cellType === 'math') {
             return {
               ...cell,
               isRunning: false,
+              lastRun: 'executed',
               execCount: nextExecCount ?? cell.execCount,
               mathOutput: response.mathOutput as any,
               output: response.output as any,
@@ -1373,6 +1381,7 @@ function App() {
             return {
               ...cell,
               isRunning: false,
+              lastRun: 'executed',
               execCount: nextExecCount ?? cell.execCount,
               stoichOutput: response.stoichOutput as any,
               ui: {
@@ -1385,6 +1394,7 @@ function App() {
             return {
               ...cell,
               isRunning: false,
+              lastRun: 'executed',
               execCount: nextExecCount ?? cell.execCount,
               regressionOutput: response.regressionOutput as any,
               output: response.output as any,
@@ -1397,6 +1407,7 @@ function App() {
           return {
             ...cell,
             isRunning: false,
+            lastRun: 'executed',
             execCount: nextExecCount ?? cell.execCount,
             output: response.output as any,
             ui: {
@@ -1423,7 +1434,13 @@ function App() {
     }
   };
 
-  const runCell = async (cellId: string, code: string, showOutput = true, countExecution = true) => {
+  const runCell = async (
+    cellId: string,
+    code: string,
+    showOutput = true,
+    countExecution = true,
+    reuseIfUnchanged = false
+  ) => {
     if (!activeKernel) return;
     const executionGeneration = executionGenerationRef.current;
     setRuntimeNotice('');
@@ -1434,7 +1451,7 @@ function App() {
               ...cell,
               source: code,
               isRunning: true,
-              output: undefined,
+              output: reuseIfUnchanged ? cell.output : undefined,
               ui: {
                 ...cell.ui,
                 outputCollapsed: false
@@ -1450,7 +1467,8 @@ function App() {
         targetCellId: cellId,
         trigMode,
         defaultMathRenderMode,
-        timeoutMs: CELL_EXECUTION_TIMEOUT_MS
+        timeoutMs: CELL_EXECUTION_TIMEOUT_MS,
+        reuseIfUnchanged
       });
       if (executionGeneration !== executionGenerationRef.current) return;
       if (showOutput) {
@@ -1487,7 +1505,8 @@ function App() {
     source: string,
     renderModeOverride?: 'exact' | 'decimal',
     trigModeOverride?: 'deg' | 'rad',
-    preserveOutput = false
+    preserveOutput = false,
+    reuseIfUnchanged = false
   ) => {
     if (!activeKernel) return;
     const executionGeneration = executionGenerationRef.current;
@@ -1503,7 +1522,7 @@ function App() {
           ? {
               ...c,
               isRunning: true,
-              ...(preserveOutput ? {} : { mathOutput: undefined, output: undefined }),
+              ...(preserveOutput || reuseIfUnchanged ? {} : { mathOutput: undefined, output: undefined }),
               ui: {
                 ...c.ui,
                 outputCollapsed: false
@@ -1519,7 +1538,8 @@ function App() {
         targetCellId: cellId,
         trigMode,
         defaultMathRenderMode,
-        timeoutMs: CELL_EXECUTION_TIMEOUT_MS
+        timeoutMs: CELL_EXECUTION_TIMEOUT_MS,
+        reuseIfUnchanged
       });
       if (executionGeneration !== executionGenerationRef.current) return;
       applyExecutionResult(cellId, response, true);
@@ -1545,6 +1565,43 @@ function App() {
     }
   };
 
+  const requestedMathRendersRef = useRef(new Set<string>());
+
+  useEffect(() => {
+    if (!activeKernel) return;
+    const pending = new Map<'exact' | 'decimal', string[]>();
+    cells.forEach((cell) => {
+      if (cell.type !== 'math' || cell.isRunning || !cell.mathOutput) return;
+      const renderMode = cell.mathRenderMode ?? defaultMathRenderMode;
+      missingMathRenderTokens(cell.mathOutput, renderMode).forEach((token) => {
+        const key = `${renderMode}:${token}`;
+        if (requestedMathRendersRef.current.has(key)) return;
+        requestedMathRendersRef.current.add(key);
+        pending.set(renderMode, [...(pending.get(renderMode) ?? []), token]);
+      });
+    });
+    pending.forEach((tokens, renderMode) => {
+      for (let start = 0; start < tokens.length; start += MATH_RENDER_BATCH_SIZE) {
+        void fetchMathRenders({ notebookId, tokens: tokens.slice(start, start + MATH_RENDER_BATCH_SIZE), renderMode })
+          .then((response) => {
+            setCells((prev) =>
+              prev.map((cell) =>
+                cell.type === 'math' &&
+                cell.mathOutput &&
+                missingMathRenderTokens(cell.mathOutput, renderMode).some((token) => token in response.renders)
+                  ? { ...cell, mathOutput: fillMathRenderCache(cell.mathOutput, renderMode, response.renders) }
+                  : cell
+              )
+            );
+          })
+          .catch(() => undefined);
+      }
+    });
+  }, [activeKernel, cells, defaultMathRenderMode, notebookId]);
+
+  const handleResamplePlot = async (request: PlotResampleRequest, signal: AbortSignal) =>
+    (await resamplePlot({ notebookId, ...request }, signal)).traces;
+
   const runStoichCell = async (cellId: string, state: StoichState) => {
     if (!activeKernel) return;
     const executionGeneration = executionGenerationRef.current;
@@ -1655,6 +1712,51 @@ function App() {
     }
   };
 
+  const runAllCellsPlanned = async () => {
+    const executionGeneration = executionGenerationRef.current;
+    const queue = cellsRef.current.filter((cell) => cell.type !== 'markdown');
+    const reuseCellIds = queue
+      .filter((cell) => (cell.type === 'math' ? cell.mathOutput !== undefined : cell.output !== undefined))
+      .map((cell) => cell.id);
+    setRuntimeNotice('');
+    setCells((prev) => prev.map((cell) => (cell.type === 'markdown' ? cell : { ...cell, isRunning: true })));
+    try {
+      // The backend runs independent branches concurrently and answers in notebook order.
+      const response = await executeNotebookRunAll({
+        notebookId,
+        cells: cellsRef.current as Array<Record<string, unknown>>,
+        trigMode,
+        defaultMathRenderMode,
+        timeoutMs: CELL_EXECUTION_TIMEOUT_MS,
+        reuseCellIds
+      });
+      if (executionGeneration !== executionGenerationRef.current) return;
+      response.results.forEach((result) => applyExecutionResult(result.cellId, result, true));
+      const defs = queue
+        .filter((cell) => (cell.type ?? 'code') === 'code')
+        .flatMap((cell) => extractCodeSymbols(cell.source, 180))
+        .filter((item) => item.type === 'function')
+        .map((item) => item.label);
+      if (defs.length > 0) {
+        setUserFunctions((prev) => Array.from(new Set([...prev, ...defs])));
+      }
+    } catch (error) {
+      if (executionGeneration !== executionGenerationRef.current) return;
+      const message = error instanceof Error ? error.message : String(error);
+      setCells((prev) =>
+        prev.map((cell) =>
+          cell.isRunning
+            ? {
+                ...cell,
+                isRunning: false,
+                output: { type: 'error', ename: 'ExecutionError', evalue: message }
+              }
+            : cell
+        )
+      );
+    }
+  };
+
   const runAllCells = async () => {
     if (isRunningAll) return;
     if (!activeKernel) {
@@ -1664,17 +1766,24 @@ function App() {
     stopRunAllRequestedRef.current = false;
     setIsRunningAll(true);
     try {
+      if (runtimeConfig?.execution?.parallelRunAll) {
+        await runAllCellsPlanned();
+        return;
+      }
       const queue = [...cells];
       for (const cell of queue) {
         if (stopRunAllRequestedRef.current) break;
         activateCell(cell.id);
         if (cell.type === 'markdown') continue;
         if (cell.type === 'math') {
+          // The runtime skips cells whose source and upstream inputs are unchanged, keeping their outputs.
           await runMathCell(
             cell.id,
             cell.source,
             cell.mathRenderMode ?? defaultMathRenderMode,
-            cell.mathTrigMode ?? trigMode
+            cell.mathTrigMode ?? trigMode,
+            false,
+            cell.mathOutput !== undefined
           );
           if (stopRunAllRequestedRef.current) break;
           continue;
@@ -1689,7 +1798,7 @@ function App() {
           if (stopRunAllRequestedRef.current) break;
           continue;
         }
-        await runCell(cell.id, cell.source);
+        await runCell(cell.id, cell.source, true, true, cell.output !== undefined);
         if (stopRunAllRequestedRef.current) break;
       }
     } finally {
@@ -4077,6 +4186,7 @@ function App() {
                             );
                           }
                         }}
+                        onResamplePlot={handleResamplePlot}
                       />
                       {cellInsertMenu?.cellId === cell.id ? (
                         <div className="cell-insert-menu" ref={cellInsertMenuRef}>
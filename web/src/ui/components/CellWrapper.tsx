@@ -20,6 +20,7 @@ type Props = {
   isActive: boolean;
   isLastActive?: boolean;
   status: string;
+  lastRun?: 'executed' | 'reused';
   isRunning?: boolean;
   onRun?: () => void;
   onStop?: () => void;
@@ -34,6 +35,7 @@ export function CellWrapper({
   isActive,
   isLastActive = false,
   status,
+  lastRun,
   isRunning = false,
   onRun,
   onStop,
@@ -129,7 +131,12 @@ export function CellWrapper({
         ) : (
           <span className="cell-gutter-spacer" aria-hidden="true" />
         )}
-        <span className="cell-gutter-status" aria-label={status ? `Execution ${status}` : 'No execution count'}>
+        <span
+          className={`cell-gutter-status${lastRun === 'reused' ? ' is-reused' : ''}`}
+          data-last-run={lastRun}
+          title={lastRun === 'reused' ? 'Reused: unchanged since its last run' : undefined}
+          aria-label={status ? `Execution ${status}${lastRun === 'reused' ? ', reused' : ''}` : 'No execution count'}
+        >
           {status || '·'}
         </span>
       </div>
@@ -4,6 +4,13 @@ import { CodeEditor } from './CodeEditor';
 import type { EditorCompletionItem } from '../utils/editorSymbols';
 import { extractMathSymbols } from '../utils/editorSymbols';
 import { sugarPyMathLanguage } from '../utils/mathLanguage';
+import { parseMathSources, type SugarPyMathDiagnostic } from '../utils/backendApi';
+import { isMathRenderExpired, type MathRenderCache } from '../utils/mathRenderCache';
+
+type ValueTable = {
+  columns: Array<{ label: string; values: Array<number | null> }>;
+  rows: number;
+};
 
 type Props = {
   value: string;
@@ -11,10 +18,7 @@ type Props = {
   onRun: (value: string) => void;
   completions?: EditorCompletionItem[];
   output?: {
-    render_cache?: {
-      exact: { steps: string[]; value?: string | null };
-      decimal: { steps: string[]; value?: string | null };
-    } | null;
+    render_cache?: MathRenderCache;
     kind: 'expression' | 'equation' | 'assignment';
     steps: string[];
     value?: string;
@@ -24,6 +28,7 @@ type Props = {
     equation_latex?: string | null;
     assigned?: string | null;
     mode: 'deg' | 'rad';
+    value_table?: ValueTable | null;
     trace?: Array<{
       line_start: number;
       source: string;
@@ -31,10 +36,8 @@ type Props = {
       steps: string[];
       value?: string | null;
       plotly_figure?: unknown;
-      render_cache?: {
-        exact: { steps: string[]; value?: string | null };
-        decimal: { steps: string[]; value?: string | null };
-      } | null;
+      value_table?: ValueTable | null;
+      render_cache?: MathRenderCache;
     }>;
   };
   isRunning?: boolean;
@@ -47,6 +50,9 @@ type Props = {
   active?: boolean;
 };
 
+// Lint runs in the server process, so it can follow typing without waiting for a runtime.
+const MATH_LINT_DELAY_MS = 250;
+
 const shortcutItems = [
   { label: 'x^2', snippet: '^2' },
   { label: 'sqrt', snippet: 'sqrt(__CURSOR__)' },
@@ -57,7 +63,8 @@ const shortcutItems = [
   { label: 'expand', snippet: 'expand(__CURSOR__)' },
   { label: 'factor', snippet: 'factor(__CURSOR__)' },
   { label: 'N', snippet: 'N(__CURSOR__)' },
-  { label: 'plot', snippet: 'plot(__CURSOR__)' }
+  { label: 'plot', snippet: 'plot(__CURSOR__)' },
+  { label: 'table', snippet: 'table(__CURSOR__, x = 0..10, step=1)' }
 ];
 
 const withSourceBreakHints = (latex: string) =>
@@ -375,6 +382,40 @@ const isTrivialAssignmentSource = (source: string, stepCount: number, kind?: str
   return /^[\[\]\w\s,.-]+$/.test(rhs);
 };
 
+const renderInlineLatex = (latex: string) => {
+  try {
+    return katex.renderToString(latex, { throwOnError: false });
+  } catch (_err) {
+    return escapeLiteralLatex(latex);
+  }
+};
+
+function ValueTableView({ table }: { table: ValueTable }) {
+  const headers = useMemo(() => table.columns.map((column) => renderInlineLatex(column.label)), [table]);
+  return (
+    <div className="math-table-wrap" data-block-cell-swipe="true">
+      <table className="math-table" data-testid="math-table">
+        <thead>
+          <tr>
+            {headers.map((html, idx) => (
+              <th key={`head-${idx}`} dangerouslySetInnerHTML={{ __html: html }} />
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {Array.from({ length: table.rows }, (_unused, row) => (
+            <tr key={`row-${row}`}>
+              {table.columns.map((column, idx) => (
+                <td key={`cell-${row}-${idx}`}>{column.values[row] ?? '–'}</td>
+              ))}
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  );
+}
+
 const isDuplicateRenderedSource = (source: string, firstStep?: string | null) => {
   if (!source.trim() || !firstStep?.trim()) return false;
   return normalizeLatexForCompare(formatSourceLatex(source)) === normalizeLatexForCompare(firstStep);
@@ -398,6 +439,7 @@ export function MathEditor({
   const [draft, setDraft] = useState(value);
   const [dirty, setDirty] = useState(false);
   const [lastRendered, setLastRendered] = useState(value);
+  const [diagnostics, setDiagnostics] = useState<SugarPyMathDiagnostic[]>([]);
 
   useEffect(() => {
     setDraft(value);
@@ -405,6 +447,23 @@ export function MathEditor({
     setDirty(false);
   }, [value]);
 
+  useEffect(() => {
+    if (!dirty || !draft.trim()) {
+      setDiagnostics([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = window.setTimeout(() => {
+      parseMathSources([draft], controller.signal)
+        .then((response) => setDiagnostics(response.results[0]?.diagnostics ?? []))
+        .catch(() => undefined);
+    }, MATH_LINT_DELAY_MS);
+    return () => {
+      window.clearTimeout(timer);
+      controller.abort();
+    };
+  }, [draft, dirty]);
+
   const renderLatexSteps = (steps: string[]) =>
     steps.map((step) => {
       const safeStep = String(step ?? '');
@@ -418,16 +477,21 @@ export function MathEditor({
       }
     });
 
+  const renderExpired = isMathRenderExpired(output?.render_cache, renderMode);
+  const renderExpiredNotice = `Re-run this cell to show the ${renderMode} result.`;
+
   const renderedSteps = useMemo(() => {
+    if (renderExpired) return [];
     const steps = output?.render_cache?.[renderMode]?.steps ?? output?.steps ?? [];
     if (!steps.length) return [];
     return renderLatexSteps(steps);
-  }, [output?.render_cache, output?.steps, renderMode]);
+  }, [output?.render_cache, output?.steps, renderExpired, renderMode]);
 
   const renderedTrace = useMemo(() => {
     if (!output?.trace?.length || output.trace.length < 2) return null;
     return output.trace.map((item, idx) => {
-      const steps = item.render_cache?.[renderMode]?.steps ?? item.steps ?? [];
+      const expired = isMathRenderExpired(item.render_cache, renderMode);
+      const steps = expired ? [] : item.render_cache?.[renderMode]?.steps ?? item.steps ?? [];
       const rendered = steps.length ? renderLatexSteps(steps) : [];
       const hideDuplicatedSource =
         isTrivialAssignmentSource(item.source || '', rendered.length, item.kind) ||
@@ -435,6 +499,7 @@ export function MathEditor({
       return {
         idx,
         item,
+        expired,
         rendered,
         renderedSource: renderSourceMath(item.source || ''),
         showSource: !hideDuplicatedSource
@@ -450,11 +515,12 @@ export function MathEditor({
     const stepCount = output?.steps?.length ?? 0;
     if (renderedTrace) return false;
     if (isTrivialAssignmentSource(sourceText, stepCount, output?.kind)) return false;
+    if (renderExpired) return true;
     return !isDuplicateRenderedSource(
       sourceText,
       output?.render_cache?.[renderMode]?.steps?.[0] ?? output?.steps?.[0] ?? null
     );
-  }, [output?.kind, output?.render_cache, output?.steps, renderMode, renderedTrace, sourceText]);
+  }, [output?.kind, output?.render_cache, output?.steps, renderExpired, renderMode, renderedTrace, sourceText]);
 
   const runNow = (nextValue: string) => {
     if (isRunning) return;
@@ -478,7 +544,7 @@ export function MathEditor({
           <div className="math-error" data-testid="math-error">{output.error}</div>
         ) : renderedTrace ? (
           <div className="math-trace math-trace-card">
-            {renderedTrace.map(({ idx, item, rendered, renderedSource, showSource }) => (
+            {renderedTrace.map(({ idx, item, expired, rendered, renderedSource, showSource }) => (
               <div className="math-trace-item" key={`trace-${idx}`}>
                 {showSource ? (
                   <div className="math-trace-line">
@@ -507,9 +573,19 @@ export function MathEditor({
                     ))}
                   </div>
                 ) : null}
+                {expired ? (
+                  <div className="math-empty" data-testid="math-render-expired">
+                    {renderExpiredNotice}
+                  </div>
+                ) : null}
+                {item.value_table ? <ValueTableView table={item.value_table} /> : null}
               </div>
             ))}
           </div>
+        ) : renderExpired ? (
+          <div className="math-empty" data-testid="math-render-expired">
+            {renderExpiredNotice}
+          </div>
         ) : renderedSteps.length > 0 ? (
           <div className="math-steps">
             {renderedSteps.map((html, idx) => (
@@ -522,6 +598,8 @@ export function MathEditor({
               />
             ))}
           </div>
+        ) : output?.value_table ? (
+          <ValueTableView table={output.value_table} />
         ) : (
           <div className="math-empty">Click to edit.</div>
         )}
@@ -559,6 +637,15 @@ export function MathEditor({
           shortcutItems={shortcutItems}
         />
       </div>
+      {diagnostics.length ? (
+        <ul className="math-lint" data-testid="math-lint">
+          {diagnostics.map((diagnostic, idx) => (
+            <li className={`math-lint-item ${diagnostic.severity}`} key={`lint-${idx}`}>
+              Line {diagnostic.line}: {diagnostic.message}
+            </li>
+          ))}
+        </ul>
+      ) : null}
       <div className="math-inline-meta" aria-label="Math settings">
         <span>{renderMode === 'decimal' ? '≈' : '='}</span>
         <span>{trigMode === 'deg' ? '°' : 'rad'}</span>
@@ -8,8 +8,9 @@ import { RegressionCell } from './RegressionCell';
 import { StoichState } from '../utils/stoichTypes';
 import { RegressionState } from '../utils/regressionTypes';
 import { CellWrapper, CellMenuAction } from './CellWrapper';
-import { OutputArea } from './OutputArea';
+import { OutputArea, PlotResampleRequest } from './OutputArea';
 import type { EditorCompletionItem } from '../utils/editorSymbols';
+import type { SugarPyPlotTrace } from '../utils/backendApi';
 import { extractCodeSymbols } from '../utils/editorSymbols';
 
 type Props = {
@@ -42,6 +43,7 @@ type Props = {
   kernelReady: boolean;
   onSetMathRenderMode: (mode: 'exact' | 'decimal') => void;
   onSetMathTrigMode: (mode: 'deg' | 'rad') => void;
+  onResamplePlot?: (request: PlotResampleRequest, signal: AbortSignal) => Promise<SugarPyPlotTrace[] | null>;
 };
 
 const statusFromCell = (cell: CellModel) => {
@@ -109,7 +111,8 @@ export function NotebookCell({
   trigMode,
   kernelReady,
   onSetMathRenderMode,
-  onSetMathTrigMode
+  onSetMathTrigMode,
+  onResamplePlot
 }: Props) {
   const cellType = cell.type ?? 'code';
   const mathRenderMode = cell.mathRenderMode ?? 'exact';
@@ -172,6 +175,7 @@ export function NotebookCell({
         isActive={isActive}
         isLastActive={isLastActive}
         status={statusFromCell(cell)}
+        lastRun={cell.lastRun}
         isRunning={!!cell.isRunning}
         onRun={runHandler}
         onStop={cell.isRunning ? onStop : undefined}
@@ -222,7 +226,7 @@ export function NotebookCell({
             />
             {!outputHidden ? (
               <div data-testid="cell-output">
-                <OutputArea output={cell.output} />
+                <OutputArea output={cell.output} onResamplePlot={onResamplePlot} />
               </div>
             ) : null}
           </>
@@ -254,7 +258,7 @@ export function NotebookCell({
             />
             {!outputHidden ? (
               <div data-testid="cell-output">
-                <OutputArea output={cell.output} />
+                <OutputArea output={cell.output} onResamplePlot={onResamplePlot} />
               </div>
             ) : null}
           </>
@@ -1,11 +1,24 @@
-import React, { useMemo } from 'react';
+import React, { useCallback, useEffect, useMemo, useRef, useState } from 'react';
 import createPlotlyComponent from 'react-plotly.js/factory';
 import Plotly from 'plotly.js-dist-min';
 import katex from 'katex';
 import { CellOutput } from '../App';
+import type { SugarPyPlotTrace } from '../utils/backendApi';
 
 const Plot = createPlotlyComponent(Plotly as any);
 
+const PLOT_RESAMPLE_DEBOUNCE_MS = 150;
+// Fraction of the view re-sampled on each side, so a short pan does not reveal the curve's ends.
+const PLOT_RESAMPLE_MARGIN = 0.25;
+const MAX_PLOT_RESAMPLE_WIDTH_PX = 4096;
+
+export type PlotResampleRequest = {
+  token: string;
+  xmin: number;
+  xmax: number;
+  widthPx: number;
+};
+
 const asText = (value: unknown) => {
   if (Array.isArray(value)) return value.join('');
   if (value === null || value === undefined) return '';
@@ -21,9 +34,31 @@ const normalizeLatex = (value: unknown) => {
 
 type Props = {
   output?: CellOutput;
+  onResamplePlot?: (request: PlotResampleRequest, signal: AbortSignal) => Promise<SugarPyPlotTrace[] | null>;
 };
 
-export function OutputArea({ output }: Props) {
+const relayoutXRange = (event: Record<string, unknown>): [number, number] | null => {
+  const range = event['xaxis.range'];
+  const lower = Array.isArray(range) ? range[0] : event['xaxis.range[0]'];
+  const upper = Array.isArray(range) ? range[1] : event['xaxis.range[1]'];
+  if (typeof lower !== 'number' || typeof upper !== 'number' || !(lower < upper)) return null;
+  return [lower, upper];
+};
+
+export function OutputArea({ output, onResamplePlot }: Props) {
+  const plotRef = useRef<HTMLDivElement | null>(null);
+  const resampleTimerRef = useRef<number | null>(null);
+  const resampleAbortRef = useRef<AbortController | null>(null);
+  const [resampled, setResampled] = useState<{ token: string; traces: SugarPyPlotTrace[] } | null>(null);
+
+  useEffect(
+    () => () => {
+      if (resampleTimerRef.current !== null) window.clearTimeout(resampleTimerRef.current);
+      resampleAbortRef.current?.abort();
+    },
+    []
+  );
+
   if (!output) return null;
 
   const data = output.data ?? {};
@@ -36,6 +71,7 @@ export function OutputArea({ output }: Props) {
     const aspectLocked = Boolean(layout.yaxis?.scaleanchor || layout.xaxis?.scaleanchor);
     const plotHeight = typeof layout.height === 'number' ? layout.height : undefined;
     return {
+      session: typeof plotFigure.plot_session === 'string' ? (plotFigure.plot_session as string) : null,
       data: Array.isArray(plotFigure.data) ? plotFigure.data : [],
       layout: {
         dragmode: 'pan',
@@ -75,6 +111,54 @@ export function OutputArea({ output }: Props) {
     };
   }, [plotFigure]);
 
+  const plotSession = plotProps?.session ?? null;
+  const plotData = useMemo(() => {
+    if (!plotProps) return [];
+    if (!resampled || resampled.token !== plotSession) return plotProps.data;
+    const byIndex = new Map(resampled.traces.map((trace) => [trace.index, trace]));
+    return plotProps.data.map((trace: any, index: number) => {
+      const replacement = byIndex.get(index);
+      return replacement ? { ...trace, x: replacement.x, y: replacement.y } : trace;
+    });
+  }, [plotProps, plotSession, resampled]);
+
+  // Pan and zoom ask the kernel for the new view at screen resolution instead of shipping a wide range up front.
+  const handleRelayout = useCallback(
+    (event: Record<string, unknown>) => {
+      if (!plotSession || !onResamplePlot) return;
+      if (event['xaxis.autorange'] === true) {
+        setResampled(null);
+        return;
+      }
+      const range = relayoutXRange(event);
+      if (!range) return;
+      if (resampleTimerRef.current !== null) window.clearTimeout(resampleTimerRef.current);
+      resampleTimerRef.current = window.setTimeout(() => {
+        resampleTimerRef.current = null;
+        resampleAbortRef.current?.abort();
+        const controller = new AbortController();
+        resampleAbortRef.current = controller;
+        const margin = (range[1] - range[0]) * PLOT_RESAMPLE_MARGIN;
+        const viewWidth = plotRef.current?.clientWidth || 640;
+        const widthPx = Math.min(
+          MAX_PLOT_RESAMPLE_WIDTH_PX,
+          Math.max(1, Math.round(viewWidth * (1 + 2 * PLOT_RESAMPLE_MARGIN)))
+        );
+        void onResamplePlot(
+          { token: plotSession, xmin: range[0] - margin, xmax: range[1] + margin, widthPx },
+          controller.signal
+        )
+          .then((traces) => {
+            if (traces && !controller.signal.aborted) setResampled({ token: plotSession, traces });
+          })
+          .catch(() => {
+            // The traces already on screen stay; an evicted session or a busy kernel is not an error.
+          });
+      }, PLOT_RESAMPLE_DEBOUNCE_MS);
+    },
+    [onResamplePlot, plotSession]
+  );
+
   if (output.type === 'error') {
     const errorName = asText(output.ename).trim() || 'ExecutionError';
     const errorValue = asText(output.evalue).trim();
@@ -91,12 +175,13 @@ export function OutputArea({ output }: Props) {
 
   if (plotProps) {
     return (
-      <div className="output output-rich" data-testid="plotly-graph" data-block-cell-swipe="true">
+      <div className="output output-rich" data-testid="plotly-graph" data-block-cell-swipe="true" ref={plotRef}>
         <Plot
-          data={plotProps.data}
+          data={plotData}
           layout={plotProps.layout}
           config={plotProps.config}
           style={plotProps.style}
+          onRelayout={handleRelayout as any}
         />
       </div>
     );
@@ -19,6 +19,7 @@ export type SugarPyRuntimeConfig = {
     assistantSandboxAvailable?: boolean;
     assistantSandboxDockerOnly?: boolean;
     coldStartReplay?: boolean;
+    parallelRunAll?: boolean;
     runtimeBackend?: string;
   };
 };
@@ -30,6 +31,7 @@ export type SugarPyExecutionRequest = {
   trigMode: 'deg' | 'rad';
   defaultMathRenderMode: 'exact' | 'decimal';
   timeoutMs?: number;
+  reuseIfUnchanged?: boolean;
 };
 
 export type SugarPyExecutionResponse = {
@@ -47,11 +49,67 @@ export type SugarPyExecutionResponse = {
   regressionOutput?: Record<string, unknown>;
   freshRuntime?: boolean;
   execCountIncrement?: boolean;
+  reused?: boolean;
   replayedCellIds?: string[];
   securityProfile?: string;
   runtime?: Record<string, unknown>;
 };
 
+export type SugarPyRunAllRequest = Omit<SugarPyExecutionRequest, 'targetCellId' | 'reuseIfUnchanged'> & {
+  reuseCellIds?: string[];
+};
+
+export type SugarPyRunAllResponse = {
+  notebookId: string;
+  results: SugarPyExecutionResponse[];
+  stages: string[][][];
+};
+
+export type SugarPyMathRender = {
+  steps: string[];
+  value?: string | null;
+};
+
+export type SugarPyMathRenderResponse = {
+  notebookId: string;
+  renderMode: 'exact' | 'decimal';
+  renders: Record<string, SugarPyMathRender | null>;
+};
+
+export type SugarPyPlotTrace = {
+  index: number;
+  x: number[];
+  y: Array<number | null>;
+};
+
+export type SugarPyPlotResampleResponse = {
+  notebookId: string;
+  token: string;
+  traces: SugarPyPlotTrace[] | null;
+};
+
+export type SugarPyMathDiagnostic = {
+  severity: 'error' | 'warning';
+  message: string;
+  line: number;
+  start: number;
+  end: number;
+};
+
+export type SugarPyMathParseResult = {
+  ok: boolean;
+  kind: 'expression' | 'equation' | 'assignment' | 'function_assignment' | null;
+  normalized_source: string;
+  statements: Array<{
+    line_start: number;
+    start: number;
+    end: number;
+    kind: SugarPyMathParseResult['kind'];
+    normalized_source: string | null;
+  }>;
+  diagnostics: SugarPyMathDiagnostic[];
+};
+
 export type SugarPyNotebookRuntime = {
   notebookId: string;
   status: string;
@@ -63,6 +121,7 @@ export type SugarPyNotebookRuntime = {
   lastActivityAt?: string | null;
   image: string;
   error?: string | null;
+  tier?: 'math' | 'kernel';
   interrupted?: boolean;
   freshRuntime?: boolean;
   sessionState?: string;
@@ -138,6 +197,45 @@ export const executeNotebookCell = (payload: SugarPyExecutionRequest) =>
     body: JSON.stringify(payload)
   });
 
+export const executeNotebookRunAll = (payload: SugarPyRunAllRequest) =>
+  apiRequest<SugarPyRunAllResponse>('execute-all', {
+    method: 'POST',
+    body: JSON.stringify(payload)
+  });
+
+export const fetchMathRenders = (payload: {
+  notebookId: string;
+  tokens: string[];
+  renderMode: 'exact' | 'decimal';
+}) =>
+  apiRequest<SugarPyMathRenderResponse>('math/render', {
+    method: 'POST',
+    body: JSON.stringify(payload)
+  });
+
+export const resamplePlot = (
+  payload: {
+    notebookId: string;
+    token: string;
+    xmin: number;
+    xmax: number;
+    widthPx: number;
+  },
+  signal?: AbortSignal
+) =>
+  apiRequest<SugarPyPlotResampleResponse>('plot/resample', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+    signal
+  });
+
+export const parseMathSources = (sources: string[], signal?: AbortSignal) =>
+  apiRequest<{ results: SugarPyMathParseResult[] }>('math/parse', {
+    method: 'POST',
+    body: JSON.stringify({ sources }),
+    signal
+  });
+
 export const getNotebookRuntimeStatus = (notebookId: string) =>
   apiRequest<SugarPyNotebookRuntime>(`runtime/${encodeURIComponent(notebookId)}`);
 
@@ -0,0 +1,40 @@
+import assert from 'node:assert/strict';
+import test from 'node:test';
+
+import { fillMathRenderCache, isMathRenderExpired, missingMathRenderTokens } from './mathRenderCache.ts';
+
+const exactOnly = (token: string) => ({
+  exact: { steps: ['\\frac{1}{3}'], value: '1/3' },
+  decimal: null,
+  token
+});
+
+test('fillMathRenderCache stores the fetched mode for a live token', () => {
+  const output = { render_cache: exactOnly('a'), trace: [{ render_cache: exactOnly('b') }] };
+  const filled = fillMathRenderCache(output, 'decimal', {
+    a: { steps: ['0.3333'], value: '0.3333' },
+    b: { steps: ['0.5'], value: '0.5' }
+  });
+  assert.deepEqual(filled.render_cache?.decimal?.steps, ['0.3333']);
+  assert.deepEqual(filled.trace?.[0].render_cache?.decimal?.steps, ['0.5']);
+  assert.deepEqual(missingMathRenderTokens(filled, 'decimal'), []);
+});
+
+test('an evicted token marks the cache expired instead of keeping the other mode', () => {
+  const output = { render_cache: exactOnly('gone'), trace: [{ render_cache: exactOnly('kept') }] };
+  const filled = fillMathRenderCache(output, 'decimal', {
+    gone: null,
+    kept: { steps: ['0.5'], value: '0.5' }
+  });
+  assert.equal(isMathRenderExpired(filled.render_cache, 'decimal'), true);
+  assert.equal(isMathRenderExpired(filled.render_cache, 'exact'), false);
+  assert.equal(isMathRenderExpired(filled.trace?.[0].render_cache, 'decimal'), false);
+  assert.deepEqual(missingMathRenderTokens(filled, 'decimal'), []);
+});
+
+test('tokens missing from the response stay pending', () => {
+  const output = { render_cache: exactOnly('later') };
+  const filled = fillMathRenderCache(output, 'decimal', {});
+  assert.equal(isMathRenderExpired(filled.render_cache, 'decimal'), false);
+  assert.deepEqual(missingMathRenderTokens(filled, 'decimal'), ['later']);
+});
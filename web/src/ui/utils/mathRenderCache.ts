@@ -0,0 +1,43 @@
+export type MathRenderMode = 'exact' | 'decimal';
+
+export type MathRender = { steps: string[]; value?: string | null };
+
+export type MathRenderCache = {
+  exact: MathRender | null;
+  decimal: MathRender | null;
+  token?: string;
+  expired?: boolean;
+} | null;
+
+type MathRenderOutput = {
+  render_cache?: MathRenderCache;
+  trace?: Array<{ render_cache?: MathRenderCache }>;
+};
+
+// The kernel renders only the requested mode; the other one is fetched by token when the cell switches to it.
+export const missingMathRenderTokens = (output: MathRenderOutput, renderMode: MathRenderMode) =>
+  [output.render_cache, ...(output.trace ?? []).map((item) => item.render_cache)].flatMap((cache) =>
+    cache?.token && !cache.expired && !cache[renderMode] ? [cache.token] : []
+  );
+
+// A null render means the kernel no longer holds the token (evicted, restarted, or run in a branch worker),
+// so the cache is marked expired and the cell has to be re-run to show that mode.
+export const fillMathRenderCache = <T extends MathRenderOutput>(
+  output: T,
+  renderMode: MathRenderMode,
+  renders: Record<string, MathRender | null>
+): T => {
+  const fill = (cache: MathRenderCache | undefined): MathRenderCache | undefined => {
+    if (!cache?.token || cache[renderMode] || !(cache.token in renders)) return cache;
+    const rendered = renders[cache.token];
+    return rendered ? { ...cache, [renderMode]: rendered } : { ...cache, expired: true };
+  };
+  return {
+    ...output,
+    render_cache: fill(output.render_cache),
+    trace: output.trace?.map((item) => ({ ...item, render_cache: fill(item.render_cache) }))
+  } as T;
+};
+
+export const isMathRenderExpired = (cache: MathRenderCache | undefined, renderMode: MathRenderMode) =>
+  !!cache?.expired && !cache[renderMode];